@@ -1,11 +1,27 @@
 """Benchmarks for``dipy.reconst`` module."""
 
+import warnings
+
 import numpy as np
 
-from dipy.core.sphere import unique_edges
-from dipy.data import default_sphere
+from dipy.core.gradients import gradient_table
+from dipy.core.sphere import HemiSphere, disperse_charges, unique_edges
+from dipy.data import default_sphere, get_3shell_gtab, get_fnames
+from dipy.io.gradients import read_bvals_bvecs
+from dipy.reconst.dki import (
+    DiffusionKurtosisModel,
+    apparent_kurtosis_coef,
+    mean_kurtosis,
+)
+from dipy.reconst.mcsd import (
+    MultiShellDeconvModel,
+    have_cvxpy,
+    multi_shell_fiber_response,
+)
+from dipy.reconst.qti import QtiModel, dtd_covariance, qti_signal
 from dipy.reconst.recspeed import local_maxima
 from dipy.reconst.vec_val_sum import vec_val_vect
+from dipy.sims.voxel import multi_tensor, multi_tensor_dki
 
 
 class BenchRecSpeed:
@@ -36,6 +52,149 @@ class BenchVecValSum:
         vec_val_vect(self.evecs, self.evals)
 
 
+class BenchMCSD:
+    params = ["batched", "cvxpy"]
+    param_names = ["solver"]
+
+    def setup(self, solver):
+        if solver == "cvxpy" and not have_cvxpy:
+            raise NotImplementedError("cvxpy is not installed")
+        gtab = get_3shell_gtab()
+        wm = np.array([[1.7e-3, 0.4e-3, 0.4e-3, 25.0]] * 3)
+        gm = np.array([[4e-4, 4e-4, 4e-4, 40.0]] * 3)
+        csf = np.array([[3e-3, 3e-3, 3e-3, 100.0]] * 3)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            response = multi_shell_fiber_response(8, [0, 1000, 2000, 3500], wm, gm, csf)
+            self.models = {
+                name: MultiShellDeconvModel(gtab, response, solver=name)
+                for name in self.params
+                if name == "batched" or have_cvxpy
+            }
+        self.model = self.models[solver]
+
+        # Noisy random mixtures of the three tissue signals
+        mevals = np.array([wm[0, :3], wm[0, :3]])
+        s_wm, _ = multi_tensor(
+            gtab, mevals, S0=wm[0, 3], angles=[(0, 0), (60, 0)], fractions=[50, 50]
+        )
+        s_gm = gm[0, 3] * np.exp(-gtab.bvals * gm[0, 0])
+        s_csf = csf[0, 3] * np.exp(-gtab.bvals * csf[0, 0])
+        rng = np.random.default_rng(1234)
+        vf = rng.dirichlet(np.ones(3), size=(10, 10))
+        signal = np.dot(vf, [s_csf, s_gm, s_wm])
+        self.data = np.abs(signal + rng.normal(scale=1.0, size=signal.shape))
+
+    def time_fit(self, solver):
+        self.model.fit(self.data)
+
+    def track_max_rel_diff_to_cvxpy(self, solver):
+        if not have_cvxpy:
+            raise NotImplementedError("cvxpy is not installed")
+        coeff = self.model.fit(self.data).all_shm_coeff
+        ref = self.models["cvxpy"].fit(self.data).all_shm_coeff
+        return np.max(np.abs(coeff - ref)) / np.max(np.abs(ref))
+
+
+class BenchDKICLS:
+    params = ["batched", "cvxpy"]
+    param_names = ["solver"]
+
+    def setup(self, solver):
+        if solver == "cvxpy" and not have_cvxpy:
+            raise NotImplementedError("cvxpy is not installed")
+        _, fbvals, fbvecs = get_fnames(name="small_64D")
+        bvals, bvecs = read_bvals_bvecs(fbvals, fbvecs)
+        bvals = np.concatenate((bvals, bvals * 2), axis=0)
+        bvecs = np.concatenate((bvecs, bvecs), axis=0)
+        gtab = gradient_table(bvals, bvecs=bvecs)
+        self.models = {
+            name: DiffusionKurtosisModel(gtab, fit_method="CWLS", solver=name)
+            for name in self.params
+            if name == "batched" or have_cvxpy
+        }
+        self.model = self.models[solver]
+
+        # Noisy crossings of random orientations
+        rng = np.random.default_rng(1234)
+        mevals = np.array([[0.00099, 0, 0], [0.00226, 0.00087, 0.00087]] * 2)
+        signal = []
+        for _ in range(500):
+            theta, phi = rng.uniform(0, 180, 2), rng.uniform(0, 360, 2)
+            angles = [(theta[0], phi[0])] * 2 + [(theta[1], phi[1])] * 2
+            s, _, _ = multi_tensor_dki(
+                gtab,
+                mevals,
+                S0=100,
+                angles=angles,
+                fractions=[24, 26, 24, 26],
+                snr=None,
+            )
+            signal.append(s)
+        signal = np.array(signal)
+        self.data = np.abs(signal + rng.normal(scale=5.0, size=signal.shape))
+
+    def time_fit(self, solver):
+        self.model.fit(self.data)
+
+    def track_min_apparent_kurtosis(self, solver):
+        # Non-negative for solutions that satisfy the constraints
+        params = self.model.fit(self.data).model_params
+        akc = apparent_kurtosis_coef(params, default_sphere, min_kurtosis=-np.inf)
+        return np.min(akc)
+
+    def track_max_mk_diff_to_cvxpy(self, solver):
+        if not have_cvxpy:
+            raise NotImplementedError("cvxpy is not installed")
+        mk = mean_kurtosis(self.model.fit(self.data).model_params)
+        ref = mean_kurtosis(self.models["cvxpy"].fit(self.data).model_params)
+        return np.max(np.abs(mk - ref))
+
+
+class BenchQTISDPdc:
+    params = ["batched", "cvxpy"]
+    param_names = ["solver"]
+
+    def setup(self, solver):
+        if solver == "cvxpy" and not have_cvxpy:
+            raise NotImplementedError("cvxpy is not installed")
+        # Two shells of linear and planar tensor encoding
+        rng = np.random.default_rng(1234)
+        hsph = HemiSphere(theta=np.pi * rng.random(30), phi=2 * np.pi * rng.random(30))
+        hsph, _ = disperse_charges(hsph, 100)
+        bvecs = np.vstack([np.zeros(3)] + [hsph.vertices] * 4)
+        bvals = np.concatenate((np.zeros(1), np.repeat([1, 2, 1, 2], 30)))
+        btens = np.array(["LTE"] * 61 + ["PTE"] * 60)
+        gtab = gradient_table(bvals, bvecs=bvecs, btens=btens)
+        self.models = {
+            name: QtiModel(gtab, fit_method="SDPdc", solver=name)
+            for name in self.params
+            if name == "batched" or have_cvxpy
+        }
+        self.model = self.models[solver]
+
+        # Noisy signals of distributions of sticks with random orientations
+        data = []
+        for _ in range(200):
+            sticks = rng.standard_normal((5, 3))
+            sticks /= np.linalg.norm(sticks, axis=1, keepdims=True)
+            DTD = sticks[:, :, None] * sticks[:, None, :]
+            D = np.mean(DTD, axis=0)
+            data.append(qti_signal(gtab, D, dtd_covariance(DTD)))
+        data = np.array(data)
+        self.data = data * (1 + 0.02 * rng.standard_normal(data.shape))
+
+    def time_fit(self, solver):
+        self.model.fit(self.data)
+
+    def track_max_rel_diff_to_cvxpy(self, solver):
+        if not have_cvxpy:
+            raise NotImplementedError("cvxpy is not installed")
+        params = self.model.fit(self.data).params
+        ref = self.models["cvxpy"].fit(self.data).params
+        return np.max(np.abs(params - ref)) / np.max(np.abs(ref))
+
+
 # class BenchCSD:
 
 #     def setup(self):
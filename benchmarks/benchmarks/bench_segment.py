@@ -5,7 +5,7 @@ import numpy as np
 from dipy.data import get_fnames
 from dipy.io.streamline import load_tractogram
 from dipy.segment.clustering import QuickBundles as QB_New
-from dipy.segment.mask import bounding_box
+from dipy.segment.mask import bounding_box, multi_median
 from dipy.segment.metricspeed import Metric
 from dipy.tracking.streamline import Streamlines, set_number_of_points
 
@@ -24,6 +24,19 @@ class BenchMask:
         bounding_box(self.dense_vol)
 
 
+class BenchMultiMedian:
+    params = ["histogram", "scipy"]
+    param_names = ["method"]
+
+    def setup(self, method):
+        rng = np.random.default_rng(1234)
+        # Quantized volume, as found in integer-valued b0 images
+        self.vol = rng.integers(0, 64, size=(96, 96, 64)).astype(np.int16)
+
+    def time_multi_median(self, method):
+        multi_median(self.vol, 4, 4, method=method)
+
+
 class BenchQuickbundles:
     def setup(self):
         dtype = "float32"
@@ -1,14 +1,18 @@
 """A unified interface for performing and debugging optimization problems."""
 
 import abc
+from concurrent.futures import ThreadPoolExecutor
+import time
 import warnings
 
 import numpy as np
 import scipy.optimize as opt
 from scipy.optimize import minimize
+import scipy.sparse as sps
 
 from dipy.testing.decorators import warning_for_keywords
 from dipy.utils.logging import logger
+from dipy.utils.omp import determine_num_threads
 from dipy.utils.optpkg import optional_package
 
 cvxpy, have_cvxpy, _ = optional_package("cvxpy", min_version="1.4.1")
@@ -327,6 +331,779 @@ def sparse_nnls(
         iteration += 1
 
 
+class _ThreadedSpMV:
+    """Products with a sparse matrix and its transpose, split across threads.
+
+    The rows of ``X`` and of ``X.T`` are partitioned into contiguous blocks
+    stored in CSR format, so that each thread computes an independent slice
+    of the result. Dense matrices are used as is, as their products are
+    already multithreaded by BLAS.
+    """
+
+    def __init__(self, X, num_threads):
+        self.shape = X.shape
+        self.dtype = X.dtype
+        self.executor = None
+        if not sps.issparse(X) or num_threads == 1:
+            self._X = X
+            self._XT = X.T
+            self._blocks = self._blocks_T = None
+            return
+        X = sps.csr_array(X)
+        XT = sps.csr_array(X.T)
+        self._blocks = self._split(X, num_threads)
+        self._blocks_T = self._split(XT, num_threads)
+        self.executor = ThreadPoolExecutor(max_workers=num_threads)
+
+    @staticmethod
+    def _split(A, n_blocks):
+        # Balance the blocks on the number of non-zeros rather than rows
+        bounds = np.searchsorted(A.indptr, np.linspace(0, A.nnz, n_blocks + 1))
+        bounds[0], bounds[-1] = 0, A.shape[0]
+        bounds = np.unique(np.clip(bounds, 0, A.shape[0]))
+        return [A[i0:i1] for i0, i1 in zip(bounds[:-1], bounds[1:])]
+
+    def _product(self, blocks, v):
+        return np.concatenate(list(self.executor.map(lambda b: b @ v, blocks)))
+
+    def matvec(self, v):
+        if self._blocks is None:
+            return self._X @ v
+        return self._product(self._blocks, v)
+
+    def rmatvec(self, v):
+        if self._blocks_T is None:
+            return self._XT @ v
+        return self._product(self._blocks_T, v)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+@warning_for_keywords()
+def sparse_nnls_fista(
+    y,
+    X,
+    *,
+    beta0=None,
+    max_iter=1000,
+    tol=1e-6,
+    restart=True,
+    power_iter=30,
+    num_threads=None,
+    callback=None,
+):
+    r"""
+    Solve y=Xh for h >= 0, using accelerated projected gradient descent.
+
+    This is the FISTA algorithm :footcite:p:`Beck2009` applied to the
+    non-negative least-squares problem
+    :math:`\min_{h \geq 0} \frac{1}{2} \|Xh - y\|^2`, with a step size
+    set by the Lipschitz constant of the gradient and adaptive restart of the
+    momentum :footcite:p:`ODonoghue2015`. Contrary to :func:`sparse_nnls`,
+    it converges to the exact solution, and the products with ``X`` and
+    ``X.T`` are split across threads.
+
+    Parameters
+    ----------
+    y : 1-d array of shape (N)
+        The data. Needs to be dense.
+    X : ndarray. May be either sparse or dense. Shape (N, M)
+        The regressors
+    beta0 : 1-d array of shape (M), optional
+        Initial estimate of the parameters, e.g. the solution of a previous
+        fit on similar data (warm start). Negative values are set to 0.
+        Default: start from the origin.
+    max_iter : int, optional
+        Maximum number of iterations.
+    tol : float, optional
+        Stop when the relative decrease of the objective and the relative
+        change of the parameters between two iterations are both below this
+        value.
+    restart : bool, optional
+        Whether to reset the momentum when the objective increases.
+    power_iter : int, optional
+        Number of power iterations used to estimate the largest singular
+        value of ``X``, which sets the step size.
+    num_threads : int, optional
+        Number of threads used for the sparse matrix-vector products. If
+        None (default), the value of the ``OMP_NUM_THREADS`` environment
+        variable is used if it is set, otherwise all available threads are
+        used. If < 0, the maximal number of threads minus ``|num_threads + 1|``
+        is used (enter -1 to use as many threads as possible). 0 raises an
+        error.
+    callback : callable, optional
+        Called after each iteration as
+        ``callback(iteration, beta, objective, elapsed)``, where ``objective``
+        is :math:`\frac{1}{2} \|X\beta - y\|^2` and ``elapsed`` is the
+        duration of the iteration in seconds. Useful for profiling.
+
+    Returns
+    -------
+    beta : 1-d array of shape (M)
+        The estimate of the parameters.
+
+    References
+    ----------
+    .. footbibliography::
+
+    """
+    y = np.asarray(y, dtype=float)
+    num_threads = determine_num_threads(num_threads)
+    op = _ThreadedSpMV(X, num_threads)
+    try:
+        num_regressors = X.shape[1]
+        # Step size from the largest eigenvalue of X.T X, by power iteration.
+        # The estimate is increased slightly as it approaches it from below.
+        v = np.ones(num_regressors) / np.sqrt(num_regressors)
+        lipschitz = 0.0
+        for _ in range(power_iter):
+            w = op.rmatvec(op.matvec(v))
+            lipschitz = np.sqrt(np.dot(w, w))
+            if lipschitz == 0:
+                return np.zeros(num_regressors)
+            v = w / lipschitz
+        step = 1.0 / (1.01 * lipschitz)
+
+        if beta0 is None:
+            beta = np.zeros(num_regressors)
+        else:
+            beta = np.clip(np.array(beta0, dtype=float), 0, None)
+        X_beta = op.matvec(beta)
+        objective = 0.5 * np.sum((X_beta - y) ** 2)
+        # Extrapolated point and its image by X (X is linear, so the image of
+        # the extrapolated point is the extrapolation of the images):
+        z, X_z = beta, X_beta
+        t = 1.0
+
+        for iteration in range(1, max_iter + 1):
+            tic = time.perf_counter()
+            beta_old, X_beta_old, objective_old = beta, X_beta, objective
+            beta = z - step * op.rmatvec(X_z - y)
+            np.maximum(beta, 0, out=beta)
+            X_beta = op.matvec(beta)
+            objective = 0.5 * np.sum((X_beta - y) ** 2)
+
+            if restart and t > 1 and objective > objective_old:
+                # Restart the momentum from the previous iterate
+                t = 1.0
+                z, X_z = beta_old, X_beta_old
+                beta, X_beta, objective = beta_old, X_beta_old, objective_old
+                converged = False
+            else:
+                t_new = (1 + np.sqrt(1 + 4 * t**2)) / 2
+                momentum = (t - 1) / t_new
+                z = beta + momentum * (beta - beta_old)
+                X_z = X_beta + momentum * (X_beta - X_beta_old)
+                t = t_new
+                diff = np.sqrt(np.sum((beta - beta_old) ** 2))
+                norm = max(np.sqrt(np.sum(beta**2)), np.finfo(float).tiny)
+                converged = (objective_old - objective) <= tol * max(
+                    objective_old, np.finfo(float).tiny
+                ) and diff <= tol * norm
+
+            if callback is not None:
+                callback(iteration, beta, objective, time.perf_counter() - tic)
+            if converged:
+                break
+    finally:
+        op.close()
+
+    return beta
+
+
+@warning_for_keywords()
+def elastic_net_batched(
+    Y,
+    X,
+    *,
+    alpha=1.0,
+    l1_ratio=0.5,
+    positive=False,
+    fit_intercept=True,
+    beta0=None,
+    max_iter=1000,
+    tol=1e-4,
+):
+    r"""
+    Solve many elastic-net problems sharing the same regressors.
+
+    Each problem minimizes the objective of
+    :class:`sklearn.linear_model.ElasticNet`:
+
+    .. math::
+
+        \frac{1}{2 N} \|y_i - X \beta - c_i\|^2
+        + \alpha \rho \|\beta\|_1
+        + \frac{\alpha (1 - \rho)}{2} \|\beta\|^2
+
+    where :math:`\rho` is ``l1_ratio`` and :math:`c_i` an optional
+    intercept, with cyclic coordinate descent :footcite:p:`Friedman2010`.
+    Each coordinate is updated for all the problems at once, from the
+    residuals of all the problems, and problems that have converged drop out
+    of the iterations. With ``alpha=0``, ``positive=True`` and
+    ``fit_intercept=False`` this is a non-negative least-squares solver.
+
+    Parameters
+    ----------
+    Y : ndarray
+        The data of the problems, shape (n_problems, N), or a single vector
+        of N elements.
+    X : ndarray
+        The regressors, shape (N, M).
+    alpha : float, optional
+        Weight of the penalty terms.
+    l1_ratio : float, optional
+        Balance between the L1 (1) and L2 (0) penalties.
+    positive : bool, optional
+        Whether to constrain the parameters to be non-negative.
+    fit_intercept : bool, optional
+        Whether to fit an intercept :math:`c_i` to each problem. It is
+        eliminated by centering ``X`` and ``Y``.
+    beta0 : ndarray, optional
+        Initial estimate of the parameters, shape (n_problems, M), e.g. the
+        solutions of neighbouring problems (warm start). Default: start from
+        the origin.
+    max_iter : int, optional
+        Maximum number of passes over the coordinates.
+    tol : float, optional
+        A problem has converged when the largest update of its parameters
+        during a pass is below ``tol`` times its largest parameter.
+
+    Returns
+    -------
+    beta : ndarray
+        The estimate of the parameters, shape (n_problems, M).
+
+    References
+    ----------
+    .. footbibliography::
+
+    """
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    X = np.asarray(X, dtype=float)
+    n_samples, n_regressors = X.shape
+    if fit_intercept:
+        X = X - X.mean(axis=0)
+        Y = Y - Y.mean(axis=-1, keepdims=True)
+    # The objective is scaled by the number of samples, as in scikit-learn
+    l1_penalty = n_samples * alpha * l1_ratio
+    squared_norms = np.sum(X**2, axis=0)
+    denominator = squared_norms + n_samples * alpha * (1 - l1_ratio)
+    Xt = np.ascontiguousarray(X.T)
+
+    if beta0 is None:
+        beta = np.zeros((Y.shape[0], n_regressors))
+    else:
+        beta = np.array(np.broadcast_to(beta0, (Y.shape[0], n_regressors)))
+        if positive:
+            np.maximum(beta, 0, out=beta)
+    beta_out = beta.copy()
+    residual = Y - np.dot(beta, Xt)
+    rows = np.arange(Y.shape[0])
+
+    for _ in range(max_iter):
+        if rows.size == 0:
+            break
+        max_update = np.zeros(rows.size)
+        for j in np.flatnonzero(denominator):
+            old = beta[:, j]
+            rho = np.dot(residual, Xt[j]) + old * squared_norms[j]
+            if positive:
+                new = np.maximum(rho - l1_penalty, 0)
+            else:
+                new = np.sign(rho) * np.maximum(np.abs(rho) - l1_penalty, 0)
+            new /= denominator[j]
+            update = new - old
+            # Coordinates that stay at zero in all the problems are skipped
+            if np.any(update):
+                residual -= update[:, None] * Xt[j]
+                beta[:, j] = new
+                np.maximum(max_update, np.abs(update), out=max_update)
+
+        max_beta = np.abs(beta).max(axis=-1)
+        done = max_update <= tol * max_beta
+        if np.any(done):
+            beta_out[rows[done]] = beta[done]
+            keep = ~done
+            rows, beta, residual = rows[keep], beta[keep], residual[keep]
+
+    beta_out[rows] = beta
+    return beta_out
+
+
+def _max_step(v, dv):
+    """Largest step in [0, 1] keeping ``v + step * dv`` non-negative."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(dv < 0, -v / dv, np.inf)
+    return np.minimum(1, ratio.min(axis=-1))
+
+
+def _mat_vec(A, x):
+    """Products ``A x`` of a shared (2D) or stacked (3D) matrix."""
+    if A.ndim == 2:
+        return np.dot(x, A.T)
+    return np.einsum("nij,nj->ni", A, x)
+
+
+def _mat_t_vec(A, x):
+    """Products ``A' x`` of a shared (2D) or stacked (3D) matrix."""
+    if A.ndim == 2:
+        return np.dot(x, A)
+    return np.einsum("nji,nj->ni", A, x)
+
+
+def _newton_step(G, A, K_inv, d, s, z, r_dual, r_prim, r_eq, r_comp):
+    """Solve the reduced Newton system of the interior-point iterations."""
+    n = r_dual.shape[-1]
+    rhs = -r_dual - _mat_t_vec(G, d * r_prim + r_comp / s)
+    sol = np.einsum("...ij,...j", K_inv, np.concatenate([rhs, -r_eq], axis=-1))
+    dx, dy = sol[:, :n], sol[:, n:]
+    dz = d * (_mat_vec(G, dx) + r_prim) + r_comp / s
+    ds = (r_comp - s * dz) / z
+    return dx, dy, ds, dz
+
+
+@warning_for_keywords()
+def solve_qp_batched(P, Q, G, H, *, A=None, b=None, tol=1e-9, max_iter=50):
+    r"""
+    Solve many Quadratic Programs (QP) at once.
+
+    Each problem has the form::
+
+        minimize      1/2 x' P x + Q[i]' x
+        subject to    G x <= H
+                      A x == b
+
+    All the problems are solved simultaneously with a primal-dual
+    interior-point method with Mehrotra predictor-corrector steps
+    :footcite:p:`Mehrotra1992`. The Newton systems of all the problems are
+    assembled with matrix products and solved as a stack, and problems that
+    have converged drop out of the iterations. ``P``, ``G``, ``H``, ``A`` and
+    ``b`` are either shared by all the problems or given for each of them,
+    with an extra leading dimension. Shared matrices are factorized only
+    once.
+
+    The Newton matrices ``P + G' diag(z / s) G`` differ from one problem to
+    the next, so they are not factorized once for all the problems as a
+    first-order method (e.g. ADMM) would do with ``P + rho G' G``. On
+    ill-conditioned and degenerate problems such as the multi-shell
+    deconvolution of :class:`dipy.reconst.mcsd.MultiShellDeconvModel`, ADMM
+    does not reach a feasible solution of the requested accuracy in a few
+    thousand iterations, whereas the interior-point method converges in a few
+    tens.
+
+    Parameters
+    ----------
+    P : ndarray
+        n x n positive semi-definite matrix for the primal QP objective
+        function, or N x n x n matrices.
+    Q : ndarray
+        N x n matrix holding the linear terms of the N problems (or a single
+        vector of n elements).
+    G : ndarray
+        m x n matrix for the inequality constraint, or N x m x n matrices.
+    H : ndarray
+        m x 1 matrix for the inequality constraint, or N x m matrix.
+    A : ndarray, optional
+        k x n matrix for the equality constraint, or N x k x n matrices.
+    b : ndarray, optional
+        k x 1 matrix for the equality constraint, or N x k matrix.
+    tol : float, optional
+        Relative tolerance on the primal and dual residuals and on the
+        duality gap.
+    max_iter : int, optional
+        Maximum number of iterations.
+
+    Returns
+    -------
+    x : array
+        Optimal solutions of the QP problems, shape (N, n). Problems that did
+        not converge within ``max_iter`` iterations are filled with NaN.
+
+    References
+    ----------
+    .. footbibliography::
+
+    """
+    Q = np.atleast_2d(Q)
+    n_prob, n = Q.shape
+    P = np.asarray(P, dtype=float)
+    G = np.asarray(G, dtype=float)
+    H = np.asarray(H, dtype=float)
+    if G.ndim == 2 and H.shape == (G.shape[0], 1):
+        H = H[:, 0]
+    if A is None:
+        A, b = np.zeros((0, n)), np.zeros(0)
+    A = np.atleast_2d(np.asarray(A, dtype=float))
+    b = np.atleast_1d(np.asarray(b, dtype=float))
+    if A.ndim == 2 and b.shape == (A.shape[0], 1):
+        b = b[:, 0]
+    m, k = G.shape[-2], A.shape[-2]
+    eye = np.eye(n)
+
+    # Per-problem arrays, which are compacted when problems converge
+    batch = {"P": P.ndim == 3, "G": G.ndim == 3, "H": H.ndim == 2}
+    batch.update({"A": A.ndim == 3, "b": b.ndim == 2})
+
+    # Rank one terms of G^T diag(d) G for a shared G, so that the Newton
+    # matrices of all the problems reduce to a single matrix product
+    if not batch["G"]:
+        iu = np.triu_indices(n)
+        GG = G[:, iu[0]] * G[:, iu[1]]
+
+    # Start from the equality constrained minimizer, shifted inside the
+    # feasible set
+    kkt = np.zeros(np.broadcast_shapes(P.shape[:-2], A.shape[:-2]) + (n + k, n + k))
+    kkt[..., :n, :n] = P
+    kkt[..., :n, n:] = np.swapaxes(A, -1, -2)
+    kkt[..., n:, :n] = A
+    rhs = np.concatenate([-Q, np.broadcast_to(b, (n_prob, k))], axis=-1)
+    try:
+        sol = _kkt_solve(kkt, rhs)
+    except np.linalg.LinAlgError:
+        trace = np.trace(P, axis1=-2, axis2=-1)[..., None, None]
+        kkt[..., :n, :n] += np.finfo(float).eps * trace * eye
+        sol = _kkt_solve(kkt, rhs)
+    x, y = sol[:, :n], sol[:, n:]
+    s = H - _mat_vec(G, x)
+    shift = -s.min(axis=-1, keepdims=True)
+    s = np.where(shift >= 0, s + 1 + shift, s)
+    z = np.ones((n_prob, m))
+
+    x_out = np.full((n_prob, n), np.nan)
+    rows = np.arange(n_prob)
+
+    for _ in range(max_iter):
+        Px, Gz, Ay = _mat_vec(P, x), _mat_t_vec(G, z), _mat_t_vec(A, y)
+        r_dual = Px + Q + Gz + Ay
+        r_prim = _mat_vec(G, x) + s - H
+        r_eq = _mat_vec(A, x) - b
+        mu = np.sum(s * z, axis=-1) / m
+        obj = np.sum((0.5 * Px + Q) * x, axis=-1)
+        # The dual residual is relative to the largest of its terms, as their
+        # cancellation limits its accuracy
+        terms = [np.abs(Px), np.abs(Q), np.abs(Gz), np.abs(Ay)]
+        scale_d = 1 + np.max(terms, axis=(0, -1))
+        scale_p = 1 + np.abs(H).max(axis=-1)
+        scale_e = 1 + np.abs(b).max(axis=-1, initial=0)
+        done = (
+            (np.abs(r_dual).max(axis=-1) <= tol * scale_d)
+            & (np.abs(r_prim).max(axis=-1) <= tol * scale_p)
+            & (np.abs(r_eq).max(axis=-1, initial=0) <= tol * scale_e)
+            & (mu <= tol * (1 + np.abs(obj)))
+        )
+        if np.any(done):
+            x_out[rows[done]] = x[done]
+            keep = ~done
+            rows, x, y, s, z, Q = (
+                rows[keep],
+                x[keep],
+                y[keep],
+                s[keep],
+                z[keep],
+                Q[keep],
+            )
+            r_dual, r_prim, r_eq, mu = r_dual[keep], r_prim[keep], r_eq[keep], mu[keep]
+            P = P[keep] if batch["P"] else P
+            G = G[keep] if batch["G"] else G
+            H = H[keep] if batch["H"] else H
+            A = A[keep] if batch["A"] else A
+            b = b[keep] if batch["b"] else b
+            if rows.size == 0:
+                break
+
+        # Newton matrices P + G^T diag(z / s) G. Bound the scaling of the
+        # constraints so that the matrices of (almost) active constraints
+        # remain invertible
+        d = np.minimum(z / s, 1e12)
+        K = np.zeros((rows.size, n + k, n + k))
+        if batch["G"]:
+            K[:, :n, :n] = np.matmul(np.swapaxes(G, -1, -2) * d[:, None], G)
+        else:
+            K[:, iu[0], iu[1]] = np.dot(d, GG)
+            K[:, iu[1], iu[0]] = K[:, iu[0], iu[1]]
+        K[:, :n, :n] += P
+        K[:, :n, n:] = np.swapaxes(A, -1, -2)
+        K[:, n:, :n] = A
+        K_inv = np.linalg.inv(K)
+
+        # Predictor (affine scaling) step
+        args = (G, A, K_inv, d, s, z, r_dual, r_prim, r_eq)
+        dx, dy, ds, dz = _newton_step(*args, -s * z)
+        alpha = np.minimum(_max_step(s, ds), _max_step(z, dz))[:, None]
+        mu_aff = np.sum((s + alpha * ds) * (z + alpha * dz), axis=-1) / m
+        sigma = (mu_aff / np.maximum(mu, np.finfo(float).tiny)) ** 3
+
+        # Corrector step
+        r_comp = -s * z + (sigma * mu)[:, None] - ds * dz
+        dx, dy, ds, dz = _newton_step(*args, r_comp)
+        alpha = 0.99 * np.minimum(_max_step(s, ds), _max_step(z, dz))[:, None]
+        x = x + alpha * dx
+        y = y + alpha * dy
+        s = s + alpha * ds
+        z = z + alpha * dz
+
+    return x_out
+
+
+def _kkt_solve(kkt, rhs):
+    """Solve shared (2D) or stacked (3D) linear systems for many problems."""
+    if kkt.ndim == 2:
+        return np.linalg.solve(kkt, rhs.T).T
+    return np.linalg.solve(kkt, rhs[..., None])[..., 0]
+
+
+def _cholesky_inv(S):
+    """Inverses of the Cholesky factors of stacked matrices.
+
+    The factors of the matrices that are not (numerically) positive definite
+    are filled with NaN.
+    """
+    try:
+        return np.linalg.inv(np.linalg.cholesky(S))
+    except np.linalg.LinAlgError:
+        L_inv = np.full_like(S, np.nan)
+        for i, S_i in enumerate(S):
+            try:
+                L_inv[i] = np.linalg.inv(np.linalg.cholesky(S_i))
+            except np.linalg.LinAlgError:
+                pass
+        return L_inv
+
+
+def _lmi_step(L_inv, dS):
+    """Largest step in [0, 1] keeping ``S + step * dS`` positive definite.
+
+    ``L_inv`` is the inverse of the Cholesky factor of ``S``.
+    """
+    lowest = np.linalg.eigvalsh(L_inv @ dS @ np.swapaxes(L_inv, 1, 2))[:, 0]
+    with np.errstate(divide="ignore"):
+        return np.where(lowest < 0, np.minimum(1, -1 / lowest), 1)
+
+
+def _lmi_newton_step(F, U, S_inv, Z, grad, target):
+    """Solve the Newton system of the LMI interior-point iterations.
+
+    ``U`` is a factor of the inverse Schur complement, ``H^-1 = U' U``, and
+    ``target`` is the desired value of ``Z + dZ``, before the linearization
+    of the complementarity condition ``S Z = sigma mu I``. The primal iterates
+    remain feasible, with ``S = M(x)``.
+    """
+    rhs = np.tensordot(target, F[1:], axes=([1, 2], [1, 2])) - grad
+    dx = np.einsum("nji,nj->ni", U, np.einsum("nij,nj->ni", U, rhs))
+    dS = np.tensordot(dx, F[1:], axes=(1, 0))
+    ZdS = np.matmul(np.matmul(Z, dS), S_inv)
+    dZ = target - Z - 0.5 * (ZdS + np.swapaxes(ZdS, 1, 2))
+    return dx, dS, dZ
+
+
+def _solve_lmi_qp_block(P, Q, F, x, *, t0, tol, max_iter):
+    """Interior-point iterations of `solve_lmi_qp_batched` for a block."""
+    n_prob, n = x.shape
+    p = F.shape[-1]
+    diag = np.arange(n)
+    x_out = x.copy()
+    rows = np.arange(n_prob)
+    batch_P = P.ndim == 3
+    # Constraint matrices side by side (p x np) and stacked (np x p), so that
+    # the products with all of them are single matrix products
+    F_side = np.swapaxes(F[1:], 0, 1).reshape(p, n * p)
+    F_stack = F[1:].reshape(n * p, p)
+
+    # Start on the central path, with a duality gap of p / t0
+    S = F[0] + np.tensordot(x, F[1:], axes=(1, 0))
+    Z = np.linalg.inv(S) / np.broadcast_to(t0, n_prob)[:, None, None]
+
+    for _ in range(max_iter):
+        Px = _mat_vec(P, x)
+        FZ = np.tensordot(Z, F[1:], axes=([1, 2], [1, 2]))
+        r_dual = Px + Q - FZ
+        gap = np.sum(S * Z, axis=(1, 2))
+        obj = np.sum((0.5 * Px + Q) * x, axis=-1)
+        scale_d = 1 + np.max([np.abs(Px), np.abs(Q), np.abs(FZ)], axis=(0, -1))
+        done = (np.abs(r_dual).max(axis=-1) <= tol * scale_d) & (
+            gap <= tol * (1 + np.abs(obj))
+        )
+
+        # Schur complement of the Newton system with the HKM direction,
+        # H_ij = tr(F_i Z F_j S^-1)
+        m = rows.size
+        S_chol_inv, Z_chol_inv = _cholesky_inv(S), _cholesky_inv(Z)
+        S_inv = np.matmul(np.swapaxes(S_chol_inv, 1, 2), S_chol_inv)
+        ZF = np.matmul(Z, F_side).reshape(m, p, n, p)
+        ZF = np.swapaxes(ZF, 1, 2).reshape(m, n, p * p)
+        FS = np.matmul(F_stack, S_inv).reshape(m, n, p * p)
+        H = np.matmul(ZF, np.swapaxes(FS, 1, 2))
+        H = 0.5 * (H + np.swapaxes(H, 1, 2)) + P
+        # Factorization H^-1 = U' U, with a diagonal scaling of the (badly
+        # scaled) variables and a small ridge for those without curvature
+        with np.errstate(invalid="ignore"):
+            scale = 1 / np.sqrt(np.maximum(H[:, diag, diag], np.finfo(float).tiny))
+        H *= scale[:, :, None] * scale[:, None, :]
+        H[:, diag, diag] += 1e-14
+        U = _cholesky_inv(np.nan_to_num(H)) * scale[:, None, :]
+
+        # Problems whose matrices are no longer numerically positive definite
+        # have reached the attainable accuracy
+        for factor in (S_chol_inv, Z_chol_inv, U):
+            done |= np.isnan(factor).any(axis=(1, 2))
+        if np.any(done):
+            x_out[rows[done]] = x[done]
+            keep = ~done
+            rows, x, Q, S, Z = rows[keep], x[keep], Q[keep], S[keep], Z[keep]
+            Px, gap, S_inv, U = Px[keep], gap[keep], S_inv[keep], U[keep]
+            S_chol_inv, Z_chol_inv = S_chol_inv[keep], Z_chol_inv[keep]
+            P = P[keep] if batch_P else P
+            if rows.size == 0:
+                break
+        args = (F, U, S_inv, Z, Px + Q)
+
+        # Predictor (affine scaling) step
+        dx, dS, dZ = _lmi_newton_step(*args, np.zeros_like(Z))
+        alpha = np.minimum(_lmi_step(S_chol_inv, dS), _lmi_step(Z_chol_inv, dZ))
+        alpha = alpha[:, None, None]
+        gap_aff = np.sum((S + alpha * dS) * (Z + alpha * dZ), axis=(1, 2))
+        sigma = (gap_aff / gap) ** 3
+
+        # Corrector step
+        second = np.matmul(np.matmul(dZ, dS), S_inv)
+        target = (sigma * gap / p)[:, None, None] * S_inv
+        target -= 0.5 * (second + np.swapaxes(second, 1, 2))
+        dx, dS, dZ = _lmi_newton_step(*args, target)
+        alpha = np.minimum(_lmi_step(S_chol_inv, dS), _lmi_step(Z_chol_inv, dZ))
+        alpha *= 0.98
+        x = x + alpha[:, None] * dx
+        S = F[0] + np.tensordot(x, F[1:], axes=(1, 0))
+        Z = Z + alpha[:, None, None] * dZ
+
+    x_out[rows] = x
+    return x_out
+
+
+@warning_for_keywords()
+def solve_lmi_qp_batched(
+    P, Q, F, x0, *, tol=1e-10, t0=1.0, max_iter=100, block_size=1000
+):
+    r"""
+    Solve many Quadratic Programs with a Linear Matrix Inequality (LMI).
+
+    Each problem has the form::
+
+        minimize      1/2 x' P x + Q[i]' x
+        subject to    F[0] + sum_j x_j F[j + 1] >= 0
+
+    where the inequality denotes positive semi-definiteness. All the problems
+    are solved simultaneously with a primal-dual interior-point method, using
+    the HKM search direction :footcite:p:`Helmberg1996` and Mehrotra
+    predictor-corrector steps :footcite:p:`Mehrotra1992`. The Newton systems
+    of all the problems are assembled with matrix products and solved as a
+    stack, and problems that have converged drop out of the iterations.
+
+    Parameters
+    ----------
+    P : ndarray
+        n x n positive semi-definite matrix for the QP objective function, or
+        N x n x n matrices.
+    Q : ndarray
+        N x n matrix holding the linear terms of the N problems.
+    F : ndarray
+        (n + 1) x p x p symmetric constraint matrices, shared by all the
+        problems.
+    x0 : ndarray
+        Strictly feasible starting point, shared by all the problems (n) or
+        given for each of them (N x n). See `lmi_feasible_point`.
+    tol : float, optional
+        Relative tolerance on the dual residual and on the duality gap.
+    t0 : float or ndarray, optional
+        Initial value of the central path parameter, shared by all the
+        problems or given for each of them. The dual variables start at
+        ``M(x0)^-1 / t0``, with a duality gap of ``p / t0``, so ``t0`` should
+        be of the order of ``p`` divided by the expected sub-optimality of
+        ``x0``.
+    max_iter : int, optional
+        Maximum number of iterations.
+    block_size : int, optional
+        Number of problems solved together, which bounds the memory used by
+        the stacked Newton systems.
+
+    Returns
+    -------
+    x : array
+        Optimal solutions of the problems, shape (N, n).
+
+    References
+    ----------
+    .. footbibliography::
+
+    """
+    Q = np.atleast_2d(np.asarray(Q, dtype=float))
+    n_prob, n = Q.shape
+    P = np.asarray(P, dtype=float)
+    F = np.asarray(F, dtype=float)
+    x = np.array(np.broadcast_to(x0, (n_prob, n)), dtype=float)
+    t0 = np.broadcast_to(t0, n_prob)
+    M = F[0] + np.tensordot(x, F[1:], axes=(1, 0))
+    if np.any(np.linalg.eigvalsh(M)[:, 0] <= 0):
+        raise ValueError("The starting point must be strictly feasible.")
+
+    for start in range(0, n_prob, block_size):
+        block = slice(start, start + block_size)
+        x[block] = _solve_lmi_qp_block(
+            P[block] if P.ndim == 3 else P,
+            Q[block],
+            F,
+            x[block],
+            t0=t0[block],
+            tol=tol,
+            max_iter=max_iter,
+        )
+    return x
+
+
+@warning_for_keywords()
+def lmi_feasible_point(F, *, regularization=1e-3):
+    r"""Find a strictly feasible point of a Linear Matrix Inequality (LMI).
+
+    Solves the phase I problem :footcite:p:`Boyd2004`::
+
+        maximize      s - regularization / 2 * ||x||^2
+        subject to    F[0] + sum_j x_j F[j + 1] >= s I
+
+    whose regularization keeps the solution bounded, with
+    `solve_lmi_qp_batched`.
+
+    Parameters
+    ----------
+    F : ndarray
+        (n + 1) x p x p symmetric constraint matrices.
+    regularization : float, optional
+        Weight of the norm of the solution.
+
+    Returns
+    -------
+    x : array
+        A point ``x`` of n elements for which ``F[0] + sum_j x_j F[j + 1]`` is
+        positive definite.
+
+    References
+    ----------
+    .. footbibliography::
+
+    """
+    F = np.asarray(F, dtype=float)
+    n, p = F.shape[0] - 1, F.shape[-1]
+    F_phase = np.concatenate([F, -np.eye(p)[None]])
+    P = np.diag(np.r_[np.full(n, regularization), 0])
+    Q = np.r_[np.zeros(n), -1][None]
+    x0 = np.r_[np.zeros(n), np.linalg.eigvalsh(F[0])[0] - 1]
+    x = solve_lmi_qp_batched(P, Q, F_phase, x0, tol=1e-6)[0]
+    if x[-1] <= 0:
+        raise ValueError("The LMI constraints have no strictly feasible point.")
+    return x[:-1]
+
+
 class SKLearnLinearSolver(metaclass=abc.ABCMeta):
     """
     Provide a sklearn-like uniform interface to algorithms that solve problems
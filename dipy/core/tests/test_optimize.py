@@ -1,10 +1,23 @@
 import numpy as np
 import numpy.testing as npt
+from scipy.optimize import nnls as sps_nnls
 import scipy.sparse as sps
 
 import dipy.core.optimize as opt
-from dipy.core.optimize import Optimizer, sparse_nnls, spdot
+from dipy.core.optimize import (
+    Optimizer,
+    elastic_net_batched,
+    lmi_feasible_point,
+    solve_lmi_qp_batched,
+    solve_qp_batched,
+    sparse_nnls,
+    sparse_nnls_fista,
+    spdot,
+)
 from dipy.testing.decorators import set_random_number_generator
+from dipy.utils.optpkg import optional_package
+
+lm, has_sklearn, _ = optional_package("sklearn.linear_model")
 
 
 def func(x):
@@ -123,3 +136,186 @@ def test_sparse_nnls(rng):
     # We should be able to get back the right answer for this simple case
     npt.assert_array_almost_equal(beta, beta_hat, decimal=1)
     npt.assert_array_almost_equal(beta, beta_hat_sparse, decimal=1)
+
+
+@set_random_number_generator()
+def test_sparse_nnls_fista(rng):
+    X = sps.random(300, 40, density=0.2, random_state=rng.integers(1000)).toarray()
+    beta = rng.random(40)
+    beta[::3] = 0
+    y = np.dot(X, beta) + 0.01 * rng.standard_normal(300)
+    expected, _ = sps_nnls(X, y)
+
+    for num_threads in (1, 3):
+        beta_hat = sparse_nnls_fista(
+            y, sps.csr_matrix(X), tol=1e-12, max_iter=5000, num_threads=num_threads
+        )
+        npt.assert_(np.all(beta_hat >= 0))
+        npt.assert_array_almost_equal(beta_hat, expected, decimal=4)
+    npt.assert_array_almost_equal(
+        sparse_nnls_fista(y, X, tol=1e-12, max_iter=5000), expected, decimal=4
+    )
+
+    # The callback exposes the objective, which does not increase, and a warm
+    # start from the solution converges right away
+    history = []
+
+    def callback(iteration, beta, objective, elapsed):
+        history.append((iteration, objective, elapsed))
+
+    sparse_nnls_fista(y, sps.csc_matrix(X), callback=callback, num_threads=2)
+    objectives = np.array([h[1] for h in history])
+    npt.assert_equal([h[0] for h in history], np.arange(1, len(history) + 1))
+    npt.assert_(np.all(np.diff(objectives) <= 1e-12))
+    npt.assert_(np.all(np.array([h[2] for h in history]) >= 0))
+
+    history = []
+    sparse_nnls_fista(y, X, beta0=expected, callback=callback)
+    npt.assert_(len(history) < 5)
+
+
+@set_random_number_generator(1234)
+def test_solve_qp_batched(rng):
+    n, m, n_prob = 6, 15, 20
+    X = rng.standard_normal((10, n))
+    P = np.dot(X.T, X)
+    G = rng.standard_normal((m, n))
+    H = rng.uniform(0.1, 1, m)
+    Q = 5 * rng.standard_normal((n_prob, n))
+
+    x = solve_qp_batched(P, Q, G, H)
+    npt.assert_equal(x.shape, (n_prob, n))
+    npt.assert_(np.all(np.dot(x, G.T) <= H + 1e-8))
+
+    # KKT conditions: the gradient of the objective is a non-negative
+    # combination of the gradients of the active constraints
+    for xi, qi in zip(x, Q):
+        active = np.dot(G, xi) >= H - 1e-6
+        grad = np.dot(P, xi) + qi
+        if not np.any(active):
+            npt.assert_allclose(grad, 0, atol=1e-5)
+            continue
+        lam, _ = sps_nnls(G[active].T, -grad)
+        npt.assert_allclose(np.dot(G[active].T, lam), -grad, atol=1e-5)
+
+    # Single problem
+    npt.assert_allclose(solve_qp_batched(P, Q[0], G, H)[0], x[0])
+
+    # Equality constraint, whose multipliers have no sign constraint
+    A = rng.standard_normal((2, n))
+    b = np.array([0.3, -0.2])
+    x = solve_qp_batched(P, Q, G, H, A=A, b=b)
+    npt.assert_allclose(np.dot(x, A.T), np.tile(b, (n_prob, 1)), atol=1e-8)
+    npt.assert_(np.all(np.dot(x, G.T) <= H + 1e-8))
+    for xi, qi in zip(x, Q):
+        active = np.dot(G, xi) >= H - 1e-6
+        grad = np.dot(P, xi) + qi
+        basis = np.vstack([G[active], A, -A]).T
+        lam, _ = sps_nnls(basis, -grad)
+        npt.assert_allclose(np.dot(basis, lam), -grad, atol=1e-5)
+
+    # Stacked matrices give the same solutions as separate problems
+    Ps = P + np.eye(n) * rng.uniform(0, 1, (n_prob, 1, 1))
+    Gs = G + 0.1 * rng.standard_normal((n_prob, m, n))
+    As = A + 0.1 * rng.standard_normal((n_prob, 2, n))
+    x = solve_qp_batched(Ps, Q, Gs, H, A=As, b=b)
+    for i in range(n_prob):
+        npt.assert_allclose(
+            x[i],
+            solve_qp_batched(Ps[i], Q[i], Gs[i], H, A=As[i], b=b)[0],
+            atol=1e-6,
+        )
+
+
+@set_random_number_generator(1234)
+def test_solve_lmi_qp_batched(rng):
+    # Frobenius projection of 2 x 2 symmetric matrices onto the PSD cone,
+    # with the variables (a, b, c) of [[a, b], [b, c]]
+    F = np.zeros((4, 2, 2))
+    F[1, 0, 0] = F[3, 1, 1] = 1
+    F[2, 0, 1] = F[2, 1, 0] = 1
+    P = np.diag([1.0, 2.0, 1.0])
+    Y = rng.standard_normal((10, 2, 2))
+    Y = Y + np.swapaxes(Y, 1, 2)
+    y = np.stack([Y[:, 0, 0], Y[:, 0, 1], Y[:, 1, 1]], axis=-1)
+    Q = -np.dot(y, P)
+
+    x = solve_lmi_qp_batched(P, Q, F, np.array([1.0, 0, 1.0]), tol=1e-12)
+    npt.assert_equal(x.shape, (10, 3))
+    evals, evecs = np.linalg.eigh(Y)
+    X = np.einsum("nij,nj,nkj->nik", evecs, np.maximum(evals, 0), evecs)
+    expected = np.stack([X[:, 0, 0], X[:, 0, 1], X[:, 1, 1]], axis=-1)
+    npt.assert_array_almost_equal(x, expected, decimal=4)
+
+    # Single problem
+    npt.assert_array_almost_equal(
+        solve_lmi_qp_batched(P, Q[0], F, np.array([1.0, 0, 1.0]), tol=1e-12)[0],
+        expected[0],
+        decimal=4,
+    )
+
+    # The starting point must be strictly feasible
+    npt.assert_raises(
+        ValueError, solve_lmi_qp_batched, P, Q, F, np.array([1.0, 1.0, 1.0])
+    )
+
+    # Feasible points
+    x0 = lmi_feasible_point(F)
+    npt.assert_(np.all(np.linalg.eigvalsh(np.tensordot(x0, F[1:], 1)) > 0))
+    F_shift = F.copy()
+    F_shift[0] = -np.eye(2)
+    x0 = lmi_feasible_point(F_shift)
+    npt.assert_(np.all(np.linalg.eigvalsh(np.tensordot(x0, F[1:], 1)) > 1))
+    F_empty = np.zeros((2, 2, 2))
+    F_empty[0] = -np.eye(2)
+    F_empty[1, 0, 0] = 1
+    F_empty[1, 1, 1] = -1
+    npt.assert_raises(ValueError, lmi_feasible_point, F_empty)
+
+
+@set_random_number_generator(1234)
+def test_elastic_net_batched(rng):
+    X = rng.standard_normal((30, 12))
+    beta = np.abs(rng.standard_normal((5, 12)))
+    beta[:, ::3] = 0
+    Y = np.dot(beta, X.T) + 0.1 * rng.standard_normal((5, 30))
+
+    # Non-negative least squares
+    beta_hat = elastic_net_batched(
+        Y, X, alpha=0, positive=True, fit_intercept=False, tol=1e-10
+    )
+    npt.assert_equal(beta_hat.shape, beta.shape)
+    for y, b in zip(Y, beta_hat):
+        npt.assert_array_almost_equal(b, sps_nnls(X, y)[0], decimal=5)
+
+    # A warm start from the solution converges right away
+    npt.assert_array_almost_equal(
+        elastic_net_batched(
+            Y,
+            X,
+            alpha=0,
+            positive=True,
+            fit_intercept=False,
+            beta0=beta_hat,
+            max_iter=1,
+        ),
+        beta_hat,
+    )
+
+    # Single problem
+    npt.assert_array_almost_equal(
+        elastic_net_batched(Y[0], X, alpha=0.1)[0],
+        elastic_net_batched(Y, X, alpha=0.1)[0],
+    )
+
+    if not has_sklearn:
+        return
+    for positive in [True, False]:
+        beta_hat = elastic_net_batched(
+            Y, X, alpha=0.05, l1_ratio=0.3, positive=positive, tol=1e-10
+        )
+        for y, b in zip(Y, beta_hat):
+            model = lm.ElasticNet(
+                alpha=0.05, l1_ratio=0.3, positive=positive, tol=1e-10
+            )
+            npt.assert_array_almost_equal(b, model.fit(X, y).coef_, decimal=5)
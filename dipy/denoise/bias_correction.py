@@ -8,21 +8,17 @@ log domain and applied uniformly to all DWI volumes.
 """
 
 import numpy as np
-from scipy import linalg as scipy_linalg, ndimage, sparse
+from scipy import linalg as scipy_linalg, ndimage
 
 try:
-    from dipy.denoise._bias_correction import (
-        compute_tukey_weights,
-        evaluate_bspline_rows,
-        gram_matrix_csr,
-        masked_voxel_coords,
-    )
+    from dipy.denoise._bias_correction import compute_tukey_weights
 
     _HAVE_CYTHON = True
 except ImportError:
     _HAVE_CYTHON = False
 
 from dipy.core.gradients import extract_b0
+from dipy.reconst.cache import memoize
 from dipy.segment.mask import applymask, median_otsu
 from dipy.utils.logging import logger
 
@@ -170,6 +166,47 @@ def _legendre_basis(*, coords_flat, order):
     return X
 
 
+def _legendre_terms(order):
+    """Exponents (i, j, k) of the Legendre terms with i + j + k <= order."""
+    return [
+        (i, j, k)
+        for i in range(order + 1)
+        for j in range(order + 1 - i)
+        for k in range(order + 1 - i - j)
+    ]
+
+
+def _legendre_axis_basis(*, n_vox, order):
+    """Legendre polynomials of one axis, sampled at the voxel positions.
+
+    The columns of the design matrix of ``_legendre_basis`` are products of
+    the columns of the bases of the three axes. The bases only depend on the
+    grid size, and are computed once per process.
+
+    Parameters
+    ----------
+    n_vox : int
+        Number of voxels along the axis.
+    order : int
+        Maximum Legendre polynomial order.
+
+    Returns
+    -------
+    L : ndarray
+        Read-only basis, shape (n_vox, order + 1), whose column d is the
+        Legendre polynomial of degree d at the normalized coordinates.
+    """
+    from numpy.polynomial.legendre import legvander
+
+    def compute():
+        coords = _normalize_coords(
+            shape=(n_vox,), coords=np.arange(n_vox)[:, np.newaxis]
+        )[:, 0]
+        return legvander(coords, order)
+
+    return memoize("bias_legendre_axis_basis", (n_vox, order), compute)
+
+
 def _weighted_ridge_solve(*, X, y, weights, lambda_reg):
     """Solve weighted ridge regression min ||W^(1/2)(y - Xβ)||² + λ||β||².
 
@@ -290,15 +327,10 @@ def _polynomial_pyramid_fit(
     if gradient_weighting:
         grad_w_full = _gradient_weights(log_b0=log_b0)
 
-    ii, jj, kk = np.meshgrid(
-        np.arange(full_shape[0]),
-        np.arange(full_shape[1]),
-        np.arange(full_shape[2]),
-        indexing="ij",
-    )
-    full_vox_coords = np.column_stack([ii.ravel(), jj.ravel(), kk.ravel()])
-    full_coords_norm = _normalize_coords(shape=full_shape, coords=full_vox_coords)
-    X_full = _legendre_basis(coords_flat=full_coords_norm, order=order)
+    # The design matrices are built from the cached bases of each axis, and
+    # the fields are evaluated as tensor products of them.
+    terms = np.array(_legendre_terms(order)).T
+    full_bases = tuple(_legendre_axis_basis(n_vox=n, order=order) for n in full_shape)
 
     # Center log_b0 so the polynomial fits only spatial variation, not the
     # DC offset (overall intensity level).
@@ -324,32 +356,17 @@ def _polynomial_pyramid_fit(
         n_masked = mask_flat.sum()
 
         # Need at least as many data points as parameters
-        n_params = sum(
-            1
-            for i in range(order + 1)
-            for j in range(order + 1 - i)
-            for _ in range(order + 1 - i - j)
-        )
+        n_params = terms.shape[1]
         if n_masked < n_params:
             continue
 
         y = level_residual.ravel()[mask_flat]
 
-        ii_l, jj_l, kk_l = np.meshgrid(
-            np.arange(level_shape[0]),
-            np.arange(level_shape[1]),
-            np.arange(level_shape[2]),
-            indexing="ij",
-        )
-        level_coords = np.column_stack(
-            [
-                ii_l.ravel()[mask_flat],
-                jj_l.ravel()[mask_flat],
-                kk_l.ravel()[mask_flat],
-            ]
-        )
-        coords_norm = _normalize_coords(shape=level_shape, coords=level_coords)
-        X = _legendre_basis(coords_flat=coords_norm, order=order)
+        X = np.ones((n_masked, n_params), dtype=np.float64)
+        level_coords = np.nonzero(level_mask)
+        for axis_coords, n, axis_terms in zip(level_coords, level_shape, terms):
+            L = _legendre_axis_basis(n_vox=n, order=order)
+            X *= L[np.ix_(axis_coords, axis_terms)]
 
         w = np.ones(n_masked, dtype=np.float64)
         if gradient_weighting:
@@ -370,7 +387,9 @@ def _polynomial_pyramid_fit(
         if beta is None:
             beta = _weighted_ridge_solve(X=X, y=y, weights=w, lambda_reg=lambda_reg)
 
-        level_bias = (X_full @ beta).reshape(full_shape)
+        beta_grid = np.zeros((order + 1,) * 3, dtype=np.float64)
+        beta_grid[tuple(terms)] = beta
+        level_bias = _separable_eval(coeffs=beta_grid, bases=full_bases)
         log_bias += level_bias
         residual = residual - level_bias
 
@@ -456,222 +475,179 @@ def polynomial_bias_field_dwi(
     return corrected, bias_field
 
 
-def _build_bspline_design_matrix_py(*, log_b0_shape, n_control, mask_flat):
-    """Build sparse B-spline design matrix (pure Python fallback).
+def _cubic_bspline_weights(u):
+    """Cubic B-spline weights of the 4 control points around each position.
 
     Parameters
     ----------
-    log_b0_shape : tuple of int
-        Shape of the 3D volume (S, R, C).
-    n_control : tuple of int
-        Control grid dimensions (ns, nr, nc).
-    mask_flat : ndarray
-        Flattened boolean mask, shape (S*R*C,).
+    u : ndarray
+        Fractional positions in [0, 1), shape (N,).
 
     Returns
     -------
-    X : scipy.sparse.csr_matrix
-        Design matrix, shape (N_masked, K_ctrl_total).
+    b : ndarray
+        Weights of the control points k - 1, k, k + 1 and k + 2, where k is
+        the integer part of the positions, shape (N, 4).
     """
-    S, R, C = log_b0_shape
-    ns, nr, nc = n_control
-    K = ns * nr * nc
+    u2 = u * u
+    u3 = u2 * u
+    return np.stack(
+        [
+            (1.0 - u) ** 3 / 6.0,
+            (3.0 * u3 - 6.0 * u2 + 4.0) / 6.0,
+            (-3.0 * u3 + 3.0 * u2 + 3.0 * u + 1.0) / 6.0,
+            u3 / 6.0,
+        ],
+        axis=-1,
+    )
+
 
-    mask_3d = mask_flat.reshape(log_b0_shape)
-    iz_all, iy_all, ix_all = np.where(mask_3d)
-    N = len(iz_all)
+def _bspline_basis_batch(t, n_ctrl):
+    """Vectorized cubic B-spline basis.
 
-    def _vox_to_ctrl_arr(vox, shape_d, n_ctrl_d):
-        if shape_d <= 1 or n_ctrl_d <= 1:
-            return np.zeros(len(vox), dtype=np.float64)
-        return vox.astype(np.float64) * (n_ctrl_d - 1) / (shape_d - 1)
+    Returns (N,4) basis values and (N,4) control indices.
+    """
+    t = np.clip(t, 0.0, n_ctrl - 1 - 1e-10)
+    k = np.floor(t).astype(np.int64)
+    k = np.minimum(k, n_ctrl - 2)
+    b = _cubic_bspline_weights(t - k)  # (N, 4)
+    ctrl = np.stack([k - 1, k, k + 1, k + 2], axis=-1)  # (N, 4)
+    return b, ctrl
 
-    tz = _vox_to_ctrl_arr(iz_all, S, ns)
-    ty = _vox_to_ctrl_arr(iy_all, R, nr)
-    tx = _vox_to_ctrl_arr(ix_all, C, nc)
 
-    def _bspline_basis_batch(t, n_ctrl):
-        """Vectorized cubic B-spline basis.
+def _bspline_axis_basis(*, n_vox, n_ctrl):
+    """Dense cubic B-spline basis of one axis of the design matrix.
 
-        Returns (N,4) basis values and (N,4) control indices.
-        """
-        t = np.clip(t, 0.0, n_ctrl - 1 - 1e-10)
-        k = np.floor(t).astype(np.int64)
-        k = np.minimum(k, n_ctrl - 2)
-        u = t - k
-        u2 = u * u
-        u3 = u2 * u
-        b = np.stack(
-            [
-                (1.0 - u) ** 3 / 6.0,
-                (3.0 * u3 - 6.0 * u2 + 4.0) / 6.0,
-                (-3.0 * u3 + 3.0 * u2 + 3.0 * u + 1.0) / 6.0,
-                u3 / 6.0,
-            ],
-            axis=-1,
-        )  # (N, 4)
-        ctrl = np.stack([k - 1, k, k + 1, k + 2], axis=-1)  # (N, 4)
-        return b, ctrl
-
-    bz, cz = _bspline_basis_batch(tz, ns)  # (N, 4)
-    by_, cy = _bspline_basis_batch(ty, nr)
-    bx, cx = _bspline_basis_batch(tx, nc)
-
-    # Tensor product: (N, 4, 4, 4) via broadcasting
-    vals = (
-        bz[:, :, np.newaxis, np.newaxis]
-        * by_[:, np.newaxis, :, np.newaxis]
-        * bx[:, np.newaxis, np.newaxis, :]
-    )
-    cols = (
-        cz[:, :, np.newaxis, np.newaxis] * (nr * nc)
-        + cy[:, np.newaxis, :, np.newaxis] * nc
-        + cx[:, np.newaxis, np.newaxis, :]
-    )
-    rows = np.broadcast_to(
-        np.arange(N, dtype=np.int64)[:, np.newaxis, np.newaxis, np.newaxis],
-        (N, 4, 4, 4),
-    )
+    The rows of the B-spline design matrix of the masked voxels are the
+    tensor products of the rows of the bases of the three axes. The bases
+    only depend on the grid size, and are computed once per process.
 
-    # Validity: all three ctrl indices must be in bounds
-    valid = (
-        (cz[:, :, np.newaxis, np.newaxis] >= 0)
-        & (cz[:, :, np.newaxis, np.newaxis] < ns)
-        & (cy[:, np.newaxis, :, np.newaxis] >= 0)
-        & (cy[:, np.newaxis, :, np.newaxis] < nr)
-        & (cx[:, np.newaxis, np.newaxis, :] >= 0)
-        & (cx[:, np.newaxis, np.newaxis, :] < nc)
-    )
+    Parameters
+    ----------
+    n_vox : int
+        Number of voxels along the axis.
+    n_ctrl : int
+        Number of control points along the axis.
 
-    return sparse.csr_matrix(
-        (vals[valid], (rows[valid], cols[valid])),
-        shape=(N, K),
-        dtype=np.float64,
-    )
+    Returns
+    -------
+    B : ndarray
+        Read-only basis, shape (n_vox, n_ctrl).
+    """
+
+    def compute():
+        if n_vox <= 1 or n_ctrl <= 1:
+            t = np.zeros(n_vox)
+        else:
+            t = np.arange(n_vox) * (n_ctrl - 1) / (n_vox - 1)
+        b, ctrl = _bspline_basis_batch(t, n_ctrl)
+        rows = np.broadcast_to(np.arange(n_vox)[:, np.newaxis], ctrl.shape)
+        valid = (ctrl >= 0) & (ctrl < n_ctrl)
+        B = np.zeros((n_vox, n_ctrl))
+        B[rows[valid], ctrl[valid]] = b[valid]
+        return B
+
+    return memoize("bias_bspline_axis_basis", (n_vox, n_ctrl), compute)
 
 
-def _build_bspline_design_matrix(*, log_b0_shape, n_control, mask_flat):
-    """Build sparse B-spline design matrix, using Cython backend if available.
+def _bspline_axis_eval_basis(*, n_vox, n_ctrl):
+    """Dense cubic B-spline evaluation basis of one axis of the field.
+
+    Reproduces ``scipy.ndimage.map_coordinates`` with ``order=3``,
+    ``mode="nearest"`` and ``prefilter=False`` at the voxel positions of
+    ``_eval_bspline_field``: out of range control points are clamped to the
+    edges of the control grid. Computed once per process.
 
     Parameters
     ----------
-    log_b0_shape : tuple of int
-        Shape of the 3D volume (S, R, C).
-    n_control : tuple of int
-        Control grid dimensions (ns, nr, nc).
-    mask_flat : ndarray
-        Flattened boolean mask, shape (S*R*C,).
+    n_vox : int
+        Number of voxels along the axis.
+    n_ctrl : int
+        Number of control points along the axis.
 
     Returns
     -------
-    X : scipy.sparse.csr_matrix
-        Design matrix, shape (N_masked, K_ctrl_total).
+    E : ndarray
+        Read-only basis, shape (n_vox, n_ctrl).
     """
-    if _HAVE_CYTHON:
-        S, R, C = log_b0_shape
-        ns, nr, nc = n_control
-        K = ns * nr * nc
-        mask_3d = mask_flat.reshape(log_b0_shape).astype(np.uint8)
-        N_max = int(mask_flat.sum())
-
-        out_coords = np.zeros((N_max, 3), dtype=np.int64)
-        N_actual = int(masked_voxel_coords(np.ascontiguousarray(mask_3d), out_coords))
-        out_coords = out_coords[:N_actual]
-
-        def _scale(axis_coords, shape_d, n_ctrl_d):
-            if shape_d <= 1 or n_ctrl_d <= 1:
-                return np.zeros(len(axis_coords), dtype=np.float64)
-            return axis_coords.astype(np.float64) * (n_ctrl_d - 1) / (shape_d - 1)
-
-        grid_coords = np.column_stack(
-            [
-                _scale(out_coords[:, 0], S, ns),
-                _scale(out_coords[:, 1], R, nr),
-                _scale(out_coords[:, 2], C, nc),
-            ]
-        ).astype(np.float64)
-
-        n_ctrl_arr = np.array([ns, nr, nc], dtype=np.int64)
-        row_ptr = np.zeros(N_actual + 1, dtype=np.int64)
-        col_idx = np.zeros(N_actual * 64, dtype=np.int64)
-        values = np.zeros(N_actual * 64, dtype=np.float64)
-
-        nnz = int(
-            evaluate_bspline_rows(
-                np.ascontiguousarray(grid_coords),
-                n_ctrl_arr,
-                row_ptr,
-                col_idx,
-                values,
-            )
-        )
-        col_idx = col_idx[:nnz]
-        values = values[:nnz]
 
-        return sparse.csr_matrix(
-            (values, col_idx, row_ptr),
-            shape=(N_actual, K),
-            dtype=np.float64,
-        )
+    def compute():
+        t = np.linspace(0, n_ctrl - 1, n_vox) if n_ctrl > 1 else np.zeros(n_vox)
+        k = np.floor(t).astype(np.int64)
+        b = _cubic_bspline_weights(t - k)
+        ctrl = np.clip(k[:, np.newaxis] + np.arange(-1, 3), 0, n_ctrl - 1)
+        rows = np.broadcast_to(np.arange(n_vox)[:, np.newaxis], ctrl.shape)
+        E = np.zeros((n_vox, n_ctrl))
+        np.add.at(E, (rows, ctrl), b)
+        return E
 
-    return _build_bspline_design_matrix_py(
-        log_b0_shape=log_b0_shape, n_control=n_control, mask_flat=mask_flat
-    )
+    return memoize("bias_bspline_axis_eval_basis", (n_vox, n_ctrl), compute)
+
+
+def _separable_eval(*, coeffs, bases):
+    """Evaluate a tensor-product expansion on a full 3D grid.
+
+    Parameters
+    ----------
+    coeffs : ndarray
+        Coefficients, shape (n0, n1, n2).
+    bases : tuple of ndarray
+        Bases of the three axes, shapes (S, n0), (R, n1) and (C, n2).
+
+    Returns
+    -------
+    field : ndarray
+        Evaluated field, shape (S, R, C).
+    """
+    B0, B1, B2 = bases
+    field = np.tensordot(B0, coeffs, axes=(1, 0))  # (S, n1, n2)
+    field = np.tensordot(field, B1, axes=(1, 1))  # (S, n2, R)
+    return np.tensordot(field, B2, axes=(1, 1))  # (S, R, C)
 
 
-def _sparse_weighted_ridge_solve(*, X_sparse, y, weights, lambda_reg):
-    """Solve sparse weighted ridge regression.
+def _separable_weighted_ridge_solve(*, bases, y, weights, lambda_reg):
+    """Solve weighted ridge regression with a tensor-product design matrix.
 
-    The Gram matrix A = X^T W X is computed via chunked dense BLAS DGEMM,
-    which is substantially faster than scipy sparse×sparse multiplication
-    when the result is nearly dense (K < 1000).
+    The rows of the design matrix are the tensor products of the rows of
+    ``bases`` at the masked voxels. The normal equations are contracted one
+    axis at a time with dense (multithreaded BLAS) matrix products, instead
+    of assembling the sparse design matrix and accumulating 64 x 64 products
+    per voxel.
 
     Parameters
     ----------
-    X_sparse : scipy.sparse.csr_matrix
-        Design matrix, shape (N, K).
+    bases : tuple of ndarray
+        Bases of the three axes, shapes (S, n0), (R, n1) and (C, n2).
     y : ndarray
-        Target values, shape (N,).
+        Target values, shape (S, R, C).
     weights : ndarray
-        Non-negative regression weights, shape (N,).
+        Non-negative regression weights, zero outside of the mask, shape
+        (S, R, C).
     lambda_reg : float
         Ridge regularization strength.
 
     Returns
     -------
     beta : ndarray
-        Coefficient vector, shape (K,).
+        Coefficient vector, shape (n0 * n1 * n2,).
     """
-    K = X_sparse.shape[1]
-    N = X_sparse.shape[0]
+    B0, B1, B2 = bases
+    (S, n0), (R, n1), (C, n2) = B0.shape, B1.shape, B2.shape
+    K = n0 * n1 * n2
+
+    # Products of the basis functions of each axis, (n_vox, n_ctrl ** 2)
+    T0, T1, T2 = (
+        (B[:, :, np.newaxis] * B[:, np.newaxis, :]).reshape(len(B), -1) for B in bases
+    )
+    A = weights.reshape(S * R, C) @ T2  # (S * R, n2 ** 2)
+    A = np.matmul(T1.T, A.reshape(S, R, n2 * n2))  # (S, n1 ** 2, n2 ** 2)
+    A = T0.T @ A.reshape(S, -1)  # (n0 ** 2, n1 ** 2 * n2 ** 2)
+    A = A.reshape(n0, n0, n1, n1, n2, n2).transpose(0, 2, 4, 1, 3, 5)
+    A = A.reshape(K, K) + lambda_reg * np.eye(K)
+
+    # X^T W y is the adjoint evaluation of the weighted targets
+    b_vec = _separable_eval(coeffs=weights * y, bases=(B0.T, B1.T, B2.T)).ravel()
 
-    if _HAVE_CYTHON:
-        # Fast path: Cython direct CSR accumulation
-        A = np.zeros((K, K), dtype=np.float64)
-        b_vec = np.zeros(K, dtype=np.float64)
-        gram_matrix_csr(
-            np.asarray(X_sparse.data, dtype=np.float64),
-            np.asarray(X_sparse.indices, dtype=np.int32),
-            np.asarray(X_sparse.indptr, dtype=np.int32),
-            np.ascontiguousarray(weights, dtype=np.float64),
-            np.ascontiguousarray(y, dtype=np.float64),
-            A,
-            b_vec,
-        )
-    else:
-        # Chunked BLAS DGEMM: avoids sparse×sparse which is slow for dense-ish
-        # results (K×K), converting sparse rows to dense in blocks and using
-        # BLAS for the accumulation.
-        chunk = min(4096, N)
-        A = np.zeros((K, K), dtype=np.float64)
-        b_vec = np.zeros(K, dtype=np.float64)
-        for i in range(0, N, chunk):
-            Xc = X_sparse[i : i + chunk].toarray()  # (chunk, K)
-            wc = weights[i : i + chunk]
-            A += Xc.T @ (wc[:, np.newaxis] * Xc)  # BLAS DGEMM
-            b_vec += Xc.T.dot(wc * y[i : i + chunk])
-
-    A += lambda_reg * np.eye(K)
     try:
         beta = scipy_linalg.solve(A, b_vec, assume_a="pos")
     except scipy_linalg.LinAlgError:
@@ -713,10 +689,11 @@ def _refine_control_coeffs(*, coeffs, n_ctrl_coarse, n_ctrl_fine):
 def _eval_bspline_field(*, coeffs, n_control, out_shape):
     """Evaluate B-spline field at all voxel positions.
 
-    Uses ``scipy.ndimage.map_coordinates`` with ``prefilter=False`` so that
     ``coeffs`` are treated directly as B-spline weights (not as values to
-    interpolate through).  This avoids building a full-resolution sparse
-    design matrix and is O(N) in C rather than O(N × 64) in Python.
+    interpolate through), as ``scipy.ndimage.map_coordinates`` with
+    ``prefilter=False`` and ``mode="nearest"`` would. The field is a tensor
+    product, so it is evaluated one axis at a time with the cached bases of
+    ``_bspline_axis_eval_basis``.
 
     Parameters
     ----------
@@ -732,22 +709,12 @@ def _eval_bspline_field(*, coeffs, n_control, out_shape):
     field : ndarray
         Evaluated field, shape out_shape.
     """
-    S, R, C = out_shape
-    ns, nr, nc = n_control
-
-    coeff_grid = np.ascontiguousarray(coeffs.reshape(n_control), dtype=np.float64)
-
-    iz = np.linspace(0, ns - 1, S) if ns > 1 else np.zeros(S)
-    iy = np.linspace(0, nr - 1, R) if nr > 1 else np.zeros(R)
-    ix_ = np.linspace(0, nc - 1, C) if nc > 1 else np.zeros(C)
-
-    II, JJ, KK = np.meshgrid(iz, iy, ix_, indexing="ij")
-    coords = np.vstack([II.ravel(), JJ.ravel(), KK.ravel()])
-
-    field = ndimage.map_coordinates(
-        coeff_grid, coords, order=3, mode="nearest", prefilter=False
+    coeff_grid = np.asarray(coeffs, dtype=np.float64).reshape(n_control)
+    bases = tuple(
+        _bspline_axis_eval_basis(n_vox=n_vox, n_ctrl=n_ctrl)
+        for n_vox, n_ctrl in zip(out_shape, n_control)
     )
-    return field.reshape(out_shape)
+    return _separable_eval(coeffs=coeff_grid, bases=bases)
 
 
 def _bspline_pyramid_fit(
@@ -828,10 +795,10 @@ def _bspline_pyramid_fit(
 
         y = level_residual.ravel()[mask_flat_level]
 
-        X = _build_bspline_design_matrix(
-            log_b0_shape=level_shape,
-            n_control=n_ctrl,
-            mask_flat=mask_flat_level,
+        # The design matrix is the tensor product of the cached bases
+        bases = tuple(
+            _bspline_axis_basis(n_vox=n_vox, n_ctrl=n_ctrl_d)
+            for n_vox, n_ctrl_d in zip(level_shape, n_ctrl)
         )
 
         # Warm-start: refine coefficients from previous coarser level
@@ -853,11 +820,14 @@ def _bspline_pyramid_fit(
                 gw = gw_down.ravel()[mask_flat_level]
             w = w * gw
 
+        w_grid = np.zeros(level_shape, dtype=np.float64)
         for _ in range(n_iter):
-            coeffs = _sparse_weighted_ridge_solve(
-                X_sparse=X, y=y, weights=w, lambda_reg=lambda_reg
-            )
-            residuals_iter = y - X @ coeffs
+            w_grid[level_mask] = w
+            coeffs = _separable_weighted_ridge_solve(
+                bases=bases, y=level_residual, weights=w_grid, lambda_reg=lambda_reg
+            ).ravel()
+            fitted = _separable_eval(coeffs=coeffs.reshape(n_ctrl), bases=bases)
+            residuals_iter = y - fitted[level_mask]
             if robust:
                 w = w * _tukey_weights(residuals=residuals_iter)
 
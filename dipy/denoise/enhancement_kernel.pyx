@@ -1,16 +1,140 @@
 import numpy as np
 cimport numpy as cnp
 cimport cython
+import hashlib
+import os
 import os.path
 
+from cython.parallel import prange
+
 from dipy.data import get_sphere
 from dipy.core.sphere import disperse_charges, Sphere, HemiSphere
 from dipy.utils.logging import logger
-from tempfile import gettempdir
+from dipy.utils.omp import determine_num_threads
+from dipy.utils.omp cimport set_num_threads, restore_default_num_threads
+from tempfile import gettempdir, NamedTemporaryFile
 from libc.math cimport sqrt, exp, fabs, cos, sin, tan, acos, atan2
 from math import ceil
 
 
+# Bump when the layout or the computation of the look-up table changes, so
+# that tables cached by older versions are not reused.
+_LUT_CACHE_VERSION = 2
+
+# Number of look-up tables kept in a cache directory. The least recently used
+# tables are removed when a new one is written.
+_LUT_CACHE_MAX_TABLES = 8
+
+
+def _lookup_table_path(D33, D44, t, orientations, cache_dir):
+    """ Path of the cached look-up table for the given kernel parameters
+
+    The file name is a hash of the parameters and of the exact orientations,
+    so that different spheres with the same number of vertices do not share
+    a table.
+
+    Parameters
+    ----------
+    D33 : float
+        Spatial diffusion
+    D44 : float
+        Angular diffusion
+    t : float
+        Diffusion time
+    orientations : 2D ndarray
+        Orientations of the kernel
+    cache_dir : str
+        Directory of the cached tables
+
+    Returns
+    -------
+    path : str
+    """
+    key = hashlib.sha256()
+    key.update(np.array([_LUT_CACHE_VERSION, D33, D44, t],
+                        dtype=np.float64).tobytes())
+    key.update(np.ascontiguousarray(orientations, dtype=np.float64).tobytes())
+    return os.path.join(cache_dir,
+                        "enhancement_kernel_%s.npy" % key.hexdigest()[:32])
+
+
+def _load_lookup_table(path, num_orientations):
+    """ Memory-map a cached look-up table, or return None if it is unusable
+
+    The table is opened read-only, so that the processes using the same
+    table share its pages.
+    """
+    try:
+        lut = np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if (lut.ndim != 5 or lut.dtype != np.float64 or
+            lut.shape[:2] != (num_orientations, num_orientations) or
+            not lut.flags.c_contiguous):
+        return None
+    # Mark the table as recently used for the eviction of the cache
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return lut
+
+
+def _save_lookup_table(path, lut):
+    """ Atomically write a look-up table to the cache
+
+    The table is written to a temporary file which is then renamed, so that
+    other processes never load a partially written table.
+
+    Returns
+    -------
+    saved : bool
+        False if the cache directory is not writable.
+    """
+    tmp_path = None
+    try:
+        with NamedTemporaryFile(dir=os.path.dirname(path), suffix=".npy",
+                                delete=False) as f:
+            tmp_path = f.name
+            np.save(f, lut)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        logger.warning("The kernel could not be cached in %s: %s" % (path, e))
+        return False
+    _evict_lookup_tables(os.path.dirname(path), _LUT_CACHE_MAX_TABLES)
+    return True
+
+
+def _evict_lookup_tables(cache_dir, max_tables):
+    """ Remove the least recently used look-up tables of a cache directory
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the cached tables
+    max_tables : int
+        Number of tables to keep
+    """
+    tables = []
+    try:
+        with os.scandir(cache_dir) as entries:
+            for entry in entries:
+                if (entry.name.startswith("enhancement_kernel_") and
+                        entry.name.endswith(".npy")):
+                    tables.append((entry.stat().st_mtime, entry.path))
+    except OSError:
+        return
+    tables.sort(reverse=True)
+    for _, path in tables[max_tables:]:
+        try:
+            os.remove(path)
+        except OSError:
+            # Removed by another process, or still mapped on Windows
+            pass
+
+
 cdef class EnhancementKernel:
     cdef double D33
     cdef double D44
@@ -18,11 +142,12 @@ cdef class EnhancementKernel:
     cdef int kernelsize
     cdef double kernelmax
     cdef double [:, :] orientations_list
-    cdef double [:, :, :, :, :] lookuptable
+    cdef const double [:, :, :, :, ::1] lookuptable
     cdef object sphere
 
     def __init__(self, D33, D44, t, force_recompute=False,
-                 orientations=None, verbose=True):
+                 orientations=None, verbose=True, cache_dir=None,
+                 num_threads=None):
         """ Compute a look-up table for the contextual
         enhancement kernel
 
@@ -40,13 +165,28 @@ cdef class EnhancementKernel:
             Diffusion time
         force_recompute : boolean, optional
             Always compute the look-up table even if it is available
-            in cache.
+            in cache. The computed table is still written to the cache.
         orientations : integer or Sphere object, optional
             Specify the number of orientations to be used with
             electrostatic repulsion, or provide a Sphere object.
-            The default sphere is 'repulsion100'.
+            The default sphere is 'repulsion100'. The look-up tables of the
+            random spheres built from a number of orientations are never
+            cached, as they are not reused.
         verbose : boolean, optional
             Enable verbose mode.
+        cache_dir : str, optional
+            Directory where the look-up tables are cached. The tables are keyed
+            by D33, D44, t and the orientations, and are memory-mapped
+            read-only when loaded, so that they are shared between processes.
+            Only the 8 most recently used tables are kept.
+            If None (default), the temporary directory of the system is used.
+        num_threads : int, optional
+            Number of threads to be used for OpenMP parallelization of the
+            look-up table computation. If None (default) the value of
+            OMP_NUM_THREADS environment variable is used if it is set,
+            otherwise all available threads are used. If < 0 the maximal
+            number of threads minus $|num_threads + 1|$ is used (enter -1 to
+            use as many threads as possible). 0 raises an error.
 
         References
         ----------
@@ -60,6 +200,7 @@ cdef class EnhancementKernel:
 
         # define a sphere
         rng = np.random.default_rng()
+        cache = True
 
         if isinstance(orientations, Sphere):
             # use the sphere defined by the user
@@ -74,6 +215,8 @@ cdef class EnhancementKernel:
                 phi = 2 * np.pi * rng.random(n_pts)
                 hsph_initial = HemiSphere(theta=theta, phi=phi)
                 sphere, potential = disperse_charges(hsph_initial, 5000)
+                # a new random sphere never hits the cache
+                cache = False
         else:
             # use default
             sphere = get_sphere(name="repulsion100")
@@ -85,27 +228,42 @@ cdef class EnhancementKernel:
             self.orientations_list = np.zeros((0,0))
             self.sphere = None
 
+        if self.sphere is None or not cache:
+            self.create_lookup_table(verbose, num_threads)
+            return
+
         # file location of the lut table for saving/loading
-        kernellutpath = os.path.join(gettempdir(),
-                                     "kernel_d33@%4.2f_d44@%4.2f_t@%4.2f_numverts%d.npy" \
-                                       % (D33, D44, t, len(self.orientations_list)))
+        if cache_dir is None:
+            cache_dir = gettempdir()
+        kernellutpath = _lookup_table_path(D33, D44, t, self.orientations_list,
+                                           cache_dir)
 
         # if LUT exists, load
+        lut = None
         if not force_recompute and os.path.isfile(kernellutpath):
-            if verbose:
+            lut = _load_lookup_table(kernellutpath,
+                                     self.orientations_list.shape[0])
+            if lut is not None and verbose:
                 logger.info("The kernel already exists. Loading from " + kernellutpath)
-            self.lookuptable = np.load(kernellutpath)
 
         # else, create
-        else:
+        if lut is None:
             if verbose:
                 logger.info("The kernel doesn't exist yet. Computing...")
-            self.create_lookup_table(verbose)
-            if self.sphere is not None:
-                np.save(kernellutpath, self.lookuptable)
+            self.create_lookup_table(verbose, num_threads)
+            if _save_lookup_table(kernellutpath, np.asarray(self.lookuptable)):
+                # Map the saved table so that its memory can be shared
+                lut = _load_lookup_table(kernellutpath,
+                                         self.orientations_list.shape[0])
+
+        if lut is not None:
+            self.lookuptable = lut
 
     def get_lookup_table(self):
         """ Return the computed look-up table.
+
+        The table is a read-only memory map when it is cached. Use
+        ``np.array(kernel.get_lookup_table())`` to get a writable copy.
         """
         return self.lookuptable
 
@@ -138,58 +296,63 @@ cdef class EnhancementKernel:
         -------
         kernel_value : double
         """
-        return self.k2(x, y, r, v)
+        cdef:
+            double a[3]
+            double rr[3]
+            double vv[3]
+            int i
+
+        for i in range(3):
+            a[i] = x[i] - y[i]
+            rr[i] = r[i]
+            vv[i] = v[i]
+        return _k2(self.D33, self.D44, self.t, a, rr, vv)
 
     @cython.wraparound(False)
     @cython.boundscheck(False)
     @cython.nonecheck(False)
     @cython.cdivision(True)
-    cdef void create_lookup_table(self, verbose=True):
+    cdef void create_lookup_table(self, verbose=True, num_threads=None):
         """ Compute the look-up table based on the parameters set
         during class initialization
 
+        The orientations v are processed in parallel.
+
         Parameters
         ----------
         verbose : boolean
             Enable verbose mode.
+        num_threads : int, optional
+            Number of threads to be used for OpenMP parallelization.
         """
         self.estimate_kernel_size(verbose)
 
         cdef:
-            double [:, :] orientations = np.copy(self.orientations_list)
+            double [:, ::1] orientations = np.ascontiguousarray(
+                self.orientations_list, dtype=np.float64)
             cnp.npy_intp OR1 = orientations.shape[0]
             cnp.npy_intp OR2 = orientations.shape[0]
             cnp.npy_intp N = self.kernelsize
-            cnp.npy_intp hn = (N-1)/2
-            cnp.npy_intp angv, angr, xp, yp, zp
-            double [:] x
-            double [:] y
-            cdef double [:, :, :, :, :] lookuptablelocal
-            double kmax = self.kernelmax
-            double l1norm
-            double kernelval
+            cnp.npy_intp angv
+            double [:, :, :, :, ::1] lookuptablelocal
+            double D33 = self.D33
+            double D44 = self.D44
+            double t = self.t
+            int threads_to_use
 
         lookuptablelocal = np.zeros((OR1, OR2, N, N, N))
-        x = np.zeros(3)
-        y = np.zeros(3) # constant at (0,0,0)
 
-        with nogil:
+        threads_to_use = determine_num_threads(num_threads)
+        set_num_threads(threads_to_use)
 
-            for angv in range(OR1):
-                for angr in range(OR2):
-                    for xp in range(-hn, hn + 1):
-                        for yp in range(-hn, hn + 1):
-                            for zp in range(-hn, hn + 1):
+        with nogil:
 
-                                x[0] = <double>xp
-                                x[1] = <double>yp
-                                x[2] = <double>zp
+            for angv in prange(OR1, schedule="dynamic"):
+                _fill_lookup_table(D33, D44, t, orientations, angv,
+                                   lookuptablelocal)
 
-                                lookuptablelocal[angv,
-                                                 angr,
-                                                 xp + hn,
-                                                 yp + hn,
-                                                 zp + hn] = self.k2(x, y, orientations[angr,:], orientations[angv,:])
+        if num_threads is not None:
+            restore_default_num_threads()
 
         # save to class member
         self.lookuptable = lookuptablelocal
@@ -209,19 +372,16 @@ cdef class EnhancementKernel:
         """
 
         cdef:
-            double [:] x
-            double [:] y
-            double [:] r
-            double [:] v
+            double x[3]
+            double r[3]
             double i
+            double kval
 
-        x = np.array([0., 0., 0.])
-        y = np.array([0., 0., 0.])
-        r = np.array([0., 0., 1.])
-        v = np.array([0., 0., 1.])
+        x[:] = [0., 0., 0.]
+        r[:] = [0., 0., 1.]
 
         # evaluate at origin
-        self.kernelmax = self.k2(x, y, r, v)
+        self.kernelmax = _k2(self.D33, self.D44, self.t, x, r, r)
 
         with nogil:
 
@@ -230,7 +390,7 @@ cdef class EnhancementKernel:
             while True:
                 i += 0.1
                 x[2] = i
-                kval = self.k2(x, y, r, v) / self.kernelmax
+                kval = _k2(self.D33, self.D44, self.t, x, r, r) / self.kernelmax
                 if kval < 0.1:
                     break
 
@@ -243,222 +403,239 @@ cdef class EnhancementKernel:
 
         self.kernelsize = N
 
-    @cython.wraparound(False)
-    @cython.boundscheck(False)
-    @cython.nonecheck(False)
-    cdef double k2(self, double [:] x, double [:] y,
-                   double [:] r, double [:] v) noexcept nogil:
-        """ Evaluate the kernel at position x relative to
-        position y, with orientation r relative to orientation v.
+cdef double PI = 3.1415926535897932
 
-        Parameters
-        ----------
-        x : 1D ndarray
-            Position x
-        y : 1D ndarray
-            Position y
-        r : 1D ndarray
-            Orientation r
-        v : 1D ndarray
-            Orientation v
 
-        Returns
-        -------
-        kernel_value : double
-        """
-        cdef:
-            double [:] a
-            double [:,:] transm
-            double [:] arg1
-            double [:] arg2p
-            double [:] arg2
-            double [:] c
-            double kernelval
-
-        with gil:
-
-            a = np.subtract(x, y)
-            transm = np.transpose(R(euler_angles(v)))
-            arg1 = np.dot(transm, a)
-            arg2p = np.dot(transm, r)
-            arg2 = euler_angles(arg2p)
-            c = self.coordinate_map(arg1[0], arg1[1], arg1[2],
-                                    arg2[0], arg2[1])
-            kernelval = self.kernel(c)
-
-        return kernelval
+@cython.wraparound(False)
+@cython.boundscheck(False)
+@cython.cdivision(True)
+cdef void _fill_lookup_table(double D33, double D44, double t,
+                             double [:, ::1] orientations, cnp.npy_intp angv,
+                             double [:, :, :, :, ::1] lut) noexcept nogil:
+    """ Compute the look-up table for one orientation v
 
-    @cython.wraparound(False)
-    @cython.boundscheck(False)
-    @cython.nonecheck(False)
-    @cython.cdivision(True)
-    cdef double [:] coordinate_map(self, double x, double y,
-                                   double z, double beta,
-                                   double gamma) noexcept nogil:
-        """ Compute a coordinate map for the kernel
+    The rotation of orientation v and the Euler angles of each rotated
+    orientation r are computed once, and reused for all the positions.
 
-        Parameters
-        ----------
-        x : double
-            X position
-        y : double
-            Y position
-        z : double
-            Z position
-        beta : double
-            First Euler angle
-        gamma : double
-            Second Euler angle
-
-        Returns
-        -------
-        c : 1D ndarray
-            array of coordinates for kernel
-        """
+    Parameters
+    ----------
+    D33 : double
+        Spatial diffusion
+    D44 : double
+        Angular diffusion
+    t : double
+        Diffusion time
+    orientations : 2D array
+        Orientations of the kernel
+    angv : int
+        Index of orientation v
+    lut : 5D array
+        Look-up table, lut[angv] is filled in
+    """
+    cdef:
+        cnp.npy_intp N = lut.shape[2]
+        cnp.npy_intp hn = (N - 1) / 2
+        cnp.npy_intp angr, xp, yp, zp
+        double rot[9]
+        double pos[3]
+        double arg1[3]
+        double arg2p[3]
+        double c[6]
+        double beta, gamma
+
+    _euler_angles(&orientations[angv, 0], &beta, &gamma)
+    _rotation_matrix(beta, gamma, rot)
+
+    for angr in range(orientations.shape[0]):
+        _transpose_dot(rot, &orientations[angr, 0], arg2p)
+        _euler_angles(arg2p, &beta, &gamma)
+        for xp in range(-hn, hn + 1):
+            for yp in range(-hn, hn + 1):
+                for zp in range(-hn, hn + 1):
+                    pos[0] = <double>xp
+                    pos[1] = <double>yp
+                    pos[2] = <double>zp
+                    _transpose_dot(rot, pos, arg1)
+                    _coordinate_map(arg1[0], arg1[1], arg1[2], beta, gamma, c)
+                    lut[angv, angr, xp + hn, yp + hn, zp + hn] = \
+                        _kernel(D33, D44, t, c)
+
+
+cdef double _k2(double D33, double D44, double t, double* a, double* r,
+                double* v) noexcept nogil:
+    """ Evaluate the kernel at relative position a = x - y, with
+    orientation r relative to orientation v.
 
-        cdef:
-            double [:] c
-            double q
-            double cg
-            double cotq2
+    Parameters
+    ----------
+    D33 : double
+        Spatial diffusion
+    D44 : double
+        Angular diffusion
+    t : double
+        Diffusion time
+    a : double[3]
+        Position x relative to position y
+    r : double[3]
+        Orientation r
+    v : double[3]
+        Orientation v
 
-        with gil:
+    Returns
+    -------
+    kernel_value : double
+    """
+    cdef:
+        double rot[9]
+        double arg1[3]
+        double arg2p[3]
+        double c[6]
+        double beta, gamma
+
+    _euler_angles(v, &beta, &gamma)
+    _rotation_matrix(beta, gamma, rot)
+    _transpose_dot(rot, a, arg1)
+    _transpose_dot(rot, r, arg2p)
+    _euler_angles(arg2p, &beta, &gamma)
+    _coordinate_map(arg1[0], arg1[1], arg1[2], beta, gamma, c)
+    return _kernel(D33, D44, t, c)
+
+
+@cython.cdivision(True)
+cdef void _coordinate_map(double x, double y, double z, double beta,
+                          double gamma, double* c) noexcept nogil:
+    """ Compute a coordinate map for the kernel
 
-            c = np.zeros(6)
+    Parameters
+    ----------
+    x : double
+        X position
+    y : double
+        Y position
+    z : double
+        Z position
+    beta : double
+        First Euler angle
+    gamma : double
+        Second Euler angle
+    c : double[6]
+        Buffer for the coordinates for the kernel
+    """
 
-        if beta == 0:
-            c[0] = x
-            c[1] = y
-            c[2] = z
-            c[3] = c[4] = c[5] = 0
+    cdef:
+        double q
+        double cg
+        double sg
+        double cotq2
 
-        else:
-            q = fabs(beta)
-            cg = cos(gamma)
-            sg = sin(gamma)
-            cotq2 = 1.0 / tan(q/2)
-
-            c[0] = -0.5*z*beta*cg + \
-                    x*(1 - (beta*beta*cg*cg * (1 - 0.5*q*cotq2)) / (q*q)) - \
-                    (y*beta*beta*cg*sg * (1 - 0.5*q*cotq2)) / (q*q)
-            c[1] = -0.5*z*beta*sg - \
-                    (x*beta*beta*cg*sg * (1 - 0.5*q*cotq2)) / (q*q) + \
-                    y * (1 - (beta*beta*sg*sg * (1 - 0.5*q*cotq2)) / (q*q))
-            c[2] = 0.5*x*beta*cg + 0.5*y*beta*sg + \
-                   z * (1 + ((1 - 0.5*q*cotq2) * (-beta*beta*cg*cg - \
-                        beta*beta*sg*sg)) / (q*q))
-            c[3] = beta * (-sg)
-            c[4] = beta * cg
-            c[5] = 0
-
-        return c
+    if beta == 0:
+        c[0] = x
+        c[1] = y
+        c[2] = z
+        c[3] = c[4] = c[5] = 0
 
-    @cython.wraparound(False)
-    @cython.boundscheck(False)
-    @cython.nonecheck(False)
-    @cython.cdivision(True)
-    cdef double kernel(self, double [:] c) noexcept nogil:
-        """ Internal function, evaluates the kernel based on the coordinate map.
+    else:
+        q = fabs(beta)
+        cg = cos(gamma)
+        sg = sin(gamma)
+        cotq2 = 1.0 / tan(q/2)
+
+        c[0] = -0.5*z*beta*cg + \
+                x*(1 - (beta*beta*cg*cg * (1 - 0.5*q*cotq2)) / (q*q)) - \
+                (y*beta*beta*cg*sg * (1 - 0.5*q*cotq2)) / (q*q)
+        c[1] = -0.5*z*beta*sg - \
+                (x*beta*beta*cg*sg * (1 - 0.5*q*cotq2)) / (q*q) + \
+                y * (1 - (beta*beta*sg*sg * (1 - 0.5*q*cotq2)) / (q*q))
+        c[2] = 0.5*x*beta*cg + 0.5*y*beta*sg + \
+               z * (1 + ((1 - 0.5*q*cotq2) * (-beta*beta*cg*cg - \
+                    beta*beta*sg*sg)) / (q*q))
+        c[3] = beta * (-sg)
+        c[4] = beta * cg
+        c[5] = 0
+
+
+@cython.cdivision(True)
+cdef double _kernel(double D33, double D44, double t,
+                    double* c) noexcept nogil:
+    """ Internal function, evaluates the kernel based on the coordinate map.
 
-        Parameters
-        ----------
-        c : 1D ndarray
-            array of coordinates for kernel
+    Parameters
+    ----------
+    D33 : double
+        Spatial diffusion
+    D44 : double
+        Angular diffusion
+    t : double
+        Diffusion time
+    c : double[6]
+        array of coordinates for kernel
 
-        Returns
-        -------
-        kernel_value : double
-        """
-        cdef double output = 1 / (8*sqrt(2))
-        output *= sqrt(PI)*self.t*sqrt(self.t*self.D33)*sqrt(self.D33*self.D44)
-        output *= 1 / (16*PI*PI*self.D33*self.D33*self.D44*self.D44*self.t*self.t*self.t*self.t)
-        output *= exp(-sqrt((c[0]*c[0] + c[1]*c[1]) / (self.D33*self.D44) + \
-                   (c[2]*c[2] / self.D33 + (c[3]*c[3]+c[4]*c[4]) / self.D44) * \
-                   (c[2]*c[2] / self.D33 + (c[3]*c[3]+c[4]*c[4]) / self.D44) + \
-                    c[5]*c[5]/self.D44) / (4*self.t))
-        return output
+    Returns
+    -------
+    kernel_value : double
+    """
+    cdef double output = 1 / (8*sqrt(2))
+    output *= sqrt(PI)*t*sqrt(t*D33)*sqrt(D33*D44)
+    output *= 1 / (16*PI*PI*D33*D33*D44*D44*t*t*t*t)
+    output *= exp(-sqrt((c[0]*c[0] + c[1]*c[1]) / (D33*D44) + \
+               (c[2]*c[2] / D33 + (c[3]*c[3]+c[4]*c[4]) / D44) * \
+               (c[2]*c[2] / D33 + (c[3]*c[3]+c[4]*c[4]) / D44) + \
+                c[5]*c[5]/D44) / (4*t))
+    return output
 
-cdef double PI = 3.1415926535897932
 
-@cython.wraparound(False)
-@cython.boundscheck(False)
-cdef double [:] euler_angles(double [:] inp) noexcept nogil:
+cdef void _euler_angles(double* inp, double* beta,
+                        double* gamma) noexcept nogil:
     """ Compute the Euler angles for a given input vector
 
     Parameters
     ----------
-    inp : 1D ndarray
+    inp : double[3]
         Input vector
-
-    Returns
-    -------
-    euler_angles : 1D ndarray
+    beta : double*
+        Output, first Euler angle
+    gamma : double*
+        Output, second Euler angle
     """
     cdef:
-        double x
-        double y
-        double z
-        double [:] output
-
-    x = inp[0]
-    y = inp[1]
-    z = inp[2]
-
-    with gil:
-
-        output = np.zeros(3)
+        double x = inp[0]
+        double y = inp[1]
+        double z = inp[2]
 
     # handle the case (0,0,1)
     if x*x < 10e-6 and y*y < 10e-6 and (z-1) * (z-1) < 10e-6:
-        output[0] = 0
-        output[1] = 0
+        beta[0] = 0
+        gamma[0] = 0
 
     # handle the case (0,0,-1)
     elif x*x < 10e-6 and y*y < 10e-6 and (z+1) * (z+1) < 10e-6:
-        output[0] = PI
-        output[1] = 0
+        beta[0] = PI
+        gamma[0] = 0
 
     # all other cases
     else:
-        output[0] = acos(z)
-        output[1] = atan2(y, x)
+        beta[0] = acos(z)
+        gamma[0] = atan2(y, x)
 
-    return output
 
-@cython.wraparound(False)
-@cython.boundscheck(False)
-cdef double [:,:] R(double [:] inp) noexcept nogil:
-    """ Compute the Rotation matrix for a given input vector
+cdef void _rotation_matrix(double beta, double gamma,
+                           double* output) noexcept nogil:
+    """ Compute the rotation matrix for the given Euler angles
 
     Parameters
     ----------
-    inp : 1D ndarray
-        Input vector
-
-    Returns
-    -------
-    rotation_matrix : 2D ndarray
+    beta : double
+        First Euler angle
+    gamma : double
+        Second Euler angle
+    output : double[9]
+        Buffer for the 3x3 rotation matrix, in row-major order
     """
     cdef:
-        double beta
-        double gamma
-        double [:] output
-        double cb
-        double sb
-        double cg
-        double sg
-
-    beta = inp[0]
-    gamma = inp[1]
-
-    with gil:
-
-        output = np.zeros(9)
-
-    cb = cos(beta)
-    sb = sin(beta)
-    cg = cos(gamma)
-    sg = sin(gamma)
+        double cb = cos(beta)
+        double sb = sin(beta)
+        double cg = cos(gamma)
+        double sg = sin(gamma)
 
     output[0] = cb * cg
     output[1] = -sg
@@ -470,6 +647,11 @@ cdef double [:,:] R(double [:] inp) noexcept nogil:
     output[7] = 0
     output[8] = cb
 
-    with gil:
 
-        return np.reshape(output, (3,3))
+cdef inline void _transpose_dot(double* rot, double* inp,
+                                double* out) noexcept nogil:
+    """ Multiply a vector by the transpose of a 3x3 row-major matrix """
+    cdef int i
+
+    for i in range(3):
+        out[i] = rot[i] * inp[0] + rot[3 + i] * inp[1] + rot[6 + i] * inp[2]
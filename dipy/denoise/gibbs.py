@@ -1,5 +1,4 @@
-from functools import partial
-import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import scipy.fft
@@ -17,48 +16,50 @@ def _image_tv(x, *, axis=0, n_points=3):
 
     Parameters
     ----------
-    x : 2D ndarray
-        matrix x
+    x : ndarray (..., M, N)
+        matrix x, or a stack of matrices.
     axis : int (0 or 1)
-        Axis which TV will be calculated. Default a is set to 0.
+        Axis of the matrices along which TV will be calculated. Default a is
+        set to 0.
     n_points : int
         Number of points to be included in TV calculation.
 
     Returns
     -------
-    ptv : 2D ndarray
+    ptv : ndarray (..., M, N)
         Total variation calculated from the right neighbours of each point.
-    ntv : 2D ndarray
+    ntv : ndarray (..., M, N)
         Total variation calculated from the left neighbours of each point.
 
     """
-    xs = x.copy() if axis else x.T.copy()
+    xs = x if axis else np.swapaxes(x, -1, -2)
 
     # Add copies of the data so that data extreme points are also analysed
     xs = np.concatenate(
-        (xs[:, (-n_points - 1) :], xs, xs[:, 0 : (n_points + 1)]), axis=1
+        (xs[..., (-n_points - 1) :], xs, xs[..., 0 : (n_points + 1)]), axis=-1
     )
 
     ptv = np.absolute(
-        xs[:, (n_points + 1) : (-n_points - 1)] - xs[:, (n_points + 2) : (-n_points)]
+        xs[..., (n_points + 1) : (-n_points - 1)]
+        - xs[..., (n_points + 2) : (-n_points)]
     )
     ntv = np.absolute(
-        xs[:, (n_points + 1) : (-n_points - 1)] - xs[:, n_points : (-n_points - 2)]
+        xs[..., (n_points + 1) : (-n_points - 1)] - xs[..., n_points : (-n_points - 2)]
     )
     for n in range(1, n_points):
-        ptv = ptv + np.absolute(
-            xs[:, (n_points + 1 + n) : (-n_points - 1 + n)]
-            - xs[:, (n_points + 2 + n) : (-n_points + n)]
+        ptv += np.absolute(
+            xs[..., (n_points + 1 + n) : (-n_points - 1 + n)]
+            - xs[..., (n_points + 2 + n) : (-n_points + n)]
         )
-        ntv = ntv + np.absolute(
-            xs[:, (n_points + 1 - n) : (-n_points - 1 - n)]
-            - xs[:, (n_points - n) : (-n_points - 2 - n)]
+        ntv += np.absolute(
+            xs[..., (n_points + 1 - n) : (-n_points - 1 - n)]
+            - xs[..., (n_points - n) : (-n_points - 2 - n)]
         )
 
     if axis:
         return ptv, ntv
     else:
-        return ptv.T, ntv.T
+        return np.swapaxes(ptv, -1, -2), np.swapaxes(ntv, -1, -2)
 
 
 @warning_for_keywords()
@@ -67,10 +68,10 @@ def _gibbs_removal_1d(x, *, axis=0, n_points=3):
 
     Parameters
     ----------
-    x : 2D ndarray
-        Matrix x.
+    x : ndarray (..., M, N)
+        Matrix x, or a stack of matrices.
     axis : int (0 or 1)
-        Axis in which Gibbs oscillations will be suppressed.
+        Axis of the matrices in which Gibbs oscillations will be suppressed.
         Default is set to 0.
     n_points : int, optional
         Number of neighbours to access local TV (see note).
@@ -78,7 +79,7 @@ def _gibbs_removal_1d(x, *, axis=0, n_points=3):
 
     Returns
     -------
-    xc : 2D ndarray
+    xc : ndarray (..., M, N)
         Matrix with suppressed Gibbs oscillations along the given axis.
 
     Notes
@@ -94,7 +95,7 @@ def _gibbs_removal_1d(x, *, axis=0, n_points=3):
 
     ssamp = np.linspace(0.02, 0.9, num=45, dtype=dtype_float)
 
-    xs = x.copy() if axis else x.T.copy()
+    xs = x.copy() if axis else np.swapaxes(x, -1, -2).copy()
 
     # TV for shift zero (baseline)
     tvr, tvl = _image_tv(xs, axis=1, n_points=n_points)
@@ -106,32 +107,34 @@ def _gibbs_removal_1d(x, *, axis=0, n_points=3):
     isn = xs.copy()
     sp = np.zeros(xs.shape, dtype=dtype_float)
     sn = np.zeros(xs.shape, dtype=dtype_float)
-    N = xs.shape[1]
-    c = _fft.fft(xs, axis=1)
+    N = xs.shape[-1]
+    c = _fft.fft(xs, axis=-1)
     k = _fft.fftfreq(N, 1 / (2.0j * np.pi))
     k = k.astype(c.dtype, copy=False)
     for s in ssamp:
         ks = k * s
         # Access positive shift for given s
-        img_p = abs(_fft.ifft(c * np.exp(ks), axis=1))
+        img_p = abs(_fft.ifft(c * np.exp(ks), axis=-1))
 
         tvsr, tvsl = _image_tv(img_p, axis=1, n_points=n_points)
         tvs_p = np.minimum(tvsr, tvsl)
 
         # Access negative shift for given s
-        img_n = abs(_fft.ifft(c * np.exp(-ks), axis=1))
+        img_n = abs(_fft.ifft(c * np.exp(-ks), axis=-1))
         tvsr, tvsl = _image_tv(img_n, axis=1, n_points=n_points)
         tvs_n = np.minimum(tvsr, tvsl)
 
         # Update positive shift params
-        isp[tvp > tvs_p] = img_p[tvp > tvs_p]
-        sp[tvp > tvs_p] = s
-        tvp[tvp > tvs_p] = tvs_p[tvp > tvs_p]
+        better = tvp > tvs_p
+        isp[better] = img_p[better]
+        sp[better] = s
+        tvp[better] = tvs_p[better]
 
         # Update negative shift params
-        isn[tvn > tvs_n] = img_n[tvn > tvs_n]
-        sn[tvn > tvs_n] = s
-        tvn[tvn > tvs_n] = tvs_n[tvn > tvs_n]
+        better = tvn > tvs_n
+        isn[better] = img_n[better]
+        sn[better] = s
+        tvn[better] = tvs_n[better]
 
     # check non-zero sub-voxel shifts
     idx = np.nonzero(sp + sn)
@@ -140,7 +143,7 @@ def _gibbs_removal_1d(x, *, axis=0, n_points=3):
     # original grid points
     xs[idx] = (isp[idx] - isn[idx]) / (sp[idx] + sn[idx]) * sn[idx] + isn[idx]
 
-    return xs if axis else xs.T
+    return xs if axis else np.swapaxes(xs, -1, -2)
 
 
 def _weights(shape):
@@ -194,8 +197,8 @@ def _gibbs_removal_2d(image, *, n_points=3, G0=None, G1=None):
 
     Parameters
     ----------
-    image : 2D ndarray
-        Matrix containing the 2D image.
+    image : ndarray (..., M, N)
+        Matrix containing the 2D image, or a stack of 2D images.
     n_points : int, optional
         Number of neighbours to access local TV (see note). Default is
         set to 3.
@@ -208,7 +211,7 @@ def _gibbs_removal_2d(image, *, n_points=3, G0=None, G1=None):
 
     Returns
     -------
-    imagec : 2D ndarray
+    imagec : ndarray (..., M, N)
         Matrix with Gibbs oscillations reduced along axis a.
 
     Notes
@@ -225,14 +228,20 @@ def _gibbs_removal_2d(image, *, n_points=3, G0=None, G1=None):
 
     """
     if G0 is None or G1 is None:
-        G0, G1 = _weights(image.shape)
+        G0, G1 = _weights(image.shape[-2:])
 
     img_c1 = _gibbs_removal_1d(image, axis=1, n_points=n_points)
     img_c0 = _gibbs_removal_1d(image, axis=0, n_points=n_points)
 
     C1 = _fft.fft2(img_c1)
     C0 = _fft.fft2(img_c0)
-    imagec = abs(_fft.ifft2(_fft.fftshift(C1) * G1 + _fft.fftshift(C0) * G0))
+    shift_axes = (-2, -1)
+    imagec = abs(
+        _fft.ifft2(
+            _fft.fftshift(C1, axes=shift_axes) * G1
+            + _fft.fftshift(C0, axes=shift_axes) * G0
+        )
+    )
 
     return imagec
 
@@ -256,10 +265,11 @@ def gibbs_removal(vol, *, slice_axis=2, n_points=3, inplace=True, num_processes=
         If True, the input data is replaced with results. Otherwise, returns
         a new array.
     num_processes : int or None, optional
-        Split the calculation to a pool of children processes. This only
-        applies to 3D or 4D `data` arrays. Default is 1. If < 0 the maximal
-        number of cores minus ``num_processes + 1`` is used (enter -1 to use
-        as many cores as possible). 0 raises an error.
+        Split the calculation to a pool of threads, which correct blocks of
+        slices in place. This only applies to 3D or 4D `data` arrays. Default
+        is 1. If < 0 the maximal number of cores minus ``num_processes + 1``
+        is used (enter -1 to use as many cores as possible). 0 raises an
+        error.
 
     Returns
     -------
@@ -320,19 +330,24 @@ def gibbs_removal(vol, *, slice_axis=2, n_points=3, inplace=True, num_processes=
     if nd == 2:
         vol[:, :] = _gibbs_removal_2d(vol, n_points=n_points, G0=G0, G1=G1)
     else:
+        # Blocks of slices are corrected together, and written in place. The
+        # FFTs and most array operations release the GIL, so that threads
+        # run them concurrently without copying the slices between processes.
+        block_size = max(2**18 // (shap[1] * shap[2]), 1)
+
+        def correct_block(start):
+            stop = min(start + block_size, shap[0])
+            vol[start:stop] = _gibbs_removal_2d(
+                vol[start:stop], n_points=n_points, G0=G0, G1=G1
+            )
+
+        starts = range(0, shap[0], block_size)
         if num_processes == 1:
-            for i in range(shap[0]):
-                vol[i, :, :] = _gibbs_removal_2d(
-                    vol[i, :, :], n_points=n_points, G0=G0, G1=G1
-                )
+            for start in starts:
+                correct_block(start)
         else:
-            mp.set_start_method("spawn", force=True)
-            pool = mp.Pool(num_processes)
-
-            partial_func = partial(_gibbs_removal_2d, n_points=n_points, G0=G0, G1=G1)
-            vol[:, :, :] = pool.map(partial_func, vol)
-            pool.close()
-            pool.join()
+            with ThreadPoolExecutor(max_workers=num_processes) as executor:
+                list(executor.map(correct_block, starts))
 
     # Reshape data to original format
     if nd == 3:
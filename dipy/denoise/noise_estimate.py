@@ -1,8 +1,11 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 from scipy.ndimage import convolve
 from scipy.special import gammainccinv
 
 from dipy.testing.decorators import warning_for_keywords
+from dipy.utils.omp import determine_num_threads
 
 
 def _inv_nchi_cdf(N, K, alpha):
@@ -32,7 +35,17 @@ opt_quantile = {
 
 
 @warning_for_keywords()
-def piesno(data, N, *, alpha=0.01, step=100, itermax=100, eps=1e-5, return_mask=False):
+def piesno(
+    data,
+    N,
+    *,
+    alpha=0.01,
+    step=100,
+    itermax=100,
+    eps=1e-5,
+    return_mask=False,
+    num_threads=None,
+):
     """
     Probabilistic Identification and Estimation of Noise (PIESNO).
 
@@ -70,6 +83,13 @@ def piesno(data, N, *, alpha=0.01, step=100, itermax=100, eps=1e-5, return_mask=
         If True, return a mask identifying all the pure noise voxel
         that were found.
 
+    num_threads : int, optional
+        Number of threads used over the slices of 4D data. If None (default),
+        the value of the ``OMP_NUM_THREADS`` environment variable is used if
+        it is set, otherwise all available threads are used. If < 0, the
+        maximal number of threads minus ``|num_threads + 1|`` is used (enter
+        -1 to use as many threads as possible). 0 raises an error.
+
     Returns
     -------
     sigma : float
@@ -114,8 +134,8 @@ def piesno(data, N, *, alpha=0.01, step=100, itermax=100, eps=1e-5, return_mask=
         sigma = np.zeros(data.shape[-2], dtype=np.float32)
         mask_noise = np.zeros(data.shape[:-1], dtype=bool)
 
-        for idx in range(data.shape[-2]):
-            sigma[idx], mask_noise[..., idx] = _piesno_3D(
+        def piesno_slice(idx):
+            return _piesno_3D(
                 data[..., idx, :],
                 N,
                 alpha=alpha,
@@ -126,6 +146,17 @@ def piesno(data, N, *, alpha=0.01, step=100, itermax=100, eps=1e-5, return_mask=
                 initial_estimation=initial_estimation,
             )
 
+        num_threads = determine_num_threads(num_threads)
+        slices = range(data.shape[-2])
+        if num_threads == 1:
+            results = map(piesno_slice, slices)
+        else:
+            with ThreadPoolExecutor(max_workers=num_threads) as executor:
+                results = list(executor.map(piesno_slice, slices))
+
+        for idx, (sigma_idx, mask_idx) in enumerate(results):
+            sigma[idx], mask_noise[..., idx] = sigma_idx, mask_idx
+
     else:
         sigma, mask_noise = _piesno_3D(
             data,
@@ -215,7 +246,7 @@ def _piesno_3D(
     .. footbibliography::
     """
 
-    if np.all(data == 0):
+    if not np.any(data):
         if return_mask:
             return 0, np.zeros(data.shape[:-1], dtype=bool)
 
@@ -239,22 +270,27 @@ def _piesno_3D(
 
     sigma_prev = 0
     sigma = m
-    prev_idx = 0
     mask = np.zeros(data.shape[:-1], dtype=bool)
 
     lambda_minus = _inv_nchi_cdf(N, K, alpha / 2)
     lambda_plus = _inv_nchi_cdf(N, K, 1 - alpha / 2)
 
-    for sigma_init in phi:
-        denominator = 2 * K * sigma_init**2
-        s = (sum_m2 / denominator) if denominator != 0 else np.zeros_like(sum_m2)
-        found_idx = np.sum(
-            np.logical_and(lambda_minus <= s, s <= lambda_plus), dtype=np.int16
-        )
+    # Number of voxels identified as noise by each initial sigma in phi,
+    # computed for blocks of candidates at once.
+    denominator = 2 * K * phi**2
+    found = np.empty(phi.size, dtype=np.intp)
+    sum_m2_flat = sum_m2.ravel()
+    block = max(2**22 // max(sum_m2_flat.size, 1), 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for start in range(0, phi.size, block):
+            s = sum_m2_flat / denominator[start : start + block, None]
+            found[start : start + block] = np.count_nonzero(
+                np.logical_and(lambda_minus <= s, s <= lambda_plus), axis=1
+            )
 
-        if found_idx > prev_idx:
-            sigma = sigma_init
-            prev_idx = found_idx
+    # The first initial sigma that identifies the most noise voxels
+    if found.size and found.max() > 0:
+        sigma = phi[np.argmax(found)]
 
     for _ in range(itermax):
         if np.abs(sigma - sigma_prev) < eps:
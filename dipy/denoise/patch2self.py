@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 import os
 from pathlib import Path
 import tempfile
@@ -12,6 +13,7 @@ from tqdm import tqdm
 from dipy.stats.sketching import count_sketch
 from dipy.testing.decorators import warning_for_keywords
 from dipy.utils.logging import logger
+from dipy.utils.omp import determine_num_threads
 from dipy.utils.optpkg import optional_package
 
 sklearn, has_sklearn, _ = optional_package("sklearn")
@@ -139,9 +141,48 @@ def _fit_denoising_model(train, vol_idx, model, alpha, *, copy_X=True):
     return model_instance, cur_x
 
 
-def _fit_denoising_models(train, model, alpha):
+def _map_voxel_blocks(func, n_voxels, n_features, num_threads):
+    """Apply a function to blocks of voxels across a thread pool.
+
+    The blocks hold about 2**23 elements of the patch matrix, which bounds
+    the memory of the temporaries of each thread.
+
+    Parameters
+    ----------
+    func : callable
+        Function of the (start, stop) indices of a block of voxels.
+    n_voxels : int
+        Number of voxels.
+    n_features : int
+        Number of rows of the patch matrix.
+    num_threads : int
+        Number of threads to use.
+
+    Returns
+    -------
+    results : list
+        The results of `func`, in block order.
+
+    """
+    block_size = max(2**23 // max(n_features, 1), 1)
+    blocks = [
+        (start, min(start + block_size, n_voxels))
+        for start in range(0, n_voxels, block_size)
+    ]
+    if num_threads == 1 or len(blocks) == 1:
+        return [func(*block) for block in blocks]
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        return list(executor.map(lambda block: func(*block), blocks))
+
+
+def _fit_denoising_models(train, model, alpha, *, num_threads=1):
     """Fit every leave-one-out 3D volume from a shared Gram matrix.
 
+    The Gram matrix of all the volumes is inverted once, and the inverse of
+    each leave-one-out system is obtained from it by a rank update that
+    removes the rows of the held out volume. If the Gram matrix is too badly
+    conditioned for this update, each system is solved separately.
+
     Parameters
     ----------
     train : ndarray
@@ -151,6 +192,8 @@ def _fit_denoising_models(train, model, alpha):
         ``Ridge(alpha=1e-10)`` to match ``_fit_denoising_model``.
     alpha : float
         Regularization parameter for ridge regression.
+    num_threads : int, optional
+        Number of threads used to accumulate the Gram matrix.
 
     Returns
     -------
@@ -164,33 +207,87 @@ def _fit_denoising_models(train, model, alpha):
     if n_vols == 0:
         return []
 
-    train_flat = train.reshape(n_vols * n_patch, n_voxels)
-
-    row_means = train_flat.mean(axis=1)
-    train_centered = train_flat - row_means[:, None]
-    G_cent = train_centered @ train_centered.T
-    reg = ridge_alpha * np.eye((n_vols - 1) * n_patch, dtype=G_cent.dtype)
+    n_features = n_vols * n_patch
+    train_flat = train.reshape(n_features, n_voxels)
+    row_means = train_flat.mean(axis=1, dtype=np.float64)
 
-    fits = []
-    center_offset = n_patch // 2
-    for vol_idx in range(n_vols):
-        held_start = vol_idx * n_patch
-        held_stop = held_start + n_patch
-        target_row = held_start + center_offset
+    def gram_block(start, stop):
+        x = train_flat[:, start:stop] - row_means[:, None]
+        return x @ x.T
 
-        keep = np.ones(n_vols * n_patch, dtype=bool)
-        keep[held_start:held_stop] = False
+    G_cent = sum(_map_voxel_blocks(gram_block, n_voxels, n_features, num_threads))
+    G_reg = G_cent + ridge_alpha * np.eye(n_features)
 
-        G_xx = G_cent[np.ix_(keep, keep)]
-        b = G_cent[keep, target_row]
+    center_offset = n_patch // 2
+    targets = np.arange(n_vols) * n_patch + center_offset
+    held = np.arange(n_features).reshape(n_vols, n_patch)
+
+    evals, evecs = np.linalg.eigh(G_reg)
+    use_update = evals[0] > 1e-8 * evals[-1]
+    if use_update:
+        H = (evecs / evals) @ evecs.T
+        # Right hand sides of all the systems, without the held out rows
+        B = G_cent[:, targets]
+        B[held.ravel(), np.repeat(np.arange(n_vols), n_patch)] = 0
+        HB = H @ B
 
-        coef = solve(G_xx + reg, b, assume_a="pos")
+    fits = []
+    for vol_idx in range(n_vols):
+        keep = np.ones(n_features, dtype=bool)
+        keep[held[vol_idx]] = False
+        target_row = targets[vol_idx]
+
+        if use_update:
+            h = HB[:, vol_idx]
+            H_kb = H[keep][:, held[vol_idx]]
+            H_bb = H[np.ix_(held[vol_idx], held[vol_idx])]
+            coef = h[keep] - H_kb @ solve(H_bb, h[held[vol_idx]], assume_a="pos")
+        else:
+            G_xx = G_reg[np.ix_(keep, keep)]
+            b = G_cent[keep, target_row]
+            coef = solve(G_xx, b, assume_a="pos")
         intercept = row_means[target_row] - row_means[keep] @ coef
         fits.append((coef, float(intercept)))
 
     return fits
 
 
+def _predict_denoising_models(train, fits, out, *, num_threads=1):
+    """Predict every held out 3D volume from its leave-one-out fit.
+
+    Parameters
+    ----------
+    train : ndarray
+        Array of all 3D patches flattened out to be 2D.
+    fits : list of (coef, intercept)
+        The fits of ``_fit_denoising_models``.
+    out : ndarray of shape (nvoxels, nvolumes)
+        Array where the denoised signal of each held out volume is written,
+        block of voxels by block of voxels.
+    num_threads : int, optional
+        Number of threads used over the blocks of voxels.
+
+    """
+    n_vols, n_patch, n_voxels = train.shape
+    n_features = n_vols * n_patch
+    train_flat = train.reshape(n_features, n_voxels)
+
+    # All the fits as one coefficient matrix, zero on the held out rows
+    dtype = np.result_type(train.dtype, np.float32)
+    coefs = np.zeros((n_features, n_vols), dtype=dtype)
+    intercepts = np.zeros(n_vols, dtype=dtype)
+    for vol_idx, (coef, intercept) in enumerate(fits):
+        keep = np.ones(n_features, dtype=bool)
+        keep[vol_idx * n_patch : (vol_idx + 1) * n_patch] = False
+        coefs[keep, vol_idx] = coef
+        intercepts[vol_idx] = intercept
+
+    def predict_block(start, stop):
+        out[start:stop] = train_flat[:, start:stop].T @ coefs + intercepts
+
+    _map_voxel_blocks(predict_block, n_voxels, n_features, num_threads)
+
+
 def vol_denoise(
     data_dict, b0_idx, dwi_idx, model, alpha, b0_denoising, verbose, tmp_dir
 ):
@@ -354,6 +451,8 @@ def patch2self(
     tmp_dir=None,
     version=3,
     gram=True,
+    num_threads=None,
+    rng=None,
 ):
     """Patch2Self Denoiser.
 
@@ -404,6 +503,18 @@ def patch2self(
         Solve leave-one-out fits from a shared Gram matrix, reducing runtime
         and memory. If False, perform per-volume regression as in the
         original publication. Applies only to `version=1`.
+    num_threads : int, optional
+        Number of threads used over blocks of voxels by the Gram matrix solver
+        (`version=1` with `gram=True`) and by the count sketch of the data
+        (`version=3`). If None (default), the value of the
+        ``OMP_NUM_THREADS`` environment variable is used if it is set,
+        otherwise all available threads are used. If < 0, the maximal number
+        of threads minus ``|num_threads + 1|`` is used (enter -1 to use as
+        many threads as possible). 0 raises an error.
+    rng : numpy.random.Generator, optional
+        Random number generator used by the count sketch of the data
+        (`version=3`). Pass a seeded generator for reproducible results. If
+        None, the generator is initialized using the default BitGenerator.
 
     Returns
     -------
@@ -435,6 +546,7 @@ def patch2self(
             clip_negative_vals,
             shift_intensity,
             gram,
+            num_threads=num_threads,
         )
     return _patch2self_version3(
         data,
@@ -448,6 +560,8 @@ def patch2self(
         clip_negative_vals,
         shift_intensity,
         tmp_dir,
+        num_threads=num_threads,
+        rng=rng,
     )
 
 
@@ -545,6 +659,8 @@ def _patch2self_version1(
     clip_negative_vals,
     shift_intensity,
     gram=True,
+    *,
+    num_threads=None,
 ):
     """Patch2Self Denoiser.
 
@@ -587,6 +703,9 @@ def _patch2self_version1(
         Solve leave-one-out fits from a shared Gram matrix, reducing runtime
         and memory. If False, perform per-volume regression as in the
         original publication. Applies only to `version=1`.
+    num_threads : int, optional
+        Number of threads used over blocks of voxels by the Gram matrix
+        solver.
 
     Returns
     -------
@@ -611,6 +730,8 @@ def _patch2self_version1(
     use_gram_solver = (
         gram and isinstance(model, str) and model.lower() in ("ols", "ridge")
     )
+    if use_gram_solver:
+        num_threads = determine_num_threads(num_threads)
 
     # Segregates volumes by b0 threshold
     b0_idx = np.argwhere(bvals <= b0_threshold)
@@ -650,12 +771,17 @@ def _patch2self_version1(
         )
 
         if use_gram_solver:
-            fits = _fit_denoising_models(train_b0, model, alpha)
-            for vol_idx, (coef, intercept) in enumerate(fits):
-                cur_x, _ = _vol_split(train_b0, vol_idx)
-                denoised_b0s[..., vol_idx] = (cur_x.T @ coef + intercept).reshape(
-                    data_b0s.shape[0], data_b0s.shape[1], data_b0s.shape[2]
-                )
+            fits = _fit_denoising_models(
+                train_b0, model, alpha, num_threads=num_threads
+            )
+            _predict_denoising_models(
+                train_b0,
+                fits,
+                denoised_b0s.reshape(-1, data_b0s.shape[3]),
+                num_threads=num_threads,
+            )
+            if verbose is True:
+                logger.info(f"Denoised b0 Volumes: {data_b0s.shape[3]}")
         else:
             for vol_idx in range(0, data_b0s.shape[3]):
                 b0_model, cur_x = _fit_denoising_model(
@@ -665,8 +791,8 @@ def _patch2self_version1(
                     data_b0s.shape[0], data_b0s.shape[1], data_b0s.shape[2]
                 )
 
-        if verbose is True:
-            logger.info(f"Denoised b0 Volume: {vol_idx}")
+            if verbose is True:
+                logger.info(f"Denoised b0 Volume: {vol_idx}")
     # Separate denoising for DWI volumes
     train_dwi = _extract_3d_patches(
         np.pad(
@@ -684,14 +810,15 @@ def _patch2self_version1(
 
     # Insert the separately denoised arrays into the respective empty arrays
     if use_gram_solver:
-        fits = _fit_denoising_models(train_dwi, model, alpha)
-        for vol_idx, (coef, intercept) in enumerate(fits):
-            cur_x, _ = _vol_split(train_dwi, vol_idx)
-            denoised_dwi[..., vol_idx] = (cur_x.T @ coef + intercept).reshape(
-                data_dwi.shape[0], data_dwi.shape[1], data_dwi.shape[2]
-            )
-            if verbose is True:
-                logger.info(f"Denoised DWI Volume: {vol_idx}")
+        fits = _fit_denoising_models(train_dwi, model, alpha, num_threads=num_threads)
+        _predict_denoising_models(
+            train_dwi,
+            fits,
+            denoised_dwi.reshape(-1, data_dwi.shape[3]),
+            num_threads=num_threads,
+        )
+        if verbose is True:
+            logger.info(f"Denoised DWI Volumes: {data_dwi.shape[3]}")
     else:
         for vol_idx in range(0, data_dwi.shape[3]):
             dwi_model, cur_x = _fit_denoising_model(
@@ -737,6 +864,9 @@ def _patch2self_version3(
     clip_negative_vals,
     shift_intensity,
     tmp_dir,
+    *,
+    num_threads=None,
+    rng=None,
 ):
     """Patch2Self Denoiser.
 
@@ -775,6 +905,10 @@ def _patch2self_version3(
     tmp_dir : str
         The directory to save the temporary files. If None, the temporary
         files are saved in the system's default temporary directory.
+    num_threads : int, optional
+        Number of threads used by the count sketch of the data.
+    rng : numpy.random.Generator, optional
+        Random number generator used by the count sketch of the data.
 
     Returns
     -------
@@ -814,6 +948,8 @@ def _patch2self_version3(
         tmp.shape,
         sketch_rows=sketch_rows,
         tmp_dir=tmp_dir,
+        rng=rng,
+        num_threads=num_threads,
     )
     sketched_matrix = np.memmap(
         sketched_matrix_name,
@@ -114,7 +114,7 @@ def convolve_sf(odfs_sf, kernel, test_mode=False, num_threads=None, normalize=Tr
 @cython.nonecheck(False)
 @cython.cdivision(True)
 cdef double [:, :, :, ::1] perform_convolution (double [:, :, :, ::1] odfs,
-                                                double [:, :, :, :, ::1] lut,
+                                                const double [:, :, :, :, ::1] lut,
                                                 cnp.npy_intp test_mode,
                                                 num_threads=None):
     """ Perform the shift-twist convolution with the ODF data
@@ -2,15 +2,21 @@
 
 import numpy as np
 import pytest
+from scipy import ndimage, sparse
 
 from dipy.core.gradients import extract_b0, gradient_table
 from dipy.denoise.bias_correction import (
-    _build_bspline_design_matrix,
+    _bspline_axis_basis,
+    _bspline_basis_batch,
+    _eval_bspline_field,
     _get_mask,
     _get_mean_b0,
     _gradient_weights,
+    _legendre_axis_basis,
     _legendre_basis,
+    _legendre_terms,
     _normalize_coords,
+    _separable_weighted_ridge_solve,
     _tukey_weights,
     bias_field_correction,
     polynomial_bias_field_dwi,
@@ -18,6 +24,69 @@ from dipy.denoise.bias_correction import (
 from dipy.segment.mask import median_otsu
 
 
+def _reference_bspline_design_matrix(*, log_b0_shape, n_control, mask_flat):
+    """Sparse B-spline design matrix of the masked voxels.
+
+    Reference for ``test_separable_bspline_matches_design_matrix`` only.
+
+    Parameters
+    ----------
+    log_b0_shape : tuple of int
+        Shape of the 3D volume (S, R, C).
+    n_control : tuple of int
+        Control grid dimensions (ns, nr, nc).
+    mask_flat : ndarray
+        Flattened boolean mask, shape (S*R*C,).
+
+    Returns
+    -------
+    X : scipy.sparse.csr_matrix
+        Design matrix, shape (N_masked, K_ctrl_total).
+    """
+    ns, nr, nc = n_control
+    voxels = np.where(mask_flat.reshape(log_b0_shape))
+    N = len(voxels[0])
+
+    bases = []
+    for vox, shape_d, n_ctrl_d in zip(voxels, log_b0_shape, n_control):
+        if shape_d <= 1 or n_ctrl_d <= 1:
+            t = np.zeros(N)
+        else:
+            t = vox * (n_ctrl_d - 1) / (shape_d - 1)
+        bases.append(_bspline_basis_batch(t, n_ctrl_d))
+    (bz, cz), (by, cy), (bx, cx) = bases
+
+    # Tensor product: (N, 4, 4, 4) via broadcasting
+    vals = (
+        bz[:, :, np.newaxis, np.newaxis]
+        * by[:, np.newaxis, :, np.newaxis]
+        * bx[:, np.newaxis, np.newaxis, :]
+    )
+    cols = (
+        cz[:, :, np.newaxis, np.newaxis] * (nr * nc)
+        + cy[:, np.newaxis, :, np.newaxis] * nc
+        + cx[:, np.newaxis, np.newaxis, :]
+    )
+    rows = np.broadcast_to(
+        np.arange(N)[:, np.newaxis, np.newaxis, np.newaxis], vals.shape
+    )
+    valid = (
+        ((cz >= 0) & (cz < ns))[:, :, np.newaxis, np.newaxis]
+        & ((cy >= 0) & (cy < nr))[:, np.newaxis, :, np.newaxis]
+        & ((cx >= 0) & (cx < nc))[:, np.newaxis, np.newaxis, :]
+    )
+    return sparse.csr_matrix(
+        (vals[valid], (rows[valid], cols[valid])), shape=(N, ns * nr * nc)
+    )
+
+
+def _sparse_weighted_ridge_solve(*, X_sparse, y, weights, lambda_reg):
+    """Weighted ridge regression with a sparse design matrix (reference)."""
+    X = X_sparse.toarray()
+    A = X.T @ (weights[:, np.newaxis] * X) + lambda_reg * np.eye(X.shape[1])
+    return np.linalg.solve(A, X.T @ (weights * y))
+
+
 def _make_synthetic_dwi(*, shape=(20, 20, 15), n_vols=10, rng=None):
     """Create synthetic DWI data with a smooth multiplicative bias field.
 
@@ -171,32 +240,75 @@ def test_get_mask_provided():
     np.testing.assert_array_equal(mask, true_mask.astype(bool))
 
 
-def test_bspline_design_matrix_shape():
-    shape = (10, 10, 8)
-    n_ctrl = (4, 4, 3)
-    mask = np.ones(shape, dtype=bool)
-    X = _build_bspline_design_matrix(
+def test_bspline_axis_basis_shape():
+    for n_vox, n_ctrl in [(10, 4), (8, 3), (1, 4), (10, 1)]:
+        B = _bspline_axis_basis(n_vox=n_vox, n_ctrl=n_ctrl)
+        assert B.shape == (n_vox, n_ctrl)
+
+
+def test_bspline_axis_basis_row_sums():
+    # The cubic B-splines are a partition of unity where all the control
+    # points supporting a voxel are on the grid; near the boundaries the
+    # missing control points leave row sums in (0, 1)
+    for n_vox, n_ctrl in [(10, 4), (12, 6)]:
+        B = _bspline_axis_basis(n_vox=n_vox, n_ctrl=n_ctrl)
+        t = np.arange(n_vox) * (n_ctrl - 1) / (n_vox - 1)
+        inner = (t >= 1) & (t <= n_ctrl - 2)
+        assert np.any(inner)
+        row_sums = B.sum(axis=1)
+        np.testing.assert_allclose(row_sums[inner], 1)
+        assert row_sums.min() > 0.0
+        assert row_sums.max() <= 1.0 + 1e-12
+
+
+def test_separable_bspline_matches_design_matrix():
+    rng = np.random.default_rng(0)
+    shape = (10, 9, 8)
+    n_ctrl = (4, 5, 3)
+    mask = rng.random(shape) > 0.3
+    X = _reference_bspline_design_matrix(
         log_b0_shape=shape, n_control=n_ctrl, mask_flat=mask.ravel()
     )
-    K = n_ctrl[0] * n_ctrl[1] * n_ctrl[2]
-    N = mask.sum()
-    assert X.shape == (N, K)
+    bases = tuple(_bspline_axis_basis(n_vox=n, n_ctrl=k) for n, k in zip(shape, n_ctrl))
+    # Cached, read-only bases
+    assert bases[0] is _bspline_axis_basis(n_vox=10, n_ctrl=4)
+    assert not bases[0].flags.writeable
+
+    y = rng.standard_normal(shape)
+    w = np.where(mask, rng.random(shape), 0.0)
+    expected = _sparse_weighted_ridge_solve(
+        X_sparse=X, y=y[mask], weights=w[mask], lambda_reg=1e-3
+    )
+    beta = _separable_weighted_ridge_solve(bases=bases, y=y, weights=w, lambda_reg=1e-3)
+    np.testing.assert_allclose(beta, expected, rtol=1e-8, atol=1e-10)
+
+    # Field evaluation matches the B-spline interpolation of the weights
+    coeffs = rng.standard_normal(n_ctrl)
+    out_shape = (12, 7, 9)
+    grids = [np.linspace(0, k - 1, n) for n, k in zip(out_shape, n_ctrl)]
+    coords = np.array([g.ravel() for g in np.meshgrid(*grids, indexing="ij")])
+    expected = ndimage.map_coordinates(
+        coeffs, coords, order=3, mode="nearest", prefilter=False
+    ).reshape(out_shape)
+    field = _eval_bspline_field(
+        coeffs=coeffs.ravel(), n_control=n_ctrl, out_shape=out_shape
+    )
+    np.testing.assert_allclose(field, expected, atol=1e-12)
 
 
-def test_bspline_design_matrix_row_sums():
-    # For a uniform B-spline, row sums should equal the sum of all
-    # basis functions at that parameter value (approximately 1 for
-    # the standard cubic B-spline kernel)
-    shape = (10, 10, 8)
-    n_ctrl = (4, 4, 3)
-    mask = np.ones(shape, dtype=bool)
-    X = _build_bspline_design_matrix(
-        log_b0_shape=shape, n_control=n_ctrl, mask_flat=mask.ravel()
+def test_legendre_axis_basis_matches_legendre_basis():
+    shape = (6, 5, 4)
+    order = 3
+    coords = np.array(np.nonzero(np.ones(shape, dtype=bool))).T
+    X = _legendre_basis(
+        coords_flat=_normalize_coords(shape=shape, coords=coords), order=order
     )
-    row_sums = np.asarray(X.sum(axis=1)).ravel()
-    # Not exactly 1 near boundaries, but should be in (0, 1.1]
-    assert row_sums.min() > 0.0
-    assert row_sums.max() <= 1.1
+    X_sep = np.ones_like(X)
+    terms = np.array(_legendre_terms(order)).T
+    for d in range(3):
+        L = _legendre_axis_basis(n_vox=shape[d], order=order)
+        X_sep *= L[np.ix_(coords[:, d], terms[d])]
+    np.testing.assert_allclose(X_sep, X, atol=1e-12)
 
 
 def test_synthetic_poly_bias():
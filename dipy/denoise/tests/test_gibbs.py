@@ -66,6 +66,22 @@ def test_parallel():
     assert_array_almost_equal(output_4d_all_cpu, output_4d_no_parallel)
 
 
+def test_stacked_slices():
+    # Stacks of slices are corrected together, in blocks, as the single slices
+    scales = np.linspace(0.5, 2, 40)
+    input_3d = image_gibbs[..., None] * scales
+    input_3d[..., ::2] = image_gibbs[::-1, :, None] * scales[::2]
+    expected = np.stack(
+        [_gibbs_removal_2d(input_3d[..., i]) for i in range(40)], axis=-1
+    )
+    assert_array_almost_equal(
+        _gibbs_removal_2d(np.moveaxis(input_3d, -1, 0)), np.moveaxis(expected, -1, 0)
+    )
+    for num_processes in [1, 3]:
+        output = gibbs_removal(input_3d, inplace=False, num_processes=num_processes)
+        assert_array_almost_equal(output, expected)
+
+
 def test_inplace():
     # Make input data
     input_2d = image_gibbs.copy()
@@ -1,9 +1,11 @@
+import os
 import warnings
 
 import numpy as np
 import numpy.testing as npt
 
 from dipy.core.sphere import Sphere
+from dipy.denoise import enhancement_kernel
 from dipy.denoise.enhancement_kernel import EnhancementKernel
 from dipy.denoise.shift_twist_convolution import convolve, convolve_sf
 from dipy.reconst.shm import descoteaux07_legacy_msg, sf_to_sh, sh_to_sf
@@ -168,3 +170,74 @@ def test_kernel_input():
 
     k = EnhancementKernel(D33, D44, t, orientations=0, force_recompute=True)
     npt.assert_equal(k.get_lookup_table().shape, (0, 0, 7, 7, 7))
+
+
+def test_kernel_cache(tmp_path):
+    """Test that the look-up tables are cached by content and memory-mapped"""
+    D33 = 1.0
+    D44 = 0.04
+    t = 1
+    sph = Sphere(xyz=np.array([[1.0, 0, 0], [0, 1.0, 0], [0, 0, 1.0]]))
+
+    k1 = EnhancementKernel(
+        D33, D44, t, orientations=sph, cache_dir=str(tmp_path), num_threads=1
+    )
+    cached = list(tmp_path.glob("*.npy"))
+    npt.assert_equal(len(cached), 1)
+
+    k2 = EnhancementKernel(D33, D44, t, orientations=sph, cache_dir=str(tmp_path))
+    lut = np.asarray(k2.get_lookup_table())
+    npt.assert_(not lut.flags.writeable)
+    npt.assert_array_equal(lut, np.asarray(k1.get_lookup_table()))
+
+    # The threaded computation gives the same table
+    k3 = EnhancementKernel(
+        D33,
+        D44,
+        t,
+        orientations=sph,
+        force_recompute=True,
+        cache_dir=str(tmp_path),
+        num_threads=2,
+    )
+    npt.assert_array_equal(np.asarray(k3.get_lookup_table()), lut)
+    npt.assert_equal(len(list(tmp_path.glob("*.npy"))), 1)
+
+    # Another sphere with as many vertices has its own table
+    sph2 = Sphere(xyz=np.array([[1.0, 0, 0], [0, 1.0, 0], [0, 0.6, 0.8]]))
+    k4 = EnhancementKernel(D33, D44, t, orientations=sph2, cache_dir=str(tmp_path))
+    npt.assert_equal(len(list(tmp_path.glob("*.npy"))), 2)
+    npt.assert_(not np.array_equal(np.asarray(k4.get_lookup_table()), lut))
+
+    # The tables of random spheres are not cached
+    k5 = EnhancementKernel(
+        D33, D44, t, orientations=3, cache_dir=str(tmp_path), verbose=False
+    )
+    npt.assert_equal(k5.get_lookup_table().shape[:2], (3, 3))
+    npt.assert_equal(len(list(tmp_path.glob("*.npy"))), 2)
+
+
+def test_kernel_cache_eviction(tmp_path, monkeypatch):
+    """Test that only the most recently used look-up tables are cached"""
+    monkeypatch.setattr(enhancement_kernel, "_LUT_CACHE_MAX_TABLES", 2)
+    sph = Sphere(xyz=np.array([[1.0, 0, 0], [0, 1.0, 0], [0, 0, 1.0]]))
+    tables = []
+    for i, D44 in enumerate([0.02, 0.03, 0.04]):
+        EnhancementKernel(
+            1.0, D44, 1, orientations=sph, cache_dir=str(tmp_path), verbose=False
+        )
+        (new,) = set(tmp_path.glob("*.npy")).difference(tables)
+        # Make the modification times distinct
+        os.utime(new, (i, i))
+        tables.append(new)
+    npt.assert_equal(set(tmp_path.glob("*.npy")), set(tables[1:]))
+
+    # Loading a table marks it as recently used
+    EnhancementKernel(
+        1.0, 0.03, 1, orientations=sph, cache_dir=str(tmp_path), verbose=False
+    )
+    EnhancementKernel(
+        1.0, 0.05, 1, orientations=sph, cache_dir=str(tmp_path), verbose=False
+    )
+    npt.assert_(tables[1].exists())
+    npt.assert_(not tables[2].exists())
@@ -355,3 +355,37 @@ def test_nlmeans_3d_invalid_sigma_and_mask_inputs():
 
     with pytest.raises(ValueError, match="mask needs to be a 3D ndarray"):
         nlmeans(arr, sigma=1.0, mask=np.ones((10, 10)), method="classic")
+
+
+@pytest.mark.parametrize("method", ["classic", "blockwise"])
+def test_nlmeans_tiled(method):
+    rng = np.random.default_rng(1234)
+    arr = 100 + 10 * rng.standard_normal((34, 21, 17, 2))
+    arr = arr.astype(np.float32)
+    mask = np.zeros(arr.shape[:3])
+    mask[3:31, 5:18, 1:16] = 1
+    mask[3:15, 5:10, 1:6] = 0
+    sigma_3d = 8 + rng.random(arr.shape[:3])
+
+    for sigma in (10.0, np.array([9.0, 11.0]), sigma_3d):
+        kwargs = {"mask": mask, "patch_radius": 1, "block_radius": 1}
+        expected = nlmeans(arr, sigma, method=method, num_threads=1, **kwargs)
+        for num_threads in (1, 3):
+            denoised = nlmeans(
+                arr,
+                sigma,
+                method=method,
+                num_threads=num_threads,
+                tiled=True,
+                **kwargs,
+            )
+            assert_equal(denoised.dtype, np.float32)
+            assert_array_almost_equal(denoised, expected, decimal=4)
+
+    expected = nlmeans(arr[..., 0], sigma_3d, method=method, mask=mask, num_threads=1)
+    denoised = nlmeans(arr[..., 0], sigma_3d, method=method, mask=mask, tiled=True)
+    assert_array_almost_equal(denoised, expected, decimal=4)
+
+    # Nothing to denoise outside of the mask
+    denoised = nlmeans(arr, 10.0, method=method, mask=np.zeros(mask.shape), tiled=True)
+    assert_equal(denoised, np.zeros_like(arr))
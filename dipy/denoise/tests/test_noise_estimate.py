@@ -129,6 +129,40 @@ def test_piesno_type():
     assert_almost_equal(sigma, 79.970003117424739)
 
 
+@set_random_number_generator(1234)
+def test_piesno_candidates_and_threads(rng):
+    N, K, alpha, step = 4, 12, 0.01, 50
+    sigma_true = 20.0
+    shape = (24, 20, 3, K)
+    noise = rng.normal(0, sigma_true, size=(2 * N,) + shape)
+    data = np.sqrt(np.sum(noise**2, axis=0))
+    # Add some signal so that not all voxels are pure noise
+    data[6:18, 5:15] += 500 * rng.random((12, 10, 3, K))
+
+    # Reference initial sigma, trying the candidates one by one
+    m = 30.0
+    phi = np.arange(1, step + 1) * m / step
+    sum_m2 = np.sum(data[..., 0, :].astype(np.float32) ** 2, axis=2)
+    lambda_minus = _inv_nchi_cdf(N, K, alpha / 2)
+    lambda_plus = _inv_nchi_cdf(N, K, 1 - alpha / 2)
+    sigma_ref, prev_idx = m, 0
+    for sigma_init in phi:
+        s = sum_m2 / (2 * K * sigma_init**2)
+        found_idx = np.sum((lambda_minus <= s) & (s <= lambda_plus))
+        if found_idx > prev_idx:
+            sigma_ref, prev_idx = sigma_init, found_idx
+    sigma_init = _piesno_3D(
+        data[..., 0, :], N, alpha=alpha, step=step, itermax=0, initial_estimation=m
+    )
+    assert_equal(sigma_init, sigma_ref)
+
+    sigma_1, mask_1 = piesno(data, N, step=step, return_mask=True, num_threads=1)
+    sigma_2, mask_2 = piesno(data, N, step=step, return_mask=True, num_threads=2)
+    assert_equal(sigma_1, sigma_2)
+    assert_equal(mask_1, mask_2)
+    assert_(np.allclose(sigma_1, sigma_true, rtol=0.2))
+
+
 def test_estimate_sigma():
     sigma = estimate_sigma(np.ones((7, 7, 7)), disable_background_masking=True)
     assert_equal(sigma, 0.0)
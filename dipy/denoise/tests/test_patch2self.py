@@ -340,15 +340,9 @@ def test_patch2self_v3_preserves_out_dtype_and_precision_invariance(rng):
     data32 = base.astype(np.float32)
     data64 = base.astype(np.float64)
 
-    state = np.random.get_state()
-    try:
-        np.random.seed(2025)
-        den32 = p2s.patch2self(data32, bvals, model="ridge", alpha=1.0, version=3)
-
-        np.random.seed(2025)
-        den64 = p2s.patch2self(data64, bvals, model="ridge", alpha=1.0, version=3)
-    finally:
-        np.random.set_state(state)
+    kwargs = {"model": "ridge", "alpha": 1.0, "version": 3}
+    den32 = p2s.patch2self(data32, bvals, rng=np.random.default_rng(2025), **kwargs)
+    den64 = p2s.patch2self(data64, bvals, rng=np.random.default_rng(2025), **kwargs)
 
     assert_equal(den32.dtype, np.float32)
     assert_equal(den64.dtype, np.float64)
@@ -361,6 +355,10 @@ def test_patch2self_v3_preserves_out_dtype_and_precision_invariance(rng):
     assert_allclose(m32, m64, rtol=2e-2, atol=1.25)
     assert_allclose(s32, s64, rtol=1e-1, atol=1.0)
 
+    # Seeded runs are reproducible
+    again = p2s.patch2self(data32, bvals, rng=np.random.default_rng(2025), **kwargs)
+    assert_equal(again, den32)
+
 
 @needs_sklearn
 def test_patch_radius_requires_scalar_or_3_tuple():
@@ -413,6 +411,46 @@ def test_fit_denoising_model_rejects_non_estimator():
         p2s._fit_denoising_model(train, 0, object(), 0.0)
 
 
+@set_random_number_generator(2026)
+def test_fit_denoising_models_rank_update(rng):
+    train = rng.standard_normal((6, 3, 200))
+    train[:, :, 100:] += 5
+
+    for model, alpha in [("ols", 1.0), ("ridge", 10.0)]:
+        fits = p2s._fit_denoising_models(train, model, alpha)
+        ridge_alpha = 1e-10 if model == "ols" else alpha
+        for vol_idx, (coef, intercept) in enumerate(fits):
+            # Ridge regression with an intercept, from the centered data
+            cur_x, y = p2s._vol_split(train, vol_idx)
+            x_mean, y_mean = cur_x.mean(axis=1), y.mean()
+            x_cent = cur_x - x_mean[:, None]
+            expected = np.linalg.solve(
+                x_cent @ x_cent.T + ridge_alpha * np.eye(len(x_mean)),
+                x_cent @ (y - y_mean),
+            )
+            assert_allclose(coef, expected, rtol=1e-6, atol=1e-9)
+            assert_allclose(intercept, y_mean - x_mean @ expected, atol=1e-9)
+
+        predictions = np.empty((200, 6))
+        p2s._predict_denoising_models(train, fits, predictions)
+        for vol_idx, (coef, intercept) in enumerate(fits):
+            cur_x, _ = p2s._vol_split(train, vol_idx)
+            assert_allclose(predictions[:, vol_idx], cur_x.T @ coef + intercept)
+        threaded = np.empty((200, 6))
+        p2s._predict_denoising_models(train, fits, threaded, num_threads=2)
+        assert_allclose(threaded, predictions)
+
+    # More features than voxels, with a well conditioned ridge penalty
+    train = rng.standard_normal((6, 27, 50))
+    fits = p2s._fit_denoising_models(train, "ridge", 1.0)
+    cur_x, y = p2s._vol_split(train, 2)
+    x_cent = cur_x - cur_x.mean(axis=1)[:, None]
+    expected = np.linalg.solve(
+        x_cent @ x_cent.T + np.eye(len(x_cent)), x_cent @ (y - y.mean())
+    )
+    assert_allclose(fits[2][0], expected, rtol=1e-6, atol=1e-9)
+
+
 def test_apply_post_processing_shift_intensity_uses_original_data():
     # Regression test: shift was previously computed as min(arr) - min(arr) == 0,
     # which silently disabled shift_intensity. The fix uses the original data
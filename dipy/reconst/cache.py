@@ -1,10 +1,402 @@
+"""Content-addressed caches of the reconstruction models.
+
+Values are cached under a digest of the content of their key, so that equal
+spheres or gradient tables built separately share their entries. Each
+instance of `Cache` keeps its entries in a least recently used cache bounded
+by the size of its values. Optionally, entries are also kept in a
+process-wide cache and in a directory, which are shared by all the instances
+with the same configuration, and by all the processes using the same
+directory, see `configure_cache`.
+
+Functions computing matrices that do not depend on a model instance (such as
+spherical harmonics bases) use `memoize` instead, which keeps their values
+in a bounded process-wide cache, and in the on-disk cache if enabled.
+"""
+
+from collections import OrderedDict
+import hashlib
+import inspect
+import os
+import pickle
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+from dipy.core.gradients import GradientTable
 from dipy.core.onetime import auto_attr
+from dipy.core.sphere import Sphere
 from dipy.testing.decorators import warning_for_keywords
 
+_MISSING = object()
+
+# Nesting depth up to which the content of objects is hashed
+_MAX_DEPTH = 4
+
+_config = {
+    "max_bytes": 256 * 2**20,
+    "shared": None,
+    "disk": None,
+    "memo": None,
+}
+
+
+def _update_digest(h, obj, stack, depth):
+    """Add the content of ``obj`` to the hash ``h``.
+
+    Returns False if the content of ``obj`` cannot be hashed.
+    """
+    if obj is None or isinstance(obj, (bool, int, float, complex, str, bytes)):
+        h.update(repr((type(obj).__name__, obj)).encode())
+        return True
+    if isinstance(obj, np.generic):
+        h.update(repr((obj.dtype.str, obj.item())).encode())
+        return True
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.hasobject:
+            return False
+        h.update(repr(("ndarray", obj.dtype.str, obj.shape)).encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+        return True
+    if inspect.isclass(obj) or inspect.isroutine(obj):
+        name = getattr(obj, "__qualname__", None)
+        if name is None or "<locals>" in name or "<lambda>" in name:
+            return False
+        h.update(repr(("type", getattr(obj, "__module__", None), name)).encode())
+        return True
+    if depth >= _MAX_DEPTH or id(obj) in stack:
+        return False
+
+    if isinstance(obj, Sphere):
+        items = [("vertices", obj.vertices)]
+    elif isinstance(obj, GradientTable):
+        attrs = ("gradients", "big_delta", "small_delta", "b0_threshold", "btens")
+        items = [(name, getattr(obj, name, None)) for name in attrs]
+    elif isinstance(obj, (tuple, list)):
+        items = list(enumerate(obj))
+    elif isinstance(obj, dict):
+        try:
+            items = sorted(obj.items())
+        except TypeError:
+            return False
+    elif hasattr(obj, "__dict__"):
+        # The cache of an instance is not part of its content
+        items = sorted(
+            (name, value)
+            for name, value in vars(obj).items()
+            if not name.startswith("_cache")
+        )
+    else:
+        return False
+
+    cls = type(obj)
+    h.update(repr(("object", cls.__module__, cls.__qualname__, len(items))).encode())
+    stack.add(id(obj))
+    try:
+        for name, value in items:
+            if not (
+                _update_digest(h, name, stack, depth + 1)
+                and _update_digest(h, value, stack, depth + 1)
+            ):
+                return False
+    finally:
+        stack.discard(id(obj))
+    return True
+
+
+def content_digest(obj):
+    """Digest of the content of an object.
+
+    Numbers, strings, arrays, spheres, gradient tables, and containers and
+    objects made of them, have equal digests when their contents are equal,
+    even if they are distinct objects.
+
+    Parameters
+    ----------
+    obj : object
+        The object to hash.
+
+    Returns
+    -------
+    digest : str or None
+        Hexadecimal digest of the content of ``obj``, or None if its content
+        cannot be hashed (e.g. if it holds arbitrary objects nested too
+        deeply).
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> from dipy.core.sphere import Sphere
+    >>> s1 = Sphere(xyz=np.eye(3))
+    >>> s2 = Sphere(xyz=np.eye(3))
+    >>> content_digest((s1, 4)) == content_digest((s2, 4))
+    True
+    >>> content_digest((s1, 4)) == content_digest((s2, 6))
+    False
+
+    """
+    h = hashlib.blake2b(digest_size=20)
+    if not _update_digest(h, obj, set(), 0):
+        return None
+    return h.hexdigest()
+
+
+def _nbytes(value):
+    """Approximate size of a cached value, in bytes."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_nbytes(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Least recently used cache bounded by the size of its values.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Largest total size of the cached values. The least recently used
+        values are evicted to respect it, and values larger than it are not
+        cached.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def nbytes(self):
+        """Total size of the cached values, in bytes."""
+        return self._nbytes
+
+    def get(self, key, default=None):
+        """Retrieve a value, and mark it as the most recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used values if needed."""
+        size = _nbytes(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._nbytes += size
+            while self._nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._nbytes -= evicted
+
+    def clear(self):
+        """Remove all the values."""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+
+class DiskCache:
+    """Cache of pickled values in a directory.
+
+    The values survive across processes, e.g. across the subjects of a batch
+    job. Only use directories that you trust, as loading a pickled value can
+    execute arbitrary code.
+
+    Parameters
+    ----------
+    directory : str
+        The directory of the cached values. It is created if needed.
+    """
+
+    def __init__(self, directory):
+        self.directory = os.fspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key, default=None):
+        """Retrieve the value of a hexadecimal key."""
+        try:
+            with open(self._path(key), "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return default
+
+    def set(self, key, value):
+        """Store the value of a hexadecimal key."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            # Atomic, so that concurrent processes never read partial files
+            os.replace(tmp_path, self._path(key))
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def clear(self):
+        """Remove all the values."""
+        for name in os.listdir(self.directory):
+            if name.endswith(".pkl"):
+                os.remove(os.path.join(self.directory, name))
+
+
+@warning_for_keywords()
+def configure_cache(
+    *,
+    max_bytes=256 * 2**20,
+    shared_max_bytes=0,
+    memo_max_bytes=64 * 2**20,
+    directory=None,
+):
+    """Configure the caches of all the reconstruction models.
+
+    Calling it without arguments restores the default configuration.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        Largest size of the values cached by each model instance created
+        afterwards.
+    shared_max_bytes : int, optional
+        Largest size of the process-wide cache, shared by all the model
+        instances with the same configuration. 0 disables it.
+    memo_max_bytes : int, optional
+        Largest size of the process-wide cache of `memoize`. 0 disables it.
+    directory : str, optional
+        Directory of an on-disk cache, shared by all the model instances with
+        the same configuration and by all the processes using the same
+        directory. None disables it.
+
+    Examples
+    --------
+    Keep the matrices of the models across the subjects of a batch job:
+
+    >>> import tempfile
+    >>> from dipy.reconst.cache import configure_cache
+    >>> with tempfile.TemporaryDirectory() as tmp_dir:
+    ...     configure_cache(shared_max_bytes=2**30, directory=tmp_dir)
+    ...     # fit the models of each subject here
+    ...     configure_cache()
+
+    """
+    _config["max_bytes"] = max_bytes
+    _config["shared"] = LRUCache(shared_max_bytes) if shared_max_bytes else None
+    _config["memo"] = LRUCache(memo_max_bytes) if memo_max_bytes else None
+    _config["disk"] = None if directory is None else DiskCache(directory)
+
+
+def _read_only(value):
+    """Mark the arrays of a cached value as read-only."""
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, (tuple, list)):
+        for v in value:
+            _read_only(v)
+    return value
+
+
+def memoize(tag, key, compute):
+    """Compute a value once per process, and reuse it afterwards.
+
+    The values are kept in a bounded process-wide cache, and in the on-disk
+    cache if one is set with `configure_cache`. The cached values are shared
+    by all the callers, so their arrays are made read-only. Callers handing
+    them out should return copies. When both caches are disabled, the value
+    is returned as computed.
+
+    Parameters
+    ----------
+    tag : str
+        Description of the value, which must be unique to ``compute``.
+    key : object
+        Arguments of ``compute`` on which the value depends. They are compared
+        by content, see `content_digest`.
+    compute : callable
+        Function without arguments computing the value.
+
+    Returns
+    -------
+    value : object
+        The value returned by ``compute``, with read-only arrays if it is
+        cached.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> from dipy.reconst.cache import memoize
+    >>> x = np.arange(3.0)
+    >>> y1 = memoize("square", x, lambda: x**2)
+    >>> y2 = memoize("square", np.arange(3.0), lambda: x**2)
+    >>> y1 is y2
+    True
+    >>> y1.flags.writeable
+    False
+
+    """
+    memo, disk = _config["memo"], _config["disk"]
+    digest = None
+    if memo is not None or disk is not None:
+        digest = content_digest(("memoize", tag, key))
+    if digest is None:
+        return compute()
+    if memo is not None:
+        value = memo.get(digest, _MISSING)
+        if value is not _MISSING:
+            return value
+    value = _MISSING if disk is None else disk.get(digest, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        if disk is not None:
+            disk.set(digest, value)
+    value = _read_only(value)
+    if memo is not None:
+        memo.set(digest, value)
+    return value
+
+
+# Default configuration
+configure_cache()
+
 
 class Cache:
     """Cache values based on a key object (such as a sphere or gradient table).
 
+    Values are cached under a digest of the content of the key (see
+    `content_digest`), so that equal keys built separately share their
+    entries. Keys whose content cannot be hashed are compared by equality,
+    as regular dictionary keys. The cache of each instance is bounded, and
+    the least recently used values are evicted first. The process-wide and
+    on-disk caches set with `configure_cache` are shared by the instances
+    whose configuration (i.e. their attributes) have equal contents.
+
     Notes
     -----
     This class is meant to be used as a mix-in::
@@ -31,7 +423,22 @@ class Cache:
     # calling the super-class constructor
     @auto_attr
     def _cache(self):
-        return {}
+        return LRUCache(_config["max_bytes"])
+
+    @auto_attr
+    def _cache_namespace(self):
+        # Digest of the configuration of the instance, which separates its
+        # entries in the shared caches from those of other configurations
+        return content_digest(self)
+
+    def _cache_shared_key(self, tag, digest):
+        """Key of an entry in the shared caches, or None if not shareable."""
+        if digest is None or (_config["shared"] is None and _config["disk"] is None):
+            return None
+        namespace = self._cache_namespace
+        if namespace is None:
+            return None
+        return content_digest((namespace, tag, digest))
 
     def cache_set(self, tag, key, value):
         """Store a value in the cache.
@@ -64,7 +471,13 @@ class Cache:
         True
 
         """
-        self._cache[(tag, key)] = value
+        digest = content_digest(key)
+        self._cache.set((tag, key if digest is None else digest), value)
+        shared_key = self._cache_shared_key(tag, digest)
+        if shared_key is not None:
+            for tier in (_config["shared"], _config["disk"]):
+                if tier is not None:
+                    tier.set(shared_key, value)
 
     @warning_for_keywords()
     def cache_get(self, tag, key, *, default=None):
@@ -86,8 +499,27 @@ class Cache:
             `default` if no cached entry is found.
 
         """
-        return self._cache.get((tag, key), default)
+        digest = content_digest(key)
+        local_key = (tag, key if digest is None else digest)
+        value = self._cache.get(local_key, _MISSING)
+        if value is not _MISSING:
+            return value
+        shared_key = self._cache_shared_key(tag, digest)
+        if shared_key is not None:
+            for tier in (_config["shared"], _config["disk"]):
+                if tier is None:
+                    continue
+                value = tier.get(shared_key, _MISSING)
+                if value is not _MISSING:
+                    self._cache.set(local_key, value)
+                    if tier is _config["disk"] and _config["shared"] is not None:
+                        _config["shared"].set(shared_key, value)
+                    return value
+        return default
 
     def cache_clear(self):
-        """Clear the cache."""
-        self._cache = {}
+        """Clear the cache of the instance.
+
+        The shared caches set with `configure_cache` are not cleared.
+        """
+        self._cache.clear()
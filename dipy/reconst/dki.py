@@ -11,7 +11,11 @@ import scipy.optimize as opt
 from dipy.core.geometry import cart2sphere, perpendicular_directions, sphere2cart
 from dipy.core.gradients import check_multi_b
 from dipy.core.ndindex import ndindex
-from dipy.core.optimize import PositiveDefiniteLeastSquares
+from dipy.core.optimize import (
+    PositiveDefiniteLeastSquares,
+    lmi_feasible_point,
+    solve_lmi_qp_batched,
+)
 import dipy.core.sphere as dps
 from dipy.data import get_fnames, get_sphere, load_sdp_constraints
 from dipy.reconst.base import ReconstModel
@@ -1783,6 +1787,12 @@ class DiffusionKurtosisModel(ReconstModel):
             - 'CWLS' for LMI constrained weighted least squares
               :footcite:p:`DelaHaije2020`. See func:`dki.cls_fit_dki`.
 
+            The constrained methods accept the ``solver`` keyword argument:
+            ``"cvxpy"`` (default) solves the problem of each voxel with CVXPY
+            (see ``cvxpy_solver``), and ``"batched"`` solves the problems of
+            all the voxels at once with an interior-point method that does
+            not require CVXPY. See func:`dki.cls_fit_dki_batched`.
+
             callable has to have the signature:
                 ``fit_method(design_matrix, data, *args, **kwargs)``
 
@@ -1836,6 +1846,15 @@ class DiffusionKurtosisModel(ReconstModel):
         self.min_diffusivity = tol / -self.design_matrix.min()
 
         self.convexity_constraint = fit_method in {"CLS", "CWLS", "NLS"}
+        self.solver = None
+        if fit_method in {"CLS", "CWLS"}:
+            self.solver = self.kwargs.pop("solver", "cvxpy")
+            if self.solver not in ("cvxpy", "batched"):
+                msg = f"Unknown solver {self.solver!r}, use 'cvxpy' or 'batched'"
+                raise ValueError(msg)
+        elif self.kwargs.get("solver") == "batched":
+            msg = "The 'batched' solver is only available for CLS and CWLS fits."
+            raise ValueError(msg)
         if self.convexity_constraint:
             self.cvxpy_solver = self.kwargs.pop("cvxpy_solver", None)
             self.convexity_level = self.kwargs.pop("convexity_level", "full")
@@ -1855,7 +1874,11 @@ class DiffusionKurtosisModel(ReconstModel):
                 self.sdp_constraints = load_sdp_constraints(
                     "dki", order=self.convexity_level
                 )
-            self.sdp = PositiveDefiniteLeastSquares(22, A=self.sdp_constraints)
+            if self.solver == "batched":
+                self.sdp_matrices = _sdp_matrices(self.sdp_constraints, 22)
+                self.sdp_feasible_point = lmi_feasible_point(self.sdp_matrices)
+            else:
+                self.sdp = PositiveDefiniteLeastSquares(22, A=self.sdp_constraints)
 
         self.weights = fit_method in {"WLS", "WLLS", "CWLS"}
 
@@ -1892,8 +1915,12 @@ class DiffusionKurtosisModel(ReconstModel):
         """
         data_thres = np.maximum(data, self.min_signal)
 
+        multi_fit = self.multi_fit
+        if self.solver == "batched":
+            multi_fit = self._cls_fit_batched
+
         if self.is_multi_method and not self.is_iter_method:
-            fit_result, extra = self.multi_fit(
+            fit_result, extra = multi_fit(
                 data_thres, mask=mask, weights=self.weights, **self.kwargs
             )
             if extra is not None:
@@ -1999,6 +2026,49 @@ class DiffusionKurtosisModel(ReconstModel):
 
         return DiffusionKurtosisFit(self, params, model_S0=S0_params), extra
 
+    @warning_for_keywords()
+    def _cls_fit_batched(self, data, *, mask=None, weights=True, **kwargs):
+        """Constrained fit of all the voxels at once.
+
+        Batched counterpart of `multi_fit` for the constrained fit methods,
+        see `cls_fit_dki_batched`.
+        """
+        if mask is None:
+            mask = np.ones(data.shape[:-1], dtype=bool)
+        elif mask.shape != data.shape[:-1]:
+            raise ValueError("mask and data shape do not match")
+        else:
+            mask = np.asarray(mask, dtype=bool)
+        if type(weights) is np.ndarray:
+            weights = weights[mask]
+
+        params, extra = cls_fit_dki_batched(
+            self.design_matrix,
+            data[mask],
+            self.inverse_design_matrix,
+            self.sdp_matrices,
+            feasible_point=self.sdp_feasible_point,
+            return_S0_hat=self.return_S0_hat,
+            weights=weights,
+            min_diffusivity=self.min_diffusivity,
+            **kwargs,
+        )
+
+        S0_params = None
+        if self.return_S0_hat:
+            params, S0_in_mask = params
+            S0_params = np.zeros(data.shape[:-1])
+            S0_params[mask] = S0_in_mask[:, 0]
+        dki_params = np.zeros(data.shape[:-1] + (27,))
+        dki_params[mask] = params
+        if extra is not None:
+            for key in extra:
+                values = extra[key]
+                extra[key] = np.zeros(data.shape)
+                extra[key][mask] = values
+
+        return DiffusionKurtosisFit(self, dki_params, model_S0=S0_params), extra
+
     def iterative_fit(
         self,
         data_thres,
@@ -2078,7 +2148,10 @@ class DiffusionKurtosisModel(ReconstModel):
                         robust,
                     )
 
-            tmp, extra = self.multi_fit(
+            multi_fit = self.multi_fit
+            if self.solver == "batched":
+                multi_fit = self._cls_fit_batched
+            tmp, extra = multi_fit(
                 data_thres, mask=mask, weights=w, return_leverages=True
             )
             leverages = extra["leverages"]
@@ -2909,6 +2982,206 @@ def cls_fit_dki(
         return dki_params[..., 0:-1], leverages
 
 
+def _sdp_matrices(sdp_constraints, m):
+    """Dense LMI matrices of the constrained fit methods.
+
+    Stacks the constraint matrices of `PositiveDefiniteLeastSquares`
+    (optionally sparse) into an array, padded with zero matrices so that
+    the first ``m`` variables are the regressors and the others are the slack
+    variables of the constraints. Rows and columns that are zero in all the
+    matrices are dropped, as they would prevent strictly feasible points.
+    """
+    matrices = [
+        A.toarray() if hasattr(A, "toarray") else np.asarray(A) for A in sdp_constraints
+    ]
+    matrices += [np.zeros_like(matrices[0])] * (m + 1 - len(matrices))
+    matrices = np.stack(matrices).astype(float)
+    keep = np.any(matrices, axis=(0, 1))
+    return matrices[:, keep][:, :, keep]
+
+
+@warning_for_keywords()
+def cls_fit_dki_batched(
+    design_matrix,
+    data,
+    inverse_design_matrix,
+    sdp_matrices,
+    *,
+    feasible_point=None,
+    return_S0_hat=False,
+    weights=True,
+    min_diffusivity=0,
+    return_lower_triangular=False,
+    return_leverages=False,
+    tol=1e-12,
+):
+    r"""Compute the diffusion and kurtosis tensors of many voxels using a
+    constrained ordinary or weighted linear least squares approach.
+
+    Batched counterpart of `cls_fit_dki`. The LMI constrained least squares
+    problems of :footcite:p:`DelaHaije2020` of all the voxels are solved
+    together with the interior-point method of `solve_lmi_qp_batched`,
+    instead of one CVXPY problem per voxel, so that CVXPY is not required.
+
+    Parameters
+    ----------
+    design_matrix : array (g, 22)
+        Design matrix holding the covariants used to solve for the regression
+        coefficients.
+    data : array (N, g)
+        Data or response variables holding the data of N voxels.
+    inverse_design_matrix : array (22, g)
+        Inverse of the design matrix.
+    sdp_matrices : array (t, p, p)
+        The LMI constraint matrices of the regressors followed by those of the
+        slack variables, see `dipy.data.load_sdp_constraints` and
+        `PositiveDefiniteLeastSquares`.
+    feasible_point : array (t - 1,), optional
+        A strictly feasible point of the constraints. If None, it is computed
+        with `lmi_feasible_point`.
+    return_S0_hat : bool, optional
+        Boolean to return (True) or not (False) the S0 values for the fit.
+    weights : bool or array-like, shape (N, g) or (g,), optional
+        Parameter indicating whether per-voxel weights are used. If True,
+        weights are estimated as the squared predicted signal from an initial
+        OLS fit. If an array is provided, these weights must correspond to the
+        squared residuals such that $S = \sum_i w_i r_i^2$ for the g
+        measurements of each voxel. If False, no weights are used.
+    min_diffusivity : float, optional
+        Because negative eigenvalues are not physical and small eigenvalues,
+        much smaller than the diffusion weighting, cause quite a lot of noise
+        in metrics such as fa, diffusivity values smaller than
+        `min_diffusivity` are replaced with `min_diffusivity`.
+    return_lower_triangular : bool, optional
+        Boolean to return (True) or not (False) the coefficients of the fit.
+    return_leverages : bool, optional
+        Boolean to return (True) or not (False) the fitting leverages.
+    tol : float, optional
+        Tolerance on the sub-optimality of the solutions, relative to the
+        squared norm of the (weighted) log signal.
+
+    Returns
+    -------
+    dki_params : array (N, 27)
+        All parameters estimated from the diffusion kurtosis model for all N
+        voxels, see `cls_fit_dki`.
+    leverages : array (N, g)
+        Leverages of the fitting problem (if return_leverages is True)
+
+    References
+    ----------
+    .. footbibliography::
+    """
+    A = design_matrix
+    n_params = A.shape[1]
+    y = np.log(data)
+
+    # weights correspond to *squared* residuals, see cls_fit_dki
+    if weights is False:
+        W = np.ones_like(y)
+    elif type(weights) is np.ndarray:
+        W = np.broadcast_to(np.sqrt(weights), y.shape)
+    else:
+        W = np.exp(np.dot(np.dot(y, inverse_design_matrix.T), A.T))
+    W_A = W[..., None] * A
+    W_y = W * y
+
+    leverages = None
+    if return_leverages:
+        if weights is False:
+            leverages = np.einsum("ij,ji->i", A, inverse_design_matrix)
+            leverages = np.broadcast_to(leverages, y.shape).copy()
+        else:
+            inv_W_A_W = np.linalg.pinv(W_A) * W[:, None, :]
+            leverages = np.einsum("ij,nji->ni", A, inv_W_A_W)
+        leverages = {"leverages": leverages}
+
+    # Least squares objectives, normalized by the squared norm of the
+    # weighted log signal, over the regressors and slack variables
+    scale = np.maximum(np.sum(W_y**2, axis=-1), np.finfo(float).tiny)
+    n_vars = sdp_matrices.shape[0] - 1
+    P = np.zeros((y.shape[0], n_vars, n_vars))
+    P[:, :n_params, :n_params] = np.matmul(np.swapaxes(W_A, 1, 2), W_A)
+    P /= scale[:, None, None]
+    Q = np.zeros((y.shape[0], n_vars))
+    Q[:, :n_params] = -np.einsum("ngi,ng->ni", W_A, W_y) / scale[:, None]
+
+    if feasible_point is None:
+        feasible_point = lmi_feasible_point(sdp_matrices)
+    x0 = _cls_starting_point(P, Q, sdp_matrices, feasible_point)
+
+    # Initial central path parameter from the gap to the unconstrained
+    # optimum, which bounds the sub-optimality of the starting point
+    P_reg, Q_reg = P[:, :n_params, :n_params], Q[:, :n_params]
+    ridge = np.finfo(float).eps * np.eye(n_params)
+    x_ols = -np.linalg.solve(P_reg + ridge, Q_reg[..., None])[..., 0]
+    f_ols = np.sum((0.5 * np.einsum("nij,nj->ni", P_reg, x_ols) + Q_reg) * x_ols, -1)
+    f_start = np.sum((0.5 * np.einsum("nij,nj->ni", P, x0) + Q) * x0, -1)
+    t0 = sdp_matrices.shape[-1] / np.maximum(f_start - f_ols, tol)
+
+    result = solve_lmi_qp_batched(P, Q, sdp_matrices, x0, tol=tol, t0=t0)
+    result = result[:, :n_params]
+
+    if return_lower_triangular:
+        return result, leverages
+
+    # Write output, see params_to_dki_params
+    evals, evecs = decompose_tensor(
+        from_lower_triangular(result[:, :6]), min_diffusivity=min_diffusivity
+    )
+    MD_square = evals.mean(axis=-1, keepdims=True) ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        KT_elements = np.where(MD_square != 0, result[:, 6:21] / MD_square, 0.0)
+    S0 = np.exp(-result[:, -1:])
+    dki_params = np.concatenate(
+        (evals, evecs.reshape((-1, 9)), KT_elements, S0), axis=-1
+    )
+
+    if return_S0_hat:
+        return (dki_params[..., 0:-1], dki_params[..., -1:]), leverages
+    else:
+        return dki_params[..., 0:-1], leverages
+
+
+def _cls_starting_point(P, Q, sdp_matrices, feasible_point):
+    """Strictly feasible starting points of the constrained DKI fits.
+
+    The variables without constraint matrices (such as the log of S0) do not
+    change the feasibility of a point, so they are set to their optimal values
+    given the others. If the constraints are homogeneous, the feasible point
+    is also scaled to minimize the objective of each voxel.
+    """
+    free = ~np.any(sdp_matrices[1:], axis=(1, 2))
+    x_dir = np.where(free, 0.0, feasible_point)
+    P_xx = np.einsum("i,nij,j->n", x_dir, P, x_dir)
+    P_fx = np.einsum("nij,j->ni", P[:, free], x_dir)
+    P_ff = P[:, free][:, :, free]
+    Q_x, Q_f = np.dot(Q, x_dir), Q[:, free]
+    ridge = np.finfo(float).eps * np.eye(P_ff.shape[-1])
+
+    scale = np.ones(Q.shape[0])
+    if not np.any(sdp_matrices[0]):
+        # Jointly optimal scale and free variables
+        P_joint = np.zeros((Q.shape[0],) + (P_ff.shape[-1] + 1,) * 2)
+        P_joint[:, 0, 0] = P_xx
+        P_joint[:, 0, 1:] = P_joint[:, 1:, 0] = P_fx
+        P_joint[:, 1:, 1:] = P_ff
+        Q_joint = np.concatenate([Q_x[:, None], Q_f], axis=-1)
+        ridge_joint = np.finfo(float).eps * np.eye(P_joint.shape[-1])
+        with np.errstate(invalid="ignore"):
+            sol = np.linalg.solve(P_joint + ridge_joint, -Q_joint[..., None])
+        scale = np.where(np.isfinite(sol[:, 0, 0]), sol[:, 0, 0], 1.0)
+        # The point must remain strictly inside the feasible set
+        scale = np.maximum(scale, 1e-6)
+
+    free_values = -np.linalg.solve(
+        P_ff + ridge, (Q_f + scale[:, None] * P_fx)[..., None]
+    )[..., 0]
+    x0 = scale[:, None] * x_dir
+    x0[:, free] = free_values
+    return x0
+
+
 def Wrotate(kt, Basis):
     r""" Rotate a kurtosis tensor from the standard Cartesian coordinate system
     to another coordinate system basis
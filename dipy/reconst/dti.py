@@ -1708,6 +1708,222 @@ class _NllsHelper:
             return -self.y[:, None] * design_matrix * self.sqrt_w
 
 
+def _nlls_lm(
+    design_matrix,
+    data,
+    init_params,
+    *,
+    weights=None,
+    ftol=1.49012e-8,
+    xtol=1.49012e-8,
+    max_nfev=None,
+    step=10000,
+):
+    r"""Batched Levenberg-Marquardt fit of $S = \exp(X \beta)$ in many voxels.
+
+    All voxels of a chunk are updated at once: the damped normal equations
+    $(J^T J + \lambda \mathrm{diag}(J^T J)) \delta = -J^T r$ are assembled for
+    every active voxel with a couple of matrix products and solved as a stack.
+    Damping and convergence are tracked per voxel, so voxels that converge
+    early drop out of the remaining iterations.
+
+    Parameters
+    ----------
+    design_matrix : array (g, p)
+        Design matrix of the cumulant expansion.
+    data : array (N, g)
+        Signal of each voxel.
+    init_params : array (N, p)
+        Starting guess for the parameters of each voxel.
+    weights : array (N, g), optional
+        Weights of the squared residuals, as in :func:`nlls_fit_tensor`.
+    ftol : float, optional
+        Relative reduction of the sum of squares below which a voxel is
+        considered converged.
+    xtol : float, optional
+        Relative (scaled) step length below which a voxel is considered
+        converged.
+    max_nfev : int, optional
+        Maximum number of iterations per voxel. Defaults to ``200 * (p + 1)``,
+        as :func:`scipy.optimize.leastsq`.
+    step : int, optional
+        Number of voxels solved simultaneously.
+
+    Returns
+    -------
+    params : array (N, p)
+        Fitted parameters.
+    failed : array (N,)
+        True where the fit could not be performed, either because there are
+        fewer (non-zero weighted) data points than parameters, or because the
+        solution is not finite.
+
+    """
+    X = np.asarray(design_matrix, dtype=np.float64)
+    g, p = X.shape
+    if max_nfev is None:
+        max_nfev = 200 * (p + 1)
+    step = int(step)
+
+    # Outer products of the design matrix rows, so that J^T W J of all voxels
+    # reduces to a single matrix product
+    XX = (X[:, :, None] * X[:, None, :]).reshape(g, p * p)
+
+    params = np.array(init_params, dtype=np.float64).reshape(-1, p)
+    data = np.asarray(data).reshape(-1, g)
+    if weights is not None:
+        weights = np.asarray(weights).reshape(-1, g)
+
+    failed = ~np.all(np.isfinite(params), axis=-1)
+    if weights is not None:
+        failed |= np.sum(weights > 0, axis=-1) < p
+    elif g < p:
+        failed[:] = True
+
+    for start in range(0, params.shape[0], step):
+        sl = slice(start, start + step)
+        w = None if weights is None else weights[sl]
+        params[sl] = _nlls_lm_chunk(
+            X, XX, data[sl], params[sl], w, ~failed[sl], ftol, xtol, max_nfev
+        )
+
+    failed |= ~np.all(np.isfinite(params), axis=-1)
+    return params, failed
+
+
+def _nlls_lm_chunk(X, XX, data, params, weights, valid, ftol, xtol, max_nfev):
+    """Run the Levenberg-Marquardt iterations of :func:`_nlls_lm` on a chunk."""
+    p = X.shape[1]
+    diag_idx = np.arange(p)
+    y = np.asarray(data, dtype=np.float64)
+    w = np.ones_like(y) if weights is None else np.asarray(weights, np.float64)
+    x = params.copy()
+
+    with np.errstate(over="ignore", invalid="ignore"):
+        y_hat = np.exp(x @ X.T)
+        res = y - y_hat
+        cost = np.sum(w * res**2, axis=-1)
+
+    lam = np.full(x.shape[0], 1e-3)
+    hess = np.empty((x.shape[0], p, p))
+    grad = np.empty((x.shape[0], p))
+    stale = np.ones(x.shape[0], dtype=bool)
+    active = np.flatnonzero(valid & np.isfinite(cost))
+
+    for _ in range(max_nfev):
+        if active.size == 0:
+            break
+
+        # Refresh J^T W J and -J^T W r where the last step was accepted
+        upd = active[stale[active]]
+        if upd.size:
+            wy = w[upd] * y_hat[upd]
+            hess[upd] = ((wy * y_hat[upd]) @ XX).reshape(-1, p, p)
+            grad[upd] = (wy * res[upd]) @ X
+            stale[upd] = False
+
+        h = hess[active]
+        diag = h[:, diag_idx, diag_idx]
+        diag = np.maximum(diag, np.finfo(float).tiny)
+        h[:, diag_idx, diag_idx] += lam[active, None] * diag
+        try:
+            delta = np.linalg.solve(h, grad[active][..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            delta = np.einsum("...ij,...j", np.linalg.pinv(h), grad[active])
+
+        x_new = x[active] + delta
+        with np.errstate(over="ignore", invalid="ignore"):
+            y_hat_new = np.exp(x_new @ X.T)
+            res_new = y[active] - y_hat_new
+            cost_new = np.sum(w[active] * res_new**2, axis=-1)
+
+        old_cost = cost[active]
+        accept = cost_new < old_cost
+        scale = np.sqrt(diag)
+        small_step = np.linalg.norm(scale * delta, axis=-1) <= xtol * np.linalg.norm(
+            scale * x_new, axis=-1
+        )
+        small_gain = old_cost - cost_new <= ftol * old_cost
+
+        acc = active[accept]
+        x[acc] = x_new[accept]
+        y_hat[acc] = y_hat_new[accept]
+        res[acc] = res_new[accept]
+        cost[acc] = cost_new[accept]
+        stale[acc] = True
+        lam[acc] = np.maximum(lam[acc] * 0.1, 1e-15)
+        lam[active[~accept]] *= 10
+
+        done = small_step | (accept & small_gain) | (lam[active] > 1e16)
+        active = active[~done]
+
+    return x
+
+
+def _nlls_leastsq(design_matrix, data, init_params, *, weights=None, jac=True):
+    """Voxel by voxel :func:`scipy.optimize.leastsq` counterpart of
+    :func:`_nlls_lm`, with the same inputs and outputs."""
+    nlls = _NllsHelper()
+    err_func = nlls.err_func
+    jac_func = nlls.jacobian_func if jac else None
+
+    params = np.array(init_params, dtype=np.float64).reshape(
+        -1, design_matrix.shape[-1]
+    )
+    failed = np.zeros(params.shape[0], dtype=bool)
+    for vox in range(params.shape[0]):
+        weights_vox = weights[vox] if weights is not None else None
+        try:
+            params[vox], _ = opt.leastsq(
+                err_func,
+                params[vox],
+                args=(design_matrix, data[vox], weights_vox),
+                Dfun=jac_func,
+            )
+        except (np.linalg.LinAlgError, TypeError):
+            failed[vox] = True
+
+    failed |= ~np.all(np.isfinite(params), axis=-1)
+    return params, failed
+
+
+def _nlls_solve(
+    design_matrix, data, init_params, *, weights=None, jac=True, solver="leastsq"
+):
+    """Dispatch a non-linear least-squares fit to the requested solver."""
+    if solver == "lm":
+        return _nlls_lm(design_matrix, data, init_params, weights=weights)
+    if solver == "leastsq":
+        return _nlls_leastsq(design_matrix, data, init_params, weights=weights, jac=jac)
+    raise ValueError(f"Unknown solver {solver!r}, use 'lm' or 'leastsq'")
+
+
+def _nlls_params(flat_params, failed, ols_params, *, fail_is_nan, min_diffusivity):
+    """Convert fitted lower triangular parameters into model parameters.
+
+    Voxels where the fit failed resort to ``ols_params`` or to NaN, depending
+    on ``fail_is_nan``. Returns the parameters (eigenvalues, eigenvectors and,
+    for DKI, the kurtosis tensor elements) and the lower triangular
+    parameters used for each voxel.
+    """
+    p = flat_params.shape[-1]
+    npa = p + 5
+    flat_params = flat_params.copy()
+    flat_params[failed] = np.nan if fail_is_nan else ols_params[failed]
+
+    params = np.full((flat_params.shape[0], npa), np.nan)
+    ok = np.all(np.isfinite(flat_params), axis=-1)
+    evals, evecs = decompose_tensor(
+        from_lower_triangular(flat_params[ok, :6]), min_diffusivity=min_diffusivity
+    )
+    params[ok, :3] = evals
+    params[ok, 3:12] = evecs.reshape(-1, 9)
+    if npa != 12:
+        md2 = evals.mean(axis=-1)[:, None] ** 2
+        params[ok, 12:] = flat_params[ok, 6:-1] / md2
+    return params, flat_params
+
+
 @warning_for_keywords()
 def _decompose_tensor_nan(tensor, tensor_alternative, *, min_diffusivity=0):
     """Helper function that expands the function decompose_tensor to deal
@@ -1766,6 +1982,7 @@ def nlls_fit_tensor(
     return_lower_triangular=False,
     return_leverages=False,
     init_params=None,
+    solver="leastsq",
 ):
     r"""
     Fit the cumulant expansion params (e.g. DTI, DKI) using non-linear
@@ -1788,7 +2005,8 @@ def nlls_fit_tensor(
         squared residuals such that $S = \sum_i w_i r_i^2$.
 
     jac : bool, optional
-        Use the Jacobian?
+        Use the Jacobian? Only used by the ``"leastsq"`` solver, the ``"lm"``
+        solver always uses the analytical Jacobian.
 
     return_S0_hat : bool, optional
         Boolean to return (True) or not (False) the S0 values for the fit.
@@ -1805,6 +2023,13 @@ def nlls_fit_tensor(
     init_params : array ([X, Y, Z, ...], Npar), optional
         Parameters in lower triangular form as initial optimization guess.
 
+    solver : {"lm", "leastsq"}, optional
+        ``"leastsq"`` (default) calls :func:`scipy.optimize.leastsq` voxel by
+        voxel. ``"lm"`` fits all voxels simultaneously with a vectorized
+        Levenberg-Marquardt solver, which is much faster. Both minimize the
+        same objective, but their results can differ within the tolerance of
+        the solvers.
+
     Returns
     -------
     nlls_params: the eigen-values and eigen-vectors of the tensor in each
@@ -1816,10 +2041,7 @@ def nlls_fit_tensor(
     # 5 due to diffusion tensor conversion to eigenvalue and eigenvectors
     npa = design_matrix.shape[-1] + 5
 
-    # Detect if number of parameters corresponds to dti
-    dti = npa == 12
-
-    # Flatten for the iteration over voxels:
+    # Flatten the voxel dimensions:
     flat_data = data.reshape((-1, data.shape[-1]))
     weights = weights.reshape((-1, weights.shape[-1])) if weights is not None else None
     if weights is not None:
@@ -1836,83 +2058,37 @@ def nlls_fit_tensor(
         if extra is not None:
             leverages = extra["leverages"]
 
-        # Flatten for the iteration over voxels:
-        ols_params = np.reshape(D, (-1, D.shape[-1]))
+        ols_params = D
     else:
         # Replace starting guess for opt (usually ols_params) with init_params
         ols_params = init_params
 
-    # Initialize parameter matrix
-    params = np.empty((flat_data.shape[0], npa))
+    ols_params = np.reshape(ols_params, (-1, design_matrix.shape[-1]))
 
-    # Initialize parameter matrix for storing flattened parameters
-    flat_params = np.empty_like(ols_params)
+    if np.any(np.all(flat_data == 0, axis=-1)):
+        raise ValueError("The data in this voxel contains only zeros")
 
-    # For warnings
-    resort_to_OLS = False
-
-    # Instance of _NllsHelper, need for nlls error func and jacobian
-    nlls = _NllsHelper()
-    err_func = nlls.err_func
-    jac_func = nlls.jacobian_func if jac else None
-
-    if return_S0_hat:
-        model_S0 = np.empty((flat_data.shape[0], 1))
-    for vox in range(flat_data.shape[0]):
-        if np.all(flat_data[vox] == 0):
-            raise ValueError("The data in this voxel contains only zeros")
-
-        start_params = ols_params[vox]
-
-        weights_vox = weights[vox] if weights is not None else None
-
-        try:
-            # Do the optimization in this voxel:
-            this_param, status = opt.leastsq(
-                err_func,
-                start_params,
-                args=(design_matrix, flat_data[vox], weights_vox),
-                Dfun=jac_func,
-            )
-
-            flat_params[vox] = this_param
-
-            # Convert diffusion tensor parameters to the evals and the evecs:
-            evals, evecs = decompose_tensor(
-                from_lower_triangular(this_param[:6]),
-                min_diffusivity=tol / -design_matrix.min(),
-            )
-            params[vox, :3] = evals
-            params[vox, 3:12] = evecs.ravel()
-
-        # If leastsq failed to converge and produced nans, we'll resort to the
-        # OLS solution in this voxel:
-        except (np.linalg.LinAlgError, TypeError):
-            resort_to_OLS = True
-            this_param = start_params
-
-            flat_params[vox] = this_param  # NOTE: ignores fail_is_nan
-
-            if not fail_is_nan:
-                # Convert diffusion tensor parameters to evals and evecs
-                evals, evecs = decompose_tensor(
-                    from_lower_triangular(this_param[:6]),
-                    min_diffusivity=tol / -design_matrix.min(),
-                )
-                params[vox, :3] = evals
-                params[vox, 3:12] = evecs.ravel()
-            else:
-                # Set NaN values
-                this_param[:] = np.nan  # so that S0_hat is NaN
-                params[vox, :] = np.nan
-
-        if return_S0_hat:
-            model_S0[vox] = np.exp(-this_param[-1])
-        if not dti:
-            md2 = evals.mean(0) ** 2
-            params[vox, 12:] = this_param[6:-1] / md2
+    fit_params, failed = _nlls_solve(
+        design_matrix,
+        flat_data,
+        ols_params,
+        weights=weights,
+        jac=jac,
+        solver=solver,
+    )
+    # If the fit failed to converge and produced nans, we'll resort to the
+    # OLS solution in these voxels:
+    params, used_params = _nlls_params(
+        fit_params,
+        failed,
+        ols_params,
+        fail_is_nan=fail_is_nan,
+        min_diffusivity=tol / -design_matrix.min(),
+    )
+    # NOTE: the lower triangular parameters ignore fail_is_nan
+    fit_params[failed] = ols_params[failed]
 
-    if resort_to_OLS:
+    if np.any(failed):
         warnings.warn(ols_resort_msg, UserWarning, stacklevel=2)
 
     if return_leverages:
@@ -1921,11 +2097,11 @@ def nlls_fit_tensor(
         leverages = None
 
     if return_lower_triangular:
-        return flat_params, leverages
+        return fit_params, leverages
 
     params = params.reshape(data.shape[:-1] + (npa,))
     if return_S0_hat:
-        model_S0 = model_S0.reshape(data.shape[:-1] + (1,))
+        model_S0 = np.exp(-used_params[:, -1]).reshape(data.shape[:-1] + (1,))
         return [params, model_S0], None
     else:
         return params, None
@@ -1933,7 +2109,14 @@ def nlls_fit_tensor(
 
 @warning_for_keywords()
 def restore_fit_tensor(
-    design_matrix, data, *, sigma=None, jac=True, return_S0_hat=False, fail_is_nan=False
+    design_matrix,
+    data,
+    *,
+    sigma=None,
+    jac=True,
+    return_S0_hat=False,
+    fail_is_nan=False,
+    solver="leastsq",
 ):
     """Compute a robust tensor fit using the RESTORE algorithm.
 
@@ -1966,6 +2149,10 @@ def restore_fit_tensor(
         Boolean to return (True) or not (False) the S0 values for the fit.
     fail_is_nan : bool, optional
         Boolean to set failed NL fitting to NaN (True) or LS (False).
+    solver : {"lm", "leastsq"}, optional
+        Non-linear least-squares solver, see :func:`nlls_fit_tensor`. With
+        ``"lm"`` every RESTORE iteration is solved for all the voxels still
+        being reweighted at once.
 
     Returns
     -------
@@ -1976,157 +2163,132 @@ def restore_fit_tensor(
     .. footbibliography::
 
     """
-    # Detect number of parameters to estimate from design_matrix length plus
-    # 5 due to diffusion tensor conversion to eigenvalue and eigenvectors
-    npa = design_matrix.shape[-1] + 5
-
-    # Detect if number of parameters corresponds to dti
-    dti = npa == 12
-
     # define some constants
     p = design_matrix.shape[-1]
     N = data.shape[-1]
     factor = 1.4826 * np.sqrt(N / (N - p))
 
-    # Flatten for the iteration over voxels:
+    def _mad(residuals):
+        med = np.median(residuals, axis=-1, keepdims=True)
+        return factor * np.median(np.abs(residuals - med), axis=-1)
+
+    def _residuals(params, idx):
+        return flat_data[idx] - np.exp(np.dot(params, design_matrix.T))
+
+    # Flatten the voxel dimensions:
     flat_data = data.reshape((-1, data.shape[-1]))
+    n_vox = flat_data.shape[0]
+    if np.any(np.all(flat_data == 0, axis=-1)):
+        raise ValueError("The data in this voxel contains only zeros")
 
     # calculate OLS solution
     D, _ = ols_fit_tensor(design_matrix, flat_data, return_lower_triangular=True)
-
-    # Flatten for the iteration over voxels:
     ols_params = np.reshape(D, (-1, D.shape[-1]))
-
-    # Initialize parameter matrix
-    params = np.empty((flat_data.shape[0], npa))
+    start_params = ols_params.copy()
 
     # For storing whether image is used in final fit for each voxel
     robust = np.ones(flat_data.shape, dtype=int)
 
-    # For warnings
-    resort_to_OLS = False
-
-    # Instance of _NllsHelper, need for nlls error func and jacobian
-    nlls = _NllsHelper()
-    err_func = nlls.err_func
-    jac_func = nlls.jacobian_func if jac else None
-
-    if return_S0_hat:
-        model_S0 = np.empty((flat_data.shape[0], 1))
-    for vox in range(flat_data.shape[0]):
-        if np.all(flat_data[vox] == 0):
-            raise ValueError("The data in this voxel contains only zeros")
-
-        start_params = ols_params[vox]
+    # Do unweighted nlls in all voxels:
+    this_param, failed = _nlls_solve(
+        design_matrix, flat_data, start_params, jac=jac, solver=solver
+    )
+    all_vox = np.arange(n_vox)
+    residuals = _residuals(this_param, all_vox)
+
+    # If any of the residuals are outliers (using 3 sigma as a criterion
+    # following Chang et al., e.g page 1089). sigma may be given per image:
+    if sigma is not None:
+        thresh = 3 * np.asarray(sigma)
+        res = np.abs(residuals).reshape(
+            (n_vox,) + (1,) * max(thresh.ndim - 1, 0) + (N,)
+        )
+        test_sigma = np.any((res > thresh).reshape(n_vox, -1), axis=-1)
+    else:
+        thresh = 3 * _mad(residuals)
+        test_sigma = np.any(np.abs(residuals) > thresh[:, None], axis=-1)
+    test_sigma &= ~failed
+
+    # Robust reweighting of the voxels with outliers
+    C = np.zeros(n_vox)
+    active = np.flatnonzero(test_sigma)
+    for _ in range(10):  # NOTE: capped at 10 iterations
+        if active.size == 0:
+            break
+        # GM weights (original Restore paper used Cauchy weights)
+        res = residuals[active]
+        C[active] = _mad(res)
+        C2 = C[active, None] ** 2
+        denominator = (C2 + res**2) ** 2
+        gmm = np.divide(
+            C2, denominator, out=np.zeros_like(denominator), where=denominator != 0
+        )
 
-        try:
-            # Do unweighted nlls in this voxel:
-            this_param, status = opt.leastsq(
-                err_func,
-                start_params,
-                args=(design_matrix, flat_data[vox]),
-                Dfun=jac_func,
+        # Do nlls with GMM-weighting:
+        new_param, new_failed = _nlls_solve(
+            design_matrix,
+            flat_data[active],
+            start_params[active],
+            weights=gmm,
+            jac=jac,
+            solver=solver,
+        )
+        failed[active[new_failed]] = True
+
+        # Recalculate residuals given gmm fit
+        this_param[active] = new_param
+        residuals[active] = _residuals(new_param, active)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            perc = (
+                100
+                * np.linalg.norm(new_param - start_params[active], axis=-1)
+                / np.linalg.norm(new_param, axis=-1)
             )
+        start_params[active[~new_failed]] = new_param[~new_failed]
+        active = active[~new_failed & ~(perc < 0.1)]
+
+    # If you still have outliers, refit without those outliers:
+    cond = np.abs(residuals) > 3 * C[:, None]
+    refit = np.flatnonzero(test_sigma & ~failed & np.any(cond, axis=-1))
+    if refit.size:
+        clean = np.logical_not(cond[refit])
+        robust[refit] = clean
+
+        # Too few clean data points to fit the model
+        too_few = np.sum(clean, axis=-1) < p
+        failed[refit[too_few]] = True
+        refit, clean = refit[~too_few], clean[~too_few]
+
+        # recalculate OLS solution with clean data, rows of the outliers are
+        # zeroed so that they do not contribute to the pseudo-inverse
+        clean_design = clean[..., None] * design_matrix
+        log_data = np.log(np.where(clean, flat_data[refit], 1))
+        new_start = np.einsum(
+            "...ij,...j", np.linalg.pinv(clean_design), clean * log_data
+        )
+        new_param, new_failed = _nlls_solve(
+            design_matrix,
+            flat_data[refit],
+            new_start,
+            weights=clean.astype(float),
+            jac=jac,
+            solver=solver,
+        )
+        this_param[refit] = new_param
+        failed[refit[new_failed]] = True
 
-            # Get the residuals:
-            pred_sig = np.exp(np.dot(design_matrix, this_param))
-            residuals = flat_data[vox] - pred_sig
-
-            # estimate or set sigma
-            if sigma is not None:
-                C = sigma
-            else:
-                C = factor * np.median(np.abs(residuals - np.median(residuals)))
-
-            # If any of the residuals are outliers (using 3 sigma as a
-            # criterion following Chang et al., e.g page 1089):
-            test_sigma = np.any(np.abs(residuals) > 3 * C)
-
-            # test for doing robust reweighting
-            if test_sigma:
-                rdx = 1
-                while rdx <= 10:  # NOTE: capped at 10 iterations
-                    # GM weights (original Restore paper used Cauchy weights)
-                    C = factor * np.median(np.abs(residuals - np.median(residuals)))
-                    denominator = (C**2 + residuals**2) ** 2
-                    gmm = np.divide(
-                        C**2,
-                        denominator,
-                        out=np.zeros_like(denominator),
-                        where=denominator != 0,
-                    )
-
-                    # Do nlls with GMM-weighting:
-                    this_param, status = opt.leastsq(
-                        err_func,
-                        start_params,
-                        args=(design_matrix, flat_data[vox], gmm),
-                        Dfun=jac_func,
-                    )
-
-                    # Recalculate residuals given gmm fit
-                    pred_sig = np.exp(np.dot(design_matrix, this_param))
-                    residuals = flat_data[vox] - pred_sig
-                    perc = (
-                        100
-                        * np.linalg.norm(this_param - start_params)
-                        / np.linalg.norm(this_param)
-                    )
-                    start_params = this_param
-                    if perc < 0.1:
-                        break
-                    rdx = rdx + 1
-
-                cond = np.abs(residuals) > 3 * C
-                if np.any(cond):
-                    # If you still have outliers, refit without those outliers:
-                    non_outlier_idx = np.where(np.logical_not(cond))
-                    clean_design = design_matrix[non_outlier_idx]
-                    clean_data = flat_data[vox][non_outlier_idx]
-                    robust[vox] = np.logical_not(cond)
-
-                    # recalculate OLS solution with clean data
-                    new_start, _ = ols_fit_tensor(
-                        clean_design, clean_data, return_lower_triangular=True
-                    )
-
-                    this_param, status = opt.leastsq(
-                        err_func,
-                        new_start,
-                        args=(clean_design, clean_data),
-                        Dfun=jac_func,
-                    )
-
-            # Convert diffusion tensor parameters to the evals and the evecs:
-            evals, evecs = decompose_tensor(from_lower_triangular(this_param[:6]))
-            params[vox, :3] = evals
-            params[vox, 3:12] = evecs.ravel()
-
-        # If leastsq failed to converge and produced nans, we'll resort to the
-        # OLS solution in this voxel:
-        except (np.linalg.LinAlgError, TypeError):
-            resort_to_OLS = True
-            this_param = start_params
-
-            if not fail_is_nan:
-                # Convert diffusion tensor parameters to evals and evecs:
-                evals, evecs = decompose_tensor(from_lower_triangular(this_param[:6]))
-                params[vox, :3] = evals
-                params[vox, 3:12] = evecs.ravel()
-            else:
-                # Set NaN values
-                this_param[:] = np.nan  # so that S0_hat is NaN
-                params[vox, :] = np.nan
-
-        if return_S0_hat:
-            model_S0[vox] = np.exp(-this_param[-1])
-        if not dti:
-            md2 = evals.mean(0) ** 2
-            params[vox, 12:] = this_param[6:-1] / md2
-
-    if resort_to_OLS:
+    # If the fit failed to converge and produced nans, we'll resort to the
+    # last starting point in these voxels:
+    if np.any(failed):
         warnings.warn(ols_resort_msg, UserWarning, stacklevel=2)
 
+    params, this_param = _nlls_params(
+        this_param, failed, start_params, fail_is_nan=fail_is_nan, min_diffusivity=0
+    )
+    npa = params.shape[-1]
+    if return_S0_hat:
+        model_S0 = np.exp(-this_param[:, -1])
+
     params = params.reshape(data.shape[:-1] + (npa,))
     extra = {"robust": robust}
     if return_S0_hat:
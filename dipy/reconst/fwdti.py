@@ -89,7 +89,7 @@ def fwdti_prediction(params, gtab, *, S0=1, Diso=3.0e-3):
 class FreeWaterTensorModel(ReconstModel):
     """Class for the Free Water Elimination Diffusion Tensor Model"""
 
-    def __init__(self, gtab, *args, fit_method="NLS", **kwargs):
+    def __init__(self, gtab, *args, fit_method="NLS", solver="voxelwise", **kwargs):
         """Free Water Diffusion Tensor Model.
 
         See :footcite:p:`NetoHenriques2017` for further details about the model.
@@ -108,6 +108,14 @@ class FreeWaterTensorModel(ReconstModel):
 
             callable has to have the signature:
               ``fit_method(design_matrix, data, *args, **kwargs)``
+        solver : {"voxelwise", "batched"}, optional
+            ``"voxelwise"`` fits each voxel with ``fit_method``.
+            ``"batched"`` fits all the voxels of a chunk at once: the grid
+            search over the free water fraction runs one broadcasted WLS
+            solve per grid point, and the NLS refinement runs a vectorized
+            Levenberg-Marquardt algorithm with an analytic Jacobian. It only
+            supports the 'WLS' and 'NLS' fit methods, without the 'gmm'
+            weighting.
         args, kwargs : arguments and key-word arguments passed to the
            fit_method. See fwdti.wls_iter, fwdti.nls_iter for
            details
@@ -127,7 +135,20 @@ class FreeWaterTensorModel(ReconstModel):
                 e_s += "method, the fit method should either be a "
                 e_s += "function or one of the common fit methods"
                 raise ValueError(e_s) from e
+        if solver not in ("voxelwise", "batched"):
+            msg = f"Unknown solver {solver!r}, use 'voxelwise' or 'batched'"
+            raise ValueError(msg)
+        if solver == "batched":
+            if fit_method not in _batched_fit_methods:
+                msg = "The batched solver only supports the 'WLS' and 'NLS' "
+                msg += "fit methods"
+                raise ValueError(msg)
+            if kwargs.get("weighting") not in (None, "sigma"):
+                msg = "The batched solver does not support the "
+                msg += f"{kwargs['weighting']!r} weighting"
+                raise ValueError(msg)
         self.fit_method = fit_method
+        self.solver = solver
         self.design_matrix = design_matrix(self.gtab)
         self.args = args
         self.kwargs = kwargs
@@ -138,7 +159,7 @@ class FreeWaterTensorModel(ReconstModel):
             mes = "fwDTI requires at least 3 b-values (which can include b=0)"
             raise ValueError(mes)
 
-    @multi_voxel_fit
+    @multi_voxel_fit(batched=True)
     @warning_for_keywords()
     def fit(self, data, *, mask=None, **kwargs):
         """Fit method of the free water elimination DTI model class
@@ -146,17 +167,31 @@ class FreeWaterTensorModel(ReconstModel):
         Parameters
         ----------
         data : array
-            The measured signal from one voxel.
+            The measured signal from one voxel, or from a batch of voxels
+            stacked along the first axis.
         mask : array
             A boolean array used to mark the coordinates in the data that
             should be analyzed that has the shape data.shape[:-1]
         """
-        S0 = np.mean(data[self.gtab.b0s_mask])
-        fwdti_params = self.fit_method(
-            self.design_matrix, data, S0, *self.args, **self.kwargs
-        )
-
-        return FreeWaterTensorFit(self, fwdti_params)
+        voxels = np.atleast_2d(data)
+        S0 = np.mean(voxels[:, self.gtab.b0s_mask], axis=-1)
+        if self.solver == "batched":
+            fit_batch = _batched_fit_methods[self.fit_method]
+            fwdti_params = fit_batch(
+                self.design_matrix, voxels, S0, *self.args, **self.kwargs
+            )
+        else:
+            fwdti_params = [
+                self.fit_method(self.design_matrix, sig, s0, *self.args, **self.kwargs)
+                for sig, s0 in zip(voxels, S0)
+            ]
+
+        if data.ndim == 1:
+            return FreeWaterTensorFit(self, fwdti_params[0])
+        fits = np.empty(len(voxels), dtype=object)
+        for i, params in enumerate(fwdti_params):
+            fits[i] = FreeWaterTensorFit(self, params)
+        return fits
 
     @warning_for_keywords()
     def predict(self, fwdti_params, *, S0=1):
@@ -890,9 +925,353 @@ def cholesky_to_lower_triangular(R):
     return np.array([Dxx, Dxy, Dyy, Dxz, Dyz, Dzz])
 
 
+def _wls_batched(
+    design_matrix,
+    data,
+    S0,
+    *,
+    Diso=3e-3,
+    mdreg=2.7e-3,
+    min_signal=1.0e-6,
+    piterations=3,
+):
+    """Weighted linear least squares fit of the free water elimination model
+    to many voxels at once.
+
+    Vectorized equivalent of `wls_iter`, with the signals of N voxels in
+    ``data``, with shape (N, g), and their non diffusion weighted signals in
+    ``S0``, with shape (N,). Each point of the grid search over the free
+    water fraction is evaluated for all the voxels with one broadcasted
+    solve.
+
+    Returns
+    -------
+    fw_params : ndarray (N, 13)
+        The free water model parameters of each voxel, see `wls_iter`.
+
+    """
+    W = design_matrix
+    fw_params = np.zeros((data.shape[0], 13))
+
+    # DTI weighted linear least square solution of each voxel
+    WTS2 = W.T * (data**2)[:, None, :]
+    invWTS2W_WTS2 = np.linalg.pinv(WTS2 @ W) @ WTS2
+    log_s = np.log(np.maximum(data, min_signal))
+    params = np.einsum("npg,ng->np", invWTS2W_WTS2, log_s)
+    md = (params[:, 0] + params[:, 2] + params[:, 5]) / 3
+
+    # Process voxels with significant signal from tissue
+    process = (md < mdreg) & (np.mean(data, axis=-1) > min_signal) & (S0 > min_signal)
+    fw_params[~process & (md > mdreg), 12] = 1.0
+    if not np.any(process):
+        return fw_params
+
+    sig = data[process]
+    invWTS2W_WTS2 = invWTS2W_WTS2[process]
+    # General free-water signal contribution
+    fwsig = np.exp(np.dot(W, np.array([Diso, 0, Diso, 0, 0, Diso, 0])))
+    S0_fwsig = S0[process, None] * fwsig
+
+    df = 1  # initialize precision
+    flow = np.zeros(sig.shape[0])  # lower f evaluated
+    fhig = np.ones(sig.shape[0])  # higher f evaluated
+    ns = 9  # initial number of samples per iteration
+    for _ in range(piterations):
+        df = df * 0.1
+        step = (fhig - flow - 2 * df) / (ns - 1)
+        for k in range(ns):
+            fs = (flow + df + k * step)[:, None]
+            SA = sig - fs * S0_fwsig
+            # See wls_iter for the replacement of negative tissue signals
+            SA[SA <= 0] = min_signal
+            y = np.log(SA / (1 - fs))
+            new_params = np.einsum("npg,ng->np", invWTS2W_WTS2, y)
+            SIpred = (1 - fs) * np.exp(np.dot(new_params, W.T)) + fs * S0_fwsig
+            F2 = np.sum(np.square(sig - SIpred), axis=-1)
+            if k == 0:
+                best_F2, best_params, f = F2, new_params, fs[:, 0].copy()
+                continue
+            # Keep the first sample with the lowest error, as np.argmin
+            better = F2 < best_F2
+            best_F2[better] = F2[better]
+            best_params[better] = new_params[better]
+            f[better] = fs[better, 0]
+        flow = f - df  # refining precision
+        fhig = f + df
+        ns = 19
+
+    evals, evecs = decompose_tensor(from_lower_triangular(best_params))
+    fw_params[process] = np.concatenate(
+        (evals, evecs.reshape((-1, 9)), f[:, None]), axis=-1
+    )
+    return fw_params
+
+
+def _cholesky_jacobian(R):
+    """Derivatives of the tensor elements with respect to the Cholesky
+    elements of many voxels, see `cholesky_to_lower_triangular`.
+
+    Parameters
+    ----------
+    R : array (N, 6)
+        The six Cholesky's decomposition elements of each voxel.
+
+    Returns
+    -------
+    jac : array (N, 6, 6)
+        ``jac[n, i, j]`` is the derivative of the i-th tensor element
+        with respect to the j-th Cholesky element of voxel n.
+    """
+    R0, R1, R2, R3, R4, R5 = R.T
+    jac = np.zeros(R.shape[:1] + (6, 6))
+    jac[:, 0, 0] = 2 * R0
+    jac[:, 1, 0], jac[:, 1, 3] = R3, R0
+    jac[:, 2, 1], jac[:, 2, 3] = 2 * R1, 2 * R3
+    jac[:, 3, 0], jac[:, 3, 5] = R5, R0
+    jac[:, 4, 1], jac[:, 4, 3], jac[:, 4, 4], jac[:, 4, 5] = R4, R5, R1, R3
+    jac[:, 5, 2], jac[:, 5, 4], jac[:, 5, 5] = 2 * R2, 2 * R4, 2 * R5
+    return jac
+
+
+def _fwdti_jacobian(x, design_matrix, *, Diso=3e-3, cholesky=False, f_transform=False):
+    """Free water DTI signal and its Jacobian for many voxels.
+
+    Parameters
+    ----------
+    x : array (N, 8)
+        The six tensor elements (or Cholesky elements if ``cholesky``),
+        -log(S0) and the free water fraction (transformed if
+        ``f_transform``) of each voxel, as in `_nls_err_func`.
+    design_matrix : array (g, 7)
+        The design matrix.
+
+    Returns
+    -------
+    S : array (N, g)
+        The predicted signal of each voxel.
+    jac : array (N, g, 8)
+        Derivatives of the signal with respect to each parameter.
+    """
+    W = design_matrix
+    tensor = x[:, :7].copy()
+    if cholesky:
+        tensor[:, :6] = cholesky_to_lower_triangular(x[:, :6].T).T
+    if f_transform:
+        f = 0.5 * (1 + np.sin(x[:, 7] - np.pi / 2))
+        df = 0.5 * np.cos(x[:, 7] - np.pi / 2)
+    else:
+        f = x[:, 7]
+        df = np.ones_like(f)
+    f, df = f[:, None], df[:, None]
+
+    t = np.exp(np.dot(tensor, W.T))
+    iso = np.array([Diso, 0, Diso, 0, 0, Diso])
+    s = np.exp(np.dot(W[:, :6], iso) + x[:, 6:7] * W[:, 6])
+
+    jac = np.empty(t.shape + (8,))
+    jac[..., :7] = ((1 - f) * t)[..., None] * W
+    if cholesky:
+        jac[..., :6] = np.einsum(
+            "ngk,nkj->ngj", jac[..., :6], _cholesky_jacobian(x[:, :6])
+        )
+    jac[..., 6] += f * s * W[:, 6]
+    jac[..., 7] = (s - t) * df
+    return (1 - f) * t + f * s, jac
+
+
+def _fwdti_lm(
+    x,
+    data,
+    design_matrix,
+    *,
+    weights=None,
+    ftol=1.49e-8,
+    xtol=1.49e-8,
+    max_iter=200,
+    **kwargs,
+):
+    """Batched Levenberg-Marquardt fit of the free water DTI model.
+
+    All the voxels iterate together, each one with its own damping, and
+    voxels drop out of the iterations as soon as they have converged.
+
+    Parameters
+    ----------
+    x : array (N, 8)
+        Initial parameters of N voxels, see `_fwdti_jacobian`.
+    data : array (N, g)
+        The signal of each voxel.
+    design_matrix : array (g, 7)
+        The design matrix.
+    weights : array (g,), optional
+        Weights of the residuals of each diffusion-weighting direction.
+    ftol : float, optional
+        Tolerance on the relative decrease of the sum of squared residuals.
+    xtol : float, optional
+        Tolerance on the relative change of the parameters.
+    max_iter : int, optional
+        Maximum number of iterations.
+    kwargs : dict
+        Keyword arguments passed to `_fwdti_jacobian`.
+
+    Returns
+    -------
+    x : array (N, 8)
+        The fitted parameters.
+    """
+    w = np.ones(data.shape[-1]) if weights is None else weights
+    out = np.array(x, dtype=float)
+    rows = np.arange(out.shape[0])
+    x = out.copy()
+    pred, jac = _fwdti_jacobian(x, design_matrix, **kwargs)
+    res = w * (data - pred)
+    cost = np.sum(res**2, axis=-1)
+    lam = np.full(rows.size, 1e-3)
+    eye = np.eye(x.shape[1])
+
+    for _ in range(max_iter):
+        if rows.size == 0:
+            break
+        J = jac * w[:, None]
+        grad = np.einsum("ngp,ng->np", J, res)
+        JJ = np.einsum("ngp,ngq->npq", J, J)
+        # Marquardt scaling, with a floor for parameters without influence
+        diag = np.diagonal(JJ, axis1=1, axis2=2)
+        diag = np.maximum(diag, 1e-12 * diag.max(axis=-1, keepdims=True) + 1e-300)
+        A = JJ + (lam[:, None] * diag)[:, :, None] * eye
+        step = np.linalg.solve(A, grad[..., None])[..., 0]
+
+        x_new = x + step
+        pred_new, jac_new = _fwdti_jacobian(x_new, design_matrix, **kwargs)
+        res_new = w * (data - pred_new)
+        cost_new = np.sum(res_new**2, axis=-1)
+
+        accept = cost_new < cost
+        small_step = np.all(np.abs(step) <= xtol * (xtol + np.abs(x)), axis=-1)
+        small_decrease = cost - cost_new <= ftol * cost
+        done = (
+            (accept & (small_step | small_decrease))
+            | ~np.any(grad, axis=-1)
+            | (lam > 1e16)
+        )
+
+        x[accept] = x_new[accept]
+        res[accept] = res_new[accept]
+        jac[accept] = jac_new[accept]
+        cost[accept] = cost_new[accept]
+        lam = np.where(accept, lam * 0.1, lam * 10)
+
+        if np.any(done):
+            out[rows[done]] = x[done]
+            keep = ~done
+            rows, x, res, jac = rows[keep], x[keep], res[keep], jac[keep]
+            cost, lam, data = cost[keep], lam[keep], data[keep]
+
+    out[rows] = x
+    return out
+
+
+def _nls_batched(
+    design_matrix,
+    data,
+    S0,
+    *,
+    Diso=3e-3,
+    mdreg=2.7e-3,
+    min_signal=1.0e-6,
+    cholesky=False,
+    f_transform=True,
+    jac=False,
+    weighting=None,
+    sigma=None,
+):
+    """Non linear least squares fit of the free water elimination model to
+    many voxels at once.
+
+    Vectorized equivalent of `nls_iter`, with the signals of N voxels in
+    ``data``, with shape (N, g), and their non diffusion weighted signals in
+    ``S0``, with shape (N,). The initial guess is computed by `_wls_batched`
+    and refined by a batched Levenberg-Marquardt algorithm, which always uses
+    the analytic Jacobian (``jac`` is ignored). The 'gmm' weighting is not
+    supported.
+
+    Returns
+    -------
+    fw_params : ndarray (N, 13)
+        The free water model parameters of each voxel, see `nls_iter`.
+
+    """
+    # Initial guess
+    params = _wls_batched(
+        design_matrix, data, S0, min_signal=min_signal, Diso=Diso, mdreg=mdreg
+    )
+
+    weights = None
+    if weighting == "sigma":
+        if sigma is None:
+            e_s = "Must provide sigma value as input to use this weighting"
+            e_s += " method"
+            raise ValueError(e_s)
+        weights = np.broadcast_to(1 / np.asarray(sigma, dtype=float), data.shape[-1:])
+    elif weighting is not None:
+        raise ValueError(f"The {weighting!r} weighting is not supported")
+
+    # Process voxels with significant signal from tissue
+    process = params[:, 12] < 0.99
+    process &= (np.mean(data, axis=-1) > min_signal) & (S0 > min_signal)
+    if not np.any(process):
+        return params
+
+    # converting evals and evecs to diffusion tensor elements
+    evals = params[process, :3]
+    evecs = params[process, 3:12].reshape((-1, 3, 3))
+    dt = lower_triangular(vec_val_vect(evecs, evals))
+    start_dt = dt
+    if cholesky:
+        dt = lower_triangular_to_cholesky(dt.T).T
+    f = params[process, 12]
+    if f_transform:
+        f = np.arcsin(2 * f - 1) + np.pi / 2
+
+    start_params = np.column_stack((dt, -np.log(S0[process]), f))
+    this_tensor = _fwdti_lm(
+        start_params,
+        data[process],
+        design_matrix,
+        weights=weights,
+        Diso=Diso,
+        cholesky=cholesky,
+        f_transform=f_transform,
+    )
+
+    # Process tissue diffusion tensor, falling back to the initial guess for
+    # voxels whose fit diverged
+    if cholesky:
+        this_tensor[:, :6] = cholesky_to_lower_triangular(this_tensor[:, :6].T).T
+    tensor = from_lower_triangular(this_tensor[:, :6])
+    diverged = ~np.all(np.isfinite(tensor), axis=(-2, -1))
+    tensor[diverged] = from_lower_triangular(start_dt[diverged])
+    evals, evecs = decompose_tensor(tensor)
+
+    # Process water volume fraction f
+    f = this_tensor[:, 7]
+    if f_transform:
+        f = 0.5 * (1 + np.sin(f - np.pi / 2))
+
+    params[process] = np.concatenate(
+        (evals, evecs.reshape((-1, 9)), f[:, None]), axis=-1
+    )
+    return params
+
+
 common_fit_methods = {
     "WLLS": wls_iter,
     "WLS": wls_iter,
     "NLLS": nls_iter,
     "NLS": nls_iter,
 }
+
+_batched_fit_methods = {
+    wls_iter: _wls_batched,
+    nls_iter: _nls_batched,
+}
@@ -130,6 +130,253 @@ def f_D_star_error(params, gtab, signal, S0, D):
     return signal - f_D_star_prediction([f, D_star], gtab, S0, D)
 
 
+def _ivim_jacobian(params, bvals):
+    """IVIM signal and its Jacobian for many voxels.
+
+    Parameters
+    ----------
+    params : array, shape (N, 4)
+        IVIM parameters [S0, f, D_star, D] of N voxels.
+    bvals : array, shape (K,)
+        The b-values.
+
+    Returns
+    -------
+    S : array, shape (N, K)
+        The IVIM signal of each voxel.
+    jac : array, shape (N, K, 4)
+        Derivatives of the signal with respect to each parameter.
+
+    """
+    S0, f, D_star, D = (p[:, None] for p in params.T)
+    e_star = np.exp(-bvals * D_star)
+    e_diff = np.exp(-bvals * D)
+    decay = f * e_star + (1 - f) * e_diff
+    jac = np.stack(
+        [
+            decay,
+            S0 * (e_star - e_diff),
+            -S0 * f * bvals * e_star,
+            -S0 * (1 - f) * bvals * e_diff,
+        ],
+        axis=-1,
+    )
+    return S0 * decay, jac
+
+
+def _ivim_lm(
+    params,
+    data,
+    bvals,
+    bounds,
+    *,
+    free,
+    x_scale=None,
+    ftol=1e-8,
+    xtol=1e-8,
+    max_iter=100,
+):
+    """Batched bounded Levenberg-Marquardt fit of the IVIM model.
+
+    All the voxels iterate together, each one with its own damping, and
+    voxels drop out of the iterations as soon as they have converged.
+    Parameters on a bound that the gradient pushes outwards are frozen for
+    the current step and the others are projected back on the bounds.
+
+    Parameters
+    ----------
+    params : array, shape (N, 4)
+        Initial IVIM parameters [S0, f, D_star, D] of N voxels. They must be
+        within the bounds.
+    data : array, shape (N, K)
+        The signal of each voxel.
+    bvals : array, shape (K,)
+        The b-values.
+    bounds : tuple of two arrays with 4 elements
+        Lower and upper bounds of the parameters.
+    free : list of int
+        Indices of the parameters to optimize, the others are kept fixed.
+    x_scale : array with 4 elements, optional
+        Characteristic scale of each parameter.
+    ftol : float, optional
+        Tolerance on the relative decrease of the cost function.
+    xtol : float, optional
+        Tolerance on the relative change of the parameters.
+    max_iter : int, optional
+        Maximum number of iterations.
+
+    Returns
+    -------
+    params : array, shape (N, 4)
+        The fitted parameters.
+
+    """
+    free = np.asarray(free)
+    lower = np.asarray(bounds[0], dtype=float)[free]
+    upper = np.asarray(bounds[1], dtype=float)[free]
+    scale = 1.0 if x_scale is None else np.asarray(x_scale, dtype=float)[free]
+    eye = np.eye(free.size)
+
+    out = np.array(params, dtype=float)
+    rows = np.arange(out.shape[0])
+    x = out.copy()
+    pred, jac = _ivim_jacobian(x, bvals)
+    res = data - pred
+    cost = np.sum(res**2, axis=-1)
+    lam = np.full(rows.size, 1e-3)
+
+    for _ in range(max_iter):
+        if rows.size == 0:
+            break
+        J = jac[..., free] * scale
+        grad = np.einsum("nkp,nk->np", J, res)
+        u = x[:, free]
+        blocked = ((u <= lower) & (grad < 0)) | ((u >= upper) & (grad > 0))
+        grad[blocked] = 0
+
+        # Marquardt scaling, with a floor for parameters without influence
+        JJ = np.einsum("nkp,nkq->npq", J, J)
+        diag = np.diagonal(JJ, axis1=1, axis2=2)
+        diag = np.maximum(diag, 1e-12 * diag.max(axis=-1, keepdims=True) + 1e-300)
+        A = JJ + (lam[:, None] * diag)[:, :, None] * eye
+        A = np.where(blocked[:, :, None] | blocked[:, None, :], eye, A)
+        step = np.linalg.solve(A, grad[..., None])[..., 0] * scale
+
+        x_new = x.copy()
+        x_new[:, free] = np.clip(u + step, lower, upper)
+        pred_new, jac_new = _ivim_jacobian(x_new, bvals)
+        res_new = data - pred_new
+        cost_new = np.sum(res_new**2, axis=-1)
+
+        accept = cost_new < cost
+        small_step = np.all(
+            np.abs(x_new[:, free] - u) <= xtol * (xtol + np.abs(u)), axis=-1
+        )
+        small_decrease = cost - cost_new <= ftol * cost
+        done = (
+            (accept & (small_step | small_decrease))
+            | ~np.any(grad, axis=-1)
+            | (lam > 1e16)
+        )
+
+        x[accept] = x_new[accept]
+        res[accept] = res_new[accept]
+        jac[accept] = jac_new[accept]
+        cost[accept] = cost_new[accept]
+        lam = np.where(accept, lam * 0.1, lam * 10)
+
+        if np.any(done):
+            out[rows[done]] = x[done]
+            keep = ~done
+            rows, x, res, jac = rows[keep], x[keep], res[keep], jac[keep]
+            cost, lam, data = cost[keep], lam[keep], data[keep]
+
+    out[rows] = x
+    return out
+
+
+def _linear_fit_batched(bvals, data, selection):
+    """Fit a mono-exponential decay to the selected b-values of many voxels.
+
+    Vectorized equivalent of `IvimModelTRR.estimate_linear_fit`.
+
+    Returns
+    -------
+    S0 : array, shape (N,)
+        The estimated S0 value (intercept) of each voxel.
+    D : array, shape (N,)
+        The estimated value of D of each voxel.
+
+    """
+    A = np.column_stack([bvals[selection], np.ones(np.sum(selection))])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        D, neg_log_S0 = np.dot(-np.log(data[:, selection]), np.linalg.pinv(A).T).T
+    return np.exp(-neg_log_S0), D
+
+
+@warning_for_keywords()
+def ivim_dictionary(gtab, *, f=None, D_star=None, D=None):
+    """Precompute a dictionary of IVIM signals.
+
+    The dictionary can be given to `IvimModelTRR` to initialize the
+    non-linear fit of each voxel with its best matching dictionary entry
+    instead of the segmented linear fit. It can be computed once and reused
+    for all the datasets acquired with the same b-values.
+
+    Parameters
+    ----------
+    gtab : GradientTable class instance
+        Gradient directions and bvalues.
+    f : array, optional
+        Perfusion fractions of the dictionary. Default: 11 values in
+        [0, 0.2].
+    D_star : array, optional
+        Pseudo-diffusion coefficients of the dictionary. Default: 20 values
+        logarithmically spaced in [0.002, 0.1].
+    D : array, optional
+        Diffusion coefficients of the dictionary. Default: 20 values
+        logarithmically spaced in [0.0001, 0.003].
+
+    Returns
+    -------
+    dictionary : tuple of arrays
+        The parameters [f, D_star, D] of the M dictionary entries, with shape
+        (M, 3), and their signals for S0 = 1, with shape (M, len(bvals)).
+
+    """
+    f = np.linspace(0, 0.2, 11) if f is None else f
+    D_star = np.geomspace(2e-3, 0.1, 20) if D_star is None else D_star
+    D = np.geomspace(1e-4, 3e-3, 20) if D is None else D
+    params = np.stack(np.meshgrid(f, D_star, D, indexing="ij"), axis=-1)
+    params = params.reshape((-1, 3))
+    full_params = np.column_stack([np.ones(len(params)), params])
+    signals, _ = _ivim_jacobian(full_params, gtab.bvals)
+    return params, signals
+
+
+def _dictionary_lookup(dictionary, data, *, block_size=1000):
+    """Match each voxel to the dictionary entry that best explains it.
+
+    Returns
+    -------
+    params : array, shape (N, 4)
+        The parameters [S0, f, D_star, D] of the best entry of each voxel,
+        with S0 fitted by linear least squares.
+
+    """
+    params, signals = dictionary
+    norms = np.linalg.norm(signals, axis=-1)
+    atoms = signals / norms[:, None]
+    out = np.empty((data.shape[0], 4))
+    for start in range(0, data.shape[0], block_size):
+        proj = np.dot(data[start : start + block_size], atoms.T)
+        best = np.argmax(proj, axis=-1)
+        out[start : start + block_size, 0] = proj[np.arange(len(best)), best]
+        out[start : start + block_size, 0] /= norms[best]
+        out[start : start + block_size, 1:] = params[best]
+    return out
+
+
+def _ivim_lm_feasible(params, data, bvals, bounds, *, free, msg, **kwargs):
+    """Run `_ivim_lm` on the voxels whose initial guess is within bounds.
+
+    The other voxels keep their initial guess and ``msg`` is issued as a
+    warning, formatted with their number.
+    """
+    u = params[:, free]
+    lower = np.asarray(bounds[0], dtype=float)[free]
+    upper = np.asarray(bounds[1], dtype=float)[free]
+    feasible = np.all((u >= lower) & (u <= upper), axis=-1)
+    feasible &= np.all(np.isfinite(params), axis=-1)
+    if not np.all(feasible):
+        warnings.warn(msg.format(np.sum(~feasible)), UserWarning, stacklevel=3)
+    params = params.copy()
+    params[feasible] = _ivim_lm(
+        params[feasible], data[feasible], bvals, bounds, free=free, **kwargs
+    )
+    return params
+
+
 @warning_for_keywords()
 def ivim_model_selector(gtab, *, fit_method="trr", **kwargs):
     """
@@ -190,6 +437,8 @@ class IvimModelTRR(ReconstModel):
         ftol=1e-15,
         eps=1e-15,
         maxiter=1000,
+        solver="least_squares",
+        dictionary=None,
     ):
         r"""
         Initialize an IVIM model.
@@ -257,10 +506,27 @@ class IvimModelTRR(ReconstModel):
         maxiter : int, optional
             Maximum number of iterations to perform.
 
+        solver : {"least_squares", "batched"}, optional
+            Non-linear least squares solver. ``"least_squares"`` calls
+            `scipy.optimize.least_squares` for each voxel. ``"batched"`` fits
+            all the voxels of a chunk at once: the segmented linear fit is
+            vectorized and the non-linear fits use a bounded
+            Levenberg-Marquardt method that iterates on all the voxels
+            together.
+
+        dictionary : tuple of arrays, optional
+            Dictionary computed with `ivim_dictionary` for the b-values of
+            ``gtab``. When given, each voxel is initialized with its best
+            matching dictionary entry instead of the segmented linear fit.
+
         References
         ----------
         .. footbibliography::
         """
+        if solver not in ("least_squares", "batched"):
+            msg = f"Unknown solver {solver!r}, use 'least_squares' or 'batched'"
+            raise ValueError(msg)
+
         if not np.any(gtab.b0s_mask):
             e_s = "No measured signal at bvalue == 0."
             e_s += "The IVIM model requires signal measured at 0 bvalue"
@@ -284,10 +550,12 @@ class IvimModelTRR(ReconstModel):
         self.tol = tol
         self.options = {"gtol": gtol, "ftol": ftol, "eps": eps, "maxiter": maxiter}
         self.x_scale = x_scale
+        self.solver = solver
+        self.dictionary = dictionary
 
         self.bounds = bounds or BOUNDS
 
-    @multi_voxel_fit
+    @multi_voxel_fit(batched=True)
     def fit(self, data, **kwargs):
         """Fit method of the IvimModelTRR class.
 
@@ -304,35 +572,55 @@ class IvimModelTRR(ReconstModel):
         least squares fitting and consider only the linear fit.
 
 
+        With the ``"batched"`` solver, the same steps are run on all the
+        voxels of a chunk at once.
+
         Parameters
         ----------
         data : array
-            The measured signal from one voxel. A multi voxel decorator
-            will be applied to this fit method to scale it and apply it
-            to multiple voxels.
+            The measured signal from one voxel, or from several voxels
+            stacked along the first axis. A multi voxel decorator will be
+            applied to this fit method to scale it and apply it to multiple
+            voxels.
 
 
         Returns
         -------
         IvimFit object
         """
-        # Get S0_prime and D - parameters assuming a single exponential decay
-        # for signals for bvals greater than `split_b_D`
-        S0_prime, D = self.estimate_linear_fit(data, self.split_b_D, less_than=False)
-
-        # Get S0 and D_star_prime - parameters assuming a single exponential
-        # decay for for signals for bvals greater than `split_b_S0`.
+        if self.solver == "batched":
+            params = self._fit_batched(np.atleast_2d(data))
+            if data.ndim == 1:
+                return IvimFit(self, params[0])
+            return _ivim_fit_array(self, params)
+        if data.ndim == 1:
+            return self._fit_voxel(data)
+        return _ivim_fit_array(self, [self._fit_voxel(vox) for vox in data])
+
+    def _fit_voxel(self, data):
+        """Fit the model to a single voxel, see `fit`."""
+        if self.dictionary is None:
+            # Get S0_prime and D - parameters assuming a single exponential
+            # decay for signals for bvals greater than `split_b_D`
+            S0_prime, D = self.estimate_linear_fit(
+                data, self.split_b_D, less_than=False
+            )
 
-        S0, D_star_prime = self.estimate_linear_fit(
-            data, self.split_b_S0, less_than=True
-        )
-        # Estimate f
-        f_guess = 1 - S0_prime / S0
+            # Get S0 and D_star_prime - parameters assuming a single
+            # exponential decay for for signals for bvals greater than
+            # `split_b_S0`.
+            S0, D_star_prime = self.estimate_linear_fit(
+                data, self.split_b_S0, less_than=True
+            )
+            # Estimate f
+            f_guess = 1 - S0_prime / S0
 
-        # Fit f and D_star using leastsq.
-        params_f_D_star = [f_guess, D_star_prime]
-        f, D_star = self.estimate_f_D_star(params_f_D_star, data, S0, D)
-        params_linear = np.array([S0, f, D_star, D])
+            # Fit f and D_star using leastsq.
+            params_f_D_star = [f_guess, D_star_prime]
+            f, D_star = self.estimate_f_D_star(params_f_D_star, data, S0, D)
+            params_linear = np.array([S0, f, D_star, D])
+        else:
+            params_linear = _dictionary_lookup(self.dictionary, data[None])[0]
         # Fit parameters again if two_stage flag is set.
         if self.two_stage:
             params_two_stage = self._leastsq(data, params_linear)
@@ -350,6 +638,66 @@ class IvimModelTRR(ReconstModel):
         else:
             return IvimFit(self, params_linear)
 
+    def _fit_batched(self, data):
+        """Fit the model to many voxels at once, see `fit`.
+
+        Parameters
+        ----------
+        data : array, shape (N, len(bvals))
+            The measured signal of N voxels.
+
+        Returns
+        -------
+        params : array, shape (N, 4)
+            The IVIM parameters of each voxel.
+        """
+        bvals = self.gtab.bvals
+        options = {
+            "x_scale": self.x_scale,
+            "ftol": self.options["ftol"],
+            "xtol": self.tol,
+            "max_iter": self.options["maxiter"],
+        }
+        if self.dictionary is None:
+            S0_prime, D = _linear_fit_batched(bvals, data, bvals >= self.split_b_D)
+            S0, D_star = _linear_fit_batched(bvals, data, bvals <= self.split_b_S0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                params = np.column_stack([S0, 1 - S0_prime / S0, D_star, D])
+
+            # Fit f and D_star, with S0 and D fixed
+            bounds = (
+                [-np.inf, 0.0, 0.0, -np.inf],
+                [np.inf, self.bounds[1][1], self.bounds[1][2], np.inf],
+            )
+            msg = "x0 obtained from linear fitting is not feasible as initial "
+            msg += "guess for leastsq while estimating f and D_star in {} "
+            msg += "voxel(s). Using parameters from the linear fit."
+            params = _ivim_lm_feasible(
+                params, data, bvals, bounds, free=[1, 2], msg=msg, **options
+            )
+        else:
+            params = _dictionary_lookup(self.dictionary, data)
+
+        if not self.two_stage:
+            return params
+
+        msg = "x0 is unfeasible for leastsq fitting in {} voxel(s)."
+        msg += " Returning x0 values from the linear fit."
+        params_two_stage = _ivim_lm_feasible(
+            params, data, bvals, self.bounds, free=[0, 1, 2, 3], msg=msg, **options
+        )
+        bounds_violated = ~np.all(
+            (params_two_stage >= self.bounds[0]) & (params_two_stage <= self.bounds[1]),
+            axis=-1,
+        )
+        if np.any(bounds_violated):
+            warningMsg = "Bounds are violated for leastsq fitting in "
+            warningMsg += f"{np.sum(bounds_violated)} voxel(s). "
+            warningMsg += "Returning parameters from linear fit"
+            warnings.warn(warningMsg, UserWarning, stacklevel=3)
+            params_two_stage[bounds_violated] = params[bounds_violated]
+        return params_two_stage
+
     @warning_for_keywords()
     def estimate_linear_fit(self, data, split_b, *, less_than=True):
         """Estimate a linear fit by taking log of data.
@@ -517,7 +865,7 @@ class IvimModelTRR(ReconstModel):
 
 class IvimModelVP(ReconstModel):
     @warning_for_keywords()
-    def __init__(self, gtab, *, bounds=None, maxiter=10, xtol=1e-8):
+    def __init__(self, gtab, *, bounds=None, maxiter=10, xtol=1e-8, solver="mix"):
         r"""Initialize an IvimModelVP class.
 
         See :footcite:p:`LeBihan1988`, :footcite:p:`Federau2012` and
@@ -543,11 +891,24 @@ class IvimModelVP(ReconstModel):
         xtol : float, optional
             Tolerance for convergence of minimization.
 
+        solver : {"mix", "batched"}, optional
+            ``"mix"`` runs the three optimizers of the MIX approach for each
+            voxel. ``"batched"`` fits all the voxels of a chunk at once: the
+            differential evolution is replaced by an exhaustive search of the
+            variable projection cost on a grid, the volume fractions have a
+            closed form and the final non-linear least squares use a bounded
+            Levenberg-Marquardt method that iterates on all the voxels
+            together. It does not require CVXPY.
+
         References
         ----------
         .. footbibliography::
         """
+        if solver not in ("mix", "batched"):
+            msg = f"Unknown solver {solver!r}, use 'mix' or 'batched'"
+            raise ValueError(msg)
 
+        self.solver = solver
         self.maxiter = maxiter
         self.xtol = xtol
         self.bvals = gtab.bvals
@@ -556,7 +917,7 @@ class IvimModelVP(ReconstModel):
         self.exp_phi1 = np.zeros((self.bvals.shape[0], 2))
         self.bounds = bounds or (BOUNDS[0][1:], BOUNDS[1][1:])
 
-    @multi_voxel_fit
+    @multi_voxel_fit(batched=True)
     def fit(self, data, bounds_de=None, **kwargs):
         r"""Fit method of the IvimModelVP model class
 
@@ -573,19 +934,33 @@ class IvimModelVP(ReconstModel):
         of the algorithm. (see :footcite:p:`Fadnavis2019` and
         :footcite:p:`Farooq2016` for a comparison and a thorough discussion).
 
+        With the ``"batched"`` solver, the same steps are run on all the
+        voxels of a chunk at once.
+
         References
         ----------
         .. footbibliography::
 
         """
-        data_max = data.max()
-        data = data / data_max
-        b = self.bvals
-
         # Setting up the bounds for differential_evolution
         if bounds_de is None:
             bounds_de = np.array([(0.005, 0.01), (10**-4, 0.001)])
 
+        if self.solver == "batched":
+            params = self._fit_batched(np.atleast_2d(data), bounds_de)
+            if data.ndim == 1:
+                return IvimFit(self, params[0])
+            return _ivim_fit_array(self, params)
+        if data.ndim == 1:
+            return self._fit_voxel(data, bounds_de)
+        return _ivim_fit_array(self, [self._fit_voxel(vox, bounds_de) for vox in data])
+
+    def _fit_voxel(self, data, bounds_de):
+        """Fit the model to a single voxel, see `fit`."""
+        data_max = data.max()
+        data = data / data_max
+        b = self.bvals
+
         # Optimizer #1: Differential Evolution
         res_one = differential_evolution(
             self.stoc_search_cost,
@@ -622,6 +997,65 @@ class IvimModelVP(ReconstModel):
         result = np.insert(result, 0, np.mean(S0_est), axis=0)
         return IvimFit(self, result)
 
+    @warning_for_keywords()
+    def _fit_batched(self, data, bounds_de, *, grid_size=32, block_size=1000):
+        """Fit the model to many voxels at once, see `fit`.
+
+        Parameters
+        ----------
+        data : array, shape (N, len(bvals))
+            The measured signal of N voxels.
+        bounds_de : array, shape (2, 2)
+            Search ranges of D_star and D.
+        grid_size : int, optional
+            Number of values of D_star and of D in the search grid.
+        block_size : int, optional
+            Number of voxels evaluated on the grid at once.
+
+        Returns
+        -------
+        params : array, shape (N, 4)
+            The IVIM parameters of each voxel.
+        """
+        b = self.bvals
+        data_max = data.max(axis=-1, keepdims=True)
+        signal = data / data_max
+
+        # Optimizer #1: variable projection cost on a grid of [D_star, D]. The
+        # cost of each grid point is the energy of the signal outside the
+        # span of phi, i.e. |signal|^2 - |L^-1 phi^T signal|^2 with L the
+        # Cholesky factor of phi^T phi.
+        grid = np.meshgrid(*(np.linspace(*r, grid_size) for r in bounds_de))
+        x_grid = np.column_stack([g.ravel() for g in grid])
+        phi = np.exp(-x_grid[:, None, :] * b[:, None])
+        gram = np.einsum("mki,mkj->mij", phi, phi)
+        gram += 1e-12 * np.eye(2) * np.trace(gram, axis1=1, axis2=2)[:, None, None]
+        proj = np.linalg.solve(np.linalg.cholesky(gram), phi.transpose(0, 2, 1))
+        x = np.empty((len(signal), 2))
+        for start in range(0, len(signal), block_size):
+            energy = np.einsum("mik,nk->nmi", proj, signal[start : start + block_size])
+            best = np.argmax(np.sum(energy**2, axis=-1), axis=-1)
+            x[start : start + block_size] = x_grid[best]
+
+        # Optimizer #2: the constrained least squares for the volume fractions
+        # reduce to a clipped projection, with the constraints of `cvx_fit`
+        e_star = np.exp(-b * x[:, :1])
+        e_diff = np.exp(-b * x[:, 1:])
+        de = e_star - e_diff
+        f = np.sum(de * (signal - e_diff), axis=-1) / np.sum(de**2, axis=-1)
+        f = np.clip(f, 0.11, min(self.bounds[1][0], 0.989))
+
+        # Optimizer #3: Nonlinear-Least Squares, with S0 fixed to 1
+        params = np.column_stack([np.ones(len(f)), f, x])
+        bounds = ([1.0, *self.bounds[0]], [1.0, *self.bounds[1]])
+        params = _ivim_lm(
+            params, signal, b, bounds, free=[1, 2, 3], xtol=self.xtol, max_iter=300
+        )
+
+        pred, _ = _ivim_jacobian(params, b)
+        params[:, 0] = np.mean(data / pred, axis=-1)
+        return params
+
     def stoc_search_cost(self, x, signal):
         """
         Cost function for differential evolution algorithm. Performs a
@@ -838,6 +1272,14 @@ class IvimModelVP(ReconstModel):
         return self.exp_phi1
 
 
+def _ivim_fit_array(model, params):
+    """Build an object array of `IvimFit` (or wrap existing fits)."""
+    fits = np.empty(len(params), dtype=object)
+    for i, p in enumerate(params):
+        fits[i] = p if isinstance(p, IvimFit) else IvimFit(model, p)
+    return fits
+
+
 class IvimFit:
     def __init__(self, model, model_params):
         """Initialize a IvimFit class instance.
@@ -14,7 +14,11 @@ from warnings import warn
 
 from dipy.core.geometry import cart2sphere
 from dipy.core.gradients import gradient_table
-from dipy.core.optimize import Optimizer, PositiveDefiniteLeastSquares
+from dipy.core.optimize import (
+    Optimizer,
+    PositiveDefiniteLeastSquares,
+    solve_qp_batched,
+)
 from dipy.data import load_sdp_constraints
 import dipy.reconst.dti as dti
 from dipy.reconst.shm import real_sh_descoteaux_from_index, sph_harm_ind_list
@@ -23,6 +27,10 @@ from dipy.utils.optpkg import optional_package
 
 cvxpy, have_cvxpy, _ = optional_package("cvxpy", min_version="1.4.1")
 
+# Largest number of voxels whose design matrices are stacked at once by the
+# batched solver
+_BLOCK_SIZE = 256
+
 
 class MapmriModel(ReconstModel, Cache):
     r"""Mean Apparent Propagator MRI (MAPMRI) of the diffusion signal.
@@ -71,6 +79,8 @@ class MapmriModel(ReconstModel, Cache):
         dti_scale_estimation=True,
         static_diffusivity=0.7e-3,
         cvxpy_solver=None,
+        solver="voxelwise",
+        mu_resolution=0.01,
     ):
         r"""Analytical and continuous modeling of the diffusion signal with
         respect to the MAPMRI basis.
@@ -168,6 +178,21 @@ class MapmriModel(ReconstModel, Cache):
             with a particular cvxpy solver. See https://www.cvxpy.org/ for
             details.
             Default: None (cvxpy chooses its own solver)
+        solver : {"voxelwise", "batched"}, optional
+            ``"voxelwise"`` fits each voxel on its own, with CVXPY when the
+            positivity constraint is used. ``"batched"`` fits all the voxels
+            of a chunk at once: voxels are grouped in bins of similar scale
+            factors which share their Laplacian and constraint matrices, the
+            generalized cross-validation is vectorized over the
+            regularization weights, and the positivity constraint is enforced
+            with :func:`dipy.core.optimize.solve_qp_batched`, without CVXPY.
+            Global constraints are not available with the batched solver.
+        mu_resolution : float, optional
+            Width of the scale factor bins of the batched solver, in
+            logarithmic units. Scale factors are rounded to the center of
+            their bin, i.e. by at most ``mu_resolution / 2`` in relative
+            terms. Set it to 0 to group only voxels with identical scale
+            factors.
 
         References
         ----------
@@ -227,10 +252,21 @@ class MapmriModel(ReconstModel, Cache):
             self.laplacian_weighting = laplacian_weighting
         self.laplacian_regularization = laplacian_regularization
 
+        if solver not in ("voxelwise", "batched"):
+            msg = f"Unknown solver {solver!r}, use 'voxelwise' or 'batched'"
+            raise ValueError(msg)
+        self.solver = solver
+        self.mu_resolution = mu_resolution
+
         if positivity_constraint:
-            if not have_cvxpy:
+            if solver == "batched":
+                if global_constraints:
+                    raise ValueError(
+                        "Global constraints are not available with solver='batched'."
+                    )
+            elif not have_cvxpy:
                 raise ImportError("CVXPY package needed to enforce constraints.")
-            if cvxpy_solver is not None:
+            elif cvxpy_solver is not None:
                 if cvxpy_solver not in cvxpy.installed_solvers():
                     installed_solvers = ", ".join(cvxpy.installed_solvers())
                     raise ValueError(
@@ -324,8 +360,37 @@ class MapmriModel(ReconstModel, Cache):
                     )
                     self.MMt_inv_Mt = np.dot(np.linalg.pinv(MMt), self.M.T)
 
-    @multi_voxel_fit
+    @multi_voxel_fit(batched=True)
     def fit(self, data, **kwargs):
+        """Fit method of the MapmriModel class.
+
+        With the ``"batched"`` solver, all the voxels of a chunk are fitted at
+        once, see `MapmriModel`.
+
+        Parameters
+        ----------
+        data : array
+            The measured signal from one voxel, or from several voxels
+            stacked along the first axis. A multi voxel decorator will be
+            applied to this fit method to scale it and apply it to multiple
+            voxels.
+
+        Returns
+        -------
+        MapmriFit object
+        """
+        if self.solver == "batched":
+            fits = self._fit_batched(np.atleast_2d(data))
+            return fits[0] if data.ndim == 1 else fits
+        if data.ndim == 1:
+            return self._fit_voxel(data)
+        fits = np.empty(len(data), dtype=object)
+        for i, vox_data in enumerate(data):
+            fits[i] = self._fit_voxel(vox_data)
+        return fits
+
+    def _fit_voxel(self, data):
+        """Fit the model to a single voxel, see `fit`."""
         errorcode = 0
         tenfit = self.tenmodel.fit(data[self.cutoff])
         evals = tenfit.evals
@@ -454,6 +519,213 @@ class MapmriModel(ReconstModel, Cache):
 
         return MapmriFit(self, coef, mu, R, lopt, errorcode=errorcode)
 
+    def _fit_batched(self, data):
+        """Fit the model to many voxels at once, see `fit`."""
+        tenfit = self.tenmodel.fit(data[:, self.cutoff])
+        R = tenfit.evecs
+        evals = tenfit.evals
+        evals = np.clip(
+            evals, self.eigenvalue_threshold, evals.max(axis=-1, keepdims=True)
+        )
+        mu_tensor = np.sqrt(evals * 2 * self.tau)
+        if self.anisotropic_scaling:
+            scales = mu_tensor
+        else:
+            if self.dti_scale_estimation:
+                u0 = isotropic_scale_factor(evals * 2 * self.tau)
+            else:
+                u0 = np.full(len(data), self.mu[0])
+            scales = u0[:, None]
+            if self.positivity_constraint and self.pos_radius == "adaptive":
+                # The constraint grid depends on the largest tensor scale
+                scales = np.column_stack([u0, mu_tensor.max(axis=-1)])
+        bins, inverse = _quantize_scales(scales, self.mu_resolution)
+        if not (self.anisotropic_scaling or self.dti_scale_estimation):
+            bins[:, 0] = self.mu[0]
+
+        coef = np.zeros((len(data), self.ind_mat.shape[0]))
+        mu = np.zeros((len(data), 3))
+        lopt = np.zeros(len(data))
+        errorcode = np.zeros(len(data), dtype=int)
+        order = np.argsort(inverse, kind="stable")
+        splits = np.cumsum(np.bincount(inverse))[:-1]
+        for bin_scales, voxels in zip(bins, np.split(order, splits)):
+            if self.anisotropic_scaling:
+                bin_mu, mu_max = bin_scales, bin_scales.max()
+            else:
+                bin_mu, mu_max = np.repeat(bin_scales[0], 3), bin_scales[-1]
+            mu[voxels] = bin_mu
+            matrices = self._bin_matrices(bin_mu, mu_max)
+            for start in range(0, voxels.size, _BLOCK_SIZE):
+                idx = voxels[start : start + _BLOCK_SIZE]
+                coef[idx], lopt[idx], errorcode[idx] = self._fit_bin(
+                    data[idx], R[idx], bin_mu, matrices
+                )
+
+        n_failed = np.sum(errorcode == 2)
+        if n_failed:
+            warn(
+                f"Optimization did not find a solution for {n_failed} voxel(s)",
+                stacklevel=2,
+            )
+
+        fits = np.empty(len(data), dtype=object)
+        for i in range(len(data)):
+            fits[i] = MapmriFit(
+                self, coef[i], mu[i], R[i], lopt[i], errorcode=errorcode[i]
+            )
+        return fits
+
+    def _bin_matrices(self, mu, mu_max):
+        """Matrices shared by the voxels of a bin of scale factors.
+
+        Parameters
+        ----------
+        mu : array, shape (3,)
+            scale factors of the bin.
+        mu_max : float
+            largest tensor scale factor of the bin, which sets the adaptive
+            positivity constraint grid.
+
+        Returns
+        -------
+        matrices : dict
+            The Laplacian regularization matrix, the constraint matrix and,
+            for the isotropic basis, the design matrix and its factorization.
+        """
+        n_coef = self.ind_mat.shape[0]
+        matrices = {}
+        if not self.laplacian_regularization:
+            matrices["laplacian"] = np.zeros((n_coef, n_coef))
+        elif self.anisotropic_scaling:
+            matrices["laplacian"] = mapmri_laplacian_reg_matrix(
+                self.ind_mat, mu, self.S_mat, self.T_mat, self.U_mat
+            )
+        else:
+            matrices["laplacian"] = self.laplacian_matrix * mu[0]
+
+        if not self.anisotropic_scaling:
+            if self.dti_scale_estimation:
+                qvals = np.sqrt(self.gtab.bvals / self.tau) / (2 * np.pi)
+                M_mu_dependent = mapmri_isotropic_M_mu_dependent(
+                    self.radial_order, mu[0], qvals
+                )
+                M = M_mu_dependent * self.M_mu_independent
+            else:
+                M = self.M
+            matrices["M"] = M
+            matrices["MtM"] = np.dot(M.T, M)
+            matrices["W"], matrices["e"] = _gcv_factors(
+                matrices["MtM"], matrices["laplacian"]
+            )
+
+        if self.positivity_constraint:
+            if self.pos_radius == "adaptive":
+                constraint_grid = create_rspace(self.pos_grid, np.sqrt(5) * mu_max)
+            else:
+                constraint_grid = self.constraint_grid
+            if self.anisotropic_scaling:
+                K = mapmri_psi_matrix(self.radial_order, mu, constraint_grid)
+            elif self.pos_radius == "adaptive":
+                K = mapmri_isotropic_psi_matrix(
+                    self.radial_order, mu[0], constraint_grid
+                )
+            else:
+                K_dependent = mapmri_isotropic_K_mu_dependent(
+                    self.radial_order, mu[0], constraint_grid
+                )
+                K = K_dependent * self.pos_K_independent
+            matrices["K"] = K
+        return matrices
+
+    def _fit_bin(self, data, R, mu, matrices):
+        """Fit voxels sharing the same scale factors at once.
+
+        Parameters
+        ----------
+        data : array, shape (N, K)
+            The signal of each voxel.
+        R : array, shape (N, 3, 3)
+            The rotation matrix of each voxel.
+        mu : array, shape (3,)
+            scale factors of the voxels.
+        matrices : dict
+            The matrices of the bin, see `_bin_matrices`.
+
+        Returns
+        -------
+        coef : array, shape (N, N_coef)
+            The MAPMRI coefficients of each voxel.
+        lopt : array, shape (N,)
+            The regularization weight of each voxel.
+        errorcode : array, shape (N,)
+            The error code of each voxel, see `MapmriFit`.
+        """
+        errorcode = np.zeros(len(data), dtype=int)
+        if self.anisotropic_scaling:
+            qvals = np.sqrt(self.gtab.bvals / self.tau) / (2 * np.pi)
+            q = np.matmul(self.gtab.bvecs, R) * qvals[:, None]
+            M = mapmri_phi_matrix(self.radial_order, mu, q)
+            MtM = np.matmul(np.swapaxes(M, -1, -2), M)
+            W, e = _gcv_factors(MtM, matrices["laplacian"])
+        else:
+            M, MtM = matrices["M"], matrices["MtM"]
+            W, e = matrices["W"], matrices["e"]
+
+        # Coordinates of the data in the basis that diagonalizes the
+        # regularized normal equations, for any regularization weight
+        c = np.einsum("...pk,...p->...k", W, np.einsum("...qp,...q->...p", M, data))
+
+        if not self.laplacian_regularization:
+            lopt = np.zeros(len(data))
+        elif isinstance(self.laplacian_weighting, str) or not np.isscalar(
+            self.laplacian_weighting
+        ):
+            coef_ls = np.einsum("...pk,...k->...p", W, c)
+            residual = data - np.einsum("...qp,...p->...q", M, coef_ls)
+            weights_array = (
+                None
+                if isinstance(self.laplacian_weighting, str)
+                else self.laplacian_weighting
+            )
+            lopt, failed = _gcv_batched(
+                c,
+                e,
+                np.sum(residual**2, axis=-1),
+                data.shape[-1],
+                weights_array=weights_array,
+            )
+            errorcode[failed] = 1
+        else:
+            lopt = np.full(len(data), float(self.laplacian_weighting))
+
+        if self.positivity_constraint:
+            b0s_mask = self.gtab.b0s_mask
+            data_norm = data / data[:, b0s_mask].mean(axis=-1, keepdims=True)
+            i0 = np.flatnonzero(b0s_mask)[0]
+            K = matrices["K"]
+            coef = solve_qp_batched(
+                MtM + lopt[:, None, None] * matrices["laplacian"],
+                -np.einsum("...qp,...q->...p", M, data_norm),
+                -K,
+                np.full(K.shape[0], 0.1),
+                A=M[..., i0 : i0 + 1, :],
+                b=np.ones(1),
+            )
+            failed = np.any(np.isnan(coef), axis=-1)
+            if np.any(failed):
+                # least squares
+                errorcode[failed] = 2
+                M_failed = M[failed] if M.ndim == 3 else M
+                coef[failed] = np.einsum(
+                    "...pq,...q->...p", np.linalg.pinv(M_failed), data[failed]
+                )
+        else:
+            coef = np.einsum("...pk,...k->...p", W, c / (1 + lopt[:, None] * e))
+
+        coef = coef / np.sum(coef * self.Bm, axis=-1, keepdims=True)
+        return coef, lopt, errorcode
+
 
 class MapmriFit(ReconstFit):
     @warning_for_keywords()
@@ -1013,22 +1285,30 @@ def isotropic_scale_factor(mu_squared):
 
     Parameters
     ----------
-    mu_squared : array, shape (N,3)
+    mu_squared : array, shape (3,) or (..., 3)
         squared scale factors of mapmri basis in x, y, z
 
     Returns
     -------
-    u0 : float
+    u0 : float or array, shape (...)
         closest isotropic scale factor for the isotropic basis
 
     References
     ----------
     .. footbibliography::
     """
-    X, Y, Z = mu_squared
-    coef_array = np.array([-3, -(X + Y + Z), (X * Y + X * Z + Y * Z), 3 * X * Y * Z])
+    mu_squared = np.asarray(mu_squared)
+    X, Y, Z = (mu_squared[..., i] for i in range(3))
+    # the roots of the cubic polynomial
+    # -3 u0^3 - (X + Y + Z) u0^2 + (X Y + X Z + Y Z) u0 + 3 X Y Z
+    # are the eigenvalues of its companion matrix, as in np.roots
+    companion = np.zeros(mu_squared.shape[:-1] + (3, 3))
+    companion[..., 0, 0] = -(X + Y + Z) / 3
+    companion[..., 0, 1] = (X * Y + X * Z + Y * Z) / 3
+    companion[..., 0, 2] = X * Y * Z
+    companion[..., 1, 0] = companion[..., 2, 1] = 1
     # take the real, positive root of the problem.
-    u0 = np.sqrt(np.real(np.roots(coef_array).max()))
+    u0 = np.sqrt(np.real(np.linalg.eigvals(companion)).max(axis=-1))
     return u0
 
 
@@ -1161,39 +1441,40 @@ def mapmri_phi_matrix(radial_order, mu, q_gradients):
     ----------
     radial_order : unsigned int,
         an even integer that represent the order of the basis
-    mu : array, shape (3,)
+    mu : array, shape (3,) or (..., 3)
         scale factors of the basis for x, y, z
-    q_gradients : array, shape (N,3)
+    q_gradients : array, shape (N,3) or (..., N, 3)
         points in the q-space in which evaluate the basis
 
+    Returns
+    -------
+    M : array, shape (N, N_coef) or (..., N, N_coef)
+        The phi matrix. Leading dimensions of ``mu`` and ``q_gradients``
+        are broadcast against each other, to compute the matrices of many
+        voxels at once.
+
     References
     ----------
     .. footbibliography::
     """
 
     ind_mat = mapmri_index_matrix(radial_order)
-    n_elem = ind_mat.shape[0]
-    n_qgrad = q_gradients.shape[0]
-
-    qx, qy, qz = q_gradients.T
-    mux, muy, muz = mu
-
-    Mx_storage = np.array(np.zeros((n_qgrad, radial_order + 1)), dtype=complex)
-    My_storage = np.array(np.zeros((n_qgrad, radial_order + 1)), dtype=complex)
-    Mz_storage = np.array(np.zeros((n_qgrad, radial_order + 1)), dtype=complex)
-    M = np.zeros((n_qgrad, n_elem))
-
-    for n in range(radial_order + 1):
-        Mx_storage[:, n] = mapmri_phi_1d(n, qx, mux)
-        My_storage[:, n] = mapmri_phi_1d(n, qy, muy)
-        Mz_storage[:, n] = mapmri_phi_1d(n, qz, muz)
-
-    for counter, (nx, ny, nz) in enumerate(ind_mat):
-        M[:, counter] = np.real(
-            Mx_storage[:, nx] * My_storage[:, ny] * Mz_storage[:, nz]
+    q_gradients = np.asarray(q_gradients)
+    mu = np.asarray(mu)[..., None, :]
+
+    M_storage = [
+        np.stack(
+            [
+                mapmri_phi_1d(n, q_gradients[..., i], mu[..., i])
+                for n in range(radial_order + 1)
+            ],
+            axis=-1,
         )
+        for i in range(3)
+    ]
+    Mx, My, Mz = (M_storage[i][..., ind_mat[:, i]] for i in range(3))
 
-    return M
+    return np.real(Mx * My * Mz)
 
 
 def mapmri_psi_1d(n, x, mu):
@@ -1232,36 +1513,40 @@ def mapmri_psi_matrix(radial_order, mu, rgrad):
     ----------
     radial_order : unsigned int,
         an even integer that represent the order of the basis
-    mu : array, shape (3,)
+    mu : array, shape (3,) or (..., 3)
         scale factors of the basis for x, y, z
-    rgrad : array, shape (N,3)
+    rgrad : array, shape (N,3) or (..., N, 3)
         points in the r-space in which evaluate the EAP
 
+    Returns
+    -------
+    K : array, shape (N, N_coef) or (..., N, N_coef)
+        The psi matrix. Leading dimensions of ``mu`` and ``rgrad`` are
+        broadcast against each other, to compute the matrices of many voxels
+        at once.
+
     References
     ----------
     .. footbibliography::
     """
 
     ind_mat = mapmri_index_matrix(radial_order)
-    n_elem = ind_mat.shape[0]
-    n_qgrad = rgrad.shape[0]
-    rx, ry, rz = rgrad.T
-    mux, muy, muz = mu
-
-    Kx_storage = np.zeros((n_qgrad, radial_order + 1))
-    Ky_storage = np.zeros((n_qgrad, radial_order + 1))
-    Kz_storage = np.zeros((n_qgrad, radial_order + 1))
-    K = np.zeros((n_qgrad, n_elem))
-
-    for n in range(radial_order + 1):
-        Kx_storage[:, n] = mapmri_psi_1d(n, rx, mux)
-        Ky_storage[:, n] = mapmri_psi_1d(n, ry, muy)
-        Kz_storage[:, n] = mapmri_psi_1d(n, rz, muz)
-
-    for counter, (nx, ny, nz) in enumerate(ind_mat):
-        K[:, counter] = Kx_storage[:, nx] * Ky_storage[:, ny] * Kz_storage[:, nz]
+    rgrad = np.asarray(rgrad)
+    mu = np.asarray(mu)[..., None, :]
+
+    K_storage = [
+        np.stack(
+            [
+                mapmri_psi_1d(n, rgrad[..., i], mu[..., i])
+                for n in range(radial_order + 1)
+            ],
+            axis=-1,
+        )
+        for i in range(3)
+    ]
+    Kx, Ky, Kz = (K_storage[i][..., ind_mat[:, i]] for i in range(3))
 
-    return K
+    return Kx * Ky * Kz
 
 
 def mapmri_odf_matrix(radial_order, mu, s, vertices):
@@ -1443,13 +1728,16 @@ def mapmri_isotropic_M_mu_independent(radial_order, q):
 
 
 def mapmri_isotropic_M_mu_dependent(radial_order, mu, qval):
-    """Computed the mu dependent part of the signal design matrix."""
+    """Computed the mu dependent part of the signal design matrix.
+
+    ``mu`` can also be an array of shape (..., 1), to compute the matrices of
+    many voxels at once.
+    """
     ind_mat = mapmri_isotropic_index_matrix(radial_order)
 
     n_elem = ind_mat.shape[0]
-    n_qgrad = qval.shape[0]
-    Q_u0_dependent = np.zeros((n_qgrad, n_elem))
     pi2q2mu2 = 2 * np.pi**2 * mu**2 * qval**2
+    Q_u0_dependent = np.zeros(pi2q2mu2.shape + (n_elem,))
 
     counter = 0
     for n in range(0, radial_order + 1, 2):
@@ -1461,7 +1749,7 @@ def mapmri_isotropic_M_mu_dependent(radial_order, mu, qval):
                 * genlaguerre(j - 1, l_value + 0.5)(2 * pi2q2mu2)
             )
             for _ in range(-l_value, l_value + 1):
-                Q_u0_dependent[:, counter] = const
+                Q_u0_dependent[..., counter] = const
                 counter += 1
 
     return Q_u0_dependent
@@ -2024,62 +2312,44 @@ def mapmri_laplacian_reg_matrix(ind_mat, mu, S_mat, T_mat, U_mat):
     ----------
     ind_mat : matrix (N_coef, 3),
         Basis order matrix
-    mu : array, shape (3,)
+    mu : array, shape (3,) or (..., 3)
         scale factors of the basis for x, y, z
     S_mat, T_mat, U_mat : ndarray, shape (N_coef,N_coef)
         Regularization submatrices
 
     Returns
     -------
-    LR : matrix (N_coef, N_coef),
-        Voxel-specific Laplacian regularization matrix
+    LR : matrix (N_coef, N_coef) or (..., N_coef, N_coef),
+        Voxel-specific Laplacian regularization matrix, for each scale
+        factor in ``mu``
 
     References
     ----------
     .. footbibliography::
 
     """
-    ux, uy, uz = mu
-    x, y, z = ind_mat.T
-    n_elem = ind_mat.shape[0]
-    LR = np.zeros((n_elem, n_elem))
+    ux, uy, uz = (np.asarray(mu)[..., i, None, None] for i in range(3))
+    i, j = np.triu_indices(ind_mat.shape[0])
+    x, y, z = ind_mat[i].T
+    xj, yj, zj = ind_mat[j].T
+    parity = ((x - xj) % 2 == 0) & ((y - yj) % 2 == 0) & ((z - zj) % 2 == 0)
+    Sx, Sy, Sz = S_mat[x, xj], S_mat[y, yj], S_mat[z, zj]
+    Tx, Ty, Tz = T_mat[x, xj], T_mat[y, yj], T_mat[z, zj]
+    Ux, Uy, Uz = U_mat[x, xj], U_mat[y, yj], U_mat[z, zj]
+
+    upper = (
+        (ux**3 / (uy * uz)) * Sx * Uy * Uz
+        + (uy**3 / (ux * uz)) * Sy * Uz * Ux
+        + (uz**3 / (ux * uy)) * Sz * Ux * Uy
+        + 2 * ((ux * uy) / uz) * Tx * Ty * Uz
+        + 2 * ((ux * uz) / uy) * Tx * Tz * Uy
+        + 2 * ((uz * uy) / ux) * Tz * Ty * Ux
+    )
+    upper = upper[..., 0, :] * parity
 
-    for i in range(n_elem):
-        for j in range(i, n_elem):
-            if (
-                (x[i] - x[j]) % 2 == 0
-                and (y[i] - y[j]) % 2 == 0
-                and (z[i] - z[j]) % 2 == 0
-            ):
-                LR[i, j] = LR[j, i] = (
-                    (ux**3 / (uy * uz))
-                    * S_mat[x[i], x[j]]
-                    * U_mat[y[i], y[j]]
-                    * U_mat[z[i], z[j]]
-                    + (uy**3 / (ux * uz))
-                    * S_mat[y[i], y[j]]
-                    * U_mat[z[i], z[j]]
-                    * U_mat[x[i], x[j]]
-                    + (uz**3 / (ux * uy))
-                    * S_mat[z[i], z[j]]
-                    * U_mat[x[i], x[j]]
-                    * U_mat[y[i], y[j]]
-                    + 2
-                    * ((ux * uy) / uz)
-                    * T_mat[x[i], x[j]]
-                    * T_mat[y[i], y[j]]
-                    * U_mat[z[i], z[j]]
-                    + 2
-                    * ((ux * uz) / uy)
-                    * T_mat[x[i], x[j]]
-                    * T_mat[z[i], z[j]]
-                    * U_mat[y[i], y[j]]
-                    + 2
-                    * ((uz * uy) / ux)
-                    * T_mat[z[i], z[j]]
-                    * T_mat[y[i], y[j]]
-                    * U_mat[x[i], x[j]]
-                )
+    LR = np.zeros(upper.shape[:-1] + (ind_mat.shape[0],) * 2)
+    LR[..., i, j] = upper
+    LR[..., j, i] = upper
 
     return LR
 
@@ -2189,3 +2459,134 @@ def gcv_cost_function(weight, args):
     normyytilde = np.linalg.norm(data - np.dot(S, data), 2)
     gcv_value = normyytilde / (K - trS)
     return gcv_value
+
+
+def _quantize_scales(scales, resolution):
+    """Group voxels into bins of similar scale factors.
+
+    Parameters
+    ----------
+    scales : array, shape (N, k)
+        positive scale factors of each voxel.
+    resolution : float
+        width of the bins in logarithmic units. If 0, only identical scale
+        factors share a bin.
+
+    Returns
+    -------
+    bins : array, shape (B, k)
+        scale factors at the center of each bin.
+    inverse : array, shape (N,)
+        index of the bin of each voxel.
+    """
+    if resolution:
+        scales = np.exp(np.round(np.log(scales) / resolution) * resolution)
+    bins, inverse = np.unique(scales, axis=0, return_inverse=True)
+    return bins, inverse.ravel()
+
+
+def _gcv_factors(MtM, LR):
+    """Simultaneous diagonalization of the normal and regularization matrices.
+
+    Computes ``W`` and ``e`` such that ``W' MtM W = I`` and
+    ``W' LR W = diag(e)``, so that for any regularization weight
+    ``inv(MtM + weight * LR) = W diag(1 / (1 + weight * e)) W'``.
+
+    Parameters
+    ----------
+    MtM : array, shape (N_coef, N_coef) or (..., N_coef, N_coef)
+        normal matrices of the design matrices.
+    LR : array, shape (N_coef, N_coef)
+        regularization matrix.
+
+    Returns
+    -------
+    W : array, shape (..., N_coef, N_coef)
+    e : array, shape (..., N_coef)
+    """
+    a, Q = np.linalg.eigh(MtM)
+    # bound the eigenvalues of rank deficient design matrices
+    a = np.maximum(a, np.finfo(float).eps * a[..., -1:])
+    B = Q / np.sqrt(a)[..., None, :]
+    e, V = np.linalg.eigh(np.matmul(np.swapaxes(B, -1, -2), np.matmul(LR, B)))
+    return np.matmul(B, V), np.maximum(e, 0)
+
+
+def _gcv_cost_batched(weights, c, e, residual, n_data):
+    """GCV cost of many voxels for many regularization weights.
+
+    Parameters
+    ----------
+    weights : array, shape (N, G)
+        regularization weights of each voxel.
+    c : array, shape (N, N_coef)
+        data of each voxel projected on ``M W``, see `_gcv_factors`.
+    e : array, shape (N, N_coef)
+        generalized eigenvalues of each voxel, see `_gcv_factors`.
+    residual : array, shape (N,)
+        squared norm of the residual of the unregularized fit of each voxel.
+    n_data : int
+        number of measurements.
+    """
+    f = 1 / (1 + weights[..., None] * e[:, None, :])
+    res = residual[:, None] + np.sum((c[:, None, :] * (1 - f)) ** 2, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.sqrt(res) / (n_data - np.sum(f, axis=-1))
+
+
+def _gcv_batched(c, e, residual, n_data, *, weights_array=None):
+    """Optimal regularization weights of many voxels.
+
+    Vectorized equivalent of `generalized_crossvalidation` and, when
+    ``weights_array`` is given, of `generalized_crossvalidation_array`. The
+    continuous optimization is replaced by a search on a logarithmic grid
+    followed by a golden section search, both over the same bounds.
+
+    Parameters
+    ----------
+    c, e, residual, n_data :
+        see `_gcv_cost_batched`.
+    weights_array : array (N_of_weights), optional
+        array of regularization weights.
+
+    Returns
+    -------
+    lopt : array, shape (N,)
+        optimal regularization weight of each voxel.
+    failed : array, shape (N,)
+        voxels with no finite GCV cost, whose weight is set to 0.05.
+    """
+    e = np.broadcast_to(e, c.shape)
+    n_vox = c.shape[0]
+
+    if weights_array is not None:
+        samples = weights_array.shape[0]
+        weights = np.broadcast_to(weights_array[: samples - 1], (n_vox, samples - 1))
+        cost = _gcv_cost_batched(weights, c, e, residual, n_data)
+        # stop at the first increase of the cost, like the loop of
+        # generalized_crossvalidation_array
+        cost = np.column_stack([np.full(n_vox, 10e10), cost])
+        stop = ~(cost[:, :-1] >= cost[:, 1:])
+        last = np.where(np.any(stop, axis=-1), np.argmax(stop, axis=-1), samples - 2)
+        return weights_array[last - 1], np.zeros(n_vox, dtype=bool)
+
+    grid = np.geomspace(1e-5, 10, 50)
+    cost = _gcv_cost_batched(
+        np.broadcast_to(grid, (n_vox, grid.size)), c, e, residual, n_data
+    )
+    cost = np.where(np.isnan(cost), np.inf, cost)
+    best = np.argmin(cost, axis=-1)
+    failed = ~np.isfinite(np.min(cost, axis=-1))
+
+    lo = np.log(grid[np.maximum(best - 1, 0)])
+    hi = np.log(grid[np.minimum(best + 1, grid.size - 1)])
+    ratio = (np.sqrt(5) - 1) / 2
+    for _ in range(30):
+        x = np.column_stack([hi - ratio * (hi - lo), lo + ratio * (hi - lo)])
+        cost = _gcv_cost_batched(np.exp(x), c, e, residual, n_data)
+        left = ~(cost[:, 0] > cost[:, 1])
+        lo, hi = np.where(left, lo, x[:, 0]), np.where(left, x[:, 1], hi)
+
+    lopt = np.exp((lo + hi) / 2)
+    lopt[failed] = 0.05
+    return lopt, failed
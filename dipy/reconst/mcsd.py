@@ -10,6 +10,7 @@ from dipy.core.gradients import (
     gradient_table,
     unique_bvals_tolerance,
 )
+from dipy.core.optimize import solve_qp_batched
 from dipy.data import default_sphere
 from dipy.reconst import shm
 from dipy.reconst.csdeconv import response_from_mask_ssst
@@ -172,6 +173,7 @@ class MultiShellDeconvModel(shm.SphHarmModel):
         sh_order_max=8,
         iso=2,
         tol=20,
+        solver="cvxpy",
     ):
         r"""
         Multi-Shell Multi-Tissue Constrained Spherical Deconvolution
@@ -215,6 +217,11 @@ class MultiShellDeconvModel(shm.SphHarmModel):
             number of compartments required is 2.
         tol : int, optional
             Tolerance gap for b-values clustering.
+        solver : {"cvxpy", "batched"}, optional
+            Quadratic programming solver. ``"cvxpy"`` builds and solves a
+            CVXPY problem for each voxel. ``"batched"`` solves many voxels at
+            once with :func:`dipy.core.optimize.solve_qp_batched` and does not
+            require CVXPY.
 
         References
         ----------
@@ -223,6 +230,10 @@ class MultiShellDeconvModel(shm.SphHarmModel):
         if not iso >= 2:
             msg = "Multi-tissue CSD requires at least 2 tissue compartments"
             raise ValueError(msg)
+        fitters = {"batched": BatchedQpFitter, "cvxpy": QpFitter}
+        if solver not in fitters:
+            msg = f"Unknown solver {solver!r}, use one of {list(fitters)}"
+            raise ValueError(msg)
 
         super().__init__(gtab)
 
@@ -260,7 +271,7 @@ class MultiShellDeconvModel(shm.SphHarmModel):
 
         X = B * multiplier_matrix
 
-        self.fitter = QpFitter(X, reg)
+        self.fitter = fitters[solver](X, reg)
         self.sh_order_max = sh_order_max
         self._X = X
         self.sphere = reg_sphere
@@ -314,34 +325,44 @@ class MultiShellDeconvModel(shm.SphHarmModel):
         pred_sig = scaling * np.dot(params, X.T)
         return pred_sig
 
-    @multi_voxel_fit
+    @multi_voxel_fit(batched=True)
     def fit(self, data, verbose=True, **kwargs):
         """Fits the model to diffusion data and returns the model fit.
 
-        Sometimes the solving process of some voxels can end in a SolverError
-        from cvxpy. This might be attributed to the response functions not
-        being tuned properly, as the solving process is very sensitive to it.
-        The method will fill the problematic voxels with a NaN value, so that
-        it is traceable. The user should check for the number of NaN values and
-        could then fill the problematic voxels with zeros, for example.
-        Running a fit again only on those problematic voxels can also work.
+        Sometimes the solving process of some voxels can fail (e.g. with a
+        SolverError from cvxpy). This might be attributed to the response
+        functions not being tuned properly, as the solving process is very
+        sensitive to it. The method will fill the problematic voxels with a
+        NaN value, so that it is traceable. The user should check for the
+        number of NaN values and could then fill the problematic voxels with
+        zeros, for example. Running a fit again only on those problematic
+        voxels can also work.
 
         Parameters
         ----------
         data : ndarray
             The diffusion data to fit the model on.
         verbose : bool, optional
-            Whether to show warnings when a SolverError appears or not.
+            Whether to show warnings when a voxel could not be solved.
         """
-        coeff = self.fitter(data)
+        if data.ndim == 1 or isinstance(self.fitter, BatchedQpFitter):
+            coeff = self.fitter(data)
+        else:
+            coeff = np.array([self.fitter(vox) for vox in data])
         if verbose:
-            if np.isnan(coeff[..., 0]):
-                msg = """Voxel could not be solved properly and ended up with a
-                SolverError. Proceeding to fill it with NaN values.
+            n_failed = np.sum(np.isnan(coeff[..., 0]))
+            if n_failed:
+                msg = f"""{n_failed} voxel(s) could not be solved properly.
+                Proceeding to fill them with NaN values.
                 """
                 warnings.warn(msg, UserWarning, stacklevel=2)
 
-        return MSDeconvFit(self, coeff, None)
+        if data.ndim == 1:
+            return MSDeconvFit(self, coeff, None)
+        fits = np.empty(len(coeff), dtype=object)
+        for i, vox_coeff in enumerate(coeff):
+            fits[i] = MSDeconvFit(self, vox_coeff, None)
+        return fits
 
 
 class MSDeconvFit(shm.SphHarmFit):
@@ -450,6 +471,51 @@ class QpFitter:
         return fodf_sh
 
 
+class BatchedQpFitter:
+    def __init__(self, X, reg):
+        r"""
+        Makes use of the batched quadratic programming solver
+        `solve_qp_batched` to fit the model to many voxels at once. Voxels
+        for which the solver does not converge are reported with a warning,
+        and fitted again with `QpFitter` if CVXPY is available.
+
+        Parameters
+        ----------
+        X : ndarray
+            Matrix to be fit by the QP solver calculated in
+            `MultiShellDeconvModel`
+        reg : ndarray
+            the regularization B matrix calculated in `MultiShellDeconvModel`
+        """
+        self._P = np.dot(X.T, X)
+        self._X = X
+
+        self._reg = reg
+        self._reg_mat = np.array(-reg)
+        self._h_mat = np.zeros(reg.shape[0])
+        self._tol = 1e-8
+
+    def __call__(self, signal):
+        signal = np.asarray(signal)
+        data = signal.reshape((-1, signal.shape[-1]))
+        Q = -np.dot(data, self._X)
+        # A tolerance of 1e-9 is below the accuracy reachable on many of
+        # these ill-conditioned problems
+        fodf_sh = solve_qp_batched(
+            self._P, Q, self._reg_mat, self._h_mat, tol=self._tol
+        )
+
+        failed = np.flatnonzero(np.isnan(fodf_sh).any(axis=-1))
+        if failed.size:
+            msg = f"The batched QP solver did not converge in {failed.size} voxel(s)"
+            if have_cvxpy:
+                msg += ", which are fitted again with CVXPY."
+                fitter = QpFitter(self._X, self._reg)
+                fodf_sh[failed] = [fitter(vox) for vox in data[failed]]
+            warnings.warn(msg, UserWarning, stacklevel=2)
+        return fodf_sh.reshape(signal.shape[:-1] + (-1,))
+
+
 @deprecated_params("sh_order", new_name="sh_order_max", since="1.9", until="2.0")
 @warning_for_keywords()
 def multi_shell_fiber_response(
@@ -779,9 +779,191 @@ def _sdpdc_fit(X, data_masked, cvxpy_solver, *, weights=None, return_leverages=F
     return params_masked, extra
 
 
+def _psd_projection(V):
+    """Project vectors in Voigt notation onto the cone of positive
+    semidefinite matrices.
+
+    Parameters
+    ----------
+    V : numpy.ndarray
+        An array of size (N, 6) or (N, 21).
+
+    Returns
+    -------
+    V_psd : numpy.ndarray
+        The vectors of the closest positive semidefinite matrices in Frobenius
+        norm, which is the Euclidean norm in Voigt notation.
+    """
+    if V.shape[-1] == 6:
+        to_matrix, to_vector = from_6x1_to_3x3, from_3x3_to_6x1
+    else:
+        to_matrix, to_vector = from_21x1_to_6x6, from_6x6_to_21x1
+    evals, evecs = np.linalg.eigh(to_matrix(V[..., np.newaxis]))
+    T = (evecs * np.maximum(evals, 0)[..., np.newaxis, :]) @ np.swapaxes(evecs, -1, -2)
+    return to_vector(0.5 * (T + np.swapaxes(T, -1, -2)))[..., 0]
+
+
+@warning_for_keywords()
+def _sdpdc_admm_fit(
+    X, data_masked, *, weights=None, return_leverages=False, tol=1e-6, max_iter=5000
+):
+    r"""Estimate the model parameters of many voxels at once while enforcing
+    positivity constraints on the D and C tensors (SDPdc).
+
+    Batched counterpart of :func:`qti._sdpdc_fit` that does not require CVXPY.
+    The constrained weighted least squares problems of all the voxels are
+    solved together with the alternating direction method of multipliers
+    (ADMM) :footcite:p:`Boyd2011`, where the projections onto the positive
+    semidefinite cones are computed by batched eigendecompositions. The
+    penalty parameter of each voxel is adapted by residual balancing.
+
+    Parameters
+    ----------
+    X : array (g, 28)
+        Design matrix holding the covariants used to solve for the regression
+        coefficients.
+    data_masked : array (N, g)
+        The measured signal, already masked.
+    weights : array (N, g), optional
+        Weights to apply for fitting. These weights must correspond to the
+        squared residuals such that $S = \sum_i w_i r_i^2$. If not provided,
+        weights are estimated as the squared predicted signal from an initial
+        OLS fit.
+    return_leverages : bool, optional
+        Boolean to return (True) or not (False) the fitting leverages.
+    tol : float, optional
+        Absolute and relative tolerance on the primal and dual residuals of
+        the ADMM iterations.
+    max_iter : int, optional
+        Maximum number of ADMM iterations.
+
+    Returns
+    -------
+    params : numpy.ndarray
+        Array of shape (..., 28) containing the estimated model parameters.
+        Element 0 is the natural logarithm of the estimated signal without
+        diffusion-weighting, elements 1-6 are the estimated diffusion tensor
+        elements in Voigt notation, and elements 7-27 are the estimated
+        covariance tensor elements in Voigt notation. The D and C tensors are
+        positive semidefinite.
+    extra : dict
+        Per-voxel convergence diagnostics: 'converged', 'n_iter',
+        'primal_residual' and 'dual_residual', and the 'leverages' if
+        `return_leverages` is True.
+
+    References
+    ----------
+    .. footbibliography::
+    """
+    size = data_masked.shape[0]
+
+    # scale the signals (different scaling per voxel), as in _sdpdc_fit
+    scale = np.maximum(np.max(data_masked, axis=1, keepdims=True), 1)
+    data_masked = data_masked / scale
+    data_masked[data_masked < MIN_POSITIVE_SIGNAL] = MIN_POSITIVE_SIGNAL
+    log_data = np.log(data_masked)
+
+    if weights is None:
+        X_inv = np.linalg.pinv(X.T @ X)  # Independent of data
+        params_ols = (X_inv @ X.T @ log_data[..., np.newaxis])[..., 0]
+        W = np.exp((X @ params_ols.T).T)
+    else:
+        W = np.sqrt(weights)
+
+    extra = {}
+    if return_leverages:
+        A = X * W[..., None]
+        inv_W_A_W = np.einsum("...ij,...j->...ij", np.linalg.pinv(A), W)
+        extra["leverages"] = np.einsum("ij,...ji->...i", X, inv_W_A_W)
+
+    # Balance the D and C blocks of the design matrix. A single factor per
+    # block keeps the positive semidefinite cones unchanged.
+    blocks = (slice(1, 7), slice(7, 28))
+    col_scale = np.ones(28)
+    for block in blocks:
+        norm = np.sqrt(np.mean(np.sum(X[:, block] ** 2, axis=0)))
+        col_scale[block] = 1 / np.maximum(norm, np.finfo(float).tiny)
+    A = W[..., np.newaxis] * (X * col_scale)
+    b = W * log_data
+    AtA = np.swapaxes(A, -1, -2) @ A
+    Atb = np.einsum("nij,ni->nj", A, b)
+
+    # The tensor elements x[:, 1:] are split from their copy z in the cones,
+    # whose blocks are offset by the S0 element
+    x = np.einsum("nij,nj->ni", np.linalg.pinv(A), b)
+    z_blocks = (slice(0, 6), slice(6, 27))
+    z = np.concatenate([_psd_projection(x[:, 1:][:, block]) for block in z_blocks], 1)
+    u = np.zeros_like(z)
+    rho = np.trace(AtA, axis1=1, axis2=2) / 28
+    penalty = np.r_[0, np.ones(27)]
+    K_inv = np.linalg.inv(AtA + rho[:, None, None] * np.diag(penalty))
+
+    n_iter = np.zeros(size, dtype=int)
+    converged = np.zeros(size, dtype=bool)
+    r_norm = np.zeros(size)
+    s_norm = np.zeros(size)
+    active = np.arange(size)
+    for it in range(max_iter):
+        if active.size == 0:
+            break
+        rho_a = rho[active, None]
+        rhs = Atb[active].copy()
+        rhs[:, 1:] += rho_a * (z[active] - u[active])
+        x[active] = np.einsum("nij,nj->ni", K_inv[active], rhs)
+
+        z_old = z[active]
+        v = x[active, 1:] + u[active]
+        z_new = np.concatenate([_psd_projection(v[:, block]) for block in z_blocks], 1)
+        z[active] = z_new
+        u[active] = v - z_new
+
+        r_norm[active] = np.linalg.norm(x[active, 1:] - z_new, axis=1)
+        s_norm[active] = rho[active] * np.linalg.norm(z_new - z_old, axis=1)
+        eps_pri = np.sqrt(27) * tol + tol * np.maximum(
+            np.linalg.norm(x[active, 1:], axis=1), np.linalg.norm(z_new, axis=1)
+        )
+        eps_dual = np.sqrt(28) * tol + tol * rho[active] * np.linalg.norm(
+            u[active], axis=1
+        )
+        n_iter[active] += 1
+        done = (r_norm[active] <= eps_pri) & (s_norm[active] <= eps_dual)
+        converged[active[done]] = True
+
+        # Residual balancing of the penalty parameters
+        if (it + 1) % 10 == 0:
+            factor = np.ones(active.size)
+            factor[r_norm[active] > 10 * s_norm[active]] = 2
+            factor[s_norm[active] > 10 * r_norm[active]] = 0.5
+            factor[done] = 1
+            update = active[factor != 1]
+            if update.size:
+                rho[update] *= factor[factor != 1]
+                u[update] /= factor[factor != 1, None]
+                K_inv[update] = np.linalg.inv(
+                    AtA[update] + rho[update, None, None] * np.diag(penalty)
+                )
+        active = active[~done]
+
+    # The tensors are taken in the cones, with the optimal S0 given them
+    a0 = A[..., 0]
+    x0 = np.sum(a0 * (b - np.einsum("nij,nj->ni", A[..., 1:], z)), axis=1)
+    x0 /= np.maximum(np.sum(a0**2, axis=1), np.finfo(float).tiny)
+    params_masked = np.concatenate((x0[:, None], z), axis=1) * col_scale
+    params_masked[:, 0] += np.log(scale[:, 0])
+
+    extra["converged"] = converged
+    extra["n_iter"] = n_iter
+    extra["primal_residual"] = r_norm
+    extra["dual_residual"] = s_norm
+
+    return params_masked, extra
+
+
 class QtiModel(ReconstModel):
     @warning_for_keywords()
-    def __init__(self, gtab, *, fit_method="WLS", cvxpy_solver="SCS", **kwargs):
+    def __init__(
+        self, gtab, *, fit_method="WLS", cvxpy_solver="SCS", solver="cvxpy", **kwargs
+    ):
         """Covariance tensor model of q-space trajectory imaging.
 
         See :footcite:t:`Westin2016` for further details about the model.
@@ -802,6 +984,12 @@ class QtiModel(ReconstModel):
 
         cvxpy_solver: str, optional
             solver for the SDP formulation. default: 'SCS'
+        solver : str, optional
+            How the 'SDPdc' fits are computed: 'cvxpy' solves the problem of
+            each voxel with CVXPY (see `cvxpy_solver`), and 'batched' solves
+            the problems of all the voxels at once on the CPU without CVXPY,
+            see :func:`qti._sdpdc_admm_fit`. Its per-voxel convergence
+            diagnostics are stored in the `extra` attribute of the model.
         **kwargs
             Arbitrary keyword arguments passed to the :func:`fit` method.
 
@@ -835,7 +1023,15 @@ class QtiModel(ReconstModel):
                 " Options: 'OLS', 'WLS', 'SDPdc', 'RWLS'."
             ) from e
 
+        if solver not in ("cvxpy", "batched"):
+            raise ValueError(
+                f"Invalid value ({solver}) for 'solver'. Options: 'cvxpy', 'batched'."
+            )
+        if fit_method == "SDPdc" and solver == "batched":
+            self.fit_method = _sdpdc_admm_fit
+
         self.cvxpy_solver = cvxpy_solver
+        self.solver = solver
         self.fit_method_name = fit_method
 
         self.is_iter_method = "weights_method" in self.kwargs
@@ -876,7 +1072,7 @@ class QtiModel(ReconstModel):
         data_in_mask = np.reshape(data[mask], (-1, sz))
 
         if not self.is_iter_method:
-            if self.fit_method_name == "SDPdc":
+            if self.fit_method_name == "SDPdc" and self.solver == "cvxpy":
                 params_in_mask, extra = self.fit_method(
                     self.X, data_in_mask, self.cvxpy_solver
                 )
@@ -898,7 +1094,9 @@ class QtiModel(ReconstModel):
 
         if extra is not None:
             for key in extra:
-                tmp_extra = np.zeros(img_shape + extra[key].shape[1:])
+                tmp_extra = np.zeros(
+                    img_shape + extra[key].shape[1:], dtype=extra[key].dtype
+                )
                 tmp_extra[mask] = extra[key]
                 self.extra[key] = tmp_extra
 
@@ -963,7 +1161,7 @@ class QtiModel(ReconstModel):
                     robust,
                 )
 
-            if self.fit_method_name == "SDPdc":
+            if self.fit_method_name == "SDPdc" and self.solver == "cvxpy":
                 params_in_mask, extra = self.fit_method(
                     X, data_masked, self.cvxpy_solver, weights=w, return_leverages=True
                 )
@@ -973,7 +1171,10 @@ class QtiModel(ReconstModel):
                 )
             leverages = extra["leverages"]
 
-        extra = {"robust": robust}
+        # Keep the diagnostics of the last fit, such as the convergence of
+        # the batched SDPdc solver
+        extra.pop("leverages")
+        extra["robust"] = robust
         return params_in_mask, extra
 
     def predict(self, params):
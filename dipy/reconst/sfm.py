@@ -342,6 +342,7 @@ class SparseFascicleModel(ReconstModel, Cache):
         alpha=0.001,
         isotropic=None,
         seed=42,
+        batched=False,
     ):
         """
         Initialize a Sparse Fascicle Model
@@ -389,6 +390,12 @@ class SparseFascicleModel(ReconstModel, Cache):
         seed : int, optional
             Seed for the random number generator.
 
+        batched : bool, optional
+            Whether to fit all the voxels at once with
+            :func:`dipy.core.optimize.elastic_net_batched`, instead of calling
+            `solver` for each voxel. Only available for the 'ElasticNet' and
+            'NNLS' solvers, and does not require scikit-learn.
+
         Notes
         -----
         This is an implementation of the SFM, described in
@@ -408,7 +415,17 @@ class SparseFascicleModel(ReconstModel, Cache):
             isotropic = IsotropicModel
 
         self.isotropic = isotropic
-        if solver == "ElasticNet":
+        self.batched = batched
+        self.l1_ratio = l1_ratio
+        self.alpha = alpha
+        if batched:
+            batched_solvers = ("ElasticNet", "NNLS", "nnls")
+            if not isinstance(solver, str) or solver not in batched_solvers:
+                e_s = "The batched fit is only available for the 'ElasticNet' "
+                e_s += "and 'NNLS' solvers"
+                raise ValueError(e_s)
+            self.solver = solver
+        elif solver == "ElasticNet":
             self.solver = lm.ElasticNet(
                 l1_ratio=l1_ratio,
                 alpha=alpha,
@@ -476,9 +493,78 @@ class SparseFascicleModel(ReconstModel, Cache):
                 return np.zeros(self.design_matrix.shape[-1])
         return coef
 
+    def _fit_batched(
+        self, signal, coords, valid, *, warm_start=False, block_size=10000
+    ):
+        """Fit the model to all the voxels at once.
+
+        Parameters
+        ----------
+        signal : array, shape (N, K)
+            The relative signal of each voxel, minus its isotropic part.
+        coords : array, shape (N, ndim)
+            The coordinates of each voxel.
+        valid : array, shape (N,)
+            The voxels to fit. The parameters of the others are zeros.
+        warm_start : bool, optional
+            See `fit`.
+        block_size : int, optional
+            Number of voxels solved at once.
+
+        Returns
+        -------
+        params : array, shape (N, M)
+            The fitted parameters of each voxel.
+        """
+        if self.solver == "ElasticNet":
+            kwargs = {"alpha": self.alpha, "l1_ratio": self.l1_ratio}
+        else:
+            kwargs = {"alpha": 0, "fit_intercept": False}
+        X = self.design_matrix
+        params = np.zeros((signal.shape[0], X.shape[-1]))
+
+        def solve(idx, beta0=None):
+            # Solve by blocks of voxels to bound the size of the temporaries
+            for start in range(0, idx.size, block_size):
+                block = slice(start, start + block_size)
+                params[idx[block]] = opt.elastic_net_batched(
+                    signal[idx[block]],
+                    X,
+                    positive=True,
+                    beta0=None if beta0 is None else beta0[block],
+                    **kwargs,
+                )
+
+        valid_idx = np.flatnonzero(valid)
+        if not warm_start:
+            solve(valid_idx)
+            return params
+
+        coords = coords[valid]
+        coarse = np.all(coords % 2 == 0, axis=-1)
+        solve(valid_idx[coarse])
+        fine = ~coarse
+        if not np.any(fine):
+            return params
+
+        # The other voxels start from the solution of the voxel at the lower
+        # corner of their 2 x 2 x 2 neighbourhood
+        grid = np.full(coords.max(axis=0) + 1, -1)
+        grid[tuple(coords[coarse].T)] = valid_idx[coarse]
+        neighbour = grid[tuple((coords[fine] - coords[fine] % 2).T)]
+        beta0 = np.where(neighbour[:, None] >= 0, params[neighbour], 0)
+        solve(valid_idx[fine], beta0=beta0)
+        return params
+
     @warning_for_keywords()
     def fit(
-        self, data, *, mask=None, num_processes=1, parallel_backend="multiprocessing"
+        self,
+        data,
+        *,
+        mask=None,
+        num_processes=1,
+        parallel_backend="multiprocessing",
+        warm_start=True,
     ):
         """
         Fit the SparseFascicleModel object to data.
@@ -518,6 +604,11 @@ class SparseFascicleModel(ReconstModel, Cache):
               in a "with nogil" block or an expensive call to a library such
               as NumPy).
 
+        warm_start : bool, optional
+            With the batched fit, first fit the voxels with even coordinates,
+            then start the fit of every other voxel from the solution of a
+            neighbour. Ignored otherwise.
+
         Returns
         -------
         SparseFascicleFit object
@@ -553,7 +644,18 @@ class SparseFascicleModel(ReconstModel, Cache):
         if not num_processes:
             num_processes = determine_num_processes(num_processes)
 
-        if num_processes > 1 and has_joblib:
+        if self.batched:
+            if mask is None:
+                coords = np.argwhere(np.ones(data.shape[:-1], dtype=bool))
+            else:
+                coords = np.argwhere(mask)
+            # In voxels in which S0 is 0, we just want to keep the
+            # parameters at all-zeros, as in `_fit_solver2voxels`:
+            valid = np.all(np.isfinite(flat_S), -1) & np.any(flat_S != 0, -1)
+            flat_params = self._fit_batched(
+                flat_S - isopredict, coords, valid, warm_start=warm_start
+            )
+        elif num_processes > 1 and has_joblib:
             with joblib.Parallel(
                 n_jobs=num_processes, backend=parallel_backend, mmap_mode="r+"
             ) as parallel:
@@ -27,7 +27,7 @@ import scipy.special as sps
 
 from dipy.core.geometry import cart2sphere
 from dipy.core.onetime import auto_attr
-from dipy.reconst.cache import Cache
+from dipy.reconst.cache import Cache, memoize
 from dipy.reconst.odf import OdfFit, OdfModel
 from dipy.testing.decorators import warning_for_keywords
 from dipy.utils.compatibility import check_max_version
@@ -450,6 +450,34 @@ def real_sh_descoteaux_from_index(m_values, l_values, theta, phi, *, legacy=True
     return real_sh
 
 
+_legacy_msgs = {
+    "descoteaux07": descoteaux07_legacy_msg,
+    "tournier07": tournier07_legacy_msg,
+}
+
+
+def _memoized_basis(basis, from_index, params, m_values, l_values, theta, phi, legacy):
+    """Real SH basis sampled at ``theta`` and ``phi``, computed once per process.
+
+    The basis is keyed on ``(basis, *params)`` and on the content of the
+    coordinates. A copy of the cached array is returned, as callers may
+    write to it or store it in writable memoryviews.
+    """
+    computed = []
+
+    def compute():
+        computed.append(True)
+        return from_index(m_values, l_values, theta, phi, legacy=legacy)
+
+    real_sh = memoize(f"real_sh_{basis}", (params, theta, phi), compute)
+    if legacy and not computed:
+        # The basis was cached, so warn as its computation would have
+        warn(_legacy_msgs[basis], category=PendingDeprecationWarning, stacklevel=2)
+    if not real_sh.flags.writeable:
+        real_sh = real_sh.copy()
+    return real_sh
+
+
 @deprecated_params("sh_order", new_name="sh_order_max", since="1.9", until="2.0")
 @warning_for_keywords()
 def real_sh_tournier(sh_order_max, theta, phi, *, full_basis=False, legacy=True):
@@ -505,7 +533,16 @@ def real_sh_tournier(sh_order_max, theta, phi, *, full_basis=False, legacy=True)
     phi = np.reshape(phi, [-1, 1])
     theta = np.reshape(theta, [-1, 1])
 
-    real_sh = real_sh_tournier_from_index(m_values, l_values, theta, phi, legacy=legacy)
+    real_sh = _memoized_basis(
+        "tournier07",
+        real_sh_tournier_from_index,
+        (sh_order_max, full_basis, legacy),
+        m_values,
+        l_values,
+        theta,
+        phi,
+        legacy,
+    )
 
     return real_sh, m_values, l_values
 
@@ -566,7 +603,16 @@ def real_sh_descoteaux(sh_order_max, theta, phi, *, full_basis=False, legacy=Tru
     phi = np.reshape(phi, [-1, 1])
     theta = np.reshape(theta, [-1, 1])
 
-    real_sh = real_sh_descoteaux_from_index(m_value, l_value, theta, phi, legacy=legacy)
+    real_sh = _memoized_basis(
+        "descoteaux07",
+        real_sh_descoteaux_from_index,
+        (sh_order_max, full_basis, legacy),
+        m_value,
+        l_value,
+        theta,
+        phi,
+        legacy,
+    )
 
     return real_sh, m_value, l_value
 
@@ -791,9 +837,17 @@ def smooth_pinv(B, L):
     product.
 
     """
-    L = np.diag(L)
-    inv = np.linalg.pinv(np.concatenate((B, L)))
-    return inv[:, : len(B)]
+
+    def compute():
+        inv = np.linalg.pinv(np.concatenate((B, np.diag(L))))
+        return inv[:, : len(B)]
+
+    B = np.asarray(B)
+    L = np.asarray(L)
+    inv = memoize("smooth_pinv", (B, L), compute)
+    if not inv.flags.writeable:
+        inv = inv.copy()
+    return inv
 
 
 def lazy_index(index):
@@ -1,7 +1,10 @@
-from numpy.testing import assert_, assert_equal
+import pickle
+
+import numpy as np
+from numpy.testing import assert_, assert_array_equal, assert_equal
 
 from dipy.core.sphere import Sphere
-from dipy.reconst.cache import Cache
+from dipy.reconst.cache import Cache, LRUCache, configure_cache, content_digest
 
 
 class DummyModel(Cache):
@@ -9,6 +12,11 @@ class DummyModel(Cache):
         pass
 
 
+class ConfiguredModel(Cache):
+    def __init__(self, order):
+        self.order = order
+
+
 def test_basic_cache():
     t = DummyModel()
     s = Sphere(theta=[0], phi=[0])
@@ -22,3 +30,78 @@ def test_basic_cache():
 
     t.cache_clear()
     assert_(t.cache_get("design_matrix", s) is None)
+
+
+def test_content_addressed_keys():
+    t = DummyModel()
+    s1 = Sphere(xyz=np.eye(3))
+    s2 = Sphere(xyz=np.eye(3))
+    s3 = Sphere(xyz=-np.eye(3))
+
+    t.cache_set("design_matrix", (s1, 4), "value")
+    assert_equal(t.cache_get("design_matrix", (s2, 4)), "value")
+    assert_(t.cache_get("design_matrix", (s2, 6)) is None)
+    assert_(t.cache_get("design_matrix", (s3, 4)) is None)
+    assert_(t.cache_get("other_matrix", (s2, 4)) is None)
+
+    assert_(content_digest(s1) == content_digest(s2))
+    assert_(content_digest(s1) != content_digest(s3))
+    assert_(content_digest(np.zeros(2)) != content_digest(np.zeros(2, dtype=int)))
+    assert_(content_digest(lambda x: x) is None)
+
+    # Keys that cannot be hashed are compared by equality
+    def key(x):
+        return x
+
+    t.cache_set("function", key, 1)
+    assert_equal(t.cache_get("function", key), 1)
+
+
+def test_lru_cache():
+    lru = LRUCache(2 * 800)
+    a, b, c = np.zeros(100), np.ones(100), np.full(100, 2.0)
+    lru.set("a", a)
+    lru.set("b", b)
+    assert_equal(lru.nbytes, 1600)
+    # Touching "a" makes "b" the least recently used value
+    assert_(lru.get("a") is a)
+    lru.set("c", c)
+    assert_equal(len(lru), 2)
+    assert_("b" not in lru)
+    assert_(lru.get("a") is a)
+    assert_(lru.get("c") is c)
+    # Values larger than the cache are not stored
+    lru.set("d", np.zeros(1000))
+    assert_("d" not in lru)
+    assert_equal(lru.nbytes, 1600)
+
+    restored = pickle.loads(pickle.dumps(lru))
+    assert_array_equal(restored.get("c"), c)
+    restored.set("e", a)
+    lru.clear()
+    assert_equal(len(lru), 0)
+    assert_equal(lru.nbytes, 0)
+
+
+def test_shared_caches(tmp_path):
+    s1 = Sphere(xyz=np.eye(3))
+    s2 = Sphere(xyz=np.eye(3))
+    try:
+        configure_cache(shared_max_bytes=2**20)
+        ConfiguredModel(4).cache_set("matrix", s1, np.arange(3))
+        assert_array_equal(ConfiguredModel(4).cache_get("matrix", s2), np.arange(3))
+        # Instances with other configurations do not share entries
+        assert_(ConfiguredModel(6).cache_get("matrix", s2) is None)
+
+        configure_cache(directory=tmp_path)
+        ConfiguredModel(4).cache_set("matrix", s1, np.arange(4))
+        assert_equal(len(list(tmp_path.glob("*.pkl"))), 1)
+        model = ConfiguredModel(4)
+        assert_array_equal(model.cache_get("matrix", s2), np.arange(4))
+
+        # Instances with a cache still pickle
+        model = pickle.loads(pickle.dumps(model))
+        assert_array_equal(model.cache_get("matrix", s1), np.arange(4))
+    finally:
+        configure_cache()
+    assert_(ConfiguredModel(4).cache_get("matrix", s1) is None)
@@ -5,6 +5,8 @@ import warnings
 
 import numpy as np
 from numpy.testing import (
+    assert_,
+    assert_allclose,
     assert_almost_equal,
     assert_array_almost_equal,
     assert_array_equal,
@@ -40,6 +42,7 @@ from dipy.reconst.weights_method import (
 )
 from dipy.sims.voxel import multi_tensor_dki
 from dipy.testing import check_for_warnings
+from dipy.testing.decorators import set_random_number_generator
 from dipy.utils.optpkg import optional_package
 from dipy.utils.tripwire import TripWireError
 
@@ -431,6 +434,92 @@ def test_dki_fits():
         assert_raises(ValueError, dki_M.fit, YN)
 
 
+@set_random_number_generator(1234)
+def test_dki_cls_batched(rng):
+    for fit_method in ["CLS", "CWLS"]:
+        dkiM = dki.DiffusionKurtosisModel(
+            gtab_2s, fit_method=fit_method, solver="batched"
+        )
+        # The constraints are not active for noise free data
+        dkiF = dkiM.fit(signal_cross)
+        assert_array_almost_equal(dkiF.model_params, crossing_ref)
+        mask = np.ones(DWI.shape[:-1], dtype=bool)
+        mask[1, 1] = False
+        expected = multi_params.copy()
+        expected[1, 1] = 0
+        dkiF = dkiM.fit(DWI, mask=mask)
+        assert_array_almost_equal(dkiF.model_params, expected)
+
+        # The apparent kurtosis of the constrained fits of noisy data is
+        # non-negative
+        noisy = signal_cross + rng.normal(0, 5, (10,) + signal_cross.shape)
+        noisy = np.abs(noisy)
+        params = dkiM.fit(noisy).model_params
+        akc = dki.apparent_kurtosis_coef(params, default_sphere, min_kurtosis=-3)
+        assert_(np.all(akc > -1e-4))
+
+    # The solutions of noisy data are those of CVXPY, up to the (lower)
+    # accuracy of SCS. The constraints are rescaled to unit diagonal at the OLS
+    # solution for the CVXPY reference, as the kurtosis elements are orders of
+    # magnitude smaller than the diffusion elements, which would otherwise
+    # leave the constraints violated by much more than their own scale.
+    if have_cvxpy:
+        A = dkiM.design_matrix
+        y = np.log(noisy[1:3])
+        F = dkiM.sdp_matrices
+        result, _ = dki.cls_fit_dki_batched(
+            A,
+            noisy[1:3],
+            dkiM.inverse_design_matrix,
+            F,
+            weights=False,
+            return_lower_triangular=True,
+        )
+        n_vars = F.shape[0] - 1
+        for y_voxel, x_batched in zip(y, result):
+            x_ols = np.linalg.lstsq(A, y_voxel, rcond=None)[0]
+            x_ols = np.concatenate([x_ols, np.zeros(n_vars - A.shape[1])])
+            M_ols = F[0] + np.tensordot(x_ols, F[1:], axes=1)
+            d = 1 / np.sqrt(np.abs(np.diag(M_ols)))
+            F_scaled = F * d[:, None] * d[None]
+            x = cvxpy.Variable(n_vars)
+            M = F_scaled[0] + sum(x[i] * F_scaled[i + 1] for i in range(n_vars))
+            objective = cvxpy.sum_squares(A @ x[: A.shape[1]] - y_voxel)
+            prob = cvxpy.Problem(cvxpy.Minimize(objective), [(M + M.T) / 2 >> 0])
+            prob.solve(solver=cvxpy.SCS, eps_abs=1e-10, eps_rel=1e-10, max_iters=500000)
+            x_cvxpy = x.value[: A.shape[1]]
+            assert_allclose(
+                np.sum((A @ x_batched - y_voxel) ** 2),
+                np.sum((A @ x_cvxpy - y_voxel) ** 2),
+                rtol=1e-5,
+            )
+            assert_array_almost_equal(x_batched[6:21], x_cvxpy[6:21], decimal=9)
+            assert_array_almost_equal(
+                dki.mean_kurtosis(dki.params_to_dki_params(x_batched)),
+                dki.mean_kurtosis(dki.params_to_dki_params(x_cvxpy)),
+                decimal=4,
+            )
+
+    assert_raises(
+        ValueError,
+        dki.DiffusionKurtosisModel,
+        gtab_2s,
+        fit_method="CLS",
+        solver="scs",
+    )
+
+    # Other fit methods keep their own solver keyword argument
+    assert_raises(
+        ValueError,
+        dki.DiffusionKurtosisModel,
+        gtab_2s,
+        fit_method="NLS",
+        solver="batched",
+    )
+    dkiM = dki.DiffusionKurtosisModel(gtab_2s, fit_method="NLS", solver="leastsq")
+    assert_array_almost_equal(dkiM.fit(signal_cross).model_params, crossing_ref)
+
+
 def test_apparent_kurtosis_coef():
     """Apparent kurtosis coefficients are tested for a spherical kurtosis
     tensor"""
@@ -1,6 +1,7 @@
 """Testing DTI."""
 
 import random
+import warnings
 
 import numpy as np
 import numpy.testing as npt
@@ -926,6 +927,56 @@ def test_restore():
     tmf = assert_warns(UserWarning, tensor_model.fit, Y.copy())
     npt.assert_equal(tmf[0].S0_hat, np.nan)
 
+    # Same with the vectorized solver, with fewer data points than parameters
+    gtab_less = grad.gradient_table(gtab.bvals[:6], bvecs=gtab.bvecs[:6])
+    for fail_is_nan in [False, True]:
+        tensor_model = dti.TensorModel(
+            gtab_less,
+            fit_method="restore",
+            sigma=67.0,
+            return_S0_hat=True,
+            fail_is_nan=fail_is_nan,
+            solver="lm",
+        )
+        tmf = assert_warns(UserWarning, tensor_model.fit, Y[:, :6].copy())
+        npt.assert_equal(np.isnan(tmf[0].S0_hat), fail_is_nan)
+
+
+@set_random_number_generator(1234)
+def test_nlls_solvers(rng=None):
+    """
+    Test that the vectorized NLLS solver matches scipy's leastsq
+    """
+    data, bvals, bvecs = get_fnames(name="small_25")
+    gtab = grad.gradient_table(bvals, bvecs=bvecs)
+    dd = load_nifti_data(data)[..., :2, :].astype(float)
+    X = dti.design_matrix(gtab)
+
+    for fit_func in [dti.nlls_fit_tensor, dti.restore_fit_tensor]:
+        kwargs = {"sigma": 20.0} if fit_func is dti.restore_fit_tensor else {}
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            [p_lm, S0_lm], _ = fit_func(
+                X, dd, return_S0_hat=True, solver="lm", **kwargs
+            )
+            [p_lsq, S0_lsq], _ = fit_func(
+                X, dd, return_S0_hat=True, solver="leastsq", **kwargs
+            )
+        npt.assert_array_almost_equal(p_lm[..., :3], p_lsq[..., :3], decimal=6)
+        npt.assert_allclose(S0_lm, S0_lsq, rtol=1e-4)
+
+    # Weighted fits
+    weights = rng.uniform(0.5, 2, size=dd.shape)
+    lo_lm, _ = dti.nlls_fit_tensor(
+        X, dd, weights=weights, return_lower_triangular=True, solver="lm"
+    )
+    lo_lsq, _ = dti.nlls_fit_tensor(
+        X, dd, weights=weights, return_lower_triangular=True, solver="leastsq"
+    )
+    npt.assert_array_almost_equal(lo_lm[:, :6], lo_lsq[:, :6], decimal=6)
+
+    npt.assert_raises(ValueError, dti.nlls_fit_tensor, X, dd, solver="bad")
+
 
 def test_adc():
     """
@@ -367,3 +367,48 @@ def test_negative_s0():
     assert_array_almost_equal(fwefit.fa, FAref)
     assert_array_almost_equal(fwefit.md, MDref)
     assert_array_almost_equal(fwefit.f, GTF)
+
+
+def test_fwdti_batched():
+    rng = np.random.default_rng(1234)
+    noisy = DWI.copy()
+    noisy[0] += rng.normal(0, 1, DWI[0].shape)
+    for fit_method, kwargs in [
+        ("WLS", {}),
+        ("WLS", {"piterations": 5}),
+        ("NLS", {}),
+        ("NLS", {"cholesky": True}),
+        ("NLS", {"f_transform": False}),
+        ("NLS", {"weighting": "sigma", "sigma": 4}),
+    ]:
+        for data in (DWI, noisy):
+            fwdm = fwdti.FreeWaterTensorModel(gtab_2s, fit_method=fit_method, **kwargs)
+            fwdm_batched = fwdti.FreeWaterTensorModel(
+                gtab_2s, fit_method=fit_method, solver="batched", **kwargs
+            )
+            fwefit = fwdm.fit(data)
+            fwefit_batched = fwdm_batched.fit(data)
+            assert_array_almost_equal(fwefit_batched.f, fwefit.f, decimal=4)
+            assert_array_almost_equal(fwefit_batched.fa, fwefit.fa, decimal=4)
+            assert_array_almost_equal(fwefit_batched.md, fwefit.md, decimal=6)
+
+    # Single voxel
+    fwdm_batched = fwdti.FreeWaterTensorModel(gtab_2s, solver="batched")
+    fwefit = fwdm_batched.fit(DWI[0, 0, 0])
+    assert_almost_equal(fwefit.f, GTF[0, 0, 0])
+
+    assert_raises(ValueError, fwdti.FreeWaterTensorModel, gtab_2s, solver="unknown")
+    assert_raises(
+        ValueError,
+        fwdti.FreeWaterTensorModel,
+        gtab_2s,
+        fit_method=lambda *args, **kwargs: np.zeros(13),
+        solver="batched",
+    )
+    assert_raises(
+        ValueError,
+        fwdti.FreeWaterTensorModel,
+        gtab_2s,
+        solver="batched",
+        weighting="gmm",
+    )
@@ -24,7 +24,12 @@ from numpy.testing import (
 import pytest
 
 from dipy.core.gradients import generate_bvecs, gradient_table
-from dipy.reconst.ivim import IvimModel, differential_evolution, ivim_prediction
+from dipy.reconst.ivim import (
+    IvimModel,
+    differential_evolution,
+    ivim_dictionary,
+    ivim_prediction,
+)
 from dipy.sims.voxel import multi_tensor
 from dipy.testing import assert_greater_equal
 from dipy.utils.optpkg import optional_package
@@ -643,6 +648,96 @@ def test_leastsq_error():
     assert_array_almost_equal(fit, [-1, -1, -1, -1])
 
 
+def test_fit_batched():
+    """
+    Test that the batched solver gives the same results as fitting each
+    voxel with `least_squares`.
+    """
+    msg = "Bounds for this fit have been set from experiments .*"
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message=msg, category=UserWarning)
+        model = IvimModel(gtab, fit_method="trr", solver="batched")
+        model_one_stage = IvimModel(
+            gtab, fit_method="trr", solver="batched", two_stage=False
+        )
+        assert_raises(ValueError, IvimModel, gtab, fit_method="trr", solver="x")
+
+    fit = model.fit(data_single)
+    assert_array_almost_equal(fit.model_params, params_trr)
+    fit = model.fit(data_multi)
+    assert_array_equal(fit.shape, (2, 2, 1))
+    assert_array_almost_equal(fit.model_params, ivim_params_trr)
+
+    fit = model_one_stage.fit(data_single)
+    linear_fit_params = [9.88834140e02, 1.19707191e-01, 7.91176970e-03, 9.30095210e-04]
+    assert_array_almost_equal(fit.model_params, linear_fit_params)
+
+    # Noisy signals, including one for which the non-linear fit fails
+    rng = np.random.default_rng(1234)
+    noisy = data_single + rng.normal(scale=10, size=(5, len(data_single)))
+    noisy = np.concatenate([noisy, noisy_single[None]])
+    with warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter("always", category=UserWarning)
+        fit = model.fit(noisy)
+        ref = ivim_model_trr.fit(noisy)
+    message = [
+        "x0 obtained from linear fitting is not feasible",
+        "x0 is unfeasible",
+        "Bounds are violated for leastsq fitting in 1 voxel(s)",
+    ]
+    for m in message:
+        assert_(any(m in str(lw.message) for lw in w))
+    rel_diff = np.abs(fit.model_params - ref.model_params) / np.abs(ref.model_params)
+    assert_array_less(rel_diff, 1e-5)
+
+
+def test_fit_dictionary():
+    """
+    Test the initialization of the fit from a dictionary of IVIM signals.
+    """
+    dictionary = ivim_dictionary(gtab, f=[0.1, f], D_star=[D_star], D=[D, 0.002])
+    assert_array_equal(dictionary[0].shape, (4, 3))
+    assert_array_equal(dictionary[1].shape, (4, len(gtab.bvals)))
+    assert_array_almost_equal(dictionary[1][2], data_single / S0)
+
+    msg = "Bounds for this fit have been set from experiments .*"
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message=msg, category=UserWarning)
+        for solver in ["least_squares", "batched"]:
+            model = IvimModel(
+                gtab, solver=solver, dictionary=dictionary, two_stage=False
+            )
+            assert_array_almost_equal(model.fit(data_single).model_params, params_trr)
+
+    # The default dictionary is a good starting point for the non-linear fit
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message=msg, category=UserWarning)
+        model = IvimModel(gtab, solver="batched", dictionary=ivim_dictionary(gtab))
+    assert_array_almost_equal(model.fit(data_multi).model_params, ivim_params_trr)
+
+
+def test_fit_vp_batched():
+    """
+    Test the batched solver of the VarPro model, which does not need cvxpy.
+    """
+    msg = "Bounds for this fit have been set from experiments .*"
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message=msg, category=UserWarning)
+        model = IvimModel(gtab, fit_method="VarPro", solver="batched")
+        assert_raises(ValueError, IvimModel, gtab, fit_method="VarPro", solver="x")
+
+    fit = model.fit(data_single)
+    assert_array_almost_equal(fit.perfusion_fraction, f_VP, decimal=2)
+    assert_array_almost_equal(fit.D_star, D_star_VP, decimal=4)
+    assert_array_almost_equal(fit.D, D_VP, decimal=4)
+    assert_array_almost_equal(fit.S0_predicted, S0)
+
+    fit = model.fit(data_multi)
+    assert_array_equal(fit.shape, (2, 2, 1))
+    assert_array_almost_equal(fit.model_params, ivim_params_trr)
+    assert_array_almost_equal(fit.predict(gtab), data_multi)
+
+
 @needs_cvxpy
 def test_perfusion_fraction_vp():
     """
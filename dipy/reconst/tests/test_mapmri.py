@@ -1095,6 +1095,111 @@ def test_laplacian_regularization(radial_order=6, rng=None):
     assert_equal(laplacian_norm_laplacian < laplacian_norm_unreg, True)
 
 
+@set_random_number_generator(1234)
+def test_mapmri_batched(radial_order=6, rng=None):
+    gtab = get_gtab_taiwan_dsi()
+    l1, l2, l3 = [0.0015, 0.0003, 0.0003]
+    S, _ = generate_signal_crossing(gtab, l1, l2, l3, angle2=60)
+    data = np.array([add_noise(S, snr=20, S0=100.0, rng=rng) for _ in range(4)])
+
+    # the batched matrices match the ones of each voxel
+    mu = rng.uniform(0.005, 0.02, (4, 3))
+    q = rng.standard_normal((4, 10, 3)) * 30
+    ind_mat = mapmri_index_matrix(radial_order)
+    S_mat, T_mat, U_mat = mapmri.mapmri_STU_reg_matrices(radial_order)
+    M = mapmri.mapmri_phi_matrix(radial_order, mu, q)
+    K = mapmri.mapmri_psi_matrix(radial_order, mu, q * 1e-3)
+    LR = mapmri.mapmri_laplacian_reg_matrix(ind_mat, mu, S_mat, T_mat, U_mat)
+    for i in range(4):
+        assert_array_almost_equal(
+            M[i], mapmri.mapmri_phi_matrix(radial_order, mu[i], q[i])
+        )
+        assert_array_almost_equal(
+            K[i], mapmri.mapmri_psi_matrix(radial_order, mu[i], q[i] * 1e-3)
+        )
+        assert_array_almost_equal(
+            LR[i],
+            mapmri.mapmri_laplacian_reg_matrix(ind_mat, mu[i], S_mat, T_mat, U_mat),
+        )
+        assert_almost_equal(
+            mapmri.isotropic_scale_factor(mu**2)[i],
+            mapmri.isotropic_scale_factor(mu[i] ** 2),
+        )
+
+    # without quantization of the scale factors the batched solver matches
+    # the voxelwise one
+    for anisotropic_scaling in [True, False]:
+        for weighting in [0.05, np.linspace(0, 0.3, 31), "GCV"]:
+            kwargs = {
+                "radial_order": radial_order,
+                "laplacian_weighting": weighting,
+                "anisotropic_scaling": anisotropic_scaling,
+            }
+            with warnings.catch_warnings():
+                warnings.filterwarnings(
+                    "ignore",
+                    message=descoteaux07_legacy_msg,
+                    category=PendingDeprecationWarning,
+                )
+                fit = MapmriModel(gtab, **kwargs).fit(data)
+                fit_batched = MapmriModel(
+                    gtab, solver="batched", mu_resolution=0, **kwargs
+                ).fit(data)
+            for i in range(len(data)):
+                assert_array_almost_equal(fit_batched[i].mu, fit[i].mu)
+                assert_almost_equal(fit_batched[i].lopt, fit[i].lopt, 2)
+                if not isinstance(weighting, str):
+                    assert_array_almost_equal(
+                        fit_batched[i].mapmri_coeff, fit[i].mapmri_coeff
+                    )
+
+    # quantized scale factors stay close to the ones of the tensor
+    fit = MapmriModel(gtab, radial_order=radial_order).fit(data)
+    fit_batched = MapmriModel(
+        gtab, radial_order=radial_order, solver="batched", mu_resolution=0.02
+    ).fit(data)
+    for i in range(len(data)):
+        assert_(np.all(np.abs(np.log(fit_batched[i].mu / fit[i].mu)) <= 0.0101))
+        assert_array_almost_equal(
+            fit_batched[i].fitted_signal(), fit[i].fitted_signal(), 2
+        )
+
+    # the positivity constraint does not need CVXPY
+    gridsize = 20
+    r_grad = mapmri.create_rspace(gridsize, 15e-3)
+    mapmod = MapmriModel(
+        gtab,
+        radial_order=radial_order,
+        laplacian_regularization=False,
+        solver="batched",
+    )
+    pdf = mapmod.fit(data).pdf(r_grad)
+    mapmod_constraint = MapmriModel(
+        gtab,
+        radial_order=radial_order,
+        laplacian_regularization=False,
+        positivity_constraint=True,
+        pos_grid=gridsize,
+        pos_radius="adaptive",
+        solver="batched",
+    )
+    mapfit_constraint = mapmod_constraint.fit(data)
+    pdf_constraint = mapfit_constraint.pdf(r_grad)
+    assert_equal(mapfit_constraint.errorcode, 0)
+    ratio = pdf_constraint[pdf_constraint < 0].sum() / pdf[pdf < 0].sum()
+    assert_(ratio < 0.1)
+
+    assert_raises(ValueError, MapmriModel, gtab, solver="cvxpy")
+    assert_raises(
+        ValueError,
+        MapmriModel,
+        gtab,
+        positivity_constraint=True,
+        global_constraints=True,
+        solver="batched",
+    )
+
+
 def test_mapmri_odf(radial_order=6):
     gtab = get_gtab_taiwan_dsi()
 
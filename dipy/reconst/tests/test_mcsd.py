@@ -3,6 +3,7 @@ import warnings
 import numpy as np
 import numpy.testing as npt
 import pytest
+from scipy.optimize import nnls
 
 from dipy.core.gradients import GradientTable
 from dipy.data import default_sphere, get_3shell_gtab
@@ -255,6 +256,98 @@ def test_MSDeconvFit():
     npt.assert_array_almost_equal(fit.volume_fractions, vf, 1)
 
 
+def test_MultiShellDeconvModel_batched():
+    gtab = get_3shell_gtab()
+
+    mevals = np.array([wm_response[0, :3], wm_response[0, :3]])
+    angles = [(0, 0), (60, 0)]
+
+    S_wm, _ = multi_tensor(
+        gtab,
+        mevals,
+        S0=wm_response[0, 3],
+        angles=angles,
+        fractions=[30.0, 70.0],
+        snr=None,
+    )
+    S_gm = gm_response[0, 3] * np.exp(-gtab.bvals * gm_response[0, 0])
+    S_csf = csf_response[0, 3] * np.exp(-gtab.bvals * csf_response[0, 0])
+
+    sh_order_max = 8
+    with warnings.catch_warnings():
+        warnings.filterwarnings(
+            "ignore",
+            message=shm.descoteaux07_legacy_msg,
+            category=PendingDeprecationWarning,
+        )
+        response = multi_shell_fiber_response(
+            sh_order_max, [0, 1000, 2000, 3500], wm_response, gm_response, csf_response
+        )
+        model = MultiShellDeconvModel(gtab, response, solver="batched")
+        npt.assert_raises(
+            ValueError, MultiShellDeconvModel, gtab, response, solver="unknown"
+        )
+    vf = [0.325, 0.2, 0.475]
+    signal = sum(i * j for i, j in zip(vf, [S_csf, S_gm, S_wm]))
+
+    fit = model.fit(signal)
+    npt.assert_array_almost_equal(fit.volume_fractions, vf, 1)
+    npt.assert_array_almost_equal(fit.predict(), signal, 0)
+
+    # The solution satisfies the KKT conditions of the QP: it is feasible,
+    # the gradient of the objective is a non-negative combination of the
+    # constraints, and the multipliers of the inactive constraints vanish
+    X, reg = model._X, model.fitter._reg
+    coeff = fit.all_shm_coeff
+    constraints = np.dot(reg, coeff)
+    grad = np.dot(X.T, np.dot(X, coeff) - signal)
+    multipliers, residual = nnls(reg.T, grad)
+    grad_scale = np.abs(np.dot(X.T, signal)).max()
+    npt.assert_array_less(-1e-6 * np.abs(coeff).max(), constraints)
+    npt.assert_array_less(residual, 1e-6 * grad_scale)
+    npt.assert_array_less(np.dot(multipliers, constraints), 1e-6 * grad_scale)
+
+    # A volume gives the same result in each voxel
+    data = np.tile(signal, (2, 3, 1, 1))
+    mask = np.ones(data.shape[:-1], dtype=bool)
+    mask[0, 0] = False
+    fit_vol = model.fit(data, mask=mask)
+    npt.assert_equal(fit_vol.shape, data.shape[:-1])
+    npt.assert_array_almost_equal(fit_vol.all_shm_coeff[1, 2, 0], fit.all_shm_coeff)
+    npt.assert_array_equal(fit_vol.all_shm_coeff[0, 0], 0)
+
+    if have_cvxpy:
+        with warnings.catch_warnings():
+            warnings.filterwarnings(
+                "ignore",
+                message=shm.descoteaux07_legacy_msg,
+                category=PendingDeprecationWarning,
+            )
+            model_cvx = MultiShellDeconvModel(gtab, response)
+        fit_cvx = model_cvx.fit(data[1])
+
+        # The objective is at least as low as that of the CVXPY solution
+        def objective(coeff):
+            return 0.5 * np.sum((np.dot(coeff, X.T) - data[1]) ** 2, axis=-1)
+
+        npt.assert_array_less(
+            objective(fit_vol.all_shm_coeff[1]),
+            objective(fit_cvx.all_shm_coeff) + 1e-8 * np.sum(signal**2),
+        )
+
+    # Voxels for which the solver does not converge are reported, and fitted
+    # again with CVXPY when it is available
+    model.fitter._tol = 0
+    with pytest.warns(UserWarning, match="did not converge in 5 voxel"):
+        fit_fail = model.fit(data, mask=mask)
+    if have_cvxpy:
+        npt.assert_array_almost_equal(
+            fit_fail.all_shm_coeff[1], fit_cvx.all_shm_coeff, decimal=3
+        )
+    else:
+        npt.assert_(np.all(np.isnan(fit_fail.all_shm_coeff[1])))
+
+
 def test_multi_shell_fiber_response():
     sh_order_max = 8
     with warnings.catch_warnings():
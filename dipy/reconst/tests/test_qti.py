@@ -464,6 +464,69 @@ def test_ls_sdp_fits(rng):
             npt.assert_equal(qtimodel_rc.extra["robust"][..., -1], False)
 
 
+@set_random_number_generator(123)
+def test_sdpdc_admm_fit(rng):
+    """Test the batched SDPdc fit against the ground-truth values."""
+    gtab = _qti_gtab(rng)
+    X = qti.design_matrix(gtab.btens)
+    DTDs = [
+        _anisotropic_DTD(),
+        _isotropic_DTD(),
+        np.concatenate((_anisotropic_DTD(), _isotropic_DTD())),
+    ]
+    data, params = [], []
+    for DTD in DTDs:
+        D = np.mean(DTD, axis=0)
+        C = qti.dtd_covariance(DTD)
+        params.append(
+            np.concatenate(
+                (
+                    np.log(1)[np.newaxis, np.newaxis],
+                    qti.from_3x3_to_6x1(D),
+                    qti.from_6x6_to_21x1(C),
+                )
+            )[:, 0]
+        )
+        data.append(qti.qti_signal(gtab, D, C))
+    data, params = np.array(data), np.array(params)
+
+    par, extra = qti._sdpdc_admm_fit(X, data)
+    npt.assert_almost_equal(par, params, decimal=1)
+    npt.assert_equal(extra["converged"], True)
+    npt.assert_equal(np.all(extra["n_iter"] > 0), True)
+    npt.assert_equal("leverages" in extra, False)
+    if have_cvxpy:
+        ref = qti._sdpdc_fit(X, data, cvxpy_solver="SCS")[0]
+        npt.assert_allclose(par, ref, atol=1e-4 * np.abs(ref).max())
+
+    # The fitted tensors of noisy data are positive semidefinite
+    noisy = data[:, None] * (1 + 0.05 * rng.standard_normal((1, 20, len(X))))
+    par, extra = qti._sdpdc_admm_fit(
+        X, noisy.reshape((-1, len(X))), return_leverages=True
+    )
+    npt.assert_almost_equal(extra["leverages"].sum(-1), 28)
+    D = qti.from_6x1_to_3x3(par[:, 1:7, None])
+    C = qti.from_21x1_to_6x6(par[:, 7:, None])
+    npt.assert_equal(np.all(np.linalg.eigvalsh(D) > -1e-10), True)
+    npt.assert_equal(np.all(np.linalg.eigvalsh(C) > -1e-10), True)
+    if have_cvxpy:
+        ref = qti._sdpdc_fit(X, noisy.reshape((-1, len(X))), cvxpy_solver="SCS")[0]
+        npt.assert_allclose(par, ref, atol=1e-3 * np.abs(ref).max())
+
+    # Model interface, with the diagnostics in the extra attribute
+    qtimodel = qti.QtiModel(gtab, fit_method="SDPdc", solver="batched")
+    qtifit = qtimodel.fit(data)
+    npt.assert_almost_equal(qtifit.params, params, decimal=1)
+    npt.assert_equal(qtimodel.extra["converged"].dtype, bool)
+    npt.assert_equal(qtimodel.extra["n_iter"].shape, (3,))
+    kwargs = {"weights_method": weights_method_wls_m_est}
+    qtimodel_rc = qti.QtiModel(gtab, fit_method="SDPdc", solver="batched", **kwargs)
+    qtimodel_rc.fit(noisy)
+    npt.assert_equal(qtimodel_rc.extra["robust"].shape, noisy.shape)
+    npt.assert_equal(qtimodel_rc.extra["converged"].shape, noisy.shape[:-1])
+    npt.assert_raises(ValueError, qti.QtiModel, gtab, solver="admm")
+
+
 @set_random_number_generator(123)
 def test_qti_model(rng):
     """Test the QTI model class."""
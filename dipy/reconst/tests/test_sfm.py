@@ -173,6 +173,42 @@ def test_sfm_stick():
     npt.assert_(xval.coeff_of_determination(pred, S) > 96)
 
 
+def test_sfm_batched():
+    fdata, fbvals, fbvecs = dpd.get_fnames()
+    data = load_nifti_data(fdata)[:3, :3, :3]
+    gtab = grad.gradient_table(fbvals, bvecs=fbvecs)
+    solvers = ["NNLS", "ElasticNet"] if has_sklearn else ["NNLS"]
+    for solver in solvers:
+        sfmodel = sfm.SparseFascicleModel(gtab, solver=solver)
+        pred = sfmodel.fit(data).predict(gtab=gtab)
+        sfmodel_batched = sfm.SparseFascicleModel(gtab, solver=solver, batched=True)
+        for warm_start in [True, False]:
+            sffit = sfmodel_batched.fit(data, warm_start=warm_start)
+            npt.assert_allclose(sffit.predict(gtab=gtab), pred, rtol=0.02)
+
+    # Fit zeros and you will get back zeros
+    sfmodel = sfm.SparseFascicleModel(gtab, solver="NNLS", batched=True)
+    npt.assert_equal(sfmodel.fit(np.zeros(data[0, 0, 0].shape)).beta, 0)
+
+    # Also in voxels with no signal among others, as in the voxelwise fit
+    data = data.astype(float)
+    data[0, 0, 0] = 0
+    for isotropic in [sfm.ExponentialIsotropicModel, sfm.IsotropicModel]:
+        kwargs = {"solver": "NNLS", "isotropic": isotropic}
+        beta = sfm.SparseFascicleModel(gtab, batched=True, **kwargs).fit(data).beta
+        npt.assert_equal(beta[0, 0, 0], 0)
+        beta_voxelwise = sfm.SparseFascicleModel(gtab, **kwargs).fit(data).beta
+        npt.assert_equal(beta_voxelwise[0, 0, 0], 0)
+
+    npt.assert_raises(
+        ValueError,
+        sfm.SparseFascicleModel,
+        gtab,
+        solver=opt.NonNegativeLeastSquares(),
+        batched=True,
+    )
+
+
 @needs_sklearn
 def test_sfm_sklearnlinearsolver():
     class SillySolver(opt.SKLearnLinearSolver):
@@ -412,6 +412,41 @@ def test_smooth_pinv():
     assert_array_almost_equal(C, D)
 
 
+def test_memoized_basis():
+    sphere = Sphere(xyz=hemi_icosahedron.vertices)
+    copy = Sphere(xyz=hemi_icosahedron.vertices.copy())
+
+    B1, _, _ = real_sh_descoteaux(4, sphere.theta, sphere.phi, legacy=False)
+    B2, _, _ = real_sh_descoteaux(4, copy.theta, copy.phi, legacy=False)
+    # Callers get writable copies of the cached basis
+    npt.assert_array_equal(B1, B2)
+    npt.assert_(B1.flags.writeable and not np.shares_memory(B1, B2))
+    B1[0] = 0
+    B6, _, _ = real_sh_descoteaux(4, sphere.theta, sphere.phi, legacy=False)
+    npt.assert_array_equal(B6, B2)
+
+    # The parameters of the basis are part of the key
+    B3, _, _ = real_sh_descoteaux(6, sphere.theta, sphere.phi, legacy=False)
+    B4, _, _ = real_sh_tournier(4, sphere.theta, sphere.phi, legacy=False)
+    B5, _, _ = real_sh_descoteaux(
+        4, sphere.theta, sphere.phi, legacy=False, full_basis=True
+    )
+    npt.assert_equal(B3.shape[1], 28)
+    npt.assert_(B4 is not B1 and B5.shape[1] == 25)
+
+    # Cached legacy bases still warn
+    for _ in range(2):
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            real_sh_descoteaux(4, sphere.theta, sphere.phi)
+        npt.assert_equal(len(w), 1)
+        npt.assert_(issubclass(w[0].category, PendingDeprecationWarning))
+
+    B, invB = sh_to_sf_matrix(sphere, basis_type="descoteaux07", legacy=False)
+    npt.assert_array_equal(B, B2.T)
+    npt.assert_(B.flags.writeable and invB.flags.writeable)
+
+
 def test_normalize_data():
     sig = np.arange(1, 66)[::-1]
 
@@ -1,7 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
 from warnings import warn
 
 import numpy as np
-from scipy.ndimage import binary_dilation, generate_binary_structure, median_filter
+from scipy.ndimage import (
+    binary_dilation,
+    generate_binary_structure,
+    median_filter,
+    uniform_filter,
+)
 
 try:
     from skimage.filters import threshold_otsu as otsu
@@ -12,9 +18,70 @@ from dipy.reconst.dti import color_fa, fractional_anisotropy
 from dipy.segment.utils import remove_holes_and_islands
 from dipy.testing.decorators import warning_for_keywords
 from dipy.utils.deprecator import deprecated_params
+from dipy.utils.omp import determine_num_threads
 
 
-def multi_median(data, median_radius, numpass):
+def _histogram_median(levels, width):
+    """Median filter of an array of integer levels by counting.
+
+    The median of a window is the smallest level ``v`` such that at least
+    half of the window is ``<= v``. The number of window elements ``<= v`` is
+    a box sum of the indicator of ``levels <= v``, which is separable, so
+    the cost grows with the number of levels rather than with the window
+    size, as in the histogram median filters of Huang and Perreault.
+
+    Parameters
+    ----------
+    levels : ndarray
+        Non-negative integer array.
+    width : int
+        Width of the window along every dimension.
+
+    Returns
+    -------
+    median : ndarray
+        Median filtered `levels`, with the boundaries reflected as in
+        ``scipy.ndimage.median_filter``.
+    """
+    size = width**levels.ndim
+    # A window holds more than size // 2 elements <= its median. The counts
+    # come as window means, accurate to far better than half an element.
+    dtype = np.float32 if size < 2**16 else np.float64
+    threshold = dtype((size // 2 + 0.5) / size)
+    lo, hi = levels.min(), levels.max()
+    median = np.full(levels.shape, lo, dtype=levels.dtype)
+    below = np.empty(levels.shape, dtype=bool)
+    counts = np.empty(levels.shape, dtype=dtype)
+    for v in range(lo, hi):
+        np.less_equal(levels, v, out=below)
+        uniform_filter(below.view(np.uint8), width, output=counts, mode="reflect")
+        median += counts < threshold
+    return median
+
+
+def _median_pass(data, output, width, filter_func, num_threads):
+    """Apply a median filter over slabs of the first axis in threads.
+
+    Each slab is extended by half the window width on both sides, so that
+    the filtered slabs match the filtered volume.
+    """
+    n = data.shape[0]
+    n_slabs = min(num_threads, n)
+    if n_slabs == 1:
+        output[...] = filter_func(data, width)
+        return
+    radius = width // 2
+    bounds = np.linspace(0, n, n_slabs + 1).astype(int)
+
+    def filter_slab(start, stop):
+        lo, hi = max(start - radius, 0), min(stop + radius, n)
+        output[start:stop] = filter_func(data[lo:hi], width)[start - lo : stop - lo]
+
+    with ThreadPoolExecutor(max_workers=n_slabs) as executor:
+        list(executor.map(filter_slab, bounds[:-1], bounds[1:]))
+
+
+def multi_median(data, median_radius, numpass, *, method="auto", num_threads=None):
     """Applies median filter multiple times on input data.
 
     Parameters
@@ -25,28 +92,64 @@ def multi_median(data, median_radius, numpass):
         Radius (in voxels) of the applied median filter
     numpass: int
         Number of pass of the median filter
+    method : {'auto', 'histogram', 'scipy'}, optional
+        'scipy' uses ``scipy.ndimage.median_filter``. 'histogram' maps the
+        values of `data` to their ranks and counts, for each rank, the
+        window elements below it with separable box sums; it is exact and
+        fast when `data` takes few distinct values. 'auto' selects
+        'histogram' for integer data whose range spans at most an eighth as
+        many values as the window has elements, and 'scipy' otherwise.
+    num_threads : int, optional
+        Number of threads used over slabs of the volume. If None (default),
+        the value of the ``OMP_NUM_THREADS`` environment variable is used if
+        it is set, otherwise all available threads are used. If < 0, the
+        maximal number of threads minus ``|num_threads + 1|`` is used (enter
+        -1 to use as many threads as possible). 0 raises an error.
 
     Returns
     -------
     data : ndarray
         Filtered input volume.
     """
-    # Array representing the size of the median window in each dimension.
-    medarr = np.ones_like(data.shape) * ((median_radius * 2) + 1)
+    if method not in ("auto", "histogram", "scipy"):
+        raise ValueError(
+            f"Unknown method '{method}'. Use 'auto', 'histogram' or 'scipy'."
+        )
+    num_threads = determine_num_threads(num_threads)
+    width = (median_radius * 2) + 1
+
+    if method == "auto":
+        method = "scipy"
+        # The range of the values bounds their number, without sorting them
+        if np.issubdtype(data.dtype, np.integer) and data.size:
+            if int(data.max()) - int(data.min()) < width**data.ndim // 8:
+                method = "histogram"
+
+    if method == "histogram":
+        values, ranks = np.unique(data, return_inverse=True)
+        rank_dtype = np.min_scalar_type(values.size - 1)
+        data = ranks.reshape(data.shape).astype(rank_dtype)
+        filter_func = _histogram_median
+    else:
+
+        def filter_func(block, width):
+            return median_filter(block, size=width)
 
-    if numpass > 1:
-        # ensure the input array is not modified
-        data = data.copy()
+        if numpass > 1:
+            # ensure the input array is not modified
+            data = data.copy()
 
     # Multi pass
     output = np.empty_like(data)
     for _ in range(0, numpass):
-        median_filter(data, medarr, output=output)
+        _median_pass(data, output, width, filter_func, num_threads)
         data, output = output, data
+    if method == "histogram":
+        data = values[data]
     return data
 
 
-def applymask(vol, mask):
+def applymask(vol, mask, *, out=None):
     """Mask vol with mask.
 
     Parameters
@@ -60,6 +163,9 @@ def applymask(vol, mask):
         `mask` can be 3D, and we append a 1 to the mask shape which (via numpy
         broadcasting) has the effect of applying the 3D mask to each 3D slice in
         `vol` (``vol[..., 0]`` to ``vol[..., -1``).
+    out : ndarray, optional
+        Array with the shape of `vol` where the result is stored. It may be
+        `vol` itself to mask it in place.
 
     Returns
     -------
@@ -68,16 +174,39 @@ def applymask(vol, mask):
         extra dimensions in `vol`
     """
     mask = mask.reshape(mask.shape + (vol.ndim - mask.ndim) * (1,))
-    return vol * mask
+    return np.multiply(vol, mask, out=out)
 
 
-def bounding_box(vol):
+def _slab_projections(slab):
+    """Nonzero projections of a slab on each of its axes."""
+    nonzero = np.asarray(slab) != 0
+    axes = range(nonzero.ndim)
+    return [nonzero.any(axis=tuple(a for a in axes if a != i)) for i in axes]
+
+
+def bounding_box(vol, *, chunk_size=None, num_threads=None):
     """Compute the bounding box of nonzero intensity voxels in the volume.
 
+    The volume is read in slabs along its first axis, and each slab is reduced
+    to its nonzero projections on every axis, so only one slab per thread is
+    held in memory. This allows bounding large volumes stored in a
+    ``np.memmap`` or a nibabel ``ArrayProxy`` (``img.dataobj``) without
+    loading them.
+
     Parameters
     ----------
-    vol : ndarray
-        Volume to compute bounding box on.
+    vol : ndarray or array_like
+        Volume to compute bounding box on. Any object with a ``shape`` that
+        can be sliced along its first axis is accepted.
+    chunk_size : int, optional
+        Number of indices along the first axis in each slab. If None
+        (default), slabs of about $2^{24}$ voxels are used.
+    num_threads : int, optional
+        Number of threads used to reduce the slabs. If None (default), the
+        value of the ``OMP_NUM_THREADS`` environment variable is used if it is
+        set, otherwise all available threads are used. If < 0, the maximal
+        number of threads minus ``|num_threads + 1|`` is used (enter -1 to use
+        as many threads as possible). 0 raises an error.
 
     Returns
     -------
@@ -86,33 +215,52 @@ def bounding_box(vol):
     npmaxs : list
         Array containing maximum index of each dimension
     """
-    # Find bounds on first dimension
-    temp = vol
-    for _ in range(vol.ndim - 1):
-        temp = temp.any(-1)
-    mins = [temp.argmax()]
-    maxs = [len(temp) - temp[::-1].argmax()]
-    # Check that vol is not all 0
-    if mins[0] == 0 and temp[0] == 0:
+    shape = tuple(vol.shape)
+    if chunk_size is None:
+        chunk_size = max(2**24 // max(int(np.prod(shape[1:])), 1), 1)
+    starts = range(0, shape[0], chunk_size)
+    num_threads = min(determine_num_threads(num_threads), len(starts))
+
+    def reduce_slab(start):
+        return _slab_projections(vol[start : start + chunk_size])
+
+    if num_threads <= 1:
+        projections = [reduce_slab(start) for start in starts]
+    else:
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            projections = list(executor.map(reduce_slab, starts))
+
+    if not projections or not any(p[0].any() for p in projections):
         warn(
             "No data found in volume to bound. Returning empty bounding box.",
             stacklevel=2,
         )
-        return [0] * vol.ndim, [0] * vol.ndim
-    # Find bounds on remaining dimensions
-    if vol.ndim > 1:
-        a, b = bounding_box(vol.any(0))
-        mins.extend(a)
-        maxs.extend(b)
+        return [0] * len(shape), [0] * len(shape)
+
+    # Slabs are stacked along the first axis and merged on the others
+    merged = [np.concatenate([p[0] for p in projections])]
+    merged.extend(
+        np.logical_or.reduce([p[i] for p in projections]) for i in range(1, len(shape))
+    )
+    mins, maxs = [], []
+    for nonzero in merged:
+        idx = np.flatnonzero(nonzero)
+        mins.append(int(idx[0]))
+        maxs.append(int(idx[-1]) + 1)
     return mins, maxs
 
 
 def crop(vol, mins, maxs):
     """Crops the input volume.
 
+    Only basic slicing is used, so the result is a view when `vol` is an
+    ndarray or a ``np.memmap``, and only the bounding box is read when `vol`
+    is a nibabel ``ArrayProxy``. If `mins` has fewer entries than `vol` has
+    dimensions, the remaining dimensions are kept whole.
+
     Parameters
     ----------
-    vol : ndarray
+    vol : ndarray or array_like
         Volume to crop.
     mins : array
         Array containing minimum index of each dimension.
@@ -127,6 +275,46 @@ def crop(vol, mins, maxs):
     return vol[tuple(slice(i, j) for i, j in zip(mins, maxs))]
 
 
+def uncrop(vol, mins, maxs, *, shape=None, out=None):
+    """Place a cropped volume back in a full volume.
+
+    This is the inverse of :func:`crop`.
+
+    Parameters
+    ----------
+    vol : ndarray
+        Cropped volume.
+    mins : array
+        Array containing minimum index of each dimension.
+    maxs : array
+        Array containing maximum index of each dimension.
+    shape : tuple, optional
+        Shape of the full volume, filled with zeros outside of the bounding
+        box. If it has fewer entries than `vol` has dimensions, the remaining
+        dimensions of `vol` are appended. Ignored if `out` is given.
+    out : ndarray, optional
+        Full volume where `vol` is written. Values outside of the bounding box
+        are left untouched.
+
+    Returns
+    -------
+    out : ndarray
+        The full volume.
+    """
+    if out is None:
+        if shape is None:
+            raise ValueError("Either shape or out needs to be given")
+        shape = tuple(shape)
+        out = np.zeros(shape + vol.shape[len(shape) :], dtype=vol.dtype)
+    box = crop(out, mins, maxs)
+    if box.shape != vol.shape:
+        raise ValueError(
+            f"vol has shape {vol.shape}, but the bounding box has shape {box.shape}"
+        )
+    box[...] = vol
+    return out
+
+
 @deprecated_params("autocrop", since="1.11", until="1.13")
 @warning_for_keywords()
 def median_otsu(
@@ -138,6 +326,7 @@ def median_otsu(
     autocrop=False,
     dilate=None,
     finalize_mask=False,
+    num_threads=None,
 ):
     """Simple brain extraction tool method for images from DWI data.
 
@@ -173,6 +362,13 @@ def median_otsu(
     finalize_mask : bool, optional
         Whether to remove potential holes or islands.
         Useful for solving minor errors.
+    num_threads : int, optional
+        Number of threads used by the median filter and the bounding box. If
+        None (default), the value of the ``OMP_NUM_THREADS`` environment
+        variable is used if it is set, otherwise all available threads are
+        used. If < 0, the maximal number of threads minus ``|num_threads + 1|``
+        is used (enter -1 to use as many threads as possible). 0 raises an
+        error.
 
     Returns
     -------
@@ -221,7 +417,7 @@ def median_otsu(
         b0vol = input_volume
     # Make a mask using a multiple pass median filter and histogram
     # thresholding.
-    mask = multi_median(b0vol, median_radius, numpass)
+    mask = multi_median(b0vol, median_radius, numpass, num_threads=num_threads)
     thresh = otsu(mask)
     mask = mask > thresh
 
@@ -235,7 +431,7 @@ def median_otsu(
     # Auto crop the volumes using the mask as input_volume for bounding box
     # computing.
     if autocrop:
-        mins, maxs = bounding_box(mask)
+        mins, maxs = bounding_box(mask, num_threads=num_threads)
         mask = crop(mask, mins, maxs)
         croppedvolume = crop(input_volume, mins, maxs)
         maskedvolume = applymask(croppedvolume, mask)
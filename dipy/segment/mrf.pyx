@@ -5,6 +5,11 @@
 import numpy as np
 
 cimport numpy as cnp
+from cython.parallel import prange
+
+from dipy.utils.omp import determine_num_threads
+from dipy.utils.omp cimport set_num_threads, restore_default_num_threads
+
 cdef extern from "dpy_math.h" nogil:
     cdef double NPY_PI
     cdef double NPY_INFINITY
@@ -123,7 +128,8 @@ class ConstantObservationModel:
         return mu, var
 
 
-    def negloglikelihood(self, image, mu, sigmasq, cnp.npy_intp nclasses):
+    def negloglikelihood(self, image, mu, sigmasq, cnp.npy_intp nclasses, *,
+                         out=None, num_threads=None):
         r""" Computes the gaussian negative log-likelihood of each class at
         each voxel of `image` assuming a gaussian distribution with means and
         variances given by `mu` and `sigmasq`, respectively (constant models
@@ -140,22 +146,39 @@ class ConstantObservationModel:
             variance of each class
         nclasses : int
             number of classes
+        out : ndarray, optional
+            4D float64 buffer of shape ``image.shape + (nclasses,)`` that
+            receives the result, so that it can be reused across iterations.
+        num_threads : int, optional
+            Number of threads to be used for OpenMP parallelization. If None
+            (default) the value of OMP_NUM_THREADS environment variable is used
+            if it is set, otherwise all available threads are used. If < 0 the
+            maximal number of threads minus $|num_threads + 1|$ is used (enter
+            -1 to use as many threads as possible). 0 raises an error.
 
         Returns
         -------
         nloglike : ndarray
             4D negloglikelihood for each class in each volume
         """
-        cdef int l
-        nloglike = np.zeros(image.shape + (nclasses,), dtype=np.float64)
+        cdef int threads_to_use
 
-        for l in range(nclasses):
-            _negloglikelihood(image, mu, sigmasq, l, nloglike)
+        if out is None:
+            out = np.empty(image.shape + (nclasses,), dtype=np.float64)
+
+        threads_to_use = determine_num_threads(num_threads)
+        set_num_threads(threads_to_use)
+
+        _negloglikelihood(image, mu, sigmasq, out)
 
-        return nloglike
+        if num_threads is not None:
+            restore_default_num_threads()
 
+        return out
 
-    def prob_image(self, img, cnp.npy_intp nclasses, mu, sigmasq, P_L_N):
+
+    def prob_image(self, img, cnp.npy_intp nclasses, mu, sigmasq, P_L_N, *,
+                   out=None, num_threads=None):
         r""" Conditional probability of the label given the image
 
         Parameters
@@ -174,28 +197,39 @@ class ConstantObservationModel:
 
         Previously computed by function prob_neighborhood
 
+        out : ndarray, optional
+            4D float64 buffer with the shape of `P_L_N` that receives the
+            result, so that it can be reused across iterations.
+        num_threads : int, optional
+            Number of threads to be used for OpenMP parallelization. If None
+            (default) the value of OMP_NUM_THREADS environment variable is used
+            if it is set, otherwise all available threads are used. If < 0 the
+            maximal number of threads minus $|num_threads + 1|$ is used (enter
+            -1 to use as many threads as possible). 0 raises an error.
+
         Returns
         -------
         P_L_Y : ndarray
             4D probability of the label given the input image
         """
-        cdef int l
-        P_L_Y = np.zeros_like(P_L_N)
-        P_L_Y_norm = np.zeros_like(img)
+        cdef int threads_to_use
 
-        g = np.empty_like(img)
+        if out is None:
+            out = np.empty(P_L_N.shape, dtype=np.float64)
 
-        for l in range(nclasses):
-            _prob_image(img, g, mu, sigmasq, l, P_L_N, P_L_Y)
-            P_L_Y_norm[:, :, :] += P_L_Y[:, :, :, l]
+        threads_to_use = determine_num_threads(num_threads)
+        set_num_threads(threads_to_use)
 
-        for l in range(nclasses):
-            P_L_Y[:, :, :, l] = P_L_Y[:, :, :, l] / P_L_Y_norm
+        _prob_image(img, mu, sigmasq, P_L_N, out)
 
-        return P_L_Y
+        if num_threads is not None:
+            restore_default_num_threads()
 
+        return out
 
-    def update_param(self, image, P_L_Y, mu, cnp.npy_intp nclasses):
+
+    def update_param(self, image, P_L_Y, mu, cnp.npy_intp nclasses, *,
+                     num_threads=None):
         r""" Updates the means and the variances in each iteration for all
         the labels. This is for equations 25 and 26 of Zhang et. al.,
         IEEE Trans. Med. Imag, Vol. 20, No. 1, Jan 2001.
@@ -212,6 +246,12 @@ class ConstantObservationModel:
             class.
         nclasses : int
             number of tissue classes
+        num_threads : int, optional
+            Number of threads to be used for OpenMP parallelization. If None
+            (default) the value of OMP_NUM_THREADS environment variable is used
+            if it is set, otherwise all available threads are used. If < 0 the
+            maximal number of threads minus $|num_threads + 1|$ is used (enter
+            -1 to use as many threads as possible). 0 raises an error.
 
         Returns
         -------
@@ -220,18 +260,24 @@ class ConstantObservationModel:
         var_upd : ndarray
                 1 x nclasses, updated variance of each tissue class
         """
-        cdef int l
-        mu_upd = np.zeros(nclasses, dtype=np.float64)
-        var_upd = np.zeros(nclasses, dtype=np.float64)
-        mu_num = np.zeros(image.shape + (nclasses,), dtype=np.float64)
-        var_num = np.zeros(image.shape + (nclasses,), dtype=np.float64)
+        cdef int threads_to_use
 
-        for l in range(nclasses):
-            mu_num[..., l] = P_L_Y[..., l] * image
-            var_num[..., l] = P_L_Y[..., l] * ((image - mu[l]) ** 2)
+        image = np.asarray(image, dtype=np.float64)
+        mu = np.asarray(mu, dtype=np.float64)
+        # One row of partial sums per x-slice keeps the threads independent
+        partial = np.empty((image.shape[0], nclasses, 3), dtype=np.float64)
+
+        threads_to_use = determine_num_threads(num_threads)
+        set_num_threads(threads_to_use)
+
+        _update_param_partial(image, P_L_Y, mu, partial)
+
+        if num_threads is not None:
+            restore_default_num_threads()
 
-            mu_upd[l] = np.sum(mu_num[..., l]) / np.sum(P_L_Y[..., l])
-            var_upd[l] = np.sum(var_num[..., l]) / np.sum(P_L_Y[..., l])
+        sums = partial.sum(axis=0)
+        mu_upd = sums[:, 0] / sums[:, 2]
+        var_upd = sums[:, 1] / sums[:, 2]
 
         return mu_upd, var_upd
 
@@ -282,13 +328,13 @@ cdef void _initialize_param_uniform(double[:, :, :] image, double[:] mu,
 
 
 cdef void _negloglikelihood(double[:, :, :] image, double[:] mu,
-                            double[:] sigmasq, int classid,
+                            double[:] sigmasq,
                             double[:, :, :, :] neglogl) noexcept nogil:
     r""" Computes the gaussian negative log-likelihood of each class at
     each voxel of `image` assuming a gaussian distribution with means and
     variances given by `mu` and `sigmasq`, respectively (constant models
     along the full volume). The negative log-likelihood will be written
-    in `neglogl`.
+    in `neglogl`. The x-slices are processed in parallel.
 
     Parameters
     ----------
@@ -298,63 +344,60 @@ cdef void _negloglikelihood(double[:, :, :] image, double[:] mu,
         mean of each class
     sigmasq : array
         variance of each class
-    classid : int
-        class identifier
     neglogl : buffer for the neg-loglikelihood
 
     Returns
     -------
     neglogl : array
-        neg-loglikelihood for the class (l = classid)
+        neg-loglikelihood of every class (l = 0, ..., neglogl.shape[3] - 1)
     """
     cdef:
         cnp.npy_intp nx = image.shape[0]
         cnp.npy_intp ny = image.shape[1]
         cnp.npy_intp nz = image.shape[2]
-        cnp.npy_intp l = classid
-        cnp.npy_intp x, y, z
+        cnp.npy_intp nclasses = neglogl.shape[3]
+        cnp.npy_intp x, y, z, l
         double eps = 1e-8      # We assume images normalized to 0-1
         double eps_sq = 1e-16  # Maximum precision for double.
 
-    for x in range(nx):
+    for x in prange(nx, schedule="static"):
         for y in range(ny):
             for z in range(nz):
+                for l in range(nclasses):
 
-                if sigmasq[l] < eps_sq:
+                    if sigmasq[l] < eps_sq:
 
-                    if fabs(image[x, y, z] - mu[l]) < eps:
-                        neglogl[x, y, z, l] = 1 + log(sqrt(2.0 * NPY_PI *
-                                                           sigmasq[l]))
-                    else:
-                        neglogl[x, y, z, l] = NPY_INFINITY
+                        if fabs(image[x, y, z] - mu[l]) < eps:
+                            neglogl[x, y, z, l] = 1 + log(sqrt(2.0 * NPY_PI *
+                                                               sigmasq[l]))
+                        else:
+                            neglogl[x, y, z, l] = NPY_INFINITY
 
-                else:
-                    neglogl[x, y, z, l] = (((image[x, y, z] - mu[l])**2.0) /
-                                           (2.0 * sigmasq[l]))
-                    neglogl[x, y, z, l] += log(sqrt(2.0 * NPY_PI *
-                                                    sigmasq[l]))
+                    else:
+                        neglogl[x, y, z, l] = (
+                            ((image[x, y, z] - mu[l]) ** 2.0) /
+                            (2.0 * sigmasq[l]) +
+                            log(sqrt(2.0 * NPY_PI * sigmasq[l])))
 
 
-cdef void _prob_image(double[:, :, :] image, double[:, :, :] gaussian,
-                      double[:] mu, double[:] sigmasq, int classid,
+cdef void _prob_image(double[:, :, :] image, double[:] mu, double[:] sigmasq,
                       double[:, :, :, :] P_L_N,
                       double[:, :, :, :] P_L_Y) noexcept nogil:
     r""" Conditional probability of the label given the image
 
+    The gaussian likelihood of each class is multiplied by P_L_N and
+    normalized over the classes in a single pass over the volume, with the
+    x-slices processed in parallel.
+
     Parameters
     ----------
     image : array
         3D structural gray-scale image
-    gaussian : array
-        3D buffer for the gaussian distribution that is multiplied by
-        P_L_N to make P_L_Y
     mu : array
         current estimate of the mean of each tissue class
     sigmasq : array
         current estimate of the variance of each tissue
         class
-    classid : int
-        tissue class identifier
     P_L_N : array
         4D probability map of the label given the neighborhood.
         Previously computed by function prob_neighborhood
@@ -370,27 +413,81 @@ cdef void _prob_image(double[:, :, :] image, double[:, :, :] gaussian,
         cnp.npy_intp nx = image.shape[0]
         cnp.npy_intp ny = image.shape[1]
         cnp.npy_intp nz = image.shape[2]
-        cnp.npy_intp l = classid
-        cnp.npy_intp x, y, z
+        cnp.npy_intp nclasses = P_L_Y.shape[3]
+        cnp.npy_intp x, y, z, l
+        double gaussian, norm
 
         double eps = 1e-8
         double eps_sq = 1e-16
 
-    for x in range(nx):
+    for x in prange(nx, schedule="static"):
         for y in range(ny):
             for z in range(nz):
 
-                if sigmasq[l] < eps_sq:
-                    if fabs(image[x, y, z] - mu[l]) < eps:
-                        gaussian[x, y, z] = 1
+                norm = 0
+                for l in range(nclasses):
+                    if sigmasq[l] < eps_sq:
+                        if fabs(image[x, y, z] - mu[l]) < eps:
+                            gaussian = 1
+                        else:
+                            gaussian = 0
                     else:
-                        gaussian[x, y, z] = 0
-                else:
-                    gaussian[x, y, z] = (
-                        (exp(-((image[x, y, z] - mu[l]) ** 2) /
-                        (2 * sigmasq[l]))) / (sqrt(2 * NPY_PI * sigmasq[l])))
+                        gaussian = (
+                            (exp(-((image[x, y, z] - mu[l]) ** 2) /
+                            (2 * sigmasq[l]))) / (sqrt(2 * NPY_PI * sigmasq[l])))
+
+                    P_L_Y[x, y, z, l] = gaussian * P_L_N[x, y, z, l]
+                    norm = norm + P_L_Y[x, y, z, l]
+
+                for l in range(nclasses):
+                    P_L_Y[x, y, z, l] = P_L_Y[x, y, z, l] / norm
 
-                P_L_Y[x, y, z, l] = gaussian[x, y, z] * P_L_N[x, y, z, l]
+
+cdef void _update_param_partial(double[:, :, :] image,
+                                double[:, :, :, :] P_L_Y, double[:] mu,
+                                double[:, :, :] partial) noexcept nogil:
+    r""" Per x-slice sums needed to update the means and variances
+
+    Parameters
+    ----------
+    image : array
+        3D structural gray-scale image
+    P_L_Y : array
+        4D probability map of the label given the input image
+    mu : array
+        current estimate of the mean of each tissue class
+    partial : array
+        buffer of shape (nx, nclasses, 3)
+
+    Returns
+    -------
+    partial : array
+        partial[x, l] holds the sums over the x-th slice of
+        P_L_Y[..., l] * image, P_L_Y[..., l] * (image - mu[l]) ** 2 and
+        P_L_Y[..., l]
+    """
+    cdef:
+        cnp.npy_intp nx = image.shape[0]
+        cnp.npy_intp ny = image.shape[1]
+        cnp.npy_intp nz = image.shape[2]
+        cnp.npy_intp nclasses = partial.shape[1]
+        cnp.npy_intp x, y, z, l
+        double p, v
+
+    for x in prange(nx, schedule="static"):
+        for l in range(nclasses):
+            partial[x, l, 0] = 0
+            partial[x, l, 1] = 0
+            partial[x, l, 2] = 0
+        for y in range(ny):
+            for z in range(nz):
+                v = image[x, y, z]
+                for l in range(nclasses):
+                    p = P_L_Y[x, y, z, l]
+                    partial[x, l, 0] = partial[x, l, 0] + p * v
+                    partial[x, l, 1] = (partial[x, l, 1] +
+                                        p * (v - mu[l]) * (v - mu[l]))
+                    partial[x, l, 2] = partial[x, l, 2] + p
 
 
 class IteratedConditionalModes:
@@ -424,7 +521,8 @@ class IteratedConditionalModes:
         return seg
 
 
-    def icm_ising(self, nloglike, beta, seg):
+    def icm_ising(self, nloglike, beta, seg, *, checkerboard=False, out=None,
+                  num_threads=None):
         r""" Executes one iteration of the ICM algorithm for MRF MAP
         estimation. The prior distribution of the MRF is a Gibbs
         distribution with the Potts/Ising model with parameter `beta`:
@@ -442,6 +540,26 @@ class IteratedConditionalModes:
         seg : ndarray
             3D initial segmentation. This segmentation will change by one
             iteration of the ICM algorithm
+        checkerboard : bool, optional
+            If False (default), every voxel is updated from the labels of its
+            neighbors in `seg`. If True, the voxels are split in a red-black
+            checkerboard, where no two voxels of the same color are
+            6-neighbors: the red voxels are updated first and the black voxels
+            are then updated from the already updated red labels. This is the
+            sequential (in-place) ICM update, reordered so that each half can
+            be updated in parallel.
+        out : tuple of ndarray, optional
+            Buffers ``(new_seg, energy)`` that receive the result, so that they
+            can be reused across iterations. `new_seg` must be an int16 array
+            and `energy` a float64 array, both with the shape of `seg`.
+            `new_seg` must not share memory with `seg` unless `checkerboard`
+            is True.
+        num_threads : int, optional
+            Number of threads to be used for OpenMP parallelization. If None
+            (default) the value of OMP_NUM_THREADS environment variable is used
+            if it is set, otherwise all available threads are used. If < 0 the
+            maximal number of threads minus $|num_threads + 1|$ is used (enter
+            -1 to use as many threads as possible). 0 raises an error.
 
         Returns
         -------
@@ -450,16 +568,32 @@ class IteratedConditionalModes:
         energy : ndarray
             3D final energy
         """
-        energy = np.zeros(nloglike.shape[:3]).astype(np.float64)
+        cdef int threads_to_use
+
+        if out is None:
+            new_seg = np.empty(seg.shape, dtype=np.int16)
+            energy = np.empty(nloglike.shape[:3], dtype=np.float64)
+        else:
+            new_seg, energy = out
 
-        new_seg = np.zeros_like(seg)
+        threads_to_use = determine_num_threads(num_threads)
+        set_num_threads(threads_to_use)
 
-        _icm_ising(nloglike, beta, seg, energy, new_seg)
+        if checkerboard:
+            new_seg[...] = seg
+            _icm_ising(nloglike, beta, new_seg, energy, new_seg, 0)
+            _icm_ising(nloglike, beta, new_seg, energy, new_seg, 1)
+        else:
+            _icm_ising(nloglike, beta, seg, energy, new_seg, -1)
+
+        if num_threads is not None:
+            restore_default_num_threads()
 
         return new_seg, energy
 
 
-    def prob_neighborhood(self, seg, beta, cnp.npy_intp nclasses):
+    def prob_neighborhood(self, seg, beta, cnp.npy_intp nclasses, *, out=None,
+                          num_threads=None):
         r""" Conditional probability of the label given the neighborhood
         Equation 2.18 of the Stan Z. Li book (Stan Z. Li, Markov Random Field
         Modeling in Image Analysis, 3rd ed., Advances in Pattern Recognition
@@ -475,6 +609,15 @@ class IteratedConditionalModes:
             Usually between 0 to 0.5
         nclasses : int
             number of tissue classes
+        out : ndarray, optional
+            4D float64 buffer of shape ``seg.shape + (nclasses,)`` that
+            receives the result, so that it can be reused across iterations.
+        num_threads : int, optional
+            Number of threads to be used for OpenMP parallelization. If None
+            (default) the value of OMP_NUM_THREADS environment variable is used
+            if it is set, otherwise all available threads are used. If < 0 the
+            maximal number of threads minus $|num_threads + 1|$ is used (enter
+            -1 to use as many threads as possible). 0 raises an error.
 
         Returns
         -------
@@ -482,26 +625,20 @@ class IteratedConditionalModes:
             4D probability map of the label given the neighborhood of the
             voxel.
         """
-        cdef:
-            double[:, :, :] P_L_N = np.zeros(seg.shape, dtype=np.float64)
-            cnp.npy_intp classid = 0
+        cdef int threads_to_use
 
-        PLN_norm = np.zeros(seg.shape, dtype=np.float64)
-        PLN = np.zeros(seg.shape + (nclasses,), dtype=np.float64)
+        if out is None:
+            out = np.empty(seg.shape + (nclasses,), dtype=np.float64)
 
-        for classid in range(nclasses):
+        threads_to_use = determine_num_threads(num_threads)
+        set_num_threads(threads_to_use)
 
-            P_L_N = np.zeros(seg.shape, dtype=np.float64)
-            _prob_class_given_neighb(seg, beta, classid, P_L_N)
+        _prob_neighborhood(seg, beta, out)
 
-            PLN[:, :, :, classid] = np.array(P_L_N)
-            PLN[:, :, :, classid] = np.exp(- PLN[:, :, :, classid])
-            PLN_norm += PLN[:, :, :, classid]
+        if num_threads is not None:
+            restore_default_num_threads()
 
-        for l in range(nclasses):
-            PLN[:, :, :, l] = PLN[:, :, :, l] / PLN_norm
-
-        return PLN
+        return out
 
 
 cdef void _initialize_maximum_likelihood(double[:,:,:,:] nloglike,
@@ -550,13 +687,15 @@ cdef void _initialize_maximum_likelihood(double[:,:,:,:] nloglike,
 
 cdef void _icm_ising(double[:,:,:,:] nloglike, double beta,
                      cnp.npy_short[:,:,:] seg, double[:,:,:] energy,
-                     cnp.npy_short[:,:,:] new_seg) noexcept nogil:
+                     cnp.npy_short[:,:,:] new_seg, int parity) noexcept nogil:
     r""" Executes one iteration of the ICM algorithm for MRF MAP estimation
     The prior distribution of the MRF is a Gibbs distribution with the
     Potts/Ising model with parameter `beta`:
 
     https://en.wikipedia.org/wiki/Potts_model
 
+    The x-slices are processed in parallel.
+
     Parameters
     ----------
     nloglike : array
@@ -572,11 +711,16 @@ cdef void _icm_ising(double[:,:,:,:] nloglike, double beta,
         3D buffer for the energy
     new_seg : array
         3D buffer for the final segmentation
+    parity : int
+        If -1, every voxel is updated and `new_seg` must not share memory
+        with `seg`. If 0 or 1, only the voxels with (x + y + z) % 2 == parity
+        are updated; since none of their neighbors is updated, `new_seg` may
+        then be the same array as `seg`.
 
     Returns
     -------
     energy : array
-        3D map of the energy for every voxel
+        3D map of the energy for every updated voxel
     new_seg : array
         3D new final segmentation (there is a new one after each
         iteration).
@@ -590,15 +734,18 @@ cdef void _icm_ising(double[:,:,:,:] nloglike, double beta,
         cnp.npy_intp ny = nloglike.shape[1]
         cnp.npy_intp nz = nloglike.shape[2]
         cnp.npy_intp nclasses = nloglike.shape[3]
-        cnp.npy_intp x, y, z, xx, yy, zz, i, j, k
+        cnp.npy_intp x, y, z, xx, yy, zz, i, k
         double min_energy = NPY_INFINITY
         double this_energy = NPY_INFINITY
         cnp.npy_short best_class
 
-    for x in range(nx):
+    for x in prange(nx, schedule="static"):
         for y in range(ny):
             for z in range(nz):
 
+                if parity >= 0 and (x + y + z) % 2 != parity:
+                    continue
+
                 best_class = -1
                 min_energy = NPY_INFINITY
 
@@ -617,9 +764,9 @@ cdef void _icm_ising(double[:,:,:,:] nloglike, double beta,
                             continue
 
                         if seg[xx, yy, zz] == k:
-                            this_energy -= beta
+                            this_energy = this_energy - beta
                         else:
-                            this_energy += beta
+                            this_energy = this_energy + beta
 
                     if this_energy < min_energy:
 
@@ -630,63 +777,69 @@ cdef void _icm_ising(double[:,:,:,:] nloglike, double beta,
                 energy[x, y, z] = min_energy
 
 
-cdef void _prob_class_given_neighb(cnp.npy_short[:, :, :] seg, double beta,
-                                   int classid, double[:, :, :] P_L_N) noexcept nogil:
+cdef void _prob_neighborhood(cnp.npy_short[:, :, :] seg, double beta,
+                             double[:, :, :, :] P_L_N) noexcept nogil:
     r""" Conditional probability of the label given the neighborhood
     Equation 2.18 of the Stan Z. Li book.
 
+    The neighborhood energy of every class is exponentiated and normalized
+    over the classes in a single pass over the volume, with the x-slices
+    processed in parallel.
+
     Parameters
     ----------
-    image : array
-        3D structural gray-scale image
     seg : array
         3D tissue segmentation derived from the ICM model
     beta : float
         scalar that determines the importance of the neighborhood and the
         spatial smoothness of the segmentation. Usually between 0 to 0.5
-    classid : int
-        tissue class identifier
     P_L_N : array
-        buffer array for P(L|N)
+        4D buffer array for P(L|N)
 
     Returns
     -------
     P_L_N : array
-        3D map of the probability of the label (l) given the neighborhood
+        4D map of the probability of each label (l) given the neighborhood
         of the voxel P(L|N)
     """
     cdef:
         cnp.npy_intp nx = seg.shape[0]
         cnp.npy_intp ny = seg.shape[1]
         cnp.npy_intp nz = seg.shape[2]
+        cnp.npy_intp nclasses = P_L_N.shape[3]
         cnp.npy_intp nneigh = 6
-        cnp.npy_intp l = classid
-        cnp.npy_intp x, y, z, xx, yy, zz
-        double vox_prob
+        cnp.npy_intp x, y, z, xx, yy, zz, i, l
+        double vox_prob, norm
         cnp.npy_intp* dX = [-1, 0, 0, 0,  0, 1]
         cnp.npy_intp* dY = [0, -1, 0, 1,  0, 0]
         cnp.npy_intp* dZ = [0,  0, 1, 0, -1, 0]
 
-    for x in range(nx):
+    for x in prange(nx, schedule="static"):
         for y in range(ny):
             for z in range(nz):
 
-                vox_prob = 0
-
-                for i in range(nneigh):
-                    xx = x + dX[i]
-                    if xx < 0 or xx >= nx:
-                        continue
-                    yy = y + dY[i]
-                    if yy < 0 or yy >= ny:
-                        continue
-                    zz = z + dZ[i]
-                    if zz < 0 or zz >= nz:
-                        continue
-
-                    if seg[xx, yy, zz] == l:
-                        vox_prob -= beta
-                    else:
-                        vox_prob += beta
+                norm = 0
+                for l in range(nclasses):
+                    vox_prob = 0
+
+                    for i in range(nneigh):
+                        xx = x + dX[i]
+                        if xx < 0 or xx >= nx:
+                            continue
+                        yy = y + dY[i]
+                        if yy < 0 or yy >= ny:
+                            continue
+                        zz = z + dZ[i]
+                        if zz < 0 or zz >= nz:
+                            continue
+
+                        if seg[xx, yy, zz] == l:
+                            vox_prob = vox_prob - beta
+                        else:
+                            vox_prob = vox_prob + beta
+
+                    P_L_N[x, y, z, l] = exp(-vox_prob)
+                    norm = norm + P_L_N[x, y, z, l]
 
-                P_L_N[x, y, z] = vox_prob
+                for l in range(nclasses):
+                    P_L_N[x, y, z, l] = P_L_N[x, y, z, l] / norm
@@ -14,6 +14,7 @@ from dipy.segment.mask import (
     median_otsu,
     multi_median,
     otsu,
+    uncrop,
 )
 from dipy.utils.deprecator import ArgsDeprecationWarning
 
@@ -53,6 +54,32 @@ def test_mask():
     assert_equal(median_test, median_control)
 
 
+@pytest.mark.parametrize("num_threads", [1, 3])
+def test_multi_median_methods(num_threads):
+    rng = np.random.default_rng(1234)
+    img = rng.integers(0, 12, size=(11, 9, 7)).astype(np.int16)
+    img_copy = img.copy()
+
+    medarr = np.ones_like(img.shape) * 5
+    median_control = median_filter(median_filter(img, medarr), medarr)
+
+    for method in ["auto", "histogram", "scipy"]:
+        median_test = multi_median(img, 2, 2, method=method, num_threads=num_threads)
+        assert_equal(img, img_copy)
+        assert_equal(median_test.dtype, img.dtype)
+        assert_equal(median_test, median_control)
+
+    # The histogram engine also handles any set of distinct float values
+    img = rng.choice([-1.5, 0.25, 3.0, 7.0], size=(10, 8))
+    median_test = multi_median(img, 1, 3, method="histogram", num_threads=num_threads)
+    median_control = img
+    for _ in range(3):
+        median_control = median_filter(median_control, 3)
+    assert_equal(median_test, median_control)
+
+    assert_raises(ValueError, multi_median, img, 1, 1, method="mean")
+
+
 def test_bounding_box():
     vol = np.zeros((100, 100, 50), dtype=int)
 
@@ -87,6 +114,47 @@ def test_bounding_box():
         assert_equal(maxs, [0, 0])
 
 
+def test_bounding_box_chunks_crop_uncrop(tmp_path):
+    vol = np.memmap(
+        tmp_path / "vol.dat", dtype=np.float32, mode="w+", shape=(40, 30, 20, 3)
+    )
+    vol[7:33, 4:25, 2:19, 1] = 1
+    vol[12, 3, 5, 2] = -2
+    vol.flush()
+    vol = np.memmap(tmp_path / "vol.dat", dtype=np.float32, mode="r", shape=vol.shape)
+
+    expected = ([7, 3, 2, 1], [33, 25, 19, 3])
+    for chunk_size in (None, 1, 6, 40):
+        for num_threads in (1, 3):
+            box = bounding_box(vol, chunk_size=chunk_size, num_threads=num_threads)
+            assert_equal(box, expected)
+
+    # Cropping gives a view, uncropping puts it back in place
+    mins, maxs = bounding_box(np.asarray(vol[..., 1]))
+    cropped = crop(vol, mins, maxs)
+    assert_equal(cropped.shape, (26, 21, 17, 3))
+    assert np.shares_memory(cropped, vol)
+    full = uncrop(cropped, mins, maxs, shape=vol.shape[:3])
+    assert_equal(full.dtype, vol.dtype)
+    assert_equal(full[..., 1], vol[..., 1])
+    assert_equal(full[12, 3, 5, 2], 0)
+
+    out = np.full(vol.shape, 5, dtype=np.float32)
+    uncrop(cropped, mins, maxs, out=out)
+    assert_equal(crop(out, mins, maxs), cropped)
+    assert_equal(out[0], 5)
+    assert_raises(ValueError, uncrop, cropped, mins, maxs)
+    assert_raises(ValueError, uncrop, cropped[1:], mins, maxs, out=out)
+
+    # Masking in place
+    data = np.array(vol)
+    mask = data[..., 1] > 0
+    expected = applymask(data, mask)
+    masked = applymask(data, mask, out=data)
+    assert masked is data
+    assert_equal(data, expected)
+
+
 def test_median_otsu():
     fname = get_fnames(name="S0_10")
     data = load_nifti_data(fname)
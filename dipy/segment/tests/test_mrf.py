@@ -377,6 +377,94 @@ def test_icm_square(rng):
     npt.assert_(not np.isclose(np.abs(np.sum(difference_map)), 0))
 
 
+def _icm_reference(nloglike, beta, seg, update):
+    # Direct ICM update of the voxels selected by `update`, reading `seg`
+    nx, ny, nz, nclasses = nloglike.shape
+    new_seg = seg.copy()
+    energy = np.zeros(seg.shape)
+    for x, y, z in zip(*np.nonzero(update)):
+        energies = nloglike[x, y, z].copy()
+        for dx, dy, dz in [
+            (-1, 0, 0),
+            (1, 0, 0),
+            (0, -1, 0),
+            (0, 1, 0),
+            (0, 0, -1),
+            (0, 0, 1),
+        ]:
+            xx, yy, zz = x + dx, y + dy, z + dz
+            if 0 <= xx < nx and 0 <= yy < ny and 0 <= zz < nz:
+                same = np.arange(nclasses) == seg[xx, yy, zz]
+                energies += np.where(same, -beta, beta)
+        new_seg[x, y, z] = np.argmin(energies)
+        energy[x, y, z] = energies.min()
+    return new_seg, energy
+
+
+@set_random_number_generator()
+def test_kernels_buffers_and_threads(rng):
+    nclasses = 3
+    beta = 0.3
+    com = ConstantObservationModel()
+    icm = IteratedConditionalModes()
+
+    image = rng.random((7, 6, 5))
+    mu = np.array([0.2, 0.5, 0.8])
+    sigmasq = np.array([0.01, 0.02, 0.03])
+    seg = rng.integers(0, nclasses, size=image.shape).astype(np.int16)
+
+    negll = com.negloglikelihood(image, mu, sigmasq, nclasses, num_threads=1)
+    expected = (image[..., None] - mu) ** 2 / (2 * sigmasq) + np.log(
+        np.sqrt(2 * np.pi * sigmasq)
+    )
+    npt.assert_allclose(negll, expected)
+
+    PLN = icm.prob_neighborhood(seg, beta, nclasses, num_threads=1)
+    npt.assert_allclose(PLN.sum(axis=-1), 1)
+    PLY = com.prob_image(image, nclasses, mu, sigmasq, PLN, num_threads=1)
+    gauss = np.exp(-expected)
+    npt.assert_allclose(PLY, gauss * PLN / (gauss * PLN).sum(-1, keepdims=True))
+
+    mu_upd, var_upd = com.update_param(image, PLY, mu, nclasses, num_threads=1)
+    weight = PLY.reshape(-1, nclasses).sum(0)
+    mu_num = (PLY * image[..., None]).reshape(-1, nclasses).sum(0)
+    var_num = (PLY * (image[..., None] - mu) ** 2).reshape(-1, nclasses).sum(0)
+    npt.assert_allclose(mu_upd, mu_num / weight)
+    npt.assert_allclose(var_upd, var_num / weight)
+
+    # Reusing buffers and running on several threads gives the same results
+    out = np.full_like(negll, np.nan)
+    res = com.negloglikelihood(image, mu, sigmasq, nclasses, out=out, num_threads=2)
+    npt.assert_(res is out)
+    npt.assert_array_equal(out, negll)
+    out = np.full_like(PLN, np.nan)
+    icm.prob_neighborhood(seg, beta, nclasses, out=out, num_threads=2)
+    npt.assert_array_equal(out, PLN)
+    out = np.full_like(PLY, np.nan)
+    com.prob_image(image, nclasses, mu, sigmasq, PLN, out=out, num_threads=2)
+    npt.assert_array_equal(out, PLY)
+
+    # Default (Jacobi) ICM update
+    ref_seg, ref_energy = _icm_reference(negll, beta, seg, np.ones(seg.shape, bool))
+    buffers = (np.empty_like(seg), np.empty(seg.shape))
+    new_seg, energy = icm.icm_ising(negll, beta, seg, out=buffers, num_threads=2)
+    npt.assert_(new_seg is buffers[0] and energy is buffers[1])
+    npt.assert_array_equal(new_seg, ref_seg)
+    npt.assert_allclose(energy, ref_energy)
+
+    # Red-black ICM: black voxels see the already updated red labels
+    red = np.indices(seg.shape).sum(axis=0) % 2 == 0
+    red_seg, red_energy = _icm_reference(negll, beta, seg, red)
+    ref_seg, black_energy = _icm_reference(negll, beta, red_seg, ~red)
+    ref_energy = np.where(red, red_energy, black_energy)
+    for num_threads in (1, 2):
+        new_seg, energy = icm.icm_ising(
+            negll, beta, seg, checkerboard=True, num_threads=num_threads
+        )
+        npt.assert_array_equal(new_seg, ref_seg)
+        npt.assert_allclose(energy, ref_energy)
+
+
 def test_classify():
     imgseg = TissueClassifierHMRF()
 
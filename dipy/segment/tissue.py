@@ -27,7 +27,15 @@ class TissueClassifierHMRF:
 
     @warning_for_keywords()
     def classify(
-        self, image, nclasses, beta, *, tolerance=1e-05, max_iter=100, min_var=1e-6
+        self,
+        image,
+        nclasses,
+        beta,
+        *,
+        tolerance=1e-05,
+        max_iter=100,
+        min_var=1e-6,
+        num_threads=None,
     ):
         """
         This method uses the Maximum a posteriori - Markov Random Field
@@ -59,6 +67,12 @@ class TissueClassifierHMRF:
         min_var : float, optional
             Minimum variance within each tissue class to prevent division by
             zero when the image is heavily masked.
+        num_threads : int, optional
+            Number of threads to be used for OpenMP parallelization. If None
+            (default) the value of OMP_NUM_THREADS environment variable is used
+            if it is set, otherwise all available threads are used. If < 0 the
+            maximal number of threads minus $|num_threads + 1|$ is used (enter
+            -1 to use as many threads as possible). 0 raises an error.
 
         Returns
         -------
@@ -97,28 +111,53 @@ class TissueClassifierHMRF:
         final_segmentation = np.empty_like(image)
         initial_segmentation = seg_init
 
+        # Work buffers reused by every iteration; the two segmentation
+        # buffers are swapped so that ICM reads one and writes the other.
+        shape = image.shape + (nclasses,)
+        PLN = np.empty(shape)
+        PVE = np.empty(shape)
+        negll = np.empty(shape)
+        energy = np.empty(image.shape)
+        seg_init = initial_segmentation.copy()
+        seg_next = np.empty_like(seg_init)
+
         for i in range(max_iter):
             if self.verbose:
                 logger.info(f">> Iteration: {i}")
 
-            PLN = icm.prob_neighborhood(seg_init, beta, nclasses)
-            PVE = com.prob_image(image_gauss, nclasses, mu, var, PLN)
+            icm.prob_neighborhood(
+                seg_init, beta, nclasses, out=PLN, num_threads=num_threads
+            )
+            com.prob_image(
+                image_gauss, nclasses, mu, var, PLN, out=PVE, num_threads=num_threads
+            )
 
-            mu_upd, var_upd = com.update_param(image_gauss, PVE, mu, nclasses)
+            mu_upd, var_upd = com.update_param(
+                image_gauss, PVE, mu, nclasses, num_threads=num_threads
+            )
             ind = np.argsort(mu_upd)
             mu_upd = mu_upd[ind]
             var_upd = var_upd[ind]
             var_upd = np.maximum(var_upd, min_var)
 
-            negll = com.negloglikelihood(image_gauss, mu_upd, var_upd, nclasses)
-            final_segmentation, energy = icm.icm_ising(negll, beta, seg_init)
+            com.negloglikelihood(
+                image_gauss,
+                mu_upd,
+                var_upd,
+                nclasses,
+                out=negll,
+                num_threads=num_threads,
+            )
+            final_segmentation, energy = icm.icm_ising(
+                negll, beta, seg_init, out=(seg_next, energy), num_threads=num_threads
+            )
 
             energy_sum.append(energy[energy > -np.inf].sum())
 
             if self.save_history:
-                self.segmentations.append(final_segmentation)
-                self.pves.append(PVE)
-                self.energies.append(energy)
+                self.segmentations.append(final_segmentation.copy())
+                self.pves.append(PVE.copy())
+                self.energies.append(energy.copy())
                 self.energies_sum.append(energy_sum[-1])
 
             if tolerance > 0 and i > 5:
@@ -131,7 +170,7 @@ class TissueClassifierHMRF:
                 if test_dist < tol:
                     break
 
-            seg_init = final_segmentation
+            seg_init, seg_next = final_segmentation, seg_init
             mu = mu_upd
             var = var_upd
 
@@ -3,7 +3,6 @@ from pathlib import Path
 import numpy as np
 from scipy.ndimage import map_coordinates
 from scipy.spatial import cKDTree
-from scipy.spatial.distance import mahalanobis
 
 from dipy.io.utils import save_buan_profiles_hdf5
 from dipy.segment.clustering import QuickBundles
@@ -14,8 +13,8 @@ from dipy.tracking.streamline import (
     orient_by_streamline,
     set_number_of_points,
     transform_streamlines,
-    values_from_volume,
 )
+from dipy.utils.parallel import paramap
 
 
 def peak_values(bundle, peaks, dt, pname, bname, subject, group_id, ind, dir_name):
@@ -194,35 +193,240 @@ def buan_profile(model_bundle, bundle, orig_bundle, metric, affine, *, no_disks=
 
     """
 
+    return buan_profiles(
+        model_bundle, bundle, orig_bundle, [metric], affine, no_disks=no_disks
+    )[0]
+
+
+@warning_for_keywords()
+def buan_profiles(
+    model_bundle, bundle, orig_bundle, metrics, affine, *, no_disks=100, assignment=None
+):
+    """
+    Create BUAN weighted mean bundle profiles (lite) for several metrics.
+
+    Batched version of :func:`buan_profile`. The assignment of the bundle
+    points to the model bundle centroids is computed once, all the metric
+    volumes are sampled in a single interpolation pass and the weighted means
+    of all the metrics and disks are obtained from a single ``np.bincount``
+    reduction.
+
+    Parameters
+    ----------
+    model_bundle : Streamlines
+        The atlas/template bundle used as the along-tract reference.
+        Must be in the same space as ``bundle`` (common/MNI space).
+    bundle : Streamlines
+        The subject bundle in common space (e.g., MNI). Used for segment
+        assignment against the model centroids.
+    orig_bundle : Streamlines
+        The same subject bundle in native/world (RAS) space. Used for
+        sampling the metric volumes. Must correspond point-for-point to
+        ``bundle``.
+    metrics : sequence of ndarray or ndarray
+        The 3-D scalar volumes (e.g., FA, MD), all in the same voxel space as
+        ``affine``. Either a sequence of 3-D volumes or a 4-D array with the
+        metrics along the last axis.
+    affine : ndarray
+        Voxel-to-world affine of the metric volumes (as returned by
+        ``nib.load(...).affine``). Used to convert ``orig_bundle`` from
+        world to voxel coordinates for metric interpolation.
+    no_disks : int, optional
+        Number of alongtract segments/disks used for dividing bundle into
+        segments.
+    assignment : tuple of ndarray, optional
+        The ``(dist, indx)`` output of :func:`assignment_map` for ``bundle``
+        and ``model_bundle``, to reuse a previously computed assignment.
+
+    Returns
+    -------
+    bundle_profiles : ndarray, shape (n_metrics, no_disks)
+        Inverse-distance-weighted mean value of each metric for each disk
+        segment. Disks with no valid data points are set to NaN.
+
+    """
     if len(model_bundle) == 0 or len(bundle) == 0 or len(orig_bundle) == 0:
         raise ValueError("One of the bundles contains no streamlines")
 
-    dist, indx = assignment_map(bundle, model_bundle, no_disks)
-    ind = np.array(indx)
+    if isinstance(metrics, np.ndarray) and metrics.ndim == 4:
+        volumes = metrics
+    else:
+        volumes = np.stack([np.asarray(m) for m in metrics], axis=-1)
+    n_metrics = volumes.shape[-1]
+
+    if assignment is None:
+        assignment = assignment_map(bundle, model_bundle, no_disks)
+    dist, indx = assignment
+    ind = np.asarray(indx)
+
     affine_r = np.linalg.inv(affine)
     transformed_orig_bundle = transform_streamlines(orig_bundle, affine_r)
-    bundle_profile = np.zeros(no_disks)
-    values = map_coordinates(metric, transformed_orig_bundle._data.T, order=1)
+    coords = transformed_orig_bundle.get_data().T
+    n_points = coords.shape[1]
+    # Sample all the metrics at once. The last (metric) coordinate being an
+    # integer, linear interpolation along it is exact. NaNs would however
+    # leak into the neighbouring metrics through the zero interpolation
+    # weights, so they are sampled separately as an indicator volume:
+    nan_mask = np.isnan(volumes)
+    has_nan = np.any(nan_mask)
+    if has_nan:
+        volumes = np.concatenate(
+            [np.where(nan_mask, 0, volumes), nan_mask.astype(volumes.dtype)], axis=-1
+        )
+    n_sampled = volumes.shape[-1]
+    coords = np.concatenate(
+        [
+            np.tile(coords, (1, n_sampled)),
+            np.repeat(np.arange(n_sampled), n_points)[None],
+        ]
+    )
+    values = map_coordinates(volumes, coords, order=1)
+    if has_nan:
+        values, nan_values = np.split(values, 2)
+        values[nan_values > 0] = np.nan
 
     epsilon = 1e-8
-    weights = 1 / (dist + epsilon)
+    weights = np.tile(1 / (dist + epsilon), n_metrics)
+    valid = ~np.isnan(values)
+
+    # One bin per (metric, disk) pair:
+    bins = (
+        np.repeat(np.arange(n_metrics), n_points) * no_disks + np.tile(ind, n_metrics)
+    )[valid]
+    n_bins = n_metrics * no_disks
+    weighted_sum = np.bincount(
+        bins, weights=weights[valid] * values[valid], minlength=n_bins
+    )
+    sum_weights = np.bincount(bins, weights=weights[valid], minlength=n_bins)
+
+    bundle_profiles = np.full(n_bins, np.nan)
+    has_data = sum_weights > 0
+    bundle_profiles[has_data] = weighted_sum[has_data] / sum_weights[has_data]
+
+    return bundle_profiles.reshape(n_metrics, no_disks)
+
+
+def _buan_subject_profiles(subject, no_disks):
+    """Compute the BUAN profiles of one subject, see ``buan_group_profiles``."""
+    model_bundles, bundles, orig_bundles, metrics, affine = subject
+    return np.stack(
+        [
+            buan_profiles(
+                model_bundle, bundle, orig_bundle, metrics, affine, no_disks=no_disks
+            )
+            for model_bundle, bundle, orig_bundle in zip(
+                model_bundles, bundles, orig_bundles
+            )
+        ]
+    )
 
-    for i in range(no_disks):
-        valid_mask = ind == i
-        valid_mask &= ~np.isnan(values)
 
-        if np.any(valid_mask):
-            vals = values[valid_mask]
-            wts = weights[valid_mask]
-            wts /= np.sum(wts)
-            weighted_mean = np.sum(wts * vals)
+@warning_for_keywords()
+def buan_group_profiles(
+    subjects, *, no_disks=100, engine="serial", n_jobs=-1, verbose=False, **kwargs
+):
+    """
+    Create BUAN weighted mean bundle profiles for a group of subjects.
 
-        else:
-            weighted_mean = np.nan
+    Each subject is processed with :func:`buan_profiles`, so the assignment of
+    each bundle is computed once for all the metrics. Subjects are
+    distributed across workers with :func:`dipy.utils.parallel.paramap`.
+
+    Parameters
+    ----------
+    subjects : sequence of tuple
+        One ``(model_bundles, bundles, orig_bundles, metrics, affine)`` tuple
+        per subject, where ``model_bundles``, ``bundles`` and
+        ``orig_bundles`` are sequences of the same length (one item per
+        bundle), and ``metrics`` and ``affine`` are as in
+        :func:`buan_profiles`.
+    no_disks : int, optional
+        Number of alongtract segments/disks used for dividing bundles into
+        segments.
+    engine : str, optional
+        {"serial", "joblib", "dask", "ray"}
+        The parallelization engine, see :func:`dipy.utils.parallel.paramap`.
+    n_jobs : int, optional
+        The number of jobs to perform in parallel. Use -1 to use all but one
+        cpu.
+    verbose : bool, optional
+        Show a progress bar.
+    kwargs : dict, optional
+        Additional arguments passed to :func:`dipy.utils.parallel.paramap`.
 
-        bundle_profile[i] = weighted_mean
+    Returns
+    -------
+    profiles : ndarray, shape (n_subjects, n_bundles, n_metrics, no_disks)
+        The profiles of each subject, bundle and metric.
+
+    """
+    results = paramap(
+        _buan_subject_profiles,
+        subjects,
+        func_args=[no_disks],
+        engine=engine,
+        n_jobs=n_jobs,
+        verbose=verbose,
+        **kwargs,
+    )
+    return np.stack(results)
 
-    return bundle_profile
+
+def _as_array(streamlines, n_points):
+    """Stack resampled streamlines into an (n_streamlines, n_points, 3) array."""
+    if isinstance(streamlines, Streamlines):
+        return streamlines.get_data().reshape(len(streamlines), n_points, 3)
+    return np.asarray(streamlines)
+
+
+def _trilinear_interpolate(volumes, points):
+    """Trilinear interpolation of several 3D volumes at once.
+
+    Equivalent to :func:`dipy.core.interpolation.interpolate_scalar_3d`
+    applied to each volume, but the interpolation weights are computed once
+    for all the volumes.
+
+    Parameters
+    ----------
+    volumes : ndarray, shape (X, Y, Z, M)
+        The M volumes to interpolate.
+    points : ndarray, shape (N, 3)
+        The voxel coordinates at which the volumes are interpolated.
+
+    Returns
+    -------
+    values : ndarray, shape (N, M)
+        The interpolated values, 0 for the points outside of the volumes.
+    """
+    shape = np.array(volumes.shape[:3])
+    dtype = np.result_type(volumes.dtype, points.dtype)
+    inside = np.all((points > -1) & (points < shape), axis=-1)
+    base = np.floor(points).astype(np.intp)
+    frac = (points - base).astype(dtype)
+    one = dtype.type(1)
+    # Same corner order and weight products as interpolate_scalar_3d
+    values = np.zeros((len(points), volumes.shape[-1]), dtype=dtype)
+    for dk, di, dj in (
+        (0, 0, 0),
+        (0, 0, 1),
+        (0, 1, 1),
+        (0, 1, 0),
+        (1, 0, 0),
+        (1, 0, 1),
+        (1, 1, 1),
+        (1, 1, 0),
+    ):
+        corner = base + (dk, di, dj)
+        valid = inside & np.all((corner >= 0) & (corner < shape), axis=-1)
+        w_i = frac[:, 1] if di else one - frac[:, 1]
+        w_j = frac[:, 2] if dj else one - frac[:, 2]
+        w_k = frac[:, 0] if dk else one - frac[:, 0]
+        weight = w_i * w_j * w_k
+        corner = corner[valid]
+        values[valid] += (
+            weight[valid, None] * volumes[corner[:, 0], corner[:, 1], corner[:, 2]]
+        )
+    return values
 
 
 @warning_for_keywords()
@@ -232,10 +436,16 @@ def gaussian_weights(bundle, *, n_points=100, return_mahalnobis=False, stat=np.m
     Mahalanobis distance from the core the bundle, at that node (mean, per
     default).
 
+    The distances of all the nodes are computed at once on the
+    (n_streamlines, n_points, 3) array of resampled coordinates, with one
+    batched inversion of the per-node covariance matrices.
+
     Parameters
     ----------
-    bundle : Streamlines
-        The streamlines to weight.
+    bundle : Streamlines or ndarray
+        The streamlines to weight, or an array of shape
+        (n_streamlines, n_points, 3) of streamlines that all have the same
+        number of points. Float32 coordinates are kept in single precision.
     n_points : int, optional
         The number of points to resample to. *If the `bundle` is an array, this
         input is ignored*.
@@ -254,46 +464,43 @@ def gaussian_weights(bundle, *, n_points=100, return_mahalnobis=False, stat=np.m
         coordinates at that node position across streamlines.
 
     """
-    # Resample to same length for each streamline:
-    bundle = set_number_of_points(bundle, nb_points=n_points)
-
-    # This is the output
-    w = np.zeros((len(bundle), n_points))
+    if isinstance(bundle, np.ndarray) and bundle.ndim == 3:
+        coords = bundle
+    else:
+        # Resample to same length for each streamline:
+        bundle = set_number_of_points(bundle, nb_points=n_points)
+        coords = _as_array(bundle, n_points)
+    if not np.issubdtype(coords.dtype, np.floating):
+        coords = coords.astype(float)
+    n_streamlines = coords.shape[0]
 
     # If there's only one fiber here, it gets the entire weighting:
-    if len(bundle) == 1:
+    if n_streamlines == 1:
         if return_mahalnobis:
             return np.array([np.nan])
         else:
             return np.array([1])
 
-    for node in range(n_points):
-        # This should come back as a 3D covariance matrix with the spatial
-        # variance covariance of this node across the different streamlines
-        # This is a 3-by-3 array:
-        node_coords = bundle._data[node::n_points]
-        c = np.cov(node_coords.T, ddof=0)
-        # Reorganize as an upper diagonal matrix for expected Mahalanobis
-        # input:
-        c = np.array(
-            [[c[0, 0], c[0, 1], c[0, 2]], [0, c[1, 1], c[1, 2]], [0, 0, c[2, 2]]]
-        )
-        # Calculate the mean or median of this node as well
-        # delta = node_coords - np.mean(node_coords, 0)
-        m = stat(node_coords, 0)
-        # Weights are the inverse of the Mahalanobis distance
-        for fn in range(len(bundle)):
-            # In the special case where all the streamlines have the exact same
-            # coordinate in this node, the covariance matrix is all zeros, so
-            # we can't calculate the Mahalanobis distance, we will instead give
-            # each streamline an identical weight, equal to the number of
-            # streamlines:
-            if np.allclose(c, 0):
-                w[:, node] = len(bundle)
-                break
-            # Otherwise, go ahead and calculate Mahalanobis for node on
-            # fiber[fn]:
-            w[fn, node] = mahalanobis(node_coords[fn], m, np.linalg.inv(c))
+    # The spatial variance covariance of each node across the different
+    # streamlines, as an array of shape (n_points, 3, 3):
+    delta = coords - np.mean(coords, 0)
+    c = np.einsum("spi,spj->pij", delta, delta) / n_streamlines
+    # Reorganize as upper diagonal matrices for expected Mahalanobis input:
+    c = np.triu(c)
+    # In the special case where all the streamlines have the exact same
+    # coordinate in a node, the covariance matrix is all zeros, so we can't
+    # calculate the Mahalanobis distance, we will instead give each
+    # streamline an identical weight, equal to the number of streamlines:
+    degenerate = np.all(np.abs(c) <= 1e-8, axis=(1, 2))
+    c[degenerate] = np.eye(3)
+    inv_c = np.linalg.inv(c)
+
+    # Calculate the mean or median of each node as well
+    m = stat(coords, 0)
+    # Weights are the inverse of the Mahalanobis distance
+    delta = coords - m
+    w = np.sqrt(np.einsum("spi,pij,spj->sp", delta, inv_c, delta))
+    w[:, degenerate] = n_streamlines
     if return_mahalnobis:
         return w
     # weighting is inverse to the distance (the further you are, the less you
@@ -313,6 +520,7 @@ def afq_profile(
     profile_stat=np.average,
     orient_by=None,
     weights=None,
+    dtype=np.float64,
     **weights_kwarg,
 ):
     """
@@ -321,10 +529,16 @@ def afq_profile(
 
     Follows the approach outlined in :footcite:p:`Yeatman2012`.
 
+    The streamlines are handled as a single (n_streamlines, n_points, 3)
+    array, and several scalar maps can be profiled at once: the
+    interpolation weights are computed once for all of them.
+
     Parameters
     ----------
-    data : 3D volume
-        The statistic to sample with the streamlines.
+    data : 3D or 4D volume
+        The statistic to sample with the streamlines. A 4D volume holds
+        several scalar maps (e.g. FA, MD, RD) along its last axis, which are
+        all profiled at once.
 
     bundle : StreamLines class instance
         The collection of streamlines (possibly already resampled into an array
@@ -347,6 +561,9 @@ def afq_profile(
         If weights is not None, this must take weights as a keyword argument.
         The default, np.average, is the same as np.mean but takes weights
         as a keyword argument.
+    dtype : data type, optional
+        The floating point precision of the interpolation. ``np.float32``
+        halves the memory used and speeds up large studies.
     weights_kwarg : key-word arguments
         Additional key-word arguments to pass to the weight-calculating
         function. Only to be used if weights is a callable.
@@ -354,7 +571,8 @@ def afq_profile(
     Returns
     -------
     ndarray : a 1D array with the profile of `data` along the length of
-        `bundle`
+        `bundle`, or an array of shape (n_maps, n_points) with the profile of
+        each map for 4D `data`.
 
     Notes
     -----
@@ -374,11 +592,28 @@ def afq_profile(
     if len(bundle) == 0:
         raise ValueError("The bundle contains no streamlines")
 
-    # Resample each streamline to the same number of points:
-    fgarray = set_number_of_points(bundle, nb_points=n_points)
+    data = np.asarray(data)
+    if data.ndim not in (3, 4):
+        raise ValueError("Data needs to have 3 or 4 dimensions")
+    volumes = data.astype(dtype, copy=False)
+    if data.ndim == 3:
+        volumes = volumes[..., None]
 
-    # Extract the values
-    values = np.array(values_from_volume(data, fgarray, affine))
+    # Resample each streamline to the same number of points:
+    if isinstance(bundle, np.ndarray) and bundle.ndim == 3:
+        fgarray = bundle
+    else:
+        fgarray = _as_array(set_number_of_points(bundle, nb_points=n_points), n_points)
+    n_streamlines, n_nodes = fgarray.shape[:2]
+
+    # Extract the values, as an array of shape (n_maps, n_streamlines, n_nodes)
+    inv_affine = np.linalg.inv(affine).astype(dtype)
+    points = fgarray.reshape(-1, 3).astype(dtype, copy=False)
+    points = np.dot(points, inv_affine[:3, :3].T) + inv_affine[:3, 3]
+    values = _trilinear_interpolate(volumes, points)
+    values = values.T.reshape(-1, n_streamlines, n_nodes)
+    if data.ndim == 3:
+        values = values[0]
 
     if weights is not None:
         if callable(weights):
@@ -389,7 +624,10 @@ def afq_profile(
                 raise ValueError(
                     "The sum of weights across streamlines", " must be equal to 1"
                 )
+        weights = np.asarray(weights).astype(dtype, copy=False)
+        if weights.ndim == 2 and values.ndim == 3:
+            weights = np.broadcast_to(weights, values.shape)
 
-        return profile_stat(values, weights=weights, axis=0)
+        return profile_stat(values, weights=weights, axis=-2)
     else:
-        return profile_stat(values, axis=0)
+        return profile_stat(values, axis=-2)
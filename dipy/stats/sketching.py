@@ -1,12 +1,61 @@
-import os
+from concurrent.futures import ThreadPoolExecutor
 import tempfile
+import threading
 
 import numpy as np
 
+from dipy.testing.decorators import warning_for_keywords
+from dipy.utils.omp import determine_num_threads
 
-def count_sketch(matrixa_name, matrixa_dtype, matrixa_shape, sketch_rows, tmp_dir):
+# Number of elements of the matrix A read by each thread at once
+_BLOCK_ELEMENTS = 2**22
+
+
+def _sketch_block(block, hashed_indices, rand_signs):
+    """Sum the signed rows of a block that are hashed to the same sketch row.
+
+    Parameters
+    ----------
+    block : ndarray (n, m)
+        Rows of the matrix A.
+    hashed_indices : ndarray (n,)
+        The sketch row of each row of the block.
+    rand_signs : ndarray (n,)
+        The random sign of each row of the block.
+
+    Returns
+    -------
+    rows : ndarray (k,)
+        The sorted, unique sketch rows of the block.
+    sums : ndarray (k, m)
+        The sum of the signed rows of the block hashed to each of them.
+
+    """
+    order = np.argsort(hashed_indices, kind="stable")
+    rows = hashed_indices[order]
+    seg_start = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    signed = block[order] * rand_signs[order, np.newaxis]
+    return rows[seg_start], np.add.reduceat(signed, seg_start, axis=0)
+
+
+@warning_for_keywords()
+def count_sketch(
+    matrixa_name,
+    matrixa_dtype,
+    matrixa_shape,
+    sketch_rows,
+    tmp_dir,
+    *,
+    rng=None,
+    num_threads=None,
+):
     """Count Sketching algorithm to reduce the size of the matrix.
 
+    The rows of the matrix A are read in blocks, in parallel. The signed rows
+    of each block are summed per sketch row with sorted segment sums, and
+    added to the sketch matrix, whose rows are split in stripes with their
+    own locks so that the threads can update it concurrently.
+
     Parameters
     ----------
     matrixa_name : str
@@ -19,6 +68,15 @@ def count_sketch(matrixa_name, matrixa_dtype, matrixa_shape, sketch_rows, tmp_di
         The number of rows in the sketch matrix.
     tmp_dir : str
         The directory to save the temporary files.
+    rng : numpy.random.Generator, optional
+        Random number generator for the hashes and signs of the rows. If None,
+        the generator is initialized using the default BitGenerator.
+    num_threads : int, optional
+        Number of threads to be used. If None (default), the value of the
+        ``OMP_NUM_THREADS`` environment variable is used if it is set,
+        otherwise all available threads are used. If < 0, the maximal number
+        of threads minus ``|num_threads + 1|`` is used (enter -1 to use as
+        many threads as possible). 0 raises an error.
 
     Returns
     -------
@@ -30,23 +88,17 @@ def count_sketch(matrixa_name, matrixa_dtype, matrixa_shape, sketch_rows, tmp_di
         The shape of the sketch matrix.
 
     """
+    if rng is None:
+        rng = np.random.default_rng()
+    num_threads = determine_num_threads(num_threads)
+
     matrixa = np.squeeze(
-        np.memmap(matrixa_name, dtype=matrixa_dtype, mode="r+", shape=matrixa_shape)
+        np.memmap(matrixa_name, dtype=matrixa_dtype, mode="r", shape=matrixa_shape)
     ).reshape(np.prod(matrixa_shape[:-1]), matrixa_shape[-1])
+    n_rows, n_cols = matrixa.shape
 
-    with tempfile.NamedTemporaryFile(
-        delete=False, dir=tmp_dir, suffix="matrix_t"
-    ) as matrixt_file:
-        matrixt = np.memmap(
-            matrixt_file.name, dtype=matrixa_dtype, mode="w+", shape=matrixa.shape
-        )
-        hashed_indices = np.random.choice(sketch_rows, matrixa.shape[0], replace=True)
-        rand_signs = np.random.choice(2, matrixa.shape[0], replace=True) * 2 - 1
-        for i in range(0, matrixa.shape[0], matrixa.shape[0] // 20):
-            end_index = min(i + matrixa.shape[0] // 20, matrixa.shape[0])
-            matrixt[i:end_index, :] = (
-                matrixa[i:end_index, :] * rand_signs[i:end_index, np.newaxis]
-            )
+    hashed_indices = rng.integers(sketch_rows, size=n_rows)
+    rand_signs = rng.integers(2, size=n_rows, dtype=np.int8) * 2 - 1
 
     with tempfile.NamedTemporaryFile(
         delete=False, dir=tmp_dir, suffix="matrix_C"
@@ -55,11 +107,35 @@ def count_sketch(matrixa_name, matrixa_dtype, matrixa_shape, sketch_rows, tmp_di
             matrixc_file.name,
             dtype=matrixa_dtype,
             mode="w+",
-            shape=(sketch_rows, matrixa.shape[1]),
+            shape=(sketch_rows, n_cols),
         )
-        np.add.at(matrixc, hashed_indices, matrixt)
-        matrixc.flush()
-        matrixt.flush()
-    del matrixt
-    os.unlink(matrixt_file.name)
+
+    n_stripes = 4 * num_threads
+    stripe_bounds = np.linspace(0, sketch_rows, n_stripes + 1).astype(int)
+    locks = [threading.Lock() for _ in range(n_stripes)]
+    block_size = max(_BLOCK_ELEMENTS // max(n_cols, 1), 1)
+
+    def sketch_block(start):
+        end = min(start + block_size, n_rows)
+        rows, sums = _sketch_block(
+            np.asarray(matrixa[start:end]),
+            hashed_indices[start:end],
+            rand_signs[start:end],
+        )
+        cuts = np.searchsorted(rows, stripe_bounds)
+        for stripe in range(n_stripes):
+            lo, hi = cuts[stripe], cuts[stripe + 1]
+            if lo < hi:
+                with locks[stripe]:
+                    matrixc[rows[lo:hi]] += sums[lo:hi]
+
+    starts = range(0, n_rows, block_size)
+    if num_threads == 1:
+        for start in starts:
+            sketch_block(start)
+    else:
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            list(executor.map(sketch_block, starts))
+
+    matrixc.flush()
     return matrixc_file.name, matrixc.dtype, matrixc.shape
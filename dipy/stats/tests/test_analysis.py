@@ -1,8 +1,15 @@
 import numpy as np
 import numpy.testing as npt
 
-from dipy.stats.analysis import afq_profile, buan_profile, gaussian_weights
-from dipy.tracking.streamline import Streamlines
+from dipy.stats.analysis import (
+    afq_profile,
+    assignment_map,
+    buan_group_profiles,
+    buan_profile,
+    buan_profiles,
+    gaussian_weights,
+)
+from dipy.tracking.streamline import Streamlines, set_number_of_points
 
 
 def test_gaussian_weights():
@@ -137,6 +144,42 @@ def test_afq_profile():
     npt.assert_raises(ValueError, afq_profile, data, empty_bundle, np.eye(4))
 
 
+def test_afq_profile_multiple_maps():
+    rng = np.random.default_rng(12)
+    data = rng.random((20, 20, 20, 3))
+    bundle = Streamlines(
+        [
+            np.linspace([2, 5 + i, 5], [17, 5 + i, 15], 30) + rng.uniform(0, 0.5, 3)
+            for i in range(6)
+        ]
+    )
+    affine = np.eye(4)
+    affine[:3, 3] = [0.5, -1, 2]
+
+    for weights in (None, gaussian_weights, np.ones((6, 100)) / 6):
+        profiles = afq_profile(data, bundle, affine, n_points=100, weights=weights)
+        npt.assert_equal(profiles.shape, (3, 100))
+        for ii in range(3):
+            npt.assert_array_almost_equal(
+                profiles[ii],
+                afq_profile(
+                    data[..., ii], bundle, affine, n_points=100, weights=weights
+                ),
+            )
+        profiles32 = afq_profile(
+            data, bundle, affine, n_points=100, weights=weights, dtype=np.float32
+        )
+        npt.assert_equal(profiles32.dtype, np.float32)
+        npt.assert_array_almost_equal(profiles32, profiles, decimal=5)
+
+    # Gaussian weights of an already resampled array of streamlines
+    resampled = np.array(list(set_number_of_points(bundle, nb_points=100)))
+    npt.assert_array_almost_equal(
+        gaussian_weights(resampled), gaussian_weights(bundle, n_points=100)
+    )
+    npt.assert_raises(ValueError, afq_profile, data[0, 0], bundle, affine)
+
+
 def test_buan_profile():
     data = np.ones((40, 40, 40), dtype=float)
 
@@ -182,3 +225,53 @@ def test_buan_profile():
         affine,
         no_disks=10,
     )
+
+
+def test_buan_profiles():
+    rng = np.random.default_rng(42)
+    n_pts = 20
+    x = np.linspace(5, 34, n_pts)
+    base = np.vstack([x, np.ones(n_pts) * 20.0, np.ones(n_pts) * 20.0]).T
+    bundle = Streamlines([base + np.array([0, i, 0]) for i in range(10)])
+    model_bundle = Streamlines([base + np.array([0, -i, 0]) for i in range(10)])
+    orig_bundle = Streamlines(
+        [
+            base + np.array([0, i, 0]) + rng.uniform(-0.3, 0.3, (n_pts, 3))
+            for i in range(10)
+        ]
+    )
+    affine = np.eye(4)
+    affine[:3, 3] = [1, -2, 0.5]
+    metrics = [rng.random((40, 40, 40)) for _ in range(3)]
+    metrics[2][:, :25] = np.nan
+
+    profiles = buan_profiles(
+        model_bundle, bundle, orig_bundle, metrics, affine, no_disks=7
+    )
+    npt.assert_equal(profiles.shape, (3, 7))
+    for metric, profile in zip(metrics, profiles):
+        npt.assert_array_almost_equal(
+            profile,
+            buan_profile(model_bundle, bundle, orig_bundle, metric, affine, no_disks=7),
+        )
+
+    # 4D input and precomputed assignment give the same result
+    assignment = assignment_map(bundle, model_bundle, 7)
+    npt.assert_array_almost_equal(
+        buan_profiles(
+            model_bundle,
+            bundle,
+            orig_bundle,
+            np.stack(metrics, axis=-1),
+            affine,
+            no_disks=7,
+            assignment=assignment,
+        ),
+        profiles,
+    )
+
+    # Group profiles, one subject with two bundles
+    subject = ([model_bundle] * 2, [bundle] * 2, [orig_bundle] * 2, metrics, affine)
+    group = buan_group_profiles([subject, subject], no_disks=7)
+    npt.assert_equal(group.shape, (2, 2, 3, 7))
+    npt.assert_array_almost_equal(group[1, 0], profiles)
@@ -4,6 +4,7 @@ import tempfile
 import numpy as np
 import pytest
 
+from dipy.stats import sketching
 from dipy.stats.sketching import count_sketch
 
 
@@ -137,3 +138,43 @@ def test_count_sketch_with_large_matrix():
         del matrixc
         os.unlink(matrixa_name)
         os.unlink(matrixc_file_name)
+
+
+@pytest.mark.parametrize("num_threads", [1, 3])
+def test_count_sketch_matches_dense_sketch(setup_matrices, monkeypatch, num_threads):
+    """Test the streaming sketch against a dense count sketch."""
+    matrixa_name, matrixa_dtype, matrixa_shape = setup_matrices
+    matrixa = np.memmap(
+        matrixa_name, dtype=matrixa_dtype, mode="r", shape=matrixa_shape
+    )
+    sketch_rows = 10
+
+    # Expected sketch, from the same hashes and signs
+    rng = np.random.default_rng(42)
+    hashed_indices = rng.integers(sketch_rows, size=matrixa_shape[0])
+    rand_signs = rng.integers(2, size=matrixa_shape[0], dtype=np.int8) * 2 - 1
+    expected = np.zeros((sketch_rows, matrixa_shape[1]))
+    np.add.at(expected, hashed_indices, matrixa * rand_signs[:, np.newaxis])
+
+    # Several blocks of rows
+    monkeypatch.setattr(sketching, "_BLOCK_ELEMENTS", 7 * matrixa_shape[1])
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        matrixc_file_name, matrixc_dtype, matrixc_shape = count_sketch(
+            matrixa_name,
+            matrixa_dtype,
+            matrixa_shape,
+            sketch_rows,
+            tmp_dir,
+            rng=np.random.default_rng(42),
+            num_threads=num_threads,
+        )
+        matrixc = np.memmap(
+            matrixc_file_name, dtype=matrixc_dtype, mode="r", shape=matrixc_shape
+        )
+        np.testing.assert_allclose(matrixc, expected)
+
+        # Only the sketch matrix is written to the temporary directory
+        assert os.listdir(tmp_dir) == [os.path.basename(matrixc_file_name)]
+
+        del matrixc
+        os.unlink(matrixc_file_name)
@@ -75,3 +75,86 @@ def _to_voxel_coordinates(streamline, lin_T, offset):
     if inds.min().round(decimals=6) < 0:
         raise IndexError("streamline has points that map to negative voxel indices")
     return inds.astype(np.intp)
+
+
+def _segment_voxel_lengths(points, lin_T, offset, lengths):
+    """Split the segments of a set of streamlines at voxel boundaries.
+
+    This function is an implementation detail of
+    ``dipy.tracking.utils.track_density_map``.
+
+    Parameters
+    ----------
+    points : ndarray, shape (N, 3)
+        The concatenated points of all the streamlines, in the space
+        defined by the affine used to build ``lin_T`` and ``offset``.
+    lin_T : ndarray, shape (3, 3)
+        Transpose of the linear part of the mapping to voxel space, as
+        returned by ``_mapping_to_voxel``.
+    offset : ndarray, shape (3,)
+        Offset part of the mapping to voxel space, as returned by
+        ``_mapping_to_voxel``.
+    lengths : ndarray, shape (S,)
+        The number of points of each streamline.
+
+    Returns
+    -------
+    inds : ndarray, shape (M, 3)
+        Voxel coordinates of each piece of segment.
+    piece_lengths : ndarray, shape (M,)
+        Length of each piece of segment, in the units of ``points``.
+    streamline_ids : ndarray, shape (M,)
+        Index of the streamline each piece of segment belongs to.
+
+    Raises
+    ------
+    IndexError
+        If any of the mapped voxel indices are negative.
+    """
+    vox = np.dot(points, lin_T)
+    vox += offset
+    if len(vox) and vox.min().round(decimals=6) < 0:
+        raise IndexError("streamline has points that map to negative voxel indices")
+
+    # Segments join consecutive points of the same streamline
+    ends = np.cumsum(lengths)
+    is_start = np.ones(len(points), dtype=bool)
+    is_start[ends[lengths > 0] - 1] = False
+    start_idx = np.flatnonzero(is_start[:-1]) if len(points) else np.array([], int)
+    seg_ids = np.repeat(np.arange(len(lengths)), np.maximum(lengths - 1, 0))
+    a = vox[start_idx]
+    b = vox[start_idx + 1]
+    seg_len = np.sqrt(((points[start_idx + 1] - points[start_idx]) ** 2).sum(-1))
+    n_seg = len(start_idx)
+
+    # Parametric positions of the crossings of the integer planes (voxel
+    # boundaries in the shifted voxel space) along each axis
+    t_all = [np.zeros(n_seg), np.ones(n_seg)]
+    s_all = [np.arange(n_seg), np.arange(n_seg)]
+    fa = np.floor(a)
+    fb = np.floor(b)
+    for d in range(3):
+        n_cross = np.abs(fb[:, d] - fa[:, d]).astype(np.intp)
+        total = n_cross.sum()
+        if total == 0:
+            continue
+        s = np.repeat(np.arange(n_seg), n_cross)
+        first = np.cumsum(n_cross) - n_cross
+        rank = np.arange(total) - np.repeat(first, n_cross)
+        lo = np.minimum(fa[:, d], fb[:, d])[s]
+        plane = lo + 1 + rank
+        t_all.append((plane - a[s, d]) / (b[s, d] - a[s, d]))
+        s_all.append(s)
+    t = np.concatenate(t_all)
+    s = np.concatenate(s_all)
+    order = np.lexsort((t, s))
+    t = t[order]
+    s = s[order]
+
+    dt = t[1:] - t[:-1]
+    keep = (s[1:] == s[:-1]) & (dt > 0)
+    s = s[:-1][keep]
+    t_mid = 0.5 * (t[1:] + t[:-1])[keep]
+    dt = dt[keep]
+    mid = a[s] + t_mid[:, None] * (b[s] - a[s])
+    return mid.astype(np.intp), dt * seg_len[s], seg_ids[s]
@@ -182,7 +182,7 @@ cdef class FBCMeasures:
             double [:] score_mp
             int [:] xd_mp, yd_mp, zd_mp
             cnp.npy_intp xd, yd, zd, N, hn
-            double [:, :, :, :, ::1] lut
+            const double [:, :, :, :, ::1] lut
             cnp.npy_intp threads_to_use = -1
 
         threads_to_use = determine_num_threads(num_threads)
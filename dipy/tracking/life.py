@@ -7,17 +7,21 @@ References
 .. footbibliography::
 """
 
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import scipy.linalg as la
 import scipy.sparse as sps
 
 import dipy.core.optimize as opt
+from dipy.core.sphere import HemiSphere
 import dipy.data as dpd
 from dipy.reconst.base import ReconstFit, ReconstModel
 from dipy.testing.decorators import warning_for_keywords
 from dipy.tracking.streamline import transform_streamlines
 from dipy.tracking.utils import unique_rows
 from dipy.tracking.vox2track import _voxel2streamline
+from dipy.utils.omp import determine_num_threads
 
 
 def gradient(f):
@@ -120,6 +124,38 @@ def streamline_gradients(streamline):
     return np.array(gradient(np.asarray(streamline))[0])
 
 
+def _streamlines_gradients(points, offsets, lengths):
+    """
+    Calculate the gradients of many streamlines along the spatial dimension
+
+    This is a vectorized version of :func:`streamline_gradients` operating on
+    the concatenated nodes of several streamlines.
+
+    Parameters
+    ----------
+    points : ndarray, shape (N, 3)
+        The concatenated nodes of all the streamlines.
+    offsets : ndarray
+        The index of the first node of each streamline in `points`.
+    lengths : ndarray
+        The number of nodes of each streamline. All the streamlines must have
+        at least two nodes.
+
+    Returns
+    -------
+    grad : ndarray, shape (N, 3)
+        Spatial gradients along the length of each streamline.
+    """
+    grad = np.empty_like(points)
+    # Central differences in the interior, first differences at the endpoints
+    grad[1:-1] = (points[2:] - points[:-2]) / 2.0
+    first = offsets
+    last = offsets + lengths - 1
+    grad[first] = points[first + 1] - points[first]
+    grad[last] = points[last] - points[last - 1]
+    return grad
+
+
 def grad_tensor(grad, evals):
     """
     Calculate the 3 by 3 tensor for a given spatial gradient,
@@ -272,14 +308,53 @@ class LifeSignalMaker:
         """
         idx = self.sphere.find_closest(xyz)
         if idx not in self._calculated:
-            bvecs = self.gtab.bvecs[~self.gtab.b0s_mask]
-            bvals = self.gtab.bvals[~self.gtab.b0s_mask]
-            tensor = grad_tensor(self.sphere.vertices[idx], self.evals)
-            ADC = np.diag(np.linalg.multi_dot([bvecs, tensor, bvecs.T]))
-            sig = np.exp(-bvals * ADC)
-            sig = sig - np.mean(sig)
-            self.signal[idx] = sig
-            self._calculated.append(idx)
+            self._calc_vertex_signal(idx)
+
+        return self.signal[idx]
+
+    def _calc_vertex_signal(self, idx):
+        """Compute and cache the signal of the sphere vertex `idx`."""
+        bvecs = self.gtab.bvecs[~self.gtab.b0s_mask]
+        bvals = self.gtab.bvals[~self.gtab.b0s_mask]
+        tensor = grad_tensor(self.sphere.vertices[idx], self.evals)
+        ADC = np.diag(np.linalg.multi_dot([bvecs, tensor, bvecs.T]))
+        sig = np.exp(-bvals * ADC)
+        sig = sig - np.mean(sig)
+        self.signal[idx] = sig
+        self._calculated.append(idx)
+
+    @warning_for_keywords()
+    def calc_signals(self, xyz, *, block_size=10000):
+        """
+        Calculate the signal for many positions at once.
+
+        Parameters
+        ----------
+        xyz : ndarray, shape (N, 3)
+            Points in 3D space (x, y, z coordinates) used to find the
+            closest vertices of the sphere for signal calculation.
+        block_size : int, optional
+            Number of points matched against the sphere vertices at once.
+            Bounds the memory used by the (block_size, n_vertices) table of
+            cosine similarities.
+
+        Returns
+        -------
+        signal : ndarray, shape (N, M)
+            The precomputed signal at the closest sphere vertex to each
+            position.
+        """
+        xyz = np.asarray(xyz, dtype=float)
+        idx = np.empty(len(xyz), dtype=np.intp)
+        for start in range(0, len(xyz), block_size):
+            cos_sim = np.dot(xyz[start : start + block_size], self.sphere.vertices.T)
+            if isinstance(self.sphere, HemiSphere):
+                cos_sim = np.abs(cos_sim)
+            idx[start : start + block_size] = np.argmax(cos_sim, axis=-1)
+
+        for this_idx in np.unique(idx):
+            if this_idx not in self._calculated:
+                self._calc_vertex_signal(this_idx)
 
         return self.signal[idx]
 
@@ -370,12 +445,26 @@ class FiberModel(ReconstModel):
         ReconstModel.__init__(self, gtab)
 
     @warning_for_keywords()
-    def setup(self, streamline, affine, *, evals=(0.001, 0, 0), sphere=None):
+    def setup(
+        self,
+        streamline,
+        affine,
+        *,
+        evals=(0.001, 0, 0),
+        sphere=None,
+        chunk_size=1000,
+        num_threads=None,
+    ):
         """
         Set up the necessary components for the LiFE model: the matrix of
         fiber-contributions to the DWI signal, and the coordinates of voxels
         for which the equations will be solved
 
+        The node-to-voxel assignment is computed for all the streamlines at
+        once. The fiber signals of each chunk of streamlines are then summed
+        per voxel with a segmented reduction, the chunks being processed in
+        parallel.
+
         Parameters
         ----------
         streamline : list
@@ -393,60 +482,90 @@ class FiberModel(ReconstModel):
             gradients along the streamlines to calculate the matrix, instead of
             an approximation. Defaults to use the 724-vertex symmetric sphere
             from :mod:`dipy.data`
+        chunk_size : int, optional
+            Number of streamlines processed together. Bounds the memory used
+            for the signals of the nodes.
+        num_threads : int, optional
+            Number of threads to be used. If None (default), the value of
+            the ``OMP_NUM_THREADS`` environment variable is used if it is set,
+            otherwise all available threads are used. If < 0, the maximal
+            number of threads minus ``|num_threads + 1|`` is used (enter -1 to
+            use as many threads as possible). 0 raises an error.
 
         """
         if sphere is not False:
             SignalMaker = LifeSignalMaker(self.gtab, evals=evals, sphere=sphere)
 
         streamline = transform_streamlines(streamline, affine)
+        lengths = np.array([len(s) for s in streamline], dtype=np.intp)
+        if np.any(lengths < 2):
+            raise IndexError("All streamlines must have at least two nodes.")
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.intp)
         # Assign some local variables, for shorthand:
-        all_coords = np.concatenate(streamline)
-        vox_coords = unique_rows(np.round(all_coords).astype(np.intp))
-        del all_coords
+        all_coords = np.concatenate(streamline).astype(float)
+        node_coords = np.round(all_coords).astype(np.intp)
+        vox_coords = unique_rows(node_coords)
+
+        # Index of the voxel of each node in vox_coords:
+        corner = vox_coords.min(0)
+        dims = vox_coords.max(0) - corner + 1
+        vox_lin = np.ravel_multi_index((vox_coords - corner).T, dims)
+        sorter = np.argsort(vox_lin)
+        node_lin = np.ravel_multi_index((node_coords - corner).T, dims)
+        node_vox = sorter[np.searchsorted(vox_lin, node_lin, sorter=sorter)]
+        del node_coords, node_lin
+
         # We only consider the diffusion-weighted signals:
         n_bvecs = self.gtab.bvals[~self.gtab.b0s_mask].shape[0]
-        v2f, v2fn = voxel2streamline(streamline, np.eye(4), unique_idx=vox_coords)
-        # How many fibers in each voxel (this will determine how many
-        # components are in the matrix):
-        n_unique_f = len(np.hstack(list(v2f.values())))
-        # Preallocate these, which will be used to generate the sparse
-        # matrix:
-        f_matrix_sig = np.zeros(n_unique_f * n_bvecs, dtype=float)
-        f_matrix_row = np.zeros(n_unique_f * n_bvecs, dtype=np.intp)
-        f_matrix_col = np.zeros(n_unique_f * n_bvecs, dtype=np.intp)
-
-        fiber_signal = []
-        for _, s in enumerate(streamline):
+        n_vox = vox_coords.shape[0]
+
+        def chunk_triplets(first):
+            last = min(first + chunk_size, len(lengths))
+            node_start = offsets[first]
+            node_end = offsets[last - 1] + lengths[last - 1]
+            chunk_lengths = lengths[first:last]
+            chunk_offsets = offsets[first:last] - node_start
+            points = all_coords[node_start:node_end]
+
             if sphere is not False:
-                fiber_signal.append(SignalMaker.streamline_signal(s))
+                grad = _streamlines_gradients(points, chunk_offsets, chunk_lengths)
+                node_sig = SignalMaker.calc_signals(grad)
             else:
-                fiber_signal.append(streamline_signal(s, self.gtab, evals=evals))
+                node_sig = np.concatenate(
+                    [
+                        streamline_signal(points[o : o + n], self.gtab, evals=evals)
+                        for o, n in zip(chunk_offsets, chunk_lengths)
+                    ]
+                )
+
+            # Sum the signal of the nodes of each fiber in each voxel:
+            f_idx = np.repeat(np.arange(first, last), chunk_lengths)
+            key = f_idx * n_vox + node_vox[node_start:node_end]
+            order = np.argsort(key, kind="stable")
+            key = key[order]
+            seg_start = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+            vox_fiber_sig = np.add.reduceat(node_sig[order], seg_start, axis=0)
+            f_col, v_idx = np.divmod(key[seg_start], n_vox)
+
+            rows = (v_idx[:, None] * n_bvecs + np.arange(n_bvecs)).ravel()
+            cols = np.repeat(f_col, n_bvecs)
+            return vox_fiber_sig.ravel(), rows, cols
+
+        chunk_starts = range(0, len(lengths), chunk_size)
+        num_threads = determine_num_threads(num_threads)
+        if num_threads == 1:
+            triplets = [chunk_triplets(first) for first in chunk_starts]
+        else:
+            with ThreadPoolExecutor(max_workers=num_threads) as executor:
+                triplets = list(executor.map(chunk_triplets, chunk_starts))
 
         del streamline
         if sphere is not False:
             del SignalMaker
 
-        keep_ct = 0
-        range_bvecs = np.arange(n_bvecs).astype(int)
-        # In each voxel:
-        for v_idx in range(vox_coords.shape[0]):
-            mat_row_idx = (range_bvecs + v_idx * n_bvecs).astype(np.intp)
-            # For each fiber in that voxel:
-            for f_idx in v2f[v_idx]:
-                # For each fiber-voxel combination, store the row/column
-                # indices in the pre-allocated linear arrays
-                f_matrix_row[keep_ct : keep_ct + n_bvecs] = mat_row_idx
-                f_matrix_col[keep_ct : keep_ct + n_bvecs] = f_idx
-
-                vox_fiber_sig = np.zeros(n_bvecs)
-                for node_idx in v2fn[f_idx][v_idx]:
-                    # Sum the signal from each node of the fiber in that voxel:
-                    vox_fiber_sig += fiber_signal[f_idx][node_idx]
-                # And add the summed thing into the corresponding rows:
-                f_matrix_sig[keep_ct : keep_ct + n_bvecs] += vox_fiber_sig
-                keep_ct = keep_ct + n_bvecs
-
-        del v2f, v2fn
+        f_matrix_sig, f_matrix_row, f_matrix_col = (
+            np.concatenate(t) for t in zip(*triplets)
+        )
         # Allocate the sparse matrix, using the more memory-efficient 'csr'
         # format:
         life_matrix = sps.csr_array((f_matrix_sig, [f_matrix_row, f_matrix_col]))
@@ -481,7 +600,19 @@ class FiberModel(ReconstModel):
         return (to_fit, weighted_signal, b0_signal, relative_signal, mean_sig, vox_data)
 
     @warning_for_keywords()
-    def fit(self, data, streamline, affine, *, evals=(0.001, 0, 0), sphere=None):
+    def fit(
+        self,
+        data,
+        streamline,
+        affine,
+        *,
+        evals=(0.001, 0, 0),
+        sphere=None,
+        num_threads=None,
+        solver="gradient",
+        beta0=None,
+        solver_options=None,
+    ):
         """
         Fit the LiFE FiberModel for data and a set of streamlines associated
         with this data
@@ -504,6 +635,21 @@ class FiberModel(ReconstModel):
             problem, but is not as accurate. If `False`, we use the exact
             gradients along the streamlines to calculate the matrix, instead of
             an approximation.
+        num_threads : int, optional
+            Number of threads used to set up the model (see
+            :meth:`FiberModel.setup`) and, with the "fista" solver, for the
+            sparse matrix-vector products.
+        solver : str, optional
+            The non-negative least-squares solver. "gradient" uses
+            :func:`dipy.core.optimize.sparse_nnls` and "fista" uses the
+            accelerated, multithreaded
+            :func:`dipy.core.optimize.sparse_nnls_fista`.
+        beta0 : array, optional
+            Initial weights of the streamlines, e.g. the ``beta`` of a previous
+            fit (warm start). Only used with the "fista" solver.
+        solver_options : dict, optional
+            Additional keyword arguments passed to the solver, e.g. ``tol`` or
+            ``callback`` for the "fista" solver.
 
         Returns
         -------
@@ -518,12 +664,26 @@ class FiberModel(ReconstModel):
                 " The LiFE model cannot be fit with these streamlines included."
             )
         life_matrix, vox_coords = self.setup(
-            streamline, affine, evals=evals, sphere=sphere
+            streamline, affine, evals=evals, sphere=sphere, num_threads=num_threads
         )
         (to_fit, weighted_signal, b0_signal, relative_signal, mean_sig, vox_data) = (
             self._signals(data, vox_coords)
         )
-        beta = opt.sparse_nnls(to_fit, life_matrix)
+        solver_options = solver_options or {}
+        if solver == "gradient":
+            beta = opt.sparse_nnls(to_fit, life_matrix, **solver_options)
+        elif solver == "fista":
+            beta = opt.sparse_nnls_fista(
+                to_fit,
+                life_matrix,
+                beta0=beta0,
+                num_threads=num_threads,
+                **solver_options,
+            )
+        else:
+            raise ValueError(
+                f"Invalid solver '{solver}', expected 'gradient' or 'fista'."
+            )
         return FiberFit(
             self,
             life_matrix,
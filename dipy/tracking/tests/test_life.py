@@ -125,6 +125,45 @@ def test_FiberModel_init():
         )
 
 
+def test_FiberModel_setup_matrix():
+    data_file, bval_file, bvec_file = dpd.get_fnames(name="small_64D")
+    bvals, bvecs = read_bvals_bvecs(bval_file, bvec_file)
+    gtab = grad.gradient_table(bvals, bvecs=bvecs)
+    FM = life.FiberModel(gtab)
+    rng = np.random.default_rng(2024)
+    streamline = [
+        np.cumsum(rng.uniform(-0.7, 0.7, (n, 3)), 0) + 5 for n in (2, 5, 9, 12, 7)
+    ]
+    n_bvecs = np.sum(~gtab.b0s_mask)
+
+    for sphere in [None, False]:
+        maker = life.LifeSignalMaker(gtab)
+        # Reference matrix, summing the signal of the nodes of each fiber in
+        # each voxel one at a time:
+        _, vox_coords = FM.setup(streamline, np.eye(4), sphere=sphere)
+        v2f, v2fn = life.voxel2streamline(streamline, np.eye(4), unique_idx=vox_coords)
+        expected = np.zeros((len(vox_coords) * n_bvecs, len(streamline)))
+        for f_idx, s in enumerate(streamline):
+            if sphere is False:
+                sig = life.streamline_signal(s, gtab)
+            else:
+                sig = maker.streamline_signal(s)
+            for v_idx, nodes in v2fn[f_idx].items():
+                rows = slice(v_idx * n_bvecs, (v_idx + 1) * n_bvecs)
+                expected[rows, f_idx] = sig[nodes].sum(0)
+
+        for num_threads, chunk_size in [(1, 1000), (2, 2), (3, 1)]:
+            fiber_matrix, vc = FM.setup(
+                streamline,
+                np.eye(4),
+                sphere=sphere,
+                chunk_size=chunk_size,
+                num_threads=num_threads,
+            )
+            npt.assert_array_equal(vc, vox_coords)
+            npt.assert_array_almost_equal(fiber_matrix.toarray(), expected)
+
+
 def test_FiberFit():
     data_file, bval_file, bvec_file = dpd.get_fnames(name="small_64D")
     data = load_nifti_data(data_file)
@@ -183,3 +222,30 @@ def test_fit_data():
     npt.assert_(np.median(model_rmse) < np.median(matlab_rmse))
     # And a moderate correlation with the Matlab implementation weights:
     npt.assert_(np.corrcoef(matlab_weights, life_fit.beta)[0, 1] > 0.6)
+
+    # The accelerated solver reaches a lower objective, also from a warm start
+    fista_fit = life_model.fit(
+        data, tensor_streamlines_vox, np.eye(4), solver="fista", num_threads=2
+    )
+    npt.assert_(np.all(fista_fit.beta >= 0))
+
+    def sse(fit):
+        return np.sum((opt.spdot(fit.life_matrix, fit.beta) - fit.fit_data) ** 2)
+
+    npt.assert_(sse(fista_fit) <= sse(life_fit))
+    warm_fit = life_model.fit(
+        data,
+        tensor_streamlines_vox,
+        np.eye(4),
+        solver="fista",
+        beta0=fista_fit.beta,
+    )
+    npt.assert_array_almost_equal(warm_fit.beta, fista_fit.beta, decimal=3)
+    npt.assert_raises(
+        ValueError,
+        life_model.fit,
+        data,
+        tensor_streamlines_vox,
+        np.eye(4),
+        solver="bad",
+    )
@@ -27,6 +27,7 @@ from dipy.tracking.utils import (
     seeds_from_mask,
     target,
     target_line_based,
+    track_density_map,
     unique_rows,
 )
 from dipy.tracking.vox2track import streamline_mapping
@@ -86,6 +87,71 @@ def test_density_map():
     npt.assert_array_equal(dm, expected)
 
 
+def test_track_density_map():
+    streamlines = [
+        np.array([np.arange(10)] * 3).T.astype(float),
+        np.ones((5, 3)),
+        np.array([[0.0, 0, 0], [0, 0, 0], [4.0, 0, 0]]),
+    ]
+    shape = (10, 10, 10)
+    affine = np.eye(4)
+
+    # "unique" matches density_map, for sequences and generators
+    expected = density_map(streamlines, affine, shape)
+    for num_threads in (1, 2):
+        for chunk_size in (1, 2, 10):
+            dm = track_density_map(
+                iter(streamlines),
+                affine,
+                shape,
+                chunk_size=chunk_size,
+                num_threads=num_threads,
+            )
+            npt.assert_array_equal(dm, expected)
+
+    # "points" counts every point
+    dm = track_density_map(streamlines, affine, shape, mode="points")
+    npt.assert_equal(dm.sum(), sum(len(sl) for sl in streamlines))
+    npt.assert_equal(dm[1, 1, 1], 6)
+    npt.assert_equal(dm[0, 0, 0], 3)
+
+    # "length" splits segments at voxel boundaries
+    dm = track_density_map(streamlines, affine, shape, mode="length")
+    total = sum(metrics.length(sl) for sl in streamlines)
+    npt.assert_almost_equal(dm.sum(), total)
+    npt.assert_almost_equal(dm[2, 0, 0], 1.0)
+    npt.assert_almost_equal(dm[0, 0, 0], np.sqrt(3) / 2 + 0.5)
+    npt.assert_almost_equal(dm[4, 0, 0], 0.5)
+
+    # Weights scale the contribution of each streamline
+    weights = np.array([1.0, 2.0, 0.5])
+    dm = track_density_map(
+        streamlines, affine, shape, weights=weights, chunk_size=2, num_threads=2
+    )
+    npt.assert_almost_equal(dm[1, 1, 1], 3.0)
+    npt.assert_almost_equal(dm[3, 0, 0], 0.0)
+    npt.assert_almost_equal(dm[0, 0, 0], 1.5)
+    npt.assert_raises(
+        ValueError, track_density_map, streamlines, affine, shape, weights=[1, 2]
+    )
+
+    # Super-resolution grid: halving the voxel size keeps the total length
+    affine_sr = np.diag([0.5, 0.5, 0.5, 1.0])
+    affine_sr[:3, 3] = -0.25
+    dm = track_density_map(streamlines, affine_sr, (20, 20, 20), mode="length")
+    npt.assert_almost_equal(dm.sum(), total)
+
+    npt.assert_raises(
+        ValueError, track_density_map, streamlines, affine, shape, mode="bad"
+    )
+    npt.assert_raises(
+        IndexError, track_density_map, [np.array([[0, 0, 20.0]])], affine, shape
+    )
+    npt.assert_raises(
+        IndexError, track_density_map, [np.array([[0, 0, -2.0]])], affine, shape
+    )
+
+
 def test_to_voxel_coordinates_precision():
     # To simplify tests, use an identity affine. This would be the result of
     # a call to _mapping_to_voxel with another identity affine.
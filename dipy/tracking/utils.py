@@ -48,8 +48,10 @@ And the letters A-D represent the following points in
 """
 
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
-from itertools import combinations
+from itertools import combinations, islice
+import threading
 from warnings import warn
 
 from nibabel.affines import apply_affine
@@ -62,8 +64,13 @@ from dipy.testing.decorators import warning_for_keywords
 from dipy.tracking import metrics
 
 # Import helper functions shared with vox2track
-from dipy.tracking._utils import _mapping_to_voxel, _to_voxel_coordinates
+from dipy.tracking._utils import (
+    _mapping_to_voxel,
+    _segment_voxel_lengths,
+    _to_voxel_coordinates,
+)
 from dipy.tracking.vox2track import _streamlines_in_mask
+from dipy.utils.omp import determine_num_threads
 
 
 def density_map(streamlines, affine, vol_dims):
@@ -109,6 +116,162 @@ def density_map(streamlines, affine, vol_dims):
     return counts
 
 
+def _track_density_chunk(chunk, weights, lin_T, offset, vol_dims, mode):
+    """Compute the sparse track density of a chunk of streamlines.
+
+    Returns the unique linear voxel indices touched by the chunk and the
+    corresponding accumulated values.
+    """
+    lengths = np.array([len(sl) for sl in chunk], dtype=np.intp)
+    points = np.concatenate([np.asarray(sl, dtype=float) for sl in chunk])
+
+    if mode == "length":
+        inds, values, sl_ids = _segment_voxel_lengths(points, lin_T, offset, lengths)
+    else:
+        inds = _to_voxel_coordinates(points, lin_T, offset)
+        sl_ids = np.repeat(np.arange(len(chunk)), lengths)
+        values = None
+
+    if np.any(inds >= vol_dims):
+        raise IndexError("streamline has points that map outside of the volume")
+    lin = np.ravel_multi_index(inds.T, vol_dims)
+
+    if mode == "unique":
+        # Count each streamline at most once per voxel
+        n_vox = np.prod(vol_dims, dtype=np.int64)
+        key = np.unique(sl_ids * n_vox + lin)
+        sl_ids, lin = np.divmod(key, n_vox)
+
+    if weights is not None:
+        w = weights[sl_ids]
+        values = w if values is None else values * w
+
+    lin, inverse = np.unique(lin, return_inverse=True)
+    return lin, np.bincount(inverse, weights=values, minlength=len(lin))
+
+
+def track_density_map(
+    streamlines,
+    affine,
+    vol_dims,
+    *,
+    mode="unique",
+    weights=None,
+    chunk_size=10000,
+    num_threads=None,
+):
+    """Compute a track density image (TDI) from a stream of streamlines.
+
+    The streamlines are consumed lazily, ``chunk_size`` at a time, so any
+    iterable can be used, e.g. the generator returned by a tracking object or
+    the streamlines of a tractogram loaded with ``lazy_load=True``. Chunks are
+    processed by a pool of threads, each accumulating into its own volume.
+    The per-thread volumes are summed at the end.
+
+    Parameters
+    ----------
+    streamlines : iterable
+        A sequence of streamlines. Each streamline should be a (N, 3) array.
+    affine : array_like (4, 4)
+        The mapping from voxel coordinates to streamline points.
+        The voxel_to_rasmm matrix, typically from a NIFTI file.
+    vol_dims : 3 ints
+        The shape of the volume to be returned. Use a finer grid (and the
+        corresponding affine) to compute super-resolution maps.
+    mode : str, optional
+        How each streamline contributes to the voxels it visits:
+
+        - ``"points"``: the number of streamline points in each voxel.
+        - ``"unique"``: the number of unique streamlines visiting each voxel,
+          based on the streamline points. This is what ``density_map``
+          computes.
+        - ``"length"``: the length of streamline within each voxel, computed
+          from the exact intersections of the segments with the voxel grid.
+          Voxels crossed by a segment are counted even when no point lies in
+          them.
+    weights : array_like (S,), optional
+        A weight for each of the S streamlines, e.g. from a filtering
+        method. The contribution of each streamline is multiplied by its
+        weight.
+    chunk_size : int, optional
+        Number of streamlines processed at once by each thread.
+    num_threads : int, optional
+        Number of threads to be used. If None (default), the value of the
+        ``OMP_NUM_THREADS`` environment variable is used if it is set,
+        otherwise all available threads are used. If < 0, the maximal number
+        of threads minus ``|num_threads + 1|`` is used (enter -1 to use as
+        many threads as possible). 0 raises an error.
+
+    Returns
+    -------
+    image_volume : ndarray, shape=vol_dims
+        The track density. The dtype is ``int`` for the ``"points"`` and
+        ``"unique"`` modes without weights, ``float`` otherwise.
+
+    Raises
+    ------
+    IndexError
+        When the points of the streamlines lie outside of the return volume.
+
+    See Also
+    --------
+    density_map
+
+    """
+    if mode not in ("points", "unique", "length"):
+        raise ValueError(
+            f"Invalid mode '{mode}', expected 'points', 'unique' or 'length'."
+        )
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer.")
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)
+
+    vol_dims = tuple(int(d) for d in vol_dims)
+    lin_T, offset = _mapping_to_voxel(affine)
+    num_threads = determine_num_threads(num_threads)
+    as_float = mode == "length" or weights is not None
+
+    source = iter(streamlines)
+    lock = threading.Lock()
+    state = {"start": 0}
+
+    def next_chunk():
+        with lock:
+            chunk = list(islice(source, chunk_size))
+            start = state["start"]
+            state["start"] += len(chunk)
+        return start, chunk
+
+    def accumulate():
+        volume = np.zeros(np.prod(vol_dims), dtype=float if as_float else np.int64)
+        start, chunk = next_chunk()
+        while chunk:
+            chunk_weights = None
+            if weights is not None:
+                chunk_weights = weights[start : start + len(chunk)]
+                if len(chunk_weights) != len(chunk):
+                    raise ValueError("weights must have one value for each streamline.")
+            lin, values = _track_density_chunk(
+                chunk, chunk_weights, lin_T, offset, vol_dims, mode
+            )
+            # Indices are unique, so fancy indexing accumulates correctly
+            volume[lin] += values if as_float else values.astype(np.int64)
+            start, chunk = next_chunk()
+        return volume
+
+    if num_threads == 1:
+        volume = accumulate()
+    else:
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            futures = [executor.submit(accumulate) for _ in range(num_threads)]
+            volume = sum(f.result() for f in futures)
+
+    if weights is not None and state["start"] != len(weights):
+        raise ValueError("weights must have one value for each streamline.")
+    return volume.reshape(vol_dims)
+
+
 @warning_for_keywords()
 def connectivity_matrix(
     streamlines,